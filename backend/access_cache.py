@@ -0,0 +1,309 @@
+# backend/access_cache.py
+# -*- coding: utf-8 -*-
+"""
+源表访问缓存（原 mapping_config.db 中 access_cache 单列 JSON）：
+- 独立存放在 access_cache.db，不再挤占每次读配置都要打开的 mapping_config.db；
+- 每张表按 CHUNK_ROWS 行切块，每块单独序列化（有 msgpack 用 msgpack，否则 JSON）并 zlib 压缩；
+- 读取可按块流式迭代（iter_access_cache），或按 offset/limit 只解压涉及的块；
+- 写入逐块进行，可直接接收生成器；同一表重写在一个事务内替换；
+- 总压缩字节数超过 CACHE_BUDGET_BYTES 时按最近访问时间淘汰（LRU），刚写入的表不参与本轮淘汰。
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+CACHE_DB = Path("access_cache.db")
+CHUNK_ROWS = 1000
+ZLIB_LEVEL = 3
+# 全部缓存（压缩后）字节上限，<=0 表示不限
+CACHE_BUDGET_BYTES = 512 * 1024 * 1024
+
+_LOCAL = threading.local()
+_INIT_LOCK = threading.Lock()
+_READY = False
+
+try:
+    import msgpack  # type: ignore
+except Exception:
+    msgpack = None
+
+
+def _conn():
+    conn = getattr(_LOCAL, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(str(CACHE_DB), timeout=30, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        except Exception:
+            pass
+        _LOCAL.conn = conn
+    return conn
+
+
+def init_access_cache_db():
+    global _READY
+    with _INIT_LOCK:
+        conn = _conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source_kind TEXT NOT NULL,
+                conn_key TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                chunk_rows INTEGER NOT NULL,
+                n_rows INTEGER DEFAULT 0,
+                n_chunks INTEGER DEFAULT 0,
+                nbytes INTEGER DEFAULT 0,
+                updated_at INTEGER,
+                accessed_at REAL,
+                UNIQUE(source_kind, conn_key, table_name)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache_chunks (
+                entry_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                blob BLOB NOT NULL,
+                PRIMARY KEY (entry_id, seq)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed ON cache_entries(accessed_at)")
+        conn.commit()
+        _READY = True
+
+
+def _ensure():
+    if not _READY:
+        init_access_cache_db()
+
+
+# ---------------- 编解码 ----------------
+def _codec() -> str:
+    return "msgpack+zlib" if msgpack is not None else "json+zlib"
+
+
+def _encode(rows: List[Dict[str, Any]], codec: str) -> bytes:
+    if codec == "msgpack+zlib":
+        raw = msgpack.packb(rows, use_bin_type=True, default=str)
+    else:
+        raw = json.dumps(rows, ensure_ascii=False, default=str).encode("utf-8")
+    return zlib.compress(raw, ZLIB_LEVEL)
+
+
+def _decode(blob: bytes, codec: str) -> List[Dict[str, Any]]:
+    raw = zlib.decompress(blob)
+    if codec == "msgpack+zlib":
+        if msgpack is None:
+            raise RuntimeError("缓存由 msgpack 写入，但当前环境未安装 msgpack")
+        return msgpack.unpackb(raw, raw=False)
+    return json.loads(raw.decode("utf-8"))
+
+
+def _key(source_kind: str, conn_key: str, table_name: str) -> Tuple[str, str, str]:
+    return (source_kind or "", conn_key or "", table_name or "")
+
+
+def _entry(cur, key: Tuple[str, str, str]) -> Optional[Tuple[int, str, int, int, int]]:
+    cur.execute(
+        "SELECT id, codec, chunk_rows, n_rows, n_chunks FROM cache_entries WHERE source_kind=? AND conn_key=? AND table_name=?",
+        key,
+    )
+    return cur.fetchone()
+
+
+def _touch(entry_id: int):
+    try:
+        conn = _conn()
+        conn.execute("UPDATE cache_entries SET accessed_at=? WHERE id=?", (time.time(), entry_id))
+        conn.commit()
+    except Exception as e:
+        print("[access_cache touch error]", e)
+
+
+# ---------------- 写入 / 淘汰 ----------------
+def set_access_cache(source_kind: str, conn_key: str, table_name: str, rows: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    逐块压缩写入整表（rows 可为列表或生成器），替换同键旧缓存；
+    返回 {"rows", "chunks", "bytes"}。写入后按字节预算淘汰其它表。
+    """
+    _ensure()
+    key = _key(source_kind, conn_key, table_name)
+    codec = _codec()
+    conn = _conn()
+    cur = conn.cursor()
+    n_rows = n_chunks = nbytes = 0
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        old = _entry(cur, key)
+        if old:
+            cur.execute("DELETE FROM cache_chunks WHERE entry_id=?", (old[0],))
+            cur.execute("DELETE FROM cache_entries WHERE id=?", (old[0],))
+        now = time.time()
+        cur.execute(
+            "INSERT INTO cache_entries(source_kind, conn_key, table_name, codec, chunk_rows, updated_at, accessed_at) VALUES(?,?,?,?,?,?,?)",
+            key + (codec, CHUNK_ROWS, int(now), now),
+        )
+        entry_id = cur.lastrowid
+        buf: List[Dict[str, Any]] = []
+        for r in rows:
+            buf.append(r)
+            if len(buf) >= CHUNK_ROWS:
+                blob = _encode(buf, codec)
+                cur.execute("INSERT INTO cache_chunks(entry_id, seq, blob) VALUES(?,?,?)", (entry_id, n_chunks, blob))
+                n_rows += len(buf)
+                n_chunks += 1
+                nbytes += len(blob)
+                buf = []
+        if buf:
+            blob = _encode(buf, codec)
+            cur.execute("INSERT INTO cache_chunks(entry_id, seq, blob) VALUES(?,?,?)", (entry_id, n_chunks, blob))
+            n_rows += len(buf)
+            n_chunks += 1
+            nbytes += len(blob)
+        cur.execute(
+            "UPDATE cache_entries SET n_rows=?, n_chunks=?, nbytes=? WHERE id=?",
+            (n_rows, n_chunks, nbytes, entry_id),
+        )
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    evict(keep=key)
+    return {"rows": n_rows, "chunks": n_chunks, "bytes": nbytes}
+
+
+def evict(budget: Optional[int] = None, keep: Optional[Tuple[str, str, str]] = None) -> int:
+    """按最近访问时间淘汰，直到总字节数不超过 budget（默认 CACHE_BUDGET_BYTES）；返回淘汰的表数"""
+    _ensure()
+    budget = CACHE_BUDGET_BYTES if budget is None else int(budget)
+    if budget <= 0:
+        return 0
+    conn = _conn()
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(SUM(nbytes), 0) FROM cache_entries")
+    total = int(cur.fetchone()[0] or 0)
+    if total <= budget:
+        return 0
+    cur.execute("SELECT id, source_kind, conn_key, table_name, nbytes FROM cache_entries ORDER BY accessed_at ASC")
+    victims = []
+    for entry_id, kind, ck, tn, nb in cur.fetchall():
+        if total <= budget:
+            break
+        if keep is not None and (kind, ck, tn) == keep:
+            continue
+        victims.append(entry_id)
+        total -= int(nb or 0)
+    if not victims:
+        return 0
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for entry_id in victims:
+            cur.execute("DELETE FROM cache_chunks WHERE entry_id=?", (entry_id,))
+            cur.execute("DELETE FROM cache_entries WHERE id=?", (entry_id,))
+        conn.commit()
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        print("[access_cache evict error]", e)
+        return 0
+    return len(victims)
+
+
+def clear_access_cache(source_kind: str = None, conn_key: str = None) -> int:
+    _ensure()
+    conn = _conn()
+    cur = conn.cursor()
+    if source_kind and conn_key:
+        where, args = "WHERE source_kind=? AND conn_key=?", (source_kind, conn_key)
+    elif source_kind:
+        where, args = "WHERE source_kind=?", (source_kind,)
+    else:
+        where, args = "", ()
+    cur.execute(f"DELETE FROM cache_chunks WHERE entry_id IN (SELECT id FROM cache_entries {where})", args)
+    cur.execute(f"DELETE FROM cache_entries {where}", args)
+    n = cur.rowcount or 0
+    conn.commit()
+    return n
+
+
+# ---------------- 读取 ----------------
+def access_cache_info(source_kind: str, conn_key: str, table_name: str) -> Optional[Dict[str, Any]]:
+    """缓存元信息（不解压）：{"rows", "chunks", "bytes", "codec", "updated_at"}；未命中返回 None"""
+    _ensure()
+    cur = _conn().cursor()
+    cur.execute(
+        "SELECT n_rows, n_chunks, nbytes, codec, updated_at FROM cache_entries WHERE source_kind=? AND conn_key=? AND table_name=?",
+        _key(source_kind, conn_key, table_name),
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+    return {"rows": row[0], "chunks": row[1], "bytes": row[2], "codec": row[3], "updated_at": row[4]}
+
+
+def iter_access_cache(source_kind: str, conn_key: str, table_name: str, offset: int = 0,
+                      limit: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+    """按块流式读取，每次产出一个块（已按 offset/limit 裁剪）的行列表；只解压涉及的块"""
+    _ensure()
+    cur = _conn().cursor()
+    ent = _entry(cur, _key(source_kind, conn_key, table_name))
+    if not ent:
+        return
+    entry_id, codec, chunk_rows, n_rows, n_chunks = ent
+    _touch(entry_id)
+    offset = max(0, int(offset or 0))
+    end = n_rows if limit is None else min(n_rows, offset + max(0, int(limit)))
+    if offset >= end:
+        return
+    first, last = offset // chunk_rows, (end - 1) // chunk_rows
+    for seq in range(first, last + 1):
+        # 每块单独取，避免长时间持有读游标
+        cur.execute("SELECT blob FROM cache_chunks WHERE entry_id=? AND seq=?", (entry_id, seq))
+        row = cur.fetchone()
+        if not row:
+            return
+        try:
+            rows = _decode(row[0], codec)
+        except Exception as e:
+            print("[access_cache decode error]", table_name, seq, e)
+            return
+        base = seq * chunk_rows
+        lo = max(0, offset - base)
+        hi = min(len(rows), end - base)
+        yield rows[lo:hi] if (lo or hi < len(rows)) else rows
+
+
+def get_access_cache(source_kind: str, conn_key: str, table_name: str, offset: int = 0,
+                     limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """读取缓存行（默认整表）；offset/limit 只解压覆盖到的块。未命中返回 []"""
+    out: List[Dict[str, Any]] = []
+    try:
+        for part in iter_access_cache(source_kind, conn_key, table_name, offset, limit):
+            out.extend(part)
+    except Exception as e:
+        print("[get_access_cache error]", e)
+        return []
+    return out
+
+
+def cache_stats() -> Dict[str, Any]:
+    _ensure()
+    cur = _conn().cursor()
+    cur.execute("SELECT COUNT(*), COALESCE(SUM(n_rows), 0), COALESCE(SUM(nbytes), 0) FROM cache_entries")
+    n, rows, nbytes = cur.fetchone()
+    return {"tables": int(n or 0), "rows": int(rows or 0), "bytes": int(nbytes or 0), "budget": CACHE_BUDGET_BYTES}
@@ -0,0 +1,244 @@
+# backend/blob_copy.py
+# -*- coding: utf-8 -*-
+"""
+附件拷贝引擎（按内容去重）：
+- 源文件 sha256 只算一次，结果按 (路径, size, mtime_ns) 持久化在 blob_cache.db；
+- 每个内容首次出现时真实拷贝并登记为该内容的落地文件，之后的引用优先 reflink（APFS clonefile / Linux FICLONE），
+  其次硬链接，均不可用（跨文件系统等）时回退为普通拷贝；
+- copy_stats() 汇总本进程的拷贝/链接数量与节省字节数。
+COPY_MODE: "auto"（默认，去重）| "copy"（始终完整拷贝，行为同 shutil.copy2）
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+BLOB_DB = Path("blob_cache.db")
+COPY_MODE = "auto"
+HASH_CHUNK = 1024 * 1024
+
+_LOCAL = threading.local()
+_LOCK = threading.Lock()
+_STATS: Dict[str, int] = {}
+
+
+def _conn():
+    conn = getattr(_LOCAL, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(str(BLOB_DB), timeout=30, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        except Exception:
+            pass
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_hashes (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS blobs (sha256 TEXT PRIMARY KEY, path TEXT, size INTEGER, mtime_ns INTEGER)")
+        conn.commit()
+        _LOCAL.conn = conn
+    return conn
+
+
+def reset_copy_stats():
+    with _LOCK:
+        _STATS.clear()
+        _STATS.update({"files": 0, "copied": 0, "linked": 0, "reflinked": 0, "existing": 0,
+                       "bytes_total": 0, "bytes_written": 0, "bytes_saved": 0})
+
+
+reset_copy_stats()
+
+
+def copy_stats() -> Dict[str, int]:
+    with _LOCK:
+        return dict(_STATS)
+
+
+def _count(how: str, size: int):
+    with _LOCK:
+        _STATS["files"] += 1
+        _STATS[how] = _STATS.get(how, 0) + 1
+        _STATS["bytes_total"] += size
+        if how == "copied":
+            _STATS["bytes_written"] += size
+        else:
+            _STATS["bytes_saved"] += size
+
+
+def file_sha256(path: Path) -> str:
+    """源文件内容哈希，按 (绝对路径, size, mtime_ns) 缓存；文件变化后自动重算"""
+    p = Path(path)
+    st = p.stat()
+    key = str(p.resolve())
+    conn = _conn()
+    row = conn.execute("SELECT size, mtime_ns, sha256 FROM file_hashes WHERE path=?", (key,)).fetchone()
+    if row and int(row[0]) == st.st_size and int(row[1]) == st.st_mtime_ns:
+        return row[2]
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    conn.execute(
+        "INSERT OR REPLACE INTO file_hashes(path, size, mtime_ns, sha256) VALUES (?,?,?,?)",
+        (key, st.st_size, st.st_mtime_ns, digest),
+    )
+    conn.commit()
+    return digest
+
+
+def _reflink(src: str, dst: str) -> bool:
+    """写时复制克隆；不支持的平台/文件系统返回 False"""
+    try:
+        if sys.platform == "darwin":
+            import ctypes
+            libc = ctypes.CDLL("libc.dylib", use_errno=True)
+            return libc.clonefile(src.encode("utf-8"), dst.encode("utf-8"), 0) == 0
+        if sys.platform.startswith("linux"):
+            import fcntl
+            FICLONE = 0x40049409
+            with open(src, "rb") as s, open(dst, "wb") as d:
+                try:
+                    fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+                    return True
+                except OSError:
+                    pass
+            os.unlink(dst)
+    except Exception:
+        try:
+            if os.path.exists(dst):
+                os.unlink(dst)
+        except Exception:
+            pass
+    return False
+
+
+def _place_from(blob: str, dst: Path) -> Optional[str]:
+    """以 blob 为源放置 dst：reflink → 硬链接；成功返回方式，否则 None"""
+    tmp = str(dst) + ".blob-tmp"
+    try:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    except Exception:
+        pass
+    if _reflink(blob, tmp):
+        os.replace(tmp, dst)
+        return "reflinked"
+    try:
+        os.link(blob, tmp)
+        os.replace(tmp, dst)
+        return "linked"
+    except OSError:
+        try:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        except Exception:
+            pass
+    return None
+
+
+def _fresh_copy(copier, src_p: Path, dst_p: Path):
+    # 先删除目标：目标可能是已有内容的硬链接，原地覆盖会改写所有引用
+    try:
+        if dst_p.exists() or dst_p.is_symlink():
+            dst_p.unlink()
+    except Exception:
+        pass
+    copier(src_p, dst_p)
+
+
+def dedup_copy(src: Any, dst: Any, preserve_meta: bool = True, mode: Optional[str] = None) -> Tuple[int, str]:
+    """
+    把 src 放到 dst：同内容已落地过则 reflink/硬链接，否则真实拷贝并登记。
+    返回 (字节数, 方式)，方式为 copied / linked / reflinked / existing。
+    """
+    src_p, dst_p = Path(src), Path(dst)
+    copier = shutil.copy2 if preserve_meta else shutil.copyfile
+    mode = mode or COPY_MODE
+    if mode == "copy":
+        _fresh_copy(copier, src_p, dst_p)
+        size = int(dst_p.stat().st_size)
+        _count("copied", size)
+        return size, "copied"
+
+    digest = file_sha256(src_p)
+    size = int(src_p.stat().st_size)
+    conn = _conn()
+    row = conn.execute("SELECT path, size, mtime_ns FROM blobs WHERE sha256=?", (digest,)).fetchone()
+    blob = row[0] if row else ""
+    if blob:
+        # 落地文件被删除或改写过则不再作为链接源
+        try:
+            bst = os.stat(blob)
+            if bst.st_size != size or bst.st_mtime_ns != int(row[2] or 0):
+                blob = ""
+        except OSError:
+            blob = ""
+    if blob:
+        try:
+            if dst_p.exists() and os.path.samefile(blob, dst_p):
+                _count("existing", size)
+                return size, "existing"
+        except OSError:
+            pass
+        how = _place_from(blob, dst_p)
+        if how:
+            _count(how, size)
+            return size, how
+    _fresh_copy(copier, src_p, dst_p)
+    if not blob:
+        conn.execute(
+            "INSERT OR REPLACE INTO blobs(sha256, path, size, mtime_ns) VALUES (?,?,?,?)",
+            (digest, str(dst_p.resolve()), size, dst_p.stat().st_mtime_ns),
+        )
+        conn.commit()
+    _count("copied", size)
+    return size, "copied"
+
+
+def fmt_bytes(n: Any) -> str:
+    n = float(n or 0)
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1024 or unit == "TB":
+            return f"{n:.1f}{unit}" if unit != "B" else f"{int(n)}B"
+        n /= 1024
+    return f"{n:.1f}TB"
+
+
+def seed_hashes_from_manifest(manifest_path: Any) -> int:
+    """
+    用 scripts/restore_minio.py 的恢复清单预填哈希缓存（清单中已有 sha256），
+    恢复出的文件作为拷贝源时无需再读一遍内容。仅收录 size 与清单一致的文件。
+    """
+    import json
+    p = Path(manifest_path)
+    if not p.exists():
+        return 0
+    rows = []
+    with open(p, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                e = json.loads(line)
+            except Exception:
+                continue
+            path, digest = e.get("path"), e.get("sha256")
+            if not path or not digest:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if st.st_size != int(e.get("size") or -1):
+                continue
+            rows.append((str(Path(path).resolve()), st.st_size, st.st_mtime_ns, digest))
+    conn = _conn()
+    conn.executemany(
+        "INSERT OR REPLACE INTO file_hashes(path, size, mtime_ns, sha256) VALUES (?,?,?,?)", rows
+    )
+    conn.commit()
+    return len(rows)
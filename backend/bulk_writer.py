@@ -0,0 +1,152 @@
+# backend/bulk_writer.py
+# -*- coding: utf-8 -*-
+"""
+PEPM file / search / usr 等表的批量写入：
+- 表字段元数据按 (运行库, 表) 缓存，不再每次写入都查 information_schema / SHOW COLUMNS；
+- 插入按 BULK_CHUNK 分块，每块一条多行 VALUES 语句，逐块提交；
+- 逐行 UPDATE 合并为 UPDATE ... SET col = CASE key WHEN .. THEN .. END WHERE key IN (...)。
+"""
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+BULK_CHUNK = 500
+
+_LOCK = threading.Lock()
+_COLS: Dict[Tuple[Any, ...], List[str]] = {}
+
+
+def _db_key() -> Tuple[Any, ...]:
+    from backend.sql_utils import current_cfg, is_pg
+    cfg = current_cfg()
+    return ("pg" if is_pg() else "mysql", cfg.get("host"), cfg.get("port"), cfg.get("database"), cfg.get("schema"))
+
+
+def table_columns(table: str, conn=None) -> List[str]:
+    """表的可写字段（MySQL 跳过生成列），按运行库缓存；查询失败返回 [] 且不缓存"""
+    from backend.sql_utils import get_conn, is_pg
+    key = _db_key() + (table,)
+    hit = _COLS.get(key)
+    if hit is not None:
+        return hit
+    own = conn is None
+    conn = conn or get_conn()
+    cols: List[str] = []
+    try:
+        with conn.cursor() as cur:
+            if is_pg():
+                cur.execute(
+                    """
+                    SELECT column_name FROM information_schema.columns
+                    WHERE table_name=%s
+                    ORDER BY ordinal_position
+                    """,
+                    (table,)
+                )
+                cols = [r[0] for r in cur.fetchall()]
+            else:
+                cur.execute(f"SHOW COLUMNS FROM {table}")
+                for r in cur.fetchall() or []:
+                    extra = str(r[5] or "") if len(r) > 5 else ""
+                    if "GENERATED" in extra.upper():
+                        continue
+                    cols.append(r[0])
+    except Exception as e:
+        print("[table_columns error]", table, e)
+        return []
+    finally:
+        if own:
+            conn.close()
+    if cols:
+        with _LOCK:
+            _COLS[key] = cols
+    return cols
+
+
+def invalidate_columns(table: Optional[str] = None):
+    with _LOCK:
+        for k in list(_COLS.keys()):
+            if table is None or k[-1] == table:
+                _COLS.pop(k, None)
+
+
+def bulk_insert(table: str, rows: List[Dict[str, Any]], columns: Optional[Sequence[str]] = None,
+                chunk: Optional[int] = None, conn=None) -> Tuple[int, Optional[str]]:
+    """
+    批量插入，返回 (写入条数, 错误信息)。
+    columns 为空时取 表字段 ∩ 首行键（与原 _insert_rows 一致）；每块提交，失败时回滚当前块并停止。
+    """
+    from backend.sql_utils import get_conn
+    if not rows:
+        return 0, None
+    if columns:
+        keys = list(columns)
+    else:
+        cols = table_columns(table)
+        if not cols:
+            return 0, f"未获取到 {table} 的字段信息"
+        keys = [c for c in cols if c in rows[0]]
+        if not keys:
+            return 0, f"{table} 无可写入字段匹配"
+    size = max(1, int(chunk or BULK_CHUNK))
+    row_ph = "(" + ",".join(["%s"] * len(keys)) + ")"
+    head = f"INSERT INTO {table} ({','.join(keys)}) VALUES "
+    own = conn is None
+    conn = conn or get_conn()
+    wrote = 0
+    try:
+        with conn.cursor() as cur:
+            for i in range(0, len(rows), size):
+                part = rows[i:i + size]
+                params: List[Any] = []
+                for r in part:
+                    params.extend(r.get(k) for k in keys)
+                try:
+                    cur.execute(head + ",".join([row_ph] * len(part)), params)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    return wrote, str(e)
+                wrote += len(part)
+        return wrote, None
+    finally:
+        if own:
+            conn.close()
+
+
+def bulk_update_case(table: str, key_col: str, set_col: str, values: Dict[Any, Any],
+                     chunk: Optional[int] = None, conn=None) -> Tuple[int, Optional[str]]:
+    """
+    values: {键: 新值}；每块一条 UPDATE ... CASE，逐块提交。返回 (提交的键数, 错误信息)
+    """
+    from backend.sql_utils import get_conn
+    if not values:
+        return 0, None
+    items = list(values.items())
+    size = max(1, int(chunk or BULK_CHUNK))
+    own = conn is None
+    conn = conn or get_conn()
+    done = 0
+    try:
+        with conn.cursor() as cur:
+            for i in range(0, len(items), size):
+                part = items[i:i + size]
+                whens = " ".join(["WHEN %s THEN %s"] * len(part))
+                ph = ",".join(["%s"] * len(part))
+                params: List[Any] = []
+                for k, v in part:
+                    params.extend([k, v])
+                params.extend(k for k, _ in part)
+                try:
+                    cur.execute(
+                        f"UPDATE {table} SET {set_col} = CASE {key_col} {whens} ELSE {set_col} END WHERE {key_col} IN ({ph})",
+                        params,
+                    )
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    return done, str(e)
+                done += len(part)
+        return done, None
+    finally:
+        if own:
+            conn.close()
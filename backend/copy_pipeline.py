@@ -0,0 +1,222 @@
+# backend/copy_pipeline.py
+# -*- coding: utf-8 -*-
+"""
+附件拷贝流水线：
+- 输入按需迭代，在途任务数不超过 queue_size（背压），内存占用与附件总数无关；
+- work(arg) 在线程池中执行（拷贝 + 构建行），失败按 retries 重试；
+- 完成的行在调用线程中按 batch_size 分批交给 sink 写库；
+- 指定 job 时，sink 成功写入的行记入 mapping_config.db 的 copy_manifest，
+  重跑同一 job 时跳过已完成的键并通过 on_row(resumed=True) 回放当时的行；
+- on_row 只在行写库成功后回调（或回放），调用方据此汇总实体更新；
+- 进度经 backend.progress.Progress 采样（条/秒、行 size 累计的字节/秒、在途与待写队列深度），
+  progress_cb 只在采样时回调，stats["progress"] 为最近快照。
+"""
+import json
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from backend.db import DB_PATH
+
+COPY_WORKERS = 4
+COPY_BATCH = 200
+COPY_RETRIES = 2
+RETRY_DELAY = 0.5
+
+
+def _conn():
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS copy_manifest (
+            job TEXT NOT NULL,
+            item_key TEXT NOT NULL,
+            row_json TEXT,
+            done_at REAL,
+            PRIMARY KEY (job, item_key)
+        )
+        """
+    )
+    return conn
+
+
+def manifest_count(job: str) -> int:
+    conn = _conn()
+    try:
+        r = conn.execute("SELECT COUNT(*) FROM copy_manifest WHERE job=?", (job,)).fetchone()
+        return int(r[0] or 0)
+    finally:
+        conn.close()
+
+
+def clear_manifest(job: Optional[str] = None, prefix: Optional[str] = None) -> int:
+    """按 job 或 job 前缀清除断点记录（均为空则全部清除）"""
+    conn = _conn()
+    try:
+        if job:
+            cur = conn.execute("DELETE FROM copy_manifest WHERE job=?", (job,))
+        elif prefix:
+            cur = conn.execute("DELETE FROM copy_manifest WHERE substr(job, 1, ?)=?", (len(prefix), prefix))
+        else:
+            cur = conn.execute("DELETE FROM copy_manifest")
+        conn.commit()
+        return int(cur.rowcount or 0)
+    finally:
+        conn.close()
+
+
+def run_copy_pipeline(items: Iterable[Tuple[str, Any]], work: Callable[[Any], Optional[Dict[str, Any]]],
+                      sink: Callable[[List[Dict[str, Any]]], int], job: Optional[str] = None,
+                      workers: int = COPY_WORKERS, queue_size: Optional[int] = None,
+                      batch_size: int = COPY_BATCH, retries: int = COPY_RETRIES,
+                      initializer: Optional[Callable[[], None]] = None,
+                      on_row: Optional[Callable[[str, Dict[str, Any], bool], None]] = None,
+                      progress_cb: Optional[Callable[[int, Optional[int], Dict[str, Any]], None]] = None,
+                      total: Optional[int] = None, cancel_event: Optional[Any] = None,
+                      progress: Optional[Any] = None) -> Dict[str, Any]:
+    """
+    items: [(稳定键, work 参数), ...]（可为生成器）；sink(rows) 返回写入条数，等于 len(rows) 视为成功。
+    progress: 外部传入的 Progress（可带其它订阅者）；默认内部创建
+    返回统计：total/done/copied/resumed/skipped/written/failed/failures/elapsed/rate/cancelled/progress
+    """
+    from backend.progress import Progress
+
+    workers = max(1, int(workers))
+    queue_size = max(workers, int(queue_size or workers * 4))
+    batch_size = max(1, int(batch_size))
+    stats: Dict[str, Any] = {
+        "total": total, "done": 0, "copied": 0, "resumed": 0, "skipped": 0, "written": 0,
+        "failed": 0, "failures": [], "elapsed": 0.0, "rate": 0.0, "cancelled": False, "progress": None,
+    }
+    start = time.time()
+    mconn = _conn() if job else None
+    pending: List[Tuple[str, Dict[str, Any]]] = []
+    inflight: Dict[Any, str] = {}
+    prog = progress if progress is not None else Progress("附件拷贝", total=total, unit="个")
+    if prog.total is None and total is not None:
+        prog.total = total
+
+    def _on_sample(snap):
+        stats["progress"] = snap
+        stats["elapsed"] = max(time.time() - start, 0.001)
+        stats["rate"] = stats["done"] / stats["elapsed"]
+        if progress_cb:
+            progress_cb(stats["done"], total, stats)
+
+    prog.subscribe(_on_sample)
+
+    def _tick(nbytes: int = 0):
+        if prog.due():
+            prog.stage("copy", depth=len(inflight))
+            prog.stage("write", depth=len(pending))
+        prog.add(1, nbytes)
+
+    def _flush():
+        if not pending:
+            return
+        rows = [r for _, r in pending]
+        try:
+            n = int(sink(rows) or 0)
+        except Exception as e:
+            print("[copy_pipeline sink error]", e)
+            n = 0
+        if n >= len(rows):
+            stats["written"] += n
+            if mconn is not None:
+                now = time.time()
+                mconn.executemany(
+                    "INSERT OR REPLACE INTO copy_manifest(job, item_key, row_json, done_at) VALUES (?,?,?,?)",
+                    [(job, k, json.dumps(r, ensure_ascii=False, default=str), now) for k, r in pending],
+                )
+                mconn.commit()
+            if on_row:
+                for k, r in pending:
+                    on_row(k, r, False)
+            prog.stage("write", done=len(rows))
+        else:
+            for k, _ in pending:
+                stats["failures"].append({"key": k, "stage": "write", "error": "写库失败"})
+            stats["failed"] = len(stats["failures"])
+            prog.error(len(pending), stage="write")
+        pending.clear()
+        prog.stage("write", depth=0)
+
+    def _attempt(arg):
+        last = None
+        for i in range(max(0, int(retries)) + 1):
+            try:
+                return work(arg)
+            except Exception as e:
+                last = e
+                if i < retries:
+                    time.sleep(RETRY_DELAY * (2 ** i))
+        raise last
+
+    def _collect(key: str, fut):
+        try:
+            row = fut.result()
+        except Exception as e:
+            stats["failures"].append({"key": key, "stage": "copy", "error": str(e)})
+            stats["failed"] = len(stats["failures"])
+            prog.error(stage="copy")
+            row = None
+        else:
+            if row:
+                stats["copied"] += 1
+                pending.append((key, row))
+            else:
+                stats["skipped"] += 1
+        stats["done"] += 1
+        if len(pending) >= batch_size:
+            _flush()
+        nbytes = 0
+        if row:
+            try:
+                nbytes = int(row.get("size") or 0)
+            except Exception:
+                nbytes = 0
+        _tick(nbytes)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, initializer=initializer) as ex:
+            for key, arg in items:
+                if cancel_event is not None and cancel_event.is_set():
+                    stats["cancelled"] = True
+                    break
+                if mconn is not None:
+                    hit = mconn.execute(
+                        "SELECT row_json FROM copy_manifest WHERE job=? AND item_key=?", (job, key)
+                    ).fetchone()
+                    if hit:
+                        stats["resumed"] += 1
+                        stats["done"] += 1
+                        if on_row:
+                            try:
+                                on_row(key, json.loads(hit[0] or "{}"), True)
+                            except Exception:
+                                pass
+                        _tick()
+                        continue
+                while len(inflight) >= queue_size:
+                    finished, _ = wait(list(inflight.keys()), return_when=FIRST_COMPLETED)
+                    for f in finished:
+                        _collect(inflight.pop(f), f)
+                inflight[ex.submit(_attempt, arg)] = key
+            for f in list(inflight.keys()):
+                if stats["cancelled"]:
+                    f.cancel()
+            while inflight:
+                finished, _ = wait(list(inflight.keys()), return_when=FIRST_COMPLETED)
+                for f in finished:
+                    key = inflight.pop(f)
+                    if f.cancelled():
+                        continue
+                    _collect(key, f)
+        _flush()
+    finally:
+        if mconn is not None:
+            mconn.close()
+    prog.stage("copy", depth=0)
+    prog.finish()
+    return stats
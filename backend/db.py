@@ -2,8 +2,9 @@
 # -*- coding: utf-8 -*-
 import sqlite3
 import json
+import threading
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import time
 
 DB_PATH = Path("mapping_config.db")
@@ -15,10 +16,126 @@ def _conn():
     return sqlite3.connect(DB_PATH)
 
 
+# ========== 配置缓存（table_map / field_map） ==========
+# 读取走每线程常驻连接（WAL），配置整体缓存在进程内存中；
+# table_map/field_map 上的触发器在任何写入后递增 config_version，
+# 读取时只比对版本号，变化后才重新加载。
+_LOCAL = threading.local()
+_CFG_LOCK = threading.Lock()
+_CFG_CACHE: Dict[str, Any] = {"version": None, "tables": {}, "fields": {}}
+
+
+def _ensure_config_version(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS config_version (
+        id INTEGER PRIMARY KEY CHECK(id=1),
+        v INTEGER DEFAULT 0
+    );
+    """)
+    cur.execute("INSERT OR IGNORE INTO config_version(id, v) VALUES (1, 0)")
+    for tbl in ("table_map", "field_map"):
+        for ev in ("INSERT", "UPDATE", "DELETE"):
+            cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{tbl}_{ev.lower()}_version
+            AFTER {ev} ON {tbl}
+            BEGIN
+                UPDATE config_version SET v = v + 1 WHERE id = 1;
+            END;
+            """)
+
+
+def _read_conn():
+    """当前线程的常驻只读连接（WAL 模式，避免并发会话在文件锁上串行）。"""
+    conn = getattr(_LOCAL, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+        except Exception:
+            pass
+        _LOCAL.conn = conn
+    return conn
+
+
+def get_config_version() -> int:
+    conn = _read_conn()
+    try:
+        row = conn.execute("SELECT v FROM config_version WHERE id=1").fetchone()
+    except sqlite3.OperationalError:
+        # 旧库尚未初始化版本表/触发器：补建后重试
+        cur = conn.cursor()
+        _ensure_config_version(cur)
+        conn.commit()
+        row = conn.execute("SELECT v FROM config_version WHERE id=1").fetchone()
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+def _config_snapshot() -> Dict[str, Any]:
+    global _CFG_CACHE
+    ver = get_config_version()
+    cache = _CFG_CACHE
+    if cache["version"] == ver:
+        return cache
+    with _CFG_LOCK:
+        if _CFG_CACHE["version"] == ver:
+            return _CFG_CACHE
+        conn = _read_conn()
+        # 按 (source_table, target_entity) 唯一索引顺序加载，与原逐条查询的命中顺序一致
+        tables: Dict[str, List[Dict[str, Any]]] = {}
+        for r in conn.execute(
+            "SELECT source_table, target_entity, priority, py_script, filter_sql "
+            "FROM table_map ORDER BY source_table, target_entity, id"
+        ).fetchall():
+            tables.setdefault(r[0], []).append({
+                "source_table": r[0],
+                "target_entity": r[1],
+                "priority": r[2],
+                "py_script": r[3],
+                "filter_sql": r[4],
+            })
+        fields: Dict[str, List[Dict[str, Any]]] = {}
+        for r in conn.execute("""
+          SELECT id, source_field, target_paths, rule, enabled, order_idx, target_entity, table_name
+          FROM field_map
+          ORDER BY order_idx ASC, id ASC
+        """).fetchall():
+            fields.setdefault(r[7], []).append({
+                "id": r[0],
+                "source_field": r[1],
+                "target_paths": r[2],
+                "rule": r[3],
+                "enabled": int(r[4] if r[4] is not None else 1),
+                "order_idx": int(r[5] or 0),
+                "target_entity": r[6] or ""
+            })
+        # 整体替换引用，读线程拿到的始终是一致快照
+        _CFG_CACHE = {"version": ver, "tables": tables, "fields": fields}
+        return _CFG_CACHE
+
+
+def _table_rows(source_table: str, target_entity: Optional[str] = None) -> List[Dict[str, Any]]:
+    rows = _config_snapshot()["tables"].get(source_table, [])
+    if target_entity:
+        rows = [t for t in rows if t["target_entity"] == target_entity]
+    return rows
+
+
+def invalidate_config_cache():
+    """强制下一次读取重新加载配置（一般无需调用，写入会自动递增版本）。"""
+    global _CFG_CACHE
+    with _CFG_LOCK:
+        _CFG_CACHE = {"version": None, "tables": {}, "fields": {}}
+
+
 
 # ========== 初始化 ==========
 def init_db():
     conn = _conn()
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+    except Exception:
+        pass
     cur = conn.cursor()
     # --- 主表 table_map ---
     cur.execute("""
@@ -141,20 +258,12 @@ def init_db():
             conn.rollback()
         except Exception:
             pass
-    # --- 访问缓存表 ---
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS access_cache (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            source_kind TEXT,
-            conn_key TEXT,
-            table_name TEXT,
-            updated_at INTEGER,
-            payload TEXT,
-            UNIQUE(source_kind, conn_key, table_name)
-        );
-        """
-    )
+    # --- 访问缓存已迁至 access_cache.db（backend/access_cache.py），旧整表 JSON 缓存直接丢弃 ---
+    try:
+        cur.execute("DROP TABLE IF EXISTS access_cache")
+        conn.commit()
+    except Exception as e:
+        print("[init_db] 删除旧 access_cache 表失败:", e)
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS app_settings (
@@ -164,14 +273,6 @@ def init_db():
         );
         """
     )
-    try:
-        cur.execute("PRAGMA table_info(access_cache)")
-        cols = [r[1] for r in cur.fetchall()]
-        if "conn_key" not in cols:
-            cur.execute("ALTER TABLE access_cache ADD COLUMN conn_key TEXT")
-            conn.commit()
-    except Exception:
-        pass
     try:
         cur.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='file_map_cfgs'")
         row = cur.fetchone()
@@ -212,6 +313,9 @@ def init_db():
             conn.rollback()
         except Exception:
             pass
+    # --- 配置版本号 + 触发器 ---
+    _ensure_config_version(cur)
+    conn.commit()
     conn.close()
 
 
@@ -386,51 +490,18 @@ def upsert_file_map_cfg(cfg: Dict[str, Any]) -> int:
 
 
 # ========== 访问缓存 API ==========
+# 实现见 backend/access_cache.py（独立库、分块压缩、按字节预算淘汰），此处保留原入口
 def get_access_cache(source_kind: str, conn_key: str, table_name: str) -> List[Dict[str, Any]]:
-    conn = _conn()
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT payload FROM access_cache WHERE source_kind=? AND conn_key=? AND table_name=?",
-        (source_kind or "", conn_key or "", table_name or "")
-    )
-    row = cur.fetchone()
-    conn.close()
-    if not row or not row[0]:
-        return []
-    try:
-        return json.loads(row[0])
-    except Exception:
-        return []
+    from backend.access_cache import get_access_cache as _get
+    return _get(source_kind, conn_key, table_name)
 
 def set_access_cache(source_kind: str, conn_key: str, table_name: str, rows: List[Dict[str, Any]]) -> None:
-    conn = _conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO access_cache(source_kind, conn_key, table_name, updated_at, payload)
-        VALUES(?,?,?,?,?)
-        ON CONFLICT(source_kind, conn_key, table_name) DO UPDATE SET
-          updated_at=excluded.updated_at,
-          payload=excluded.payload
-        """,
-        (source_kind or "", conn_key or "", table_name or "", int(time.time()), json.dumps(rows, ensure_ascii=False))
-    )
-    conn.commit()
-    conn.close()
+    from backend.access_cache import set_access_cache as _set
+    _set(source_kind, conn_key, table_name, rows)
 
 def clear_access_cache(source_kind: str = None, conn_key: str = None) -> int:
-    conn = _conn()
-    cur = conn.cursor()
-    if source_kind and conn_key:
-        cur.execute("DELETE FROM access_cache WHERE source_kind=? AND conn_key=?", (source_kind, conn_key))
-    elif source_kind:
-        cur.execute("DELETE FROM access_cache WHERE source_kind=?", (source_kind,))
-    else:
-        cur.execute("DELETE FROM access_cache")
-    conn.commit()
-    n = cur.rowcount or 0
-    conn.close()
-    return n
+    from backend.access_cache import clear_access_cache as _clear
+    return _clear(source_kind, conn_key)
 
 
 def list_file_map_cfgs() -> List[Dict[str, Any]]:
@@ -592,61 +663,22 @@ def restore_table(source_table: str):
 
 
 def get_target_entity(source_table: str) -> str:
-    conn = _conn()
-    cur = conn.cursor()
-    cur.execute("SELECT target_entity FROM table_map WHERE source_table=?", (source_table,))
-    row = cur.fetchone()
-    conn.close()
-    return (row[0] or "") if row else ""
+    rows = _table_rows(source_table)
+    return (rows[0]["target_entity"] or "") if rows else ""
 
 
 def get_priority(source_table: str, target_entity: str = None) -> int:
-    conn = _conn()
-    cur = conn.cursor()
-    if target_entity:
-        cur.execute(
-            "SELECT priority FROM table_map WHERE source_table=? AND target_entity=?",
-            (source_table, target_entity)
-        )
-    else:
-        cur.execute("SELECT priority FROM table_map WHERE source_table=?", (source_table,))
-    row = cur.fetchone()
-    conn.close()
-    return int(row[0]) if row and row[0] is not None else 0
+    rows = _table_rows(source_table, target_entity)
+    return int(rows[0]["priority"]) if rows and rows[0]["priority"] is not None else 0
 
 
 # ========== 字段映射 ==========
 def get_field_mappings(table_name: str, target_entity: str = None) -> List[Dict[str, Any]]:
-    conn = _conn()
-    cur = conn.cursor()
+    rows = _config_snapshot()["fields"].get(table_name, [])
     if target_entity:
-        cur.execute("""
-          SELECT id, source_field, target_paths, rule, enabled, order_idx, target_entity
-          FROM field_map
-          WHERE table_name=? AND target_entity=?
-          ORDER BY order_idx ASC, id ASC
-        """, (table_name, target_entity))
-    else:
-        cur.execute("""
-          SELECT id, source_field, target_paths, rule, enabled, order_idx, target_entity
-          FROM field_map
-          WHERE table_name=?
-          ORDER BY order_idx ASC, id ASC
-        """, (table_name,))
-    rows = [
-        {
-            "id": r[0],
-            "source_field": r[1],
-            "target_paths": r[2],
-            "rule": r[3],
-            "enabled": int(r[4]),
-            "order_idx": int(r[5]),
-            "target_entity": r[6] or ""
-        }
-        for r in cur.fetchall()
-    ]
-    conn.close()
-    return rows
+        rows = [r for r in rows if r["target_entity"] == target_entity]
+    # 返回副本：调用方（如详情页会话缓存）会就地修改
+    return [dict(r) for r in rows]
 
 
 def delete_field_mapping(table_name: str, source_field: str, target_entity: str = ""):
@@ -864,23 +896,17 @@ def import_all(obj: Dict[str, Any]):
 
 
 # ========== 脚本存取 ==========
+def _top_priority_row(source_table: str, target_entity: str = None) -> Optional[Dict[str, Any]]:
+    rows = _table_rows(source_table, target_entity)
+    if not target_entity:
+        # 兼容旧用法：未指定 entity 时，取该表 priority 最高的一行
+        rows = sorted(rows, key=lambda t: -(t["priority"] or 0))
+    return rows[0] if rows else None
+
+
 def get_table_script(source_table: str, target_entity: str = None) -> str:
-    conn = _conn()
-    cur = conn.cursor()
-    if target_entity:
-        cur.execute(
-            "SELECT py_script FROM table_map WHERE source_table=? AND target_entity=?",
-            (source_table, target_entity)
-        )
-    else:
-        # 兼容旧用法：未指定 entity 时，返回该表的一个脚本（按 priority 优先）
-        cur.execute(
-            "SELECT py_script FROM table_map WHERE source_table=? ORDER BY priority DESC LIMIT 1",
-            (source_table,)
-        )
-    row = cur.fetchone()
-    conn.close()
-    return row[0] if row and row[0] else ""
+    row = _top_priority_row(source_table, target_entity)
+    return row["py_script"] if row and row["py_script"] else ""
 
 
 def save_table_script(source_table: str, py_script: str, target_entity: str = None) -> bool:
@@ -905,21 +931,8 @@ def save_table_script(source_table: str, py_script: str, target_entity: str = No
 
 
 def get_table_filter_sql(source_table: str, target_entity: str = None) -> str:
-    conn = _conn()
-    cur = conn.cursor()
-    if target_entity:
-        cur.execute(
-            "SELECT filter_sql FROM table_map WHERE source_table=? AND target_entity=?",
-            (source_table, target_entity)
-        )
-    else:
-        cur.execute(
-            "SELECT filter_sql FROM table_map WHERE source_table=? ORDER BY priority DESC LIMIT 1",
-            (source_table,)
-        )
-    row = cur.fetchone()
-    conn.close()
-    return row[0] if row and row[0] else ""
+    row = _top_priority_row(source_table, target_entity)
+    return row["filter_sql"] if row and row["filter_sql"] else ""
 
 
 def save_table_filter_sql(source_table: str, filter_sql: str, target_entity: str = None) -> bool:
@@ -0,0 +1,228 @@
+# backend/event_log.py
+# -*- coding: utf-8 -*-
+"""
+入库事件日志（JSON lines）：
+- log_event 只把事件放进有界队列，由后台线程批量写入常开的日志文件；队列满时丢弃并计数，
+  不阻塞入库线程（丢弃数随下一批写出）；
+- 文件超过 LOG_MAX_BYTES 时轮转为 .1 … .LOG_BACKUPS；
+- log_error 对逐条记录的重复错误限流：同一 key 在 RATE_WINDOW 秒内只输出前 RATE_BURST 条，
+  其余只计数，窗口结束后输出一条汇总（suppressed=N）；
+- 读取端 tail_events / log_reader.tail_log 按游标（文件 inode, 字节偏移）seek 读取增量，不重读整个文件；
+  inode 变化（已轮转）时从新文件开头读。
+每行格式：{"ts", "level", "source", "msg", ...附加字段}
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+LOG_PATH = Path("import_log.jsonl")
+LOG_MAX_BYTES = 32 * 1024 * 1024
+LOG_BACKUPS = 5
+QUEUE_MAX = 50000
+FLUSH_INTERVAL = 0.5
+FLUSH_BATCH = 2000
+RATE_WINDOW = 60.0
+RATE_BURST = 5
+# 限流后的错误是否同时打印到控制台
+ECHO_ERRORS = True
+
+_Q: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=QUEUE_MAX)
+_LOCK = threading.Lock()
+_WRITER: Optional[threading.Thread] = None
+_DROPPED = 0
+# key -> [窗口开始时间, 窗口内次数, source, 最后一条消息]
+_RATE: Dict[str, List[Any]] = {}
+
+
+# ---------------- 写入 ----------------
+def _rotate(fh):
+    fh.close()
+    for k in range(LOG_BACKUPS - 1, 0, -1):
+        src = LOG_PATH.with_name(f"{LOG_PATH.name}.{k}")
+        if src.exists():
+            os.replace(src, LOG_PATH.with_name(f"{LOG_PATH.name}.{k + 1}"))
+    if LOG_BACKUPS > 0:
+        os.replace(LOG_PATH, LOG_PATH.with_name(f"{LOG_PATH.name}.1"))
+    else:
+        LOG_PATH.unlink()
+    return open(LOG_PATH, "a", encoding="utf-8")
+
+
+def _writer_loop():
+    global _DROPPED
+    fh = None
+    while True:
+        try:
+            first = _Q.get(timeout=FLUSH_INTERVAL)
+        except queue.Empty:
+            _flush_rate_windows()
+            continue
+        batch = [first]
+        while len(batch) < FLUSH_BATCH:
+            try:
+                batch.append(_Q.get_nowait())
+            except queue.Empty:
+                break
+        taken = len(batch)
+        try:
+            if fh is None:
+                LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+                fh = open(LOG_PATH, "a", encoding="utf-8")
+            with _LOCK:
+                dropped, _DROPPED = _DROPPED, 0
+            if dropped:
+                batch.append({"ts": time.time(), "level": "warning", "source": "event_log",
+                              "msg": f"日志队列已满，丢弃 {dropped} 条"})
+            fh.write("".join(json.dumps(ev, ensure_ascii=False, default=str) + "\n" for ev in batch))
+            fh.flush()
+            if fh.tell() >= LOG_MAX_BYTES:
+                fh = _rotate(fh)
+        except Exception as e:
+            print("[event_log write error]", e)
+            try:
+                if fh is not None:
+                    fh.close()
+            except Exception:
+                pass
+            fh = None
+        finally:
+            for _ in range(taken):
+                _Q.task_done()
+        _flush_rate_windows()
+
+
+def _ensure_writer():
+    global _WRITER
+    if _WRITER is not None and _WRITER.is_alive():
+        return
+    with _LOCK:
+        if _WRITER is None or not _WRITER.is_alive():
+            _WRITER = threading.Thread(target=_writer_loop, name="event-log-writer", daemon=True)
+            _WRITER.start()
+
+
+def log_event(level: str, msg: str, source: str = "", **fields):
+    """非阻塞地记录一条事件；队列满时丢弃并计数"""
+    global _DROPPED
+    ev = {"ts": time.time(), "level": level, "source": source, "msg": str(msg)}
+    if fields:
+        ev.update(fields)
+    _ensure_writer()
+    try:
+        _Q.put_nowait(ev)
+    except queue.Full:
+        with _LOCK:
+            _DROPPED += 1
+
+
+def log_error(key: str, err: Any = "", source: str = "", **fields):
+    """
+    逐条记录错误的限流输出：key 相同的错误在 RATE_WINDOW 秒内只记录（并打印）前 RATE_BURST 条，
+    之后只计数，窗口结束时写一条汇总。
+    """
+    now = time.time()
+    msg = f"[{key}] {err}" if err != "" else f"[{key}]"
+    with _LOCK:
+        st = _RATE.get(key)
+        if st is None or now - st[0] >= RATE_WINDOW:
+            if st is not None and st[1] > RATE_BURST:
+                _emit_suppressed(key, st)
+            st = _RATE[key] = [now, 0, source, msg]
+        st[1] += 1
+        st[3] = msg
+        n = st[1]
+    if n > RATE_BURST:
+        return
+    if ECHO_ERRORS:
+        print(msg if n < RATE_BURST else f"{msg}（后续同类错误 {int(RATE_WINDOW)} 秒内只计数）")
+    log_event("error", msg, source=source, key=key, **fields)
+
+
+def _emit_suppressed(key: str, st: List[Any]):
+    """调用方持有 _LOCK"""
+    global _DROPPED
+    ev = {"ts": time.time(), "level": "error", "source": st[2], "key": key,
+          "msg": f"{st[3]}（{int(RATE_WINDOW)} 秒内另有 {st[1] - RATE_BURST} 条同类错误）",
+          "suppressed": st[1] - RATE_BURST, "window_start": st[0]}
+    try:
+        _Q.put_nowait(ev)
+    except queue.Full:
+        _DROPPED += 1
+
+
+def _flush_rate_windows(force: bool = False):
+    now = time.time()
+    with _LOCK:
+        for key in list(_RATE.keys()):
+            st = _RATE[key]
+            if force or now - st[0] >= RATE_WINDOW:
+                if st[1] > RATE_BURST:
+                    _emit_suppressed(key, st)
+                del _RATE[key]
+
+
+def flush(timeout: Optional[float] = 5.0):
+    """输出未结束窗口的汇总，并等待队列写完（脚本退出前调用）"""
+    _flush_rate_windows(force=True)
+    if _Q.unfinished_tasks:
+        _ensure_writer()
+    end = time.time() + timeout if timeout else None
+    while _Q.unfinished_tasks:
+        if end is not None and time.time() > end:
+            break
+        time.sleep(0.02)
+
+
+atexit.register(flush, 2.0)
+
+
+# ---------------- 读取 ----------------
+def tail_events(cursor: Any = 0, max_bytes: int = 4 * 1024 * 1024,
+                path: Optional[Path] = None) -> Tuple[List[Dict[str, Any]], Tuple[int, int]]:
+    """
+    从游标 cursor=(inode, 字节偏移) 起读取完整的 JSON 行，返回 (事件列表, 新游标)。
+    inode 与当前文件不同（已轮转）或文件比偏移小时从头读；末尾不完整的一行留到下次。
+    cursor 也可传纯偏移（int，不校验 inode）。
+    """
+    if isinstance(cursor, (tuple, list)):
+        ino, offset = (int(x or 0) for x in cursor)
+    else:
+        ino, offset = None, int(cursor or 0)
+    p = Path(path or LOG_PATH)
+    try:
+        f = open(p, "rb")
+    except OSError:
+        return [], (0, 0)
+    with f:
+        stt = os.fstat(f.fileno())
+        size = stt.st_size
+        if (ino is not None and ino != stt.st_ino) or offset > size:
+            offset = 0
+        if offset == size:
+            return [], (stt.st_ino, offset)
+        f.seek(offset)
+        raw = f.read(max_bytes)
+    cut = raw.rfind(b"\n")
+    if cut < 0:
+        return [], (stt.st_ino, offset)
+    out: List[Dict[str, Any]] = []
+    for line in raw[:cut].split(b"\n"):
+        if not line.strip():
+            continue
+        try:
+            out.append(json.loads(line.decode("utf-8")))
+        except Exception:
+            out.append({"level": "raw", "msg": line.decode("utf-8", errors="replace")})
+    return out, (stt.st_ino, offset + cut + 1)
+
+
+def format_event(ev: Dict[str, Any]) -> str:
+    ts = ev.get("ts")
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)) if isinstance(ts, (int, float)) else ""
+    lvl = ev.get("level") or ""
+    return f"[{stamp}] {lvl.upper() + ' ' if lvl and lvl != 'info' else ''}{ev.get('msg', '')}"
@@ -0,0 +1,248 @@
+# backend/file_index.py
+# -*- coding: utf-8 -*-
+"""
+本地文件索引（source/files，MinIO 恢复目录）：
+- os.scandir 扫描写入 SQLite（file_index.db）：entries(name, path, parent, is_dir, size, mtime) + dirs(path, mtime)；
+- 增量重扫：目录 mtime 未变则不重新列举其直接子项，只沿库中记录的子目录继续下探；
+- 查找：按文件名走索引，再按 token / 日期（路径包含）过滤；目录（MinIO 对象）解析为其下首个 part.1。
+"""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+INDEX_DB = Path("file_index.db")
+DEFAULT_ROOT = Path("source/files")
+# 进程内距上次扫描超过该秒数时，查找前先做一次增量扫描
+RESCAN_INTERVAL = 600.0
+# 查找未命中时，距上次扫描超过该秒数则先增量重扫再查一次（新恢复的文件无需等 RESCAN_INTERVAL）
+MISS_RESCAN_INTERVAL = 30.0
+
+_LOCAL = threading.local()
+_SCAN_LOCK = threading.Lock()
+_LAST_SCAN: Dict[str, float] = {}
+
+
+def _conn():
+    conn = getattr(_LOCAL, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(str(INDEX_DB), timeout=30, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        except Exception:
+            pass
+        _LOCAL.conn = conn
+    return conn
+
+
+def init_file_index_db():
+    conn = _conn()
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS entries (
+            path TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            parent TEXT NOT NULL,
+            is_dir INTEGER NOT NULL,
+            size INTEGER DEFAULT 0,
+            mtime REAL DEFAULT 0
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_name ON entries(name)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_parent ON entries(parent)")
+    conn.execute("CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime REAL)")
+    conn.commit()
+
+
+def _root_str(root: Optional[Path]) -> str:
+    return str(Path(root or DEFAULT_ROOT).resolve())
+
+
+def _drop_subtree(cur, path: str):
+    """删除某目录及其全部后代的索引记录（按路径前缀范围）"""
+    lo, hi = path + os.sep, path + chr(ord(os.sep) + 1)
+    cur.execute("DELETE FROM entries WHERE path=? OR (path>=? AND path<?)", (path, lo, hi))
+    cur.execute("DELETE FROM dirs WHERE path=? OR (path>=? AND path<?)", (path, lo, hi))
+
+
+def scan(root: Optional[Path] = None, full: bool = False) -> Dict[str, Any]:
+    """
+    扫描 root 并更新索引；full=True 时忽略目录 mtime 全量重扫。
+    返回 {"dirs": 遍历目录数, "changed": 重新列举的目录数, "entries": 写入条目数, "elapsed": 秒}
+    """
+    init_file_index_db()
+    root_s = _root_str(root)
+    stats = {"dirs": 0, "changed": 0, "entries": 0, "elapsed": 0.0}
+    t0 = time.time()
+    with _SCAN_LOCK:
+        conn = _conn()
+        cur = conn.cursor()
+        if not os.path.isdir(root_s):
+            _drop_subtree(cur, root_s)
+            conn.commit()
+            _LAST_SCAN[root_s] = time.time()
+            return stats
+        known = {} if full else dict(cur.execute(
+            "SELECT path, mtime FROM dirs WHERE path=? OR (path>=? AND path<?)",
+            (root_s, root_s + os.sep, root_s + chr(ord(os.sep) + 1)),
+        ).fetchall())
+        stack = [root_s]
+        pending = 0
+        while stack:
+            d = stack.pop()
+            stats["dirs"] += 1
+            try:
+                mtime = os.stat(d).st_mtime
+            except OSError:
+                _drop_subtree(cur, d)
+                continue
+            if not full and known.get(d) == mtime:
+                stack.extend(r[0] for r in cur.execute(
+                    "SELECT path FROM entries WHERE parent=? AND is_dir=1", (d,)
+                ).fetchall())
+                continue
+            stats["changed"] += 1
+            old_dirs = {r[0] for r in cur.execute(
+                "SELECT path FROM entries WHERE parent=? AND is_dir=1", (d,)
+            ).fetchall()}
+            rows = []
+            cur_dirs = set()
+            try:
+                with os.scandir(d) as it:
+                    for e in it:
+                        try:
+                            is_dir = e.is_dir(follow_symlinks=False)
+                            st = e.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        rows.append((e.path, e.name, d, 1 if is_dir else 0, 0 if is_dir else int(st.st_size), st.st_mtime))
+                        if is_dir:
+                            cur_dirs.add(e.path)
+            except OSError as ex:
+                print("[file_index scan error]", d, ex)
+                continue
+            for gone in old_dirs - cur_dirs:
+                _drop_subtree(cur, gone)
+            cur.execute("DELETE FROM entries WHERE parent=?", (d,))
+            cur.executemany(
+                "INSERT OR REPLACE INTO entries(path,name,parent,is_dir,size,mtime) VALUES (?,?,?,?,?,?)", rows
+            )
+            cur.execute("INSERT OR REPLACE INTO dirs(path, mtime) VALUES (?,?)", (d, mtime))
+            stats["entries"] += len(rows)
+            stack.extend(cur_dirs)
+            pending += len(rows)
+            if pending >= 20000:
+                conn.commit()
+                pending = 0
+        conn.commit()
+        _LAST_SCAN[root_s] = time.time()
+    stats["elapsed"] = time.time() - t0
+    return stats
+
+
+def ensure_scanned(root: Optional[Path] = None, max_age: float = RESCAN_INTERVAL):
+    """本进程内超过 max_age 秒未扫描则做一次增量扫描"""
+    root_s = _root_str(root)
+    if time.time() - _LAST_SCAN.get(root_s, 0.0) > max_age:
+        scan(root)
+
+
+def find_entries(name: str, root: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """按文件/目录名精确查找，返回 [{path,is_dir,size,mtime}]，按路径排序"""
+    ensure_scanned(root)
+    root_s = _root_str(root)
+    rows = _conn().execute(
+        "SELECT path, is_dir, size, mtime FROM entries WHERE name=? AND path>=? AND path<? ORDER BY path",
+        (name, root_s + os.sep, root_s + chr(ord(os.sep) + 1)),
+    ).fetchall()
+    return [{"path": r[0], "is_dir": bool(r[1]), "size": int(r[2] or 0), "mtime": r[3]} for r in rows]
+
+
+def _first_part(dir_path: str) -> str:
+    row = _conn().execute(
+        "SELECT path FROM entries WHERE name='part.1' AND is_dir=0 AND path>=? AND path<? ORDER BY path LIMIT 1",
+        (dir_path + os.sep, dir_path + chr(ord(os.sep) + 1)),
+    ).fetchone()
+    return row[0] if row else ""
+
+
+def find_local_file(name: str, ext: str = "", expected_token: str = "", expected_ymd: str = "",
+                    root: Optional[Path] = None, _retry: bool = True) -> str:
+    """
+    与原 rglob 查找语义一致：按 name[.ext] 找候选；给出 token 时路径须包含 token，否则给出日期时须包含日期；
+    命中目录（MinIO 对象）时取其下首个 part.1。返回绝对路径，未找到返回空串。
+    未命中时按 MISS_RESCAN_INTERVAL 限频做一次增量重扫（只重新列举 mtime 变化的目录）后再查。
+    """
+    key = f"{name}.{ext}" if ext else str(name or "")
+    if not key:
+        return ""
+    cands = find_entries(key, root)
+    if expected_token:
+        cands = [c for c in cands if expected_token in c["path"]]
+    elif expected_ymd:
+        cands = [c for c in cands if expected_ymd in c["path"]]
+    if not cands:
+        if _retry and time.time() - _LAST_SCAN.get(_root_str(root), 0.0) > MISS_RESCAN_INTERVAL:
+            scan(root)
+            return find_local_file(name, ext, expected_token, expected_ymd, root, _retry=False)
+        return ""
+    found = cands[0]
+    path = _first_part(found["path"]) if found["is_dir"] else found["path"]
+    if path and os.path.isfile(path):
+        return path
+    if _retry:
+        # 索引过期（文件被移动/删除）：增量重扫后再试一次
+        scan(root)
+        return find_local_file(name, ext, expected_token, expected_ymd, root, _retry=False)
+    return ""
+
+
+def index_stats(root: Optional[Path] = None) -> Dict[str, Any]:
+    init_file_index_db()
+    root_s = _root_str(root)
+    lo, hi = root_s + os.sep, root_s + chr(ord(os.sep) + 1)
+    r = _conn().execute(
+        "SELECT COUNT(*), SUM(CASE WHEN is_dir=0 THEN 1 ELSE 0 END), SUM(size) FROM entries WHERE path>=? AND path<?",
+        (lo, hi),
+    ).fetchone()
+    return {"entries": int(r[0] or 0), "files": int(r[1] or 0), "bytes": int(r[2] or 0),
+            "last_scan": _LAST_SCAN.get(root_s)}
+
+
+def ingest_manifest(manifest_path: Any, root: Optional[Path] = None) -> int:
+    """
+    直接把 scripts/restore_minio.py 写出的恢复清单（JSON lines）并入索引，免去恢复后的全量扫描。
+    只收录 root 下且仍存在的文件；所在目录的 mtime 未登记，下次增量扫描会校正这些目录。
+    """
+    import json
+    init_file_index_db()
+    root_s = _root_str(root)
+    rows = []
+    p = Path(manifest_path)
+    if not p.exists():
+        return 0
+    with open(p, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                e = json.loads(line)
+            except Exception:
+                continue
+            path = str(e.get("path") or "")
+            if not path.startswith(root_s + os.sep):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            rows.append((path, os.path.basename(path), os.path.dirname(path), 0, int(st.st_size), st.st_mtime))
+    with _SCAN_LOCK:
+        conn = _conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO entries(path,name,parent,is_dir,size,mtime) VALUES (?,?,?,?,?,?)", rows
+        )
+        conn.commit()
+    return len(rows)
@@ -0,0 +1,127 @@
+# backend/flow_import.py
+# -*- coding: utf-8 -*-
+"""
+流程数据批量入库引擎：
+- prepare(item) 在线程池中并行构建每个流程实例的待写实体（bundle + 映射），
+  同时在途的实例数不超过 queue_size（默认 workers*4），不一次性提交全部实例；
+- 写入由调用线程按提交顺序串行完成，使用单连接 + upsert_entity_rows 分批提交；
+- 统计每个实例的失败原因与整体吞吐；进度经 backend.progress.Progress 采样，
+  progress_cb 只在采样时回调（stats["progress"] 为最近快照：EWMA 速率、ETA、各阶段队列深度）。
+prepare 返回 dict（type_name/key_field/key_value/name_val/data_json/meta/import_mode）或 None（跳过）。
+"""
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+FLOW_IMPORT_WORKERS = 4
+FLOW_IMPORT_BATCH = 200
+
+
+def run_flow_import(items: List[Tuple[str, Any]], prepare: Callable[[Any], Optional[Dict[str, Any]]], sid: str,
+                    workers: int = FLOW_IMPORT_WORKERS, batch_size: int = FLOW_IMPORT_BATCH,
+                    initializer: Optional[Callable[[], None]] = None,
+                    progress_cb: Optional[Callable[[int, int, Dict[str, Any]], None]] = None,
+                    cancel_event: Optional[Any] = None, progress: Optional[Any] = None,
+                    queue_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    items: [(实例键, prepare 的参数), ...]
+    queue_size: 在途（已提交未取结果）实例数上限，默认 workers*4
+    progress: 外部传入的 Progress（可带其它订阅者）；默认内部创建
+    返回统计：total/prepared/skipped/wrote/failed/failures/elapsed/rate/progress
+    failures: [{"key": 实例键, "stage": "prepare"|"write", "error": 原因}, ...]
+    """
+    from backend.mapper_core import upsert_entity_rows
+    from backend.progress import Progress
+    from backend.sql_utils import get_conn
+
+    total = len(items or [])
+    stats: Dict[str, Any] = {
+        "total": total, "done": 0, "prepared": 0, "skipped": 0, "wrote": 0,
+        "failed": 0, "failures": [], "elapsed": 0.0, "rate": 0.0, "cancelled": False, "progress": None,
+    }
+    start = time.time()
+    pending_rows: List[Dict[str, Any]] = []
+    pending_keys: List[str] = []
+    prog = progress if progress is not None else Progress("流程入库", total=total, unit="实例")
+    if prog.total is None:
+        prog.total = total
+
+    def _on_sample(snap):
+        stats["progress"] = snap
+        stats["elapsed"] = max(time.time() - start, 0.001)
+        stats["rate"] = stats["done"] / stats["elapsed"]
+        if progress_cb:
+            progress_cb(stats["done"], total, stats)
+
+    prog.subscribe(_on_sample)
+
+    conn = get_conn()
+
+    def _flush():
+        if not pending_rows:
+            return
+        wrote, fails = upsert_entity_rows(list(pending_rows), sid, conn=conn)
+        stats["wrote"] += wrote
+        for i, why in fails:
+            stats["failures"].append({"key": pending_keys[i], "stage": "write", "error": why})
+        stats["failed"] = len(stats["failures"])
+        if fails:
+            prog.error(len(fails), stage="write")
+        prog.stage("write", depth=0, done=len(pending_rows))
+        pending_rows.clear()
+        pending_keys.clear()
+
+    workers = max(1, int(workers))
+    queue_size = max(workers, int(queue_size or workers * 4))
+    try:
+        with ThreadPoolExecutor(max_workers=workers, initializer=initializer) as ex:
+            # 按提交顺序取结果：同一键的多条记录仍按源顺序合并；窗口内保持 queue_size 个在途实例
+            todo = iter(items or [])
+            futs: deque = deque()
+
+            def _fill():
+                while len(futs) < queue_size:
+                    nxt = next(todo, None)
+                    if nxt is None:
+                        return
+                    futs.append((nxt[0], ex.submit(prepare, nxt[1])))
+
+            _fill()
+            while futs:
+                if cancel_event is not None and cancel_event.is_set():
+                    stats["cancelled"] = True
+                    for _, f in futs:
+                        f.cancel()
+                    break
+                key, fut = futs.popleft()
+                try:
+                    row = fut.result()
+                    if row:
+                        pending_rows.append(row)
+                        pending_keys.append(key)
+                        stats["prepared"] += 1
+                    else:
+                        stats["skipped"] += 1
+                except Exception as e:
+                    stats["failures"].append({"key": key, "stage": "prepare", "error": str(e)})
+                    stats["failed"] = len(stats["failures"])
+                    prog.error(stage="prepare")
+                stats["done"] += 1
+                if len(pending_rows) >= batch_size:
+                    _flush()
+                if prog.due():
+                    # 仅在采样时刷新队列深度：待取结果的实例数、待写入的行数
+                    prog.stage("prepare", depth=total - stats["done"])
+                    prog.stage("write", depth=len(pending_rows))
+                prog.add()
+                _fill()
+        _flush()
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    prog.stage("prepare", depth=0)
+    prog.finish()
+    return stats
@@ -0,0 +1,152 @@
+# backend/flow_store.py
+# -*- coding: utf-8 -*-
+"""
+流程实例数据索引：一次性读取 Flowable act_* / bpm_* 表并按流程实例 id 分组，
+单个实例的 JSON 构建只做字典查找。源行来自 source_store（文件按 mtime、源库按 TTL 缓存），
+任一底层表的行对象变化即重建索引。
+"""
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+# 按流程实例分组的表 -> 实例 id 列
+INSTANCE_TABLES: Dict[str, str] = {
+    "act_ru_task": "proc_inst_id_",
+    "act_ru_execution": "proc_inst_id_",
+    "act_ru_variable": "proc_inst_id_",
+    "act_hi_taskinst": "proc_inst_id_",
+    "act_hi_actinst": "proc_inst_id_",
+    "act_hi_varinst": "proc_inst_id_",
+    "act_hi_comment": "proc_inst_id_",
+    "bpm_process_instance_copy": "process_instance_id",
+}
+LOOKUP_TABLES = ["act_hi_procinst", "bpm_process_definition_info", "bpm_category", "bpm_form"]
+
+_EMPTY: List[Dict[str, Any]] = []
+_LOCK = threading.Lock()
+_INDEX: Dict[Tuple[str, str], Dict[str, Any]] = {}
+# (kind, conn_key, table, col) -> (行列表 id, 行列表, 索引)
+_ROW_INDEX: Dict[Tuple[str, str, str, str], Tuple[int, List[Dict[str, Any]], Dict[str, Dict[str, Any]]]] = {}
+
+
+def def_code_of(def_id: Any) -> str:
+    s = str(def_id or "")
+    return s.split(":")[0] if ":" in s else s
+
+
+def _source_rows(kind: str, conn_key: str, table: str) -> List[Dict[str, Any]]:
+    from backend import source_store
+    if kind == "db":
+        try:
+            return source_store.db_rows(table, conn_key or None)
+        except Exception as e:
+            print("[flow_store read error]", table, e)
+            return _EMPTY
+    from backend.source_fields import detect_sql_path
+    p = detect_sql_path(table)
+    if not p.exists():
+        return _EMPTY
+    return source_store.file_rows(p, table)
+
+
+def _build(sources: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    by_pid: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+    for tbl, col in INSTANCE_TABLES.items():
+        g = defaultdict(list)
+        for r in sources.get(tbl) or []:
+            pid = str(r.get(col, "") or "").strip()
+            if pid:
+                g[pid].append(r)
+        by_pid[tbl] = dict(g)
+
+    procinst: Dict[str, Dict[str, Any]] = {}
+    for r in sources.get("act_hi_procinst") or []:
+        procinst.setdefault(str(r.get("id_", "") or "").strip(), r)
+
+    def_by_code: Dict[str, Dict[str, Any]] = {}
+    for d in sources.get("bpm_process_definition_info") or []:
+        def_by_code.setdefault(def_code_of(d.get("process_definition_id")), d)
+
+    cat_name: Dict[str, Any] = {}
+    cat_name_any: Dict[str, Any] = {}
+    for c in sources.get("bpm_category") or []:
+        code = str(c.get("code", ""))
+        cat_name_any[code] = c.get("name", "")
+        try:
+            del_flag = int(str(c.get("deleted", 0) or 0))
+        except Exception:
+            del_flag = 0
+        if del_flag != 1:
+            cat_name[code] = c.get("name", "")
+
+    form_by_id: Dict[str, Dict[str, Any]] = {}
+    for f in sources.get("bpm_form") or []:
+        form_by_id.setdefault(str(f.get("id", "")), f)
+
+    return {
+        "procinst_rows": sources.get("act_hi_procinst") or [],
+        "procinst": procinst,
+        "by_pid": by_pid,
+        "def_by_code": def_by_code,
+        "cat_name": cat_name,
+        "cat_name_any": cat_name_any,
+        "form_by_id": form_by_id,
+    }
+
+
+def flow_index(kind: str = "file", conn_key: str = "") -> Dict[str, Any]:
+    """返回 (kind, conn_key) 对应的流程索引；底层任一表变化时重建"""
+    tables = list(INSTANCE_TABLES.keys()) + LOOKUP_TABLES
+    sources = {t: _source_rows(kind, conn_key, t) for t in tables}
+    # source_store 在数据未变时返回同一列表对象；索引持有旧列表引用，id 不会被复用
+    stamp = tuple(id(sources[t]) for t in tables)
+    key = (kind, conn_key or "")
+    hit = _INDEX.get(key)
+    if hit is not None and hit["stamp"] == stamp:
+        return hit
+    with _LOCK:
+        hit = _INDEX.get(key)
+        if hit is not None and hit["stamp"] == stamp:
+            return hit
+        idx = _build(sources)
+        idx["stamp"] = stamp
+        idx["sources"] = sources
+        _INDEX[key] = idx
+        return idx
+
+
+def instance_rows(idx: Dict[str, Any], table: str, pid: str) -> List[Dict[str, Any]]:
+    return idx["by_pid"].get(table, {}).get(str(pid or "").strip(), _EMPTY)
+
+
+def invalidate():
+    with _LOCK:
+        _INDEX.clear()
+        _ROW_INDEX.clear()
+
+
+def source_row_index(kind: str, conn_key: str, table: str, col: str = "process_instance_id") -> Dict[str, Dict[str, Any]]:
+    """
+    业务源表按流程实例 id 的索引（取首条），行与 _parse_all_inserts 一致：
+    本地 dump 为数值化视图，源库为原始行。
+    """
+    from backend import source_store
+    if kind == "db":
+        try:
+            rows = source_store.db_rows(table, conn_key or None)
+        except Exception as e:
+            print("[flow_store read error]", table, e)
+            rows = _EMPTY
+    else:
+        from backend.source_fields import detect_sql_path
+        p = detect_sql_path(table)
+        rows = source_store.typed_file_rows(p, table) if p.exists() else _EMPTY
+    key = (kind, conn_key or "", table, col)
+    hit = _ROW_INDEX.get(key)
+    if hit is not None and hit[0] == id(rows):
+        return hit[2]
+    idx: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        idx.setdefault(str(r.get(col, "")), r)
+    _ROW_INDEX[key] = (id(rows), rows, idx)
+    return idx
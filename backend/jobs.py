@@ -0,0 +1,341 @@
+# backend/jobs.py
+# -*- coding: utf-8 -*-
+"""
+进程内入库任务管理：
+- 任务记录持久化到 mapping_config.db 的 import_jobs 表，Streamlit 重跑/刷新不影响任务；
+- 固定大小线程池执行 import_table_data，多表可并发入库（并发度 JOB_WORKERS）；
+- 通过 threading.Event 协作取消；进度/速率/ETA 由 UI 轮询 get_job/list_jobs；
+  运行中的进度由 backend.progress.Progress 采样（EWMA 速率、ETA），快照放在 job["progress"]；
+- profile=True 的任务记录耗时剖析（backend/profiler.py），结束后写入 import_profiles/。
+进程重启后，遗留的 queued/running 任务标记为 interrupted。
+"""
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from backend.db import DB_PATH
+
+JOB_WORKERS = 3
+# 进度落库节流（秒）；内存中的进度实时更新
+_PERSIST_INTERVAL = 1.0
+
+_LOCK = threading.Lock()
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_CANCEL: Dict[str, threading.Event] = {}
+_LIVE: Dict[str, Dict[str, Any]] = {}
+_DONE: Dict[str, threading.Event] = {}
+_INITED = False
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_COLS = [
+    "id", "source_table", "target_entity", "sid", "import_mode", "sync_soft_delete",
+    "status", "done", "total", "wrote", "error",
+    "created_at", "started_at", "finished_at", "updated_at",
+]
+
+
+def _conn():
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_jobs_db():
+    """确保任务表存在；并把上个进程遗留的未完成任务标记为 interrupted。"""
+    global _INITED
+    with _LOCK:
+        if _INITED:
+            return
+        with _conn() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS import_jobs (
+                    id TEXT PRIMARY KEY,
+                    source_table TEXT NOT NULL,
+                    target_entity TEXT,
+                    sid TEXT,
+                    import_mode TEXT,
+                    sync_soft_delete INTEGER DEFAULT 0,
+                    status TEXT NOT NULL,
+                    done INTEGER DEFAULT 0,
+                    total INTEGER DEFAULT 0,
+                    wrote INTEGER DEFAULT 0,
+                    error TEXT,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL,
+                    updated_at REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_import_jobs_status ON import_jobs(status, created_at)")
+            conn.execute(
+                "UPDATE import_jobs SET status='interrupted', finished_at=?, updated_at=? WHERE status IN ('queued','running')",
+                (time.time(), time.time()),
+            )
+        _INITED = True
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="import-job")
+        return _EXECUTOR
+
+
+def _persist(job_id: str, **fields):
+    if not fields:
+        return
+    fields["updated_at"] = time.time()
+    keys = list(fields.keys())
+    sets = ",".join(f"{k}=?" for k in keys)
+    try:
+        with _conn() as conn:
+            conn.execute(f"UPDATE import_jobs SET {sets} WHERE id=?", [fields[k] for k in keys] + [job_id])
+    except Exception as e:
+        print("[jobs persist error]", e)
+
+
+def _with_rates(job: Dict[str, Any]) -> Dict[str, Any]:
+    """补充 rate（条/秒）、eta（秒）、elapsed（秒）：运行中取采样快照的 EWMA 速率，否则取全程平均"""
+    started = job.get("started_at") or 0
+    end = job.get("finished_at") or time.time()
+    elapsed = max(end - started, 0.0) if started else 0.0
+    done = int(job.get("done") or 0)
+    total = int(job.get("total") or 0)
+    snap = job.get("progress") if job.get("status") == "running" else None
+    if snap and snap.get("rate"):
+        rate = float(snap["rate"])
+    else:
+        rate = (done / elapsed) if elapsed > 0 else 0.0
+    eta = int((total - done) / rate) if rate > 0 and total > done else 0
+    job["elapsed"] = elapsed
+    job["rate"] = rate
+    job["eta"] = eta
+    return job
+
+
+def _run_job(job_id: str, params: Dict[str, Any]):
+    try:
+        _run_job_inner(job_id, params)
+    finally:
+        _CANCEL.pop(job_id, None)
+        dev = _DONE.get(job_id)
+        if dev is not None:
+            dev.set()
+
+
+def _run_job_inner(job_id: str, params: Dict[str, Any]):
+    from backend.mapper_core import import_table_data
+    from backend.progress import Progress
+
+    ev = _CANCEL.get(job_id)
+    live = _LIVE.setdefault(job_id, {})
+    # 依赖任务先于本任务提交、在线程池队列中靠前，等待不会占死线程池
+    for dep in params.get("after") or []:
+        dev = _DONE.get(dep)
+        while dev is not None and not dev.wait(0.5):
+            if ev is not None and ev.is_set():
+                break
+    if ev is not None and ev.is_set():
+        live.update(status="cancelled", finished_at=time.time())
+        _persist(job_id, status="cancelled", finished_at=live["finished_at"])
+        return
+    started = time.time()
+    live.update(status="running", started_at=started)
+    _persist(job_id, status="running", started_at=started)
+    last_persist = [0.0]
+
+    def _publish(snap):
+        live.update(done=snap["done"], total=int(snap["total"] or 0), progress=snap)
+        now = time.time()
+        if now - last_persist[0] >= _PERSIST_INTERVAL:
+            last_persist[0] = now
+            _persist(job_id, done=snap["done"], total=int(snap["total"] or 0))
+
+    tracker = Progress(params["source_table"]).subscribe(_publish)
+
+    def _cb(done, total):
+        tracker.update(done, total)
+
+    prof = None
+    if params.get("profile"):
+        from backend.profiler import ImportProfile
+        prof = ImportProfile(f"{params['source_table']}_{params.get('target_entity') or ''}_{job_id}", job_id=job_id)
+    status, err, wrote = "done", None, 0
+    try:
+        wrote = import_table_data(
+            params["source_table"],
+            sid=params.get("sid"),
+            target_entity_spec=params.get("target_entity") or None,
+            import_mode=params.get("import_mode") or "upsert",
+            progress_cb=_cb,
+            sync_soft_delete=bool(params.get("sync_soft_delete")),
+            cancel_event=ev,
+            source_kind=params.get("source_kind") or "file",
+            profile=prof,
+        )
+        if ev is not None and ev.is_set():
+            status = "cancelled"
+    except Exception as e:
+        status, err = "failed", str(e)
+        print("[jobs run error]", e)
+    tracker.finish()
+    finished = time.time()
+    if prof is not None:
+        try:
+            prof.finish(status=status)
+            live["profile_path"] = str(prof.dump())
+        except Exception as e:
+            print("[jobs profile dump error]", e)
+    live.update(status=status, wrote=int(wrote or 0), error=err, finished_at=finished)
+    _persist(
+        job_id, status=status, wrote=int(wrote or 0), error=err, finished_at=finished,
+        done=int(live.get("done") or 0), total=int(live.get("total") or 0),
+    )
+
+
+def submit_import_job(source_table: str, target_entity: Optional[str] = None, sid: Optional[str] = None,
+                      import_mode: str = "upsert", sync_soft_delete: bool = False,
+                      after: Optional[List[str]] = None, source_kind: str = "file",
+                      profile: bool = False) -> str:
+    """
+    提交一个入库任务，返回 job_id。同一 (源表, 目标, sid) 已有活动任务时直接返回该任务。
+    after: 需先结束的 job_id 列表（用于按优先级分批执行）。
+    source_kind: 'file'（本地 dump）或 'db'（源库流式读取）。
+    profile: 记录本次入库的耗时剖析。
+    """
+    init_jobs_db()
+    with _LOCK:
+        for jid, lv in _LIVE.items():
+            if lv.get("status") in ACTIVE_STATUSES and lv.get("source_table") == source_table \
+                    and lv.get("target_entity") == (target_entity or "") and lv.get("sid") == (sid or ""):
+                return jid
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        params = {
+            "source_table": source_table,
+            "target_entity": target_entity or "",
+            "sid": sid or "",
+            "import_mode": import_mode or "upsert",
+            "sync_soft_delete": 1 if sync_soft_delete else 0,
+            "source_kind": source_kind or "file",
+            "profile": bool(profile),
+        }
+        _CANCEL[job_id] = threading.Event()
+        _DONE[job_id] = threading.Event()
+        _LIVE[job_id] = dict(params, id=job_id, status="queued", done=0, total=0, wrote=0, error=None,
+                             created_at=now, started_at=None, finished_at=None)
+    try:
+        with _conn() as conn:
+            conn.execute(
+                """
+                INSERT INTO import_jobs (id, source_table, target_entity, sid, import_mode, sync_soft_delete,
+                                         status, created_at, updated_at)
+                VALUES (?,?,?,?,?,?,'queued',?,?)
+                """,
+                (job_id, params["source_table"], params["target_entity"], params["sid"],
+                 params["import_mode"], params["sync_soft_delete"], now, now),
+            )
+    except Exception as e:
+        print("[submit_import_job error]", e)
+    _executor().submit(_run_job, job_id, dict(params, after=list(after or [])))
+    return job_id
+
+
+def submit_import_batch(rows: List[Dict[str, Any]], sid: Optional[str] = None,
+                        import_mode: str = "upsert", sync_soft_delete: bool = False,
+                        source_kind: str = "file", profile: bool = False) -> List[str]:
+    """
+    批量提交：同一 priority 的表并发执行，较低 priority 的批次等待较高批次全部结束，
+    保持与原先按优先级顺序入库一致的依赖关系。rows 需含 source_table/target_entity/priority。
+    """
+    ids: List[str] = []
+    prev_tier: List[str] = []
+    ordered = sorted(rows or [], key=lambda r: -int(r.get("priority") or 0))
+    i = 0
+    while i < len(ordered):
+        pri = int(ordered[i].get("priority") or 0)
+        tier: List[str] = []
+        while i < len(ordered) and int(ordered[i].get("priority") or 0) == pri:
+            r = ordered[i]
+            tier.append(submit_import_job(
+                r.get("source_table") or "", target_entity=r.get("target_entity"), sid=sid,
+                import_mode=import_mode, sync_soft_delete=sync_soft_delete, after=prev_tier,
+                source_kind=source_kind, profile=profile,
+            ))
+            i += 1
+        ids.extend(tier)
+        prev_tier = tier
+    return ids
+
+
+def cancel_job(job_id: str) -> bool:
+    """请求取消；运行中的任务在处理下一条记录前停止。"""
+    ev = _CANCEL.get(job_id)
+    if ev is None:
+        return False
+    ev.set()
+    return True
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    init_jobs_db()
+    job = None
+    try:
+        with _conn() as conn:
+            r = conn.execute(f"SELECT {','.join(_COLS)} FROM import_jobs WHERE id=?", (job_id,)).fetchone()
+            if r:
+                job = dict(r)
+    except Exception as e:
+        print("[get_job error]", e)
+    live = _LIVE.get(job_id)
+    if live:
+        job = dict(job or {}, **live)
+    return _with_rates(job) if job else None
+
+
+def list_jobs(limit: int = 50, active_only: bool = False) -> List[Dict[str, Any]]:
+    """按创建时间倒序返回任务；运行中的任务以内存进度为准。"""
+    init_jobs_db()
+    out: List[Dict[str, Any]] = []
+    try:
+        with _conn() as conn:
+            sql = f"SELECT {','.join(_COLS)} FROM import_jobs"
+            if active_only:
+                sql += " WHERE status IN ('queued','running')"
+            sql += " ORDER BY created_at DESC LIMIT ?"
+            out = [dict(r) for r in conn.execute(sql, (int(limit),)).fetchall()]
+    except Exception as e:
+        print("[list_jobs error]", e)
+    for job in out:
+        live = _LIVE.get(job["id"])
+        if live:
+            job.update(live)
+    return [_with_rates(j) for j in out]
+
+
+def has_active_jobs() -> bool:
+    return any(lv.get("status") in ACTIVE_STATUSES for lv in list(_LIVE.values()))
+
+
+def clear_finished_jobs() -> int:
+    """删除已结束的任务记录"""
+    init_jobs_db()
+    try:
+        with _conn() as conn:
+            cur = conn.execute("DELETE FROM import_jobs WHERE status NOT IN ('queued','running')")
+            n = cur.rowcount or 0
+    except Exception as e:
+        print("[clear_finished_jobs error]", e)
+        return 0
+    with _LOCK:
+        for jid in [k for k, v in _LIVE.items() if v.get("status") not in ACTIVE_STATUSES]:
+            _LIVE.pop(jid, None)
+            _DONE.pop(jid, None)
+    return n
@@ -1,12 +1,14 @@
-from pathlib import Path
-import time
+from typing import Any, Dict, List, Tuple
 
-LOG_PATH = Path("import_log.txt")
+from backend.event_log import LOG_PATH, format_event, tail_events
 
-def tail_log(last_size=0):
-    """读取日志增量"""
-    if not LOG_PATH.exists():
-        return "", 0
-    text = LOG_PATH.read_text(encoding="utf-8")
-    new_text = text[last_size:]
-    return new_text, len(text)
+def tail_log(cursor=0) -> Tuple[str, Tuple[int, int]]:
+    """读取日志增量：从上次的游标 (inode, 字节偏移) seek 读取新增的完整行，返回 (文本, 新游标)"""
+    events, cursor = tail_events(cursor)
+    if not events:
+        return "", cursor
+    return "\n".join(format_event(ev) for ev in events) + "\n", cursor
+
+def tail_log_events(cursor=0) -> Tuple[List[Dict[str, Any]], Tuple[int, int]]:
+    """同 tail_log，返回结构化事件"""
+    return tail_events(cursor)
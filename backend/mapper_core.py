@@ -1,12 +1,14 @@
 # backend/mapper_core.py
 # -*- coding: utf-8 -*-
-from typing import Dict, Any, Tuple, Optional, List, Callable
-import re, pymysql, json, time,math, datetime
+from typing import Dict, Any, Tuple, Optional, List, Callable, Iterator
+import re, json, time,math, datetime, itertools
 from pathlib import Path
 from types import SimpleNamespace
 from backend.db import list_tables, get_priority, get_field_mappings, get_target_entity
 from backend.source_fields import detect_sql_path
-from backend.sql_utils import get_conn, is_pg, json_equals_clause
+from backend.sql_utils import get_conn, is_pg, json_equals_clause, json_text_expr, current_cfg
+from backend.event_log import log_error as _log_error
+from backend.profiler import activate as _prof_activate, count_cache as _prof_cache, count_error as _prof_error, current as _profile, phase as _prof_phase
 
 try:
     from version3 import MYSQL_CFG, SID
@@ -102,7 +104,8 @@ def _eval_sql_complex_expr(expr: str, record: Dict[str, Any]) -> Optional[Any]:
     try:
         return _sql_lookup(table, where_field, v, target_field) or ""
     except Exception as e:
-        print("[_eval_sql_complex_expr error]", e)
+        _log_error("_eval_sql_complex_expr error", e, source="mapper_core")
+        _prof_error()
         return ""
 
 def __date_ts__(v) -> int:
@@ -190,6 +193,7 @@ def _entity_fetch(type_name: str, where_field: str, where_val: Any, target_path:
                     sql = f"SELECT JSON_UNQUOTE(JSON_EXTRACT(data, '$.{tpath}')) FROM entity WHERE type=%s AND {json_equals_clause('data', where_field)} LIMIT 1"
                     cur.execute(sql, (type_name, str(where_val)))
             row = cur.fetchone()
+            _prof_cache("entity_lookup", bool(row and row[0]))
             if row and row[0]:
                 _CACHE[key] = row[0]
                 return row[0]
@@ -198,7 +202,8 @@ def _entity_fetch(type_name: str, where_field: str, where_val: Any, target_path:
                     del _CACHE[key]
                 return None
     except Exception as e:
-        print("[_entity_fetch error]", e)
+        _log_error("_entity_fetch error", e, source="mapper_core")
+        _prof_error()
         return None
     finally:
         if conn:
@@ -269,6 +274,7 @@ def _entity_rel_fetch(type_name: str, entity_id: Any, field: str = "uuid") -> Op
     key = f"REL:{type_name}:{entity_id}:{field}"
     if key in _CACHE:
         return _CACHE[key]
+    import pymysql
     conn = pymysql.connect(**MYSQL_CFG)
     try:
         with conn.cursor() as cur:
@@ -313,6 +319,7 @@ def _sql_lookup(table: str, where_field: str, where_val: Any, target_field: str)
 
         # 取 rows 缓存（不受 _CACHE.clear() 影响）；若文件变更则强制重载
         rows = _SQL_ROWS_CACHE.get(table)
+        _prof_cache("sql_rows", not ((rows is None) or (last_mtime < cur_mtime)))
         if (rows is None) or (last_mtime < cur_mtime):
             rows = _parse_sql_file(p)
             _SQL_ROWS_CACHE[table] = rows
@@ -328,6 +335,7 @@ def _sql_lookup(table: str, where_field: str, where_val: Any, target_field: str)
         # 若该字段未建立索引，构建一次基于小写、去空格的索引
         idx_key = f"{table}|{wf}"
         idx = _SQL_IDX_CACHE.get(idx_key)
+        _prof_cache("sql_index", idx is not None)
         if idx is None:
             idx = {}
             for r in rows:
@@ -345,7 +353,8 @@ def _sql_lookup(table: str, where_field: str, where_val: Any, target_field: str)
             return None
         return val
     except Exception as e:
-        print("[_sql_lookup error]", e)
+        _log_error("_sql_lookup error", e, source="mapper_core")
+        _prof_error()
         return None
 
 # ========== 对外：SQL 缓存管理 ==========
@@ -353,6 +362,11 @@ def clear_sql_cache(table: Optional[str] = None) -> Dict[str, int]:
     """清理 SQL 解析与索引缓存。table 为空则清理全部。返回统计信息。"""
     cleared_rows = 0
     cleared_idx = 0
+    try:
+        from backend.source_store import invalidate
+        invalidate("file", table=table)
+    except Exception:
+        pass
     if table:
         if table in _SQL_ROWS_CACHE:
             del _SQL_ROWS_CACHE[table]
@@ -420,6 +434,40 @@ SOURCE_RE        = re.compile(r"source\((?P<table>\w+)\.(?P<field>\w+)=(?P<sexpr
 
 def _split_args(s: str) -> List[str]:
     return [a.strip() for a in s.split(",")]
+
+def _format_date_value(val: Any, fmt: str) -> str:
+    """date(fmt, field) 的格式化逻辑（逐行与列式求值共用）。"""
+    if not val:
+        return ""
+    for f in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            dt = datetime.datetime.strptime(str(val).split(".")[0], f)
+            return dt.strftime(fmt)
+        except Exception:
+            continue
+    dt2 = __date_any__(val)
+    if dt2:
+        return dt2.strftime(fmt)
+    return str(val).split(" ")[0]
+
+def _parse_py_dict_get(expr: str) -> Tuple[Dict[Any, Any], str, Any]:
+    """解析 py:{...}.get(key, default) -> (mapping, key_expr, default)；格式不合法时抛异常。"""
+    import ast
+    dict_part, _, tail = expr.partition("}.get(")
+    dict_part = dict_part + "}"
+    args_part = tail.rsplit(")", 1)[0]
+    mapping = ast.literal_eval(dict_part)
+    args = [a.strip() for a in args_part.split(",")]
+    key_expr = args[0]
+    default_val = ast.literal_eval(args[1]) if len(args) > 1 else ""
+    return mapping, key_expr, default_val
+
+def _py_dict_get_value(mapping: Dict[Any, Any], raw_val: Any, default_val: Any) -> Any:
+    if isinstance(raw_val, str) and "," in raw_val:
+        parts = [p.strip() for p in raw_val.split(",") if p.strip()]
+        mapped = [mapping.get(p, default_val) for p in parts]
+        return ",".join(mapped)
+    return mapping.get(str(raw_val), default_val)
 # ========== 时间戳辅助 ==========
 
 
@@ -475,21 +523,10 @@ def _eval_rule(rule: str, record: Dict[str, Any]) -> Any:
                 val = record.get(field_part[7:], "")
             else:
                 val = record.get(field_part, "")
-            if not val:
-                return ""
-            # 格式化
-            for f in ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
-                try:
-                    dt = datetime.datetime.strptime(str(val).split(".")[0], f)
-                    return dt.strftime(fmt)
-                except Exception:
-                    continue
-            dt2 = __date_any__(val)
-            if dt2:
-                return dt2.strftime(fmt)
-            return str(val).split(" ")[0]
+            return _format_date_value(val, fmt)
         except Exception as e:
-            print("[date(fmt, field) error]", e)
+            _log_error("date(fmt, field) error", e, source="mapper_core")
+            _prof_error()
             return ""
 
     # ========== ✅ 保留: date:%Y-%m-%d 旧写法 ==========
@@ -564,13 +601,7 @@ def _eval_rule(rule: str, record: Dict[str, Any]) -> Any:
         # --- py:{...}.get(...) 字典映射 ---
         if ".get(" in expr and expr.strip().startswith("{"):
             try:
-                dict_part, _, tail = expr.partition("}.get(")
-                dict_part = dict_part + "}"
-                args_part = tail.rsplit(")", 1)[0]
-                mapping = ast.literal_eval(dict_part)
-                args = [a.strip() for a in args_part.split(",")]
-                key_expr = args[0]
-                default_val = ast.literal_eval(args[1]) if len(args) > 1 else ""
+                mapping, key_expr, default_val = _parse_py_dict_get(expr)
 
                 def _eval_key(_e: str):
                     _e = _e.strip()
@@ -580,14 +611,10 @@ def _eval_rule(rule: str, record: Dict[str, Any]) -> Any:
                         return record[_e]
                     return _e
 
-                raw_val = _eval_key(key_expr)
-                if isinstance(raw_val, str) and "," in raw_val:
-                    parts = [p.strip() for p in raw_val.split(",") if p.strip()]
-                    mapped = [mapping.get(p, default_val) for p in parts]
-                    return ",".join(mapped)
-                return mapping.get(str(raw_val), default_val)
+                return _py_dict_get_value(mapping, _eval_key(key_expr), default_val)
             except Exception as e:
-                print("[py-get parse error]", e)
+                _log_error("py-get parse error", e, source="mapper_core")
+                _prof_error()
                 return None
 
         # --- 常规 py 表达式 ---
@@ -612,7 +639,8 @@ def _eval_rule(rule: str, record: Dict[str, Any]) -> Any:
             val = eval(expr, safe_globals, {"record": rec_obj, **record})
             return val
         except Exception as e:
-            print("[py expr error]", e)
+            _log_error("py expr error", e, source="mapper_core")
+            _prof_error()
             return None
 
     # ========== 默认 ==========
@@ -630,6 +658,8 @@ def apply_record_mapping(source_table: str, record: Dict[str, Any], py_script: s
     type_override = (target_entity or get_target_entity(source_table) or "")
     out_name = ""
     new_rec = dict(record)
+    prof = _profile()
+    t_map = time.perf_counter() if prof is not None else 0.0
 
     for m in mappings:
         if not int(m["enabled"]):
@@ -645,7 +675,11 @@ def apply_record_mapping(source_table: str, record: Dict[str, Any], py_script: s
             sub_rules = [x.strip() for x in rule.split("||")]
             for i, t in enumerate(targets):
                 sel_rule = sub_rules[i] if i < len(sub_rules) else sub_rules[-1]
-                val_i = _eval_rule(sel_rule, new_rec)
+                if prof is not None:
+                    with prof.rule(f"{m.get('id')}.{i}", _rule_kind(sel_rule), 1, source_field=src, target=t, rule=sel_rule):
+                        val_i = _eval_rule(sel_rule, new_rec)
+                else:
+                    val_i = _eval_rule(sel_rule, new_rec)
 
                 # ✅ 关键点：只要写了 rule，就不允许回退到 source_field
                 if val_i is None:
@@ -654,7 +688,12 @@ def apply_record_mapping(source_table: str, record: Dict[str, Any], py_script: s
                 _assign_target(new_rec, t, val_i, name_holder=lambda v: _set_name(new_rec, v))
         else:
             # 单规则或无规则
-            if rule:
+            if rule and prof is not None:
+                with prof.rule(str(m.get("id")), _rule_kind(rule), 1, source_field=src, target=",".join(targets), rule=rule):
+                    val = _eval_rule(rule, new_rec)
+                if val is None:
+                    val = ""
+            elif rule:
                 val = _eval_rule(rule, new_rec)
 
                 # ✅ 关键点：只要写了 rule，就不允许回退到 source_field
@@ -670,32 +709,281 @@ def apply_record_mapping(source_table: str, record: Dict[str, Any], py_script: s
 
     if "__name__" not in new_rec:
         new_rec["__name__"] = out_name or new_rec.get("__name__", "")
+    if prof is not None:
+        prof.add_phase("map", time.perf_counter() - t_map)
 
     # ---------- 表级脚本 ----------
-    if py_script and py_script.strip():
-        try:
-            safe_globals = {
-                "__builtins__": {
-                    "len": len, "str": str, "int": int, "float": float,
-                    "dict": dict, "list": list, "print": print,
-                    "range": range, "__import__": __import__,
-                }
-            }
-            # 注入当前 entity 上下文，脚本可读 current_entity / type_name
-            loc = {
-                "record": new_rec,
-                "current_entity": (target_entity or ""),
-                "target_entity": (target_entity or ""),
-                "type_name": (target_entity or get_target_entity(source_table) or source_table)
-            }
-            exec(py_script, safe_globals, loc)
-            new_rec = loc["record"]
-        except Exception as e:
-            print("[py_script error]", e)
+    new_rec = _run_table_script(py_script, new_rec, source_table, target_entity)
 
     return new_rec, new_rec.get("__name__", ""), type_override
 
 
+def _run_table_script(py_script: str, new_rec: Dict[str, Any], source_table: str, target_entity: Optional[str]) -> Dict[str, Any]:
+    if not (py_script and py_script.strip()):
+        return new_rec
+    with _prof_phase("script"):
+        return _exec_table_script(py_script, new_rec, source_table, target_entity)
+
+
+def _exec_table_script(py_script: str, new_rec: Dict[str, Any], source_table: str, target_entity: Optional[str]) -> Dict[str, Any]:
+    try:
+        safe_globals = {
+            "__builtins__": {
+                "len": len, "str": str, "int": int, "float": float,
+                "dict": dict, "list": list, "print": print,
+                "range": range, "__import__": __import__,
+            }
+        }
+        # 注入当前 entity 上下文，脚本可读 current_entity / type_name
+        loc = {
+            "record": new_rec,
+            "current_entity": (target_entity or ""),
+            "target_entity": (target_entity or ""),
+            "type_name": (target_entity or get_target_entity(source_table) or source_table)
+        }
+        exec(py_script, safe_globals, loc)
+        new_rec = loc["record"]
+    except Exception as e:
+        _log_error("py_script error", e, source="mapper_core")
+        _prof_error("script")
+    return new_rec
+
+
+# ================= 列式批量映射 =================
+# 将一批记录视为若干列：pass-through / record.x / 字面量 / concat / coalesce /
+# py:{...}.get(...) / date(fmt, field) 按列一次性计算；py 表达式、entity/sql 查找
+# 等规则仍逐行调用 _eval_rule。映射按配置顺序逐条处理，保证与逐行模式结果一致。
+COLUMNAR_CHUNK = 1000
+
+def _compile_atom(atom: str) -> Optional[Tuple[str, Any]]:
+    a = atom.strip()
+    if not a:
+        return ("lit", "")
+    if a.startswith("'") and a.endswith("'"):
+        return ("lit", a[1:-1])
+    if a.startswith("record."):
+        return ("field", a[7:])
+    if a.startswith("entity("):
+        return None
+    return ("name", a)
+
+def _atom_getter(atom: Tuple[str, Any]) -> Callable[[Dict[str, Any]], Any]:
+    kind, arg = atom
+    if kind == "lit":
+        return lambda rec: arg
+    if kind == "field":
+        return lambda rec: rec.get(arg, "")
+    return lambda rec: rec.get(arg) if arg in rec else arg
+
+def _compile_rule(rule: str) -> Optional[Tuple[str, Any]]:
+    """把单条 rule 编译为列式算子；返回 None 表示只能逐行求值。"""
+    r = (rule or "").strip()
+    if not r:
+        return ("const", None)
+    if COMPLEX_EXPR_RE.fullmatch(r) or SQL_COMPLEX_RE.fullmatch(r):
+        return None
+    if r.lower().startswith("date(") and "," in r:
+        try:
+            fmt_part, field_part = [x.strip() for x in r[5:-1].split(",", 1)]
+        except Exception:
+            return None
+        fmt = fmt_part.strip()
+        if fmt.startswith("'") or fmt.startswith('"'):
+            fmt = fmt[1:-1]
+        field = field_part[7:] if field_part.startswith("record.") else field_part
+        return ("date", (fmt, field))
+    if r.startswith("date:"):
+        return None
+    for kind, func_re in (("coalesce", FUNC_COALESCE), ("concat", FUNC_CONCAT)):
+        m = func_re.match(r)
+        if m:
+            atoms = [_compile_atom(x) for x in _split_args(m.group(1))]
+            if any(a is None for a in atoms):
+                return None
+            return (kind, [_atom_getter(a) for a in atoms])
+    if ENTITY_SIMPLE_RE.fullmatch(r) or ENTITY_JOIN_RE.fullmatch(r) or REL_RE.fullmatch(r) or SOURCE_RE.fullmatch(r):
+        return None
+    m = PY_RE.match(r)
+    if m:
+        expr = m.group("expr").strip()
+        if ".get(" in expr and expr.startswith("{"):
+            try:
+                mapping, key_expr, default_val = _parse_py_dict_get(expr)
+            except Exception:
+                return None
+            key_atom = _compile_atom(key_expr)
+            if key_atom is None or key_atom[0] == "lit":
+                # 与逐行语义对齐：字面量 key 不去引号，交由 _eval_rule 处理
+                return None
+            return ("dict_get", (mapping, _atom_getter(key_atom), default_val))
+        return None
+    atom = _compile_atom(r)
+    if atom is None:
+        return None
+    return ("atom", _atom_getter(atom))
+
+def _rule_kind(rule: str) -> str:
+    """规则类型（用于耗时剖析分组）"""
+    r = (rule or "").strip()
+    if not r:
+        return "passthrough"
+    m = COMPLEX_EXPR_RE.fullmatch(r)
+    if m:
+        return m.group("etype")
+    if SQL_COMPLEX_RE.fullmatch(r):
+        return "sql"
+    if r.lower().startswith("date(") or r.startswith("date:"):
+        return "date"
+    if FUNC_COALESCE.match(r):
+        return "coalesce"
+    if FUNC_CONCAT.match(r):
+        return "concat"
+    if ENTITY_SIMPLE_RE.fullmatch(r) or ENTITY_JOIN_RE.fullmatch(r):
+        return "entity"
+    if REL_RE.fullmatch(r):
+        return "rel"
+    if SOURCE_RE.fullmatch(r):
+        return "source"
+    m = PY_RE.match(r)
+    if m:
+        expr = m.group("expr").strip()
+        return "py_get" if (".get(" in expr and expr.startswith("{")) else "py"
+    return "atom"
+
+def _eval_rule_column(op: Optional[Tuple[str, Any]], rule: str, rows: List[Dict[str, Any]]) -> List[Any]:
+    if op is None:
+        return [_eval_rule(rule, rec) for rec in rows]
+    kind, arg = op
+    if kind == "const":
+        return [arg] * len(rows)
+    if kind == "atom":
+        return [arg(rec) for rec in rows]
+    if kind == "coalesce":
+        out = []
+        for rec in rows:
+            hit = ""
+            for getter in arg:
+                v = getter(rec)
+                if v not in (None, "", "null", "NULL"):
+                    hit = v
+                    break
+            out.append(hit)
+        return out
+    if kind == "concat":
+        return ["".join(str(getter(rec) or "") for getter in arg) for rec in rows]
+    if kind == "dict_get":
+        mapping, key_getter, default_val = arg
+        out = []
+        for rec in rows:
+            try:
+                out.append(_py_dict_get_value(mapping, key_getter(rec), default_val))
+            except Exception as e:
+                _log_error("py-get parse error", e, source="mapper_core")
+                _prof_error()
+                out.append(None)
+        return out
+    if kind == "date":
+        fmt, field = arg
+        memo: Dict[Any, Any] = {}
+        computed = 0
+        out = []
+        for rec in rows:
+            val = rec.get(field, "")
+            hashable = isinstance(val, (str, int, float))
+            if hashable and val in memo:
+                out.append(memo[val])
+                continue
+            computed += 1
+            try:
+                res = _format_date_value(val, fmt)
+            except Exception as e:
+                _log_error("date(fmt, field) error", e, source="mapper_core")
+                _prof_error()
+                res = ""
+            if hashable:
+                memo[val] = res
+            out.append(res)
+        _prof_cache("date_memo", True, len(rows) - computed)
+        _prof_cache("date_memo", False, computed)
+        return out
+    return [_eval_rule(rule, rec) for rec in rows]
+
+# entity / rel / sql 查找（含 py: 表达式里的 __entity__ / __sql_lookup__ / __sql_list__）：
+# 可能读到本次导入中先写入的行（如自引用的上级查找）
+_LOOKUP_RULE_RE = re.compile(r"\b(?:entity|rel)\(|\b(?:entity|sql)\.\w+\(|__(?:entity|sql_lookup|sql_list)__\(")
+
+def _has_lookup_rules(source_table: str, target_entity: Optional[str] = None) -> bool:
+    """启用的字段映射（含 || 备选）中是否有 entity / rel / sql 查找规则"""
+    for m in get_field_mappings(source_table, target_entity or None):
+        if int(m["enabled"]) and _LOOKUP_RULE_RE.search(m.get("rule") or ""):
+            return True
+    return False
+
+def apply_records_mapping(source_table: str, records: List[Dict[str, Any]], py_script: str = "", target_entity: Optional[str] = None) -> List[Tuple[Dict[str, Any], str, str]]:
+    """
+    列式版 apply_record_mapping：一次处理一批记录，返回与逐条调用相同的
+    [(mapped_record, name, type_override), ...]。
+    """
+    _CACHE.clear()
+    if not records:
+        return []
+
+    mappings = get_field_mappings(source_table, target_entity or None)
+    type_override = (target_entity or get_target_entity(source_table) or "")
+    rows = [dict(r) for r in records]
+    compiled: Dict[str, Optional[Tuple[str, Any]]] = {}
+    prof = _profile()
+    t_map = time.perf_counter() if prof is not None else 0.0
+
+    def _column(rule_: str, rule_id: str = "", **info) -> List[Any]:
+        if rule_ not in compiled:
+            compiled[rule_] = _compile_rule(rule_)
+        if prof is not None:
+            with prof.rule(rule_id, _rule_kind(rule_), len(rows), rule=rule_, **info):
+                col = _eval_rule_column(compiled[rule_], rule_, rows)
+        else:
+            col = _eval_rule_column(compiled[rule_], rule_, rows)
+        # 只要写了 rule，就不允许回退到 source_field
+        return ["" if v is None else v for v in col]
+
+    for m in mappings:
+        if not int(m["enabled"]):
+            continue
+
+        targets = [t.strip() for t in (m["target_paths"] or "").split(",") if t.strip()]
+        rule = (m["rule"] or "").strip()
+        src = m["source_field"] or ""
+
+        if "||" in rule and len(targets) > 1:
+            sub_rules = [x.strip() for x in rule.split("||")]
+            for i, t in enumerate(targets):
+                sel_rule = sub_rules[i] if i < len(sub_rules) else sub_rules[-1]
+                col = _column(sel_rule, f"{m.get('id')}.{i}", source_field=src, target=t)
+                for rec, v in zip(rows, col):
+                    _assign_target(rec, t, v)
+        else:
+            if rule:
+                col = _column(rule, str(m.get("id")), source_field=src, target=",".join(targets))
+            elif prof is not None:
+                with prof.rule(str(m.get("id")), "passthrough", len(rows), source_field=src, target=",".join(targets), rule=""):
+                    col = [rec.get(src, "") for rec in rows]
+            else:
+                col = [rec.get(src, "") for rec in rows]
+            for t in targets:
+                for rec, v in zip(rows, col):
+                    _assign_target(rec, t, v)
+
+    if prof is not None:
+        prof.add_phase("map", time.perf_counter() - t_map, len(rows))
+    out = []
+    for rec in rows:
+        if "__name__" not in rec:
+            rec["__name__"] = rec.get("__name__", "")
+        rec = _run_table_script(py_script, rec, source_table, target_entity)
+        out.append((rec, rec.get("__name__", ""), type_override))
+    return out
+
+
 
 def _set_name(rec: Dict[str, Any], v: Any):
     rec["__name__"] = str(v or "")
@@ -806,10 +1094,33 @@ def _parse_values(raw: str) -> List[Any]:
     return [_norm(v) for v in out]
 
 def _parse_sql_file(sql_path: Path) -> List[Dict[str, Any]]:
-    """返回所有 INSERT 记录组成的 dict 列表"""
-    txt = _safe_read_sql(sql_path)
-    entities = []
-    
+    """返回所有 INSERT 记录组成的 dict 列表（经 source_store 按文件 mtime 缓存，结果勿原地修改）"""
+    from backend.source_store import file_rows
+    return file_rows(sql_path)
+
+def _parse_sql_path(sql_path: Path) -> List[Dict[str, Any]]:
+    """实际解析 dump：有有效分片清单（<dump>.shards.json）时并行解析各分片并按序拼接，否则整文件扫描"""
+    from backend.sql_shards import map_shards
+    parts = map_shards(sql_path, _parse_sql_text)
+    if parts is not None:
+        return [r for part in parts for r in part]
+    return _parse_sql_text(_safe_read_sql(sql_path))
+
+def _parse_sql_text(txt: str) -> List[Dict[str, Any]]:
+    """状态机扫描文本中全部 INSERT"""
+    return list(_iter_sql_text(txt))
+
+def iter_sql_records(sql_path: Path) -> Iterator[Dict[str, Any]]:
+    """逐条产出 dump 中的 INSERT 记录（不缓存）；有分片清单时逐个分片读取，只驻留一个分片的文本"""
+    from backend.sql_shards import load_shard_manifest, read_shard_text
+    m = load_shard_manifest(sql_path)
+    if m:
+        for shard in m["shards"]:
+            yield from _iter_sql_text(read_shard_text(sql_path, shard))
+        return
+    yield from _iter_sql_text(_safe_read_sql(sql_path))
+
+def _iter_sql_text(txt: str) -> Iterator[Dict[str, Any]]:
     # 使用 state machine 解析，避免 values 内部包含 ); 导致正则截断
     pos = 0
     while True:
@@ -832,13 +1143,11 @@ def _parse_sql_file(sql_path: Path) -> List[Dict[str, Any]]:
         vals = _parse_values(vals_str)
         
         if len(cols) == len(vals):
-            entities.append(dict(zip(cols, vals)))
+            yield dict(zip(cols, vals))
             
         # 移动 pos 到当前 INSERT 语句之后
         # end_vals 指向 ')'，后面应该是 ';'
         pos = end_vals + 1
-        
-    return entities
 
 def _split_sql_params_header(sql: str) -> Tuple[str, Dict[str, Any]]:
     s = sql or ""
@@ -1014,11 +1323,8 @@ def query_source_sql(sql: str, main_table: str = "", parameters: Optional[Dict[s
             if not p.exists():
                 continue
             
-            # 优先用缓存
-            rows = _SQL_ROWS_CACHE.get(tbl)
-            if rows is None:
-                rows = _parse_sql_file(p)
-                _SQL_ROWS_CACHE[tbl] = rows
+            # source_store 按文件 mtime 缓存
+            rows = _parse_sql_file(p)
             
             if not rows:
                 # 空表创建 dummy
@@ -1126,6 +1432,7 @@ def insert_entities(rows: List[Tuple[str,str,str,str,str,int,int,int]]):
     """rows: (uuid, sid, type, name, data_json, del, input_ts, update_ts)"""
     if not rows:
         return 0
+    import pymysql
     conn = pymysql.connect(**MYSQL_CFG)
     try:
         _ensure_entity_table(conn)
@@ -1199,6 +1506,32 @@ def _extract_entity_meta(mapped: Dict[str, Any], now_ts: Optional[int] = None) -
 
 
 # ========== NEW: 单条 UPSERT 到 entity ==========
+_UPDATE_MODES = ("upsert", "update_only", "upsert_merge", "update_merge", "upsert_replace", "update_replace")
+_INSERT_MODES = ("upsert", "create_only")
+
+def _merge_entity_json(old_data_json: Any, data_json: str, import_mode: str) -> str:
+    """
+    命中已有实体时的 data 合并策略：
+    - import_mode 包含 "replace" 时，直接覆盖（不合并）
+    - 否则做深度合并，旧数据解析失败则回退为替换
+    """
+    if "replace" in str(import_mode or ""):
+        return data_json
+    try:
+        old_data = old_data_json if isinstance(old_data_json, dict) else json.loads(old_data_json or "{}")
+        new_data = json.loads(data_json or "{}")
+        def deep_merge(a, b):
+            for k, v in b.items():
+                if isinstance(v, dict) and isinstance(a.get(k), dict):
+                    deep_merge(a[k], v)
+                else:
+                    a[k] = v
+            return a
+        merged = deep_merge(old_data, new_data)
+        return json.dumps(merged, ensure_ascii=False)
+    except Exception:
+        return data_json
+
 def _upsert_entity_row(type_name: str, key_field: str, key_value: Any,
                        sid: str, name_val: str, data_json: str,
                        meta: Dict[str, int], import_mode: str = "upsert",
@@ -1210,13 +1543,15 @@ def _upsert_entity_row(type_name: str, key_field: str, key_value: Any,
     """
     if key_value in (None, ""):
         # 没有唯一键值，不写
-        print(f"[_upsert_entity_row] Skipped due to empty key_value. type={type_name}, key_field={key_field}")
+        _log_error("_upsert_entity_row empty key_value", f"type={type_name}, key_field={key_field}", source="mapper_core")
         return 0
 
     should_close = False
     if conn is None:
         conn = get_conn()
         should_close = True
+    prof = _profile()
+    t_write = time.perf_counter() if prof is not None else 0.0
 
     try:
         with conn.cursor() as cur:
@@ -1234,24 +1569,9 @@ def _upsert_entity_row(type_name: str, key_field: str, key_value: Any,
                 # 合并/覆盖策略：
                 # - import_mode 包含 "replace" 时，直接覆盖（不合并）
                 # - 否则做深度合并，旧数据解析失败则回退为替换
-                merged_json = data_json
-                if "replace" not in str(import_mode or ""):
-                    try:
-                        old_data = json.loads(old_data_json or "{}")
-                        new_data = json.loads(data_json or "{}")
-                        def deep_merge(a, b):
-                            for k, v in b.items():
-                                if isinstance(v, dict) and isinstance(a.get(k), dict):
-                                    deep_merge(a[k], v)
-                                else:
-                                    a[k] = v
-                            return a
-                        merged = deep_merge(old_data, new_data)
-                        merged_json = json.dumps(merged, ensure_ascii=False)
-                    except Exception:
-                        merged_json = data_json
+                merged_json = _merge_entity_json(old_data_json, data_json, import_mode)
 
-                if import_mode in ("upsert", "update_only", "upsert_merge", "update_merge", "upsert_replace", "update_replace"):
+                if import_mode in _UPDATE_MODES:
                     # 若 name 为空字符串，则保留旧 name
                     final_name = old_name if (name_val is None or str(name_val) == "") else name_val
                     upd_sql = """
@@ -1270,7 +1590,7 @@ def _upsert_entity_row(type_name: str, key_field: str, key_value: Any,
                     # create_only 命中则不写
                     return 0
             else:    # 未命中
-                if import_mode in ("upsert", "create_only"):
+                if import_mode in _INSERT_MODES:
                     ins_sql = """
                         INSERT INTO entity
                             (uuid,sid,type,name,data,del,input_date,update_date)
@@ -1286,18 +1606,155 @@ def _upsert_entity_row(type_name: str, key_field: str, key_value: Any,
                     # update_only 未命中则不写
                     return 0
 
-        conn.commit()
+        if prof is not None:
+            t_commit = time.perf_counter()
+            prof.add_phase("write", t_commit - t_write)
+            t_write = None
+            conn.commit()
+            prof.add_phase("commit", time.perf_counter() - t_commit)
+        else:
+            conn.commit()
+        if should_close:
+            invalidate_entity_status(sid)
         return 1
     except Exception as e:
         conn.rollback()
-        print("[_upsert_entity_row error]", e)
+        _log_error("_upsert_entity_row error", e, source="mapper_core")
+        _prof_error("write")
         return 0
+    finally:
+        if prof is not None and t_write is not None:
+            prof.add_phase("write", time.perf_counter() - t_write)
+        if should_close:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+UPSERT_BATCH = 500
+
+def upsert_entity_rows(rows: List[Dict[str, Any]], sid: str, conn=None) -> Tuple[int, List[Tuple[int, str]]]:
+    """
+    批量版 _upsert_entity_row：rows 每项含 type_name/key_field/key_value/name_val/data_json/meta/import_mode。
+    每 UPSERT_BATCH 条：按 (type, key_field) 一次 IN (...) 查出已有实体，再 executemany 插入/更新并提交一次。
+    同批内重复键按顺序生效（后者合并到前者结果上），语义与逐条调用一致。
+    返回 (写入条数, [(行下标, 原因), ...])；批次失败时回滚并逐条重试以定位失败行。
+    """
+    should_close = False
+    if conn is None:
+        conn = get_conn()
+        should_close = True
+    wrote = 0
+    failures: List[Tuple[int, str]] = []
+    try:
+        for start in range(0, len(rows or []), UPSERT_BATCH):
+            chunk = rows[start:start + UPSERT_BATCH]
+            try:
+                with _prof_phase("write"):
+                    n, skipped = _upsert_entity_chunk(chunk, sid, conn)
+                with _prof_phase("commit"):
+                    conn.commit()
+                wrote += n
+                failures.extend((start + i, why) for i, why in skipped)
+            except Exception as e:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                print("[upsert_entity_rows batch error, retry row by row]", e)
+                _prof_error("write")
+                for i, r in enumerate(chunk):
+                    ok = _upsert_entity_row(
+                        r.get("type_name"), r.get("key_field") or "id", r.get("key_value"), sid,
+                        r.get("name_val") or "", r.get("data_json") or "{}", r.get("meta") or {},
+                        import_mode=r.get("import_mode") or "upsert", conn=conn,
+                    )
+                    if ok:
+                        wrote += 1
+                    else:
+                        failures.append((start + i, "写入失败或被入库方式跳过"))
     finally:
         if should_close:
             try:
                 conn.close()
             except Exception:
                 pass
+        invalidate_entity_status(sid)
+    return wrote, failures
+
+def _upsert_entity_chunk(chunk: List[Dict[str, Any]], sid: str, conn) -> Tuple[int, List[Tuple[int, str]]]:
+    skipped: List[Tuple[int, str]] = []
+    keys_by_group: Dict[Tuple[str, str], set] = {}
+    for i, r in enumerate(chunk):
+        kv = r.get("key_value")
+        if kv in (None, ""):
+            continue
+        g = (r.get("type_name") or "", r.get("key_field") or "id")
+        keys_by_group.setdefault(g, set()).add(str(kv))
+
+    # (type, key_field, key) -> [uuid, name, data]
+    existing: Dict[Tuple[str, str, str], List[Any]] = {}
+    with conn.cursor() as cur:
+        for (tname, kf), keys in keys_by_group.items():
+            kexpr = json_text_expr("data", kf)
+            keys = list(keys)
+            for j in range(0, len(keys), UPSERT_BATCH):
+                part = keys[j:j + UPSERT_BATCH]
+                ph = ",".join(["%s"] * len(part))
+                cur.execute(
+                    f"SELECT uuid, name, data, {kexpr} FROM entity WHERE type=%s AND sid=%s AND {kexpr} IN ({ph})",
+                    [tname, sid] + part,
+                )
+                for uuid, name, data, kv in cur.fetchall() or []:
+                    existing.setdefault((tname, kf, str(kv)), [uuid, name, data])
+
+        inserts: List[Tuple[Any, ...]] = []
+        updates: Dict[str, Tuple[Any, ...]] = {}
+        for i, r in enumerate(chunk):
+            kv = r.get("key_value")
+            if kv in (None, ""):
+                _log_error("upsert_entity_rows empty key_value", f"type={r.get('type_name')}, key_field={r.get('key_field')}", source="mapper_core")
+                skipped.append((i, "唯一键为空"))
+                continue
+            tname = r.get("type_name") or ""
+            kf = r.get("key_field") or "id"
+            mode = r.get("import_mode") or "upsert"
+            meta = r.get("meta") or {}
+            name_val = r.get("name_val")
+            data_json = r.get("data_json") or "{}"
+            hit = existing.get((tname, kf, str(kv)))
+            if hit:
+                if mode not in _UPDATE_MODES:
+                    skipped.append((i, "已存在（仅创建）"))
+                    continue
+                merged_json = _merge_entity_json(hit[2], data_json, mode)
+                final_name = hit[1] if (name_val is None or str(name_val) == "") else name_val
+                hit[1], hit[2] = final_name, merged_json
+                updates[hit[0]] = (final_name, merged_json, int(meta["del"]), int(meta["update_date"]), hit[0])
+            else:
+                if mode not in _INSERT_MODES:
+                    skipped.append((i, "不存在（仅更新）"))
+                    continue
+                uuid = _make_uuid10()
+                inserts.append((uuid, sid, tname, name_val, data_json,
+                                int(meta["del"]), int(meta["input_date"]), int(meta["update_date"])))
+                existing[(tname, kf, str(kv))] = [uuid, name_val, data_json]
+        if inserts:
+            cur.executemany(
+                """
+                INSERT INTO entity
+                    (uuid,sid,type,name,data,del,input_date,update_date)
+                VALUES
+                    (%s,%s,%s,%s,%s,%s,%s,%s)
+                """,
+                inserts,
+            )
+        if updates:
+            cur.executemany(
+                "UPDATE entity SET name=%s, data=%s, del=%s, update_date=%s WHERE uuid=%s",
+                list(updates.values()),
+            )
+    return len(chunk) - len(skipped), skipped
 
 def upsert_entity(type_name: str, key_field: str, key_value: Any, name: str, data_json: str):
     conn = get_conn()
@@ -1371,6 +1828,93 @@ def update_entity_data_by_uuid(uuid: str, patch: Dict[str, Any], name: Optional[
         return 0
     finally:
         conn.close()
+
+# =============== 批量实体解析 ===============
+ENTITY_LOOKUP_BATCH = 500
+# 待解析值超过该数量时改为整类型一次扫描，不再分批 IN
+ENTITY_LOOKUP_SCAN_THRESHOLD = 5000
+
+def _match_key(v: Any) -> str:
+    """与逐条 = 查询的 MySQL 排序规则一致的比较键：忽略大小写与末尾空格"""
+    return str(v).rstrip(" ").lower()
+
+def resolve_entity_uuids(entity_type: str, match_field: str, values: List[Any], conn=None) -> Dict[str, str]:
+    """
+    批量按 data.<match_field> 解析实体 uuid，返回 {str(值): uuid}（同值取首条）。
+    与逐条 json_equals_clause ... LIMIT 1 等价，但只需少量 IN (...) 查询；
+    MySQL 下库中值按 _match_key 对回请求值（逐条 = 比较时库端忽略大小写与末尾空格），PG 按原值。
+    """
+    keys = list(dict.fromkeys(str(v) for v in (values or [])))
+    out: Dict[str, str] = {}
+    if not keys or not entity_type or not match_field:
+        return out
+    norm = str if is_pg() else _match_key
+    wanted: Dict[str, List[str]] = {}
+    for k in keys:
+        wanted.setdefault(norm(k), []).append(k)
+
+    def _take(uuid, kv):
+        if kv is None or not uuid:
+            return
+        for k in wanted.get(norm(kv), []):
+            out.setdefault(k, uuid)
+    own = conn is None
+    conn = conn or get_conn()
+    try:
+        kexpr = json_text_expr("data", match_field)
+        with conn.cursor() as cur:
+            if len(keys) > ENTITY_LOOKUP_SCAN_THRESHOLD:
+                cur.execute(f"SELECT uuid, {kexpr} FROM entity WHERE type=%s", (entity_type,))
+                for uuid, kv in cur.fetchall() or []:
+                    _take(uuid, kv)
+            else:
+                for j in range(0, len(keys), ENTITY_LOOKUP_BATCH):
+                    part = keys[j:j + ENTITY_LOOKUP_BATCH]
+                    ph = ",".join(["%s"] * len(part))
+                    cur.execute(
+                        f"SELECT uuid, {kexpr} FROM entity WHERE type=%s AND {kexpr} IN ({ph})",
+                        [entity_type] + part,
+                    )
+                    for uuid, kv in cur.fetchall() or []:
+                        _take(uuid, kv)
+    except Exception as e:
+        print("[resolve_entity_uuids error]", e)
+    finally:
+        if own:
+            conn.close()
+    return out
+
+def fetch_entities_by_uuid(uuids: List[Any], conn=None) -> Dict[str, Dict[str, Any]]:
+    """批量读取实体，返回 {uuid: {"uuid": uuid, **data}}"""
+    keys = list(dict.fromkeys(str(u).strip() for u in (uuids or []) if str(u or "").strip()))
+    out: Dict[str, Dict[str, Any]] = {}
+    if not keys:
+        return out
+    own = conn is None
+    conn = conn or get_conn()
+    try:
+        with conn.cursor() as cur:
+            for j in range(0, len(keys), ENTITY_LOOKUP_BATCH):
+                part = keys[j:j + ENTITY_LOOKUP_BATCH]
+                ph = ",".join(["%s"] * len(part))
+                cur.execute(f"SELECT uuid, data FROM entity WHERE uuid IN ({ph})", part)
+                for uuid, data_json in cur.fetchall() or []:
+                    if str(uuid) in out:
+                        continue
+                    try:
+                        data = data_json if isinstance(data_json, dict) else (json.loads(data_json) if data_json else {})
+                    except Exception:
+                        data = {}
+                    res = {"uuid": uuid}
+                    if isinstance(data, dict):
+                        res.update(data)
+                    out[str(uuid)] = res
+    except Exception as e:
+        print("[fetch_entities_by_uuid error]", e)
+    finally:
+        if own:
+            conn.close()
+    return out
 # =============== 对外：状态 / 入库 / 删除 ===============
 def check_entity_status(type_name: str, sid: Optional[str] = None) -> int:
     """返回该 type 在 entity 的记录数；若传入 sid 则按 sid 过滤"""
@@ -1389,62 +1933,219 @@ def check_entity_status(type_name: str, sid: Optional[str] = None) -> int:
     finally:
         conn.close()
 
-def import_table_data(source_table: str, sid: str = None, target_entity_spec: Optional[str] = None, import_mode: str = "upsert", progress_cb: Optional[Callable[[int, int], None]] = None, sync_soft_delete: bool = False) -> int:
+def load_source_records(source_table: str, target_entity_spec: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
     """
-    读取 source/sql/<table>.sql 的所有 INSERT，映射后按 (type(key)) 规则 UPSERT 入库。
-    - target_entity 支持 'fund' 或 'fund(id)'；后者表示统一主键是 data.id。
-    - 若未配置 ()，默认 key_field='id'。
-    - 确保该 key_field 写入到 data JSON（即 mapped_data[key_field] 存在）。
-    - del/input_date/update_date 抽到 entity 顶层（不进 data JSON）。
+    读取待入库记录：配置了筛选 SQL 时执行筛选 SQL，否则解析 source/sql/<table>.sql。
+    返回 (records, error)；error 非空表示读取失败。
     """
-    sid = sid or SID
-    
     # ✅ 尝试加载自定义筛选 SQL
     from backend.db import get_table_filter_sql
     # 确定目标实体 key：优先使用传入的 spec，否则查默认
     eff_target = target_entity_spec or get_target_entity(source_table)
     filter_sql = get_table_filter_sql(source_table, eff_target)
-    
-    records = []
+
     if filter_sql and filter_sql.strip():
-        # print(f"[import_table_data] Using custom filter SQL for {source_table}")
-        res = query_source_sql(filter_sql, source_table)
+        with _prof_phase("filter"):
+            res = query_source_sql(filter_sql, source_table)
         if res and isinstance(res, list) and len(res) > 0 and "error" in res[0]:
-             print(f"[import_table_data] Filter SQL error: {res[0]['error']}")
-             return 0
-        records = res
-    else:
-        sql_path = detect_sql_path(source_table)
-        if not sql_path.exists():
-            print(f"[import_table_data] SQL not found: {sql_path}")
-            return 0
-        records = _parse_sql_file(sql_path)
+            _prof_error("filter")
+            return [], f"Filter SQL error: {res[0]['error']}"
+        return res or [], None
+    sql_path = detect_sql_path(source_table)
+    if not sql_path.exists():
+        return [], f"SQL not found: {sql_path}"
+    with _prof_phase("parse"):
+        return _parse_sql_file(sql_path), None
+
+def preview_source_records(source_table: str, target_entity_spec: Optional[str] = None, limit: int = 20) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    前 limit 条待入库记录（映射预览用），来源与 load_source_records 一致；
+    本地 dump 逐条解析到 limit 条即停止，不解析整表。
+    """
+    from backend.db import get_table_filter_sql
+    limit = max(0, int(limit))
+    eff_target = target_entity_spec or get_target_entity(source_table)
+    filter_sql = get_table_filter_sql(source_table, eff_target)
+    if filter_sql and filter_sql.strip():
+        records, err = load_source_records(source_table, target_entity_spec)
+        return records[:limit], err
+    sql_path = detect_sql_path(source_table)
+    if not sql_path.exists():
+        return [], f"SQL not found: {sql_path}"
+    return list(itertools.islice(iter_sql_records(sql_path), limit)), None
+
+# ================= 实体状态汇总 =================
+ENTITY_STATUS_TTL = 10.0
+_ENTITY_STATUS_CACHE: Dict[Tuple[Any, ...], Tuple[float, Dict[str, Dict[str, int]]]] = {}
+
+def _entity_status_key(sid: Optional[str]) -> Tuple[Any, ...]:
+    cfg = current_cfg()
+    return ("pg" if is_pg() else "mysql", cfg.get("host"), cfg.get("port"), cfg.get("database"), cfg.get("schema"), sid or "")
+
+def entity_status_by_sid(sid: Optional[str] = None, ttl: Optional[float] = None) -> Dict[str, Dict[str, int]]:
+    """
+    一次 GROUP BY 返回 {type: {"count": n, "update_date": max_ts}}；
+    结果按 (运行库, sid) 缓存 ttl 秒，导入/删除后由 invalidate_entity_status 失效。
+    """
+    key = _entity_status_key(sid)
+    ttl = ENTITY_STATUS_TTL if ttl is None else ttl
+    hit = _ENTITY_STATUS_CACHE.get(key)
+    now = time.time()
+    if hit and now - hit[0] < ttl:
+        return hit[1]
+    out: Dict[str, Dict[str, int]] = {}
+    try:
+        conn = get_conn()
+    except Exception as e:
+        print("[entity_status_by_sid error]", e)
+        return out
+    try:
+        with conn.cursor() as cur:
+            if sid:
+                cur.execute("SELECT type, COUNT(*), MAX(update_date) FROM entity WHERE sid=%s GROUP BY type", (sid,))
+            else:
+                cur.execute("SELECT type, COUNT(*), MAX(update_date) FROM entity GROUP BY type")
+            for t, n, ud in cur.fetchall() or []:
+                out[str(t or "")] = {"count": int(n or 0), "update_date": int(ud or 0)}
+        _ENTITY_STATUS_CACHE[key] = (now, out)
+    except Exception as e:
+        print("[entity_status_by_sid error]", e)
+    finally:
+        conn.close()
+    return out
 
-    if not records:
+def invalidate_entity_status(sid: Optional[str] = None) -> None:
+    """清除实体状态缓存；传入 sid 时仅清除该 sid（以及不限 sid 的汇总）"""
+    if sid is None:
+        _ENTITY_STATUS_CACHE.clear()
+        return
+    for k in list(_ENTITY_STATUS_CACHE.keys()):
+        if k[-1] in (sid, ""):
+            _ENTITY_STATUS_CACHE.pop(k, None)
+
+def _source_batches(source_table: str, target_entity_spec: Optional[str], source_kind: str,
+                    batch: int) -> Tuple[Optional[Any], Optional[int], Optional[str]]:
+    """
+    返回 (批次迭代器, 总数, 错误)。
+    source_kind='db' 且未配置筛选 SQL 时，经服务端游标从源库分批流式读取（总数来自 COUNT(*)，
+    计数失败时为 None，表示未知，仍照常流式读取）；
+    否则沿用 load_source_records（筛选 SQL / 本地 dump）并按 batch 切片。
+    """
+    if source_kind == "db":
+        from backend.db import get_table_filter_sql
+        eff_target = target_entity_spec or get_target_entity(source_table)
+        filter_sql = get_table_filter_sql(source_table, eff_target)
+        if not (filter_sql and filter_sql.strip()):
+            from backend.source_store import count_db_rows, iter_db_batches
+            with _prof_phase("parse"):
+                total = count_db_rows(source_table)
+            return _timed_batches(iter_db_batches(source_table, batch=batch, as_text=True)), total, None
+    records, err = load_source_records(source_table, target_entity_spec)
+    if err:
+        return None, 0, err
+    return (records[i:i + batch] for i in range(0, len(records), batch)), len(records), None
+
+def _timed_batches(batches) -> Any:
+    """剖析开启时把每批的读取耗时计入 parse 阶段"""
+    prof = _profile()
+    if prof is None:
+        yield from batches
+        return
+    it = iter(batches)
+    while True:
+        t0 = time.perf_counter()
+        batch = next(it, None)
+        prof.add_phase("parse", time.perf_counter() - t0)
+        if batch is None:
+            return
+        yield batch
+
+def _iter_batch_records(batches) -> Any:
+    """逐条产出 (记录, 批内序号, 所在批)"""
+    for batch in batches:
+        for pos, rec in enumerate(batch):
+            yield rec, pos, batch
+
+def import_table_data(source_table: str, sid: str = None, target_entity_spec: Optional[str] = None, import_mode: str = "upsert", progress_cb: Optional[Callable[[int, int], None]] = None, sync_soft_delete: bool = False, columnar: bool = True, cancel_event: Optional[Any] = None, source_kind: str = "file", profile: Optional[Any] = None) -> int:
+    """
+    见 _import_table_data。profile 为 backend.profiler.ImportProfile 时，本次入库在当前线程内
+    按阶段 / 规则 / 规则类型 / 缓存命中记录耗时，结束后由调用方 dump 或展示。
+    """
+    if profile is None:
+        return _import_table_data(source_table, sid, target_entity_spec, import_mode, progress_cb,
+                                  sync_soft_delete, columnar, cancel_event, source_kind)
+    profile.meta.update(source_table=source_table, target_entity=target_entity_spec or "",
+                        import_mode=import_mode, source_kind=source_kind, columnar=columnar)
+    with _prof_activate(profile):
+        wrote = _import_table_data(source_table, sid, target_entity_spec, import_mode, progress_cb,
+                                   sync_soft_delete, columnar, cancel_event, source_kind)
+    profile.finish(wrote=wrote)
+    return wrote
+
+def _import_table_data(source_table: str, sid: str = None, target_entity_spec: Optional[str] = None, import_mode: str = "upsert", progress_cb: Optional[Callable[[int, int], None]] = None, sync_soft_delete: bool = False, columnar: bool = True, cancel_event: Optional[Any] = None, source_kind: str = "file") -> int:
+    """
+    读取 source/sql/<table>.sql 的所有 INSERT，映射后按 (type(key)) 规则 UPSERT 入库。
+    - target_entity 支持 'fund' 或 'fund(id)'；后者表示统一主键是 data.id。
+    - 若未配置 ()，默认 key_field='id'。
+    - 确保该 key_field 写入到 data JSON（即 mapped_data[key_field] 存在）。
+    - del/input_date/update_date 抽到 entity 顶层（不进 data JSON）。
+    - columnar=True 时按 COLUMNAR_CHUNK 分块列式映射（结果与逐条映射一致）；
+      规则含 entity / rel / sql 查找时仍逐条映射并写入，以便查到本次导入中先写入的行。
+    - cancel_event（threading.Event 等带 is_set() 的对象）被置位后停止后续写入，并跳过同步清理。
+    - source_kind='db' 时从源库表流式读取（整表行数据进入 data JSON，故读取全部列，不做列裁剪），
+      按 COLUMNAR_CHUNK 分批映射入库，不在内存中驻留整表。
+    """
+    sid = sid or SID
+
+    batches, total, err = _source_batches(source_table, target_entity_spec, source_kind, COLUMNAR_CHUNK)
+    if err:
+        print(f"[import_table_data] {err}")
+        return 0
+
+    if total == 0:
         print(f"[import_table_data] No records (SQL/Filter) for {source_table}")
         return 0
 
     # ⭐ 支持外部指定目标类型与排除（如 'fund'、'fund(id)'、'fund(usci)[data.id,name]'）
     target_type_spec = (target_entity_spec or get_target_entity(source_table) or source_table)
     final_type, key_field, excludes = _parse_type_and_key(target_type_spec)
+    # 整块先映射再写入会让查找看不到同块中先写入的行（且 _CACHE 按块清空）
+    if columnar and _has_lookup_rules(source_table, final_type):
+        columnar = False
 
     now_ts = int(time.time())
     wrote = 0
-    total = len(records)
+    prof = _profile()
     # 进度回调节流：最多 ~100 次更新，且保证最后一次更新
-    stride = 1 if total <= 100 else max(1, total // 100)
+    # 总数未知（源库计数失败）时每 100 条回调一次，total 传 None
+    stride = 100 if total is None else (1 if total <= 100 else max(1, total // 100))
     last_cb_ts = 0.0
 
     # 使用单个连接进行批量处理，避免频繁握手导致 OperationalError
     conn = get_conn()
     try:
         seen_keys_by_type: Dict[str, set] = {}
-        for idx, rec in enumerate(records, start=1):
+        mapped_chunk: List[Tuple[Dict[str, Any], str, str]] = []
+        cancelled = False
+        idx = 0
+        for rec, pos, batch in _iter_batch_records(batches):
+            if cancel_event is not None and cancel_event.is_set():
+                cancelled = True
+                break
+            idx += 1
             # 1) 映射：按当前 final_type 过滤字段映射 & 脚本上下文
-            mapped_data, out_name, type_override = apply_record_mapping(
-                source_table, rec, py_script="", target_entity=final_type
-            )
+            if columnar:
+                if pos == 0:
+                    mapped_chunk = apply_records_mapping(
+                        source_table, batch, py_script="", target_entity=final_type
+                    )
+                mapped_data, out_name, type_override = mapped_chunk[pos]
+            else:
+                mapped_data, out_name, type_override = apply_record_mapping(
+                    source_table, rec, py_script="", target_entity=final_type
+                )
             type_here = (type_override or final_type).strip() or source_table
+            t_ser = time.perf_counter() if prof is not None else 0.0
 
             # 2) 统一键值：优先 mapped_data，其次原始 rec
             key_val = mapped_data.get(key_field, None)
@@ -1453,7 +2154,7 @@ def import_table_data(source_table: str, sid: str = None, target_entity_spec: Op
             
             # 调试：如果最终 key_val 仍为空，打印警告
             if key_val in (None, ""):
-                print(f"[import_table_data] Warning: key_field '{key_field}' is empty for record. Source: {source_table}. Record: {rec}")
+                _log_error(f"import_table_data empty key_field {source_table}.{key_field}", f"Record: {rec}", source="mapper_core")
 
             # 3) 应用排除：删除指定的 data.* 字段；'name' 排除则不写顶层 name
             name_excluded = False
@@ -1484,6 +2185,8 @@ def import_table_data(source_table: str, sid: str = None, target_entity_spec: Op
 
             # 7) 序列化 data（此时已不包含 del/input_date/update_date）
             data_json = json.dumps(mapped_data, ensure_ascii=False)
+            if prof is not None:
+                prof.add_phase("serialize", time.perf_counter() - t_ser)
 
             # 8) UPSERT
             wrote += _upsert_entity_row(
@@ -1507,13 +2210,14 @@ def import_table_data(source_table: str, sid: str = None, target_entity_spec: Op
                 if progress_cb:
                     now = time.time()
                     if (idx == total) or (idx % stride == 0) or (now - last_cb_ts >= 0.05):
-                        progress_cb(idx, total)
+                        progress_cb(idx, None if total is None else max(total, idx))
                         last_cb_ts = now
             except Exception:
                 # 回调失败不影响主流程
                 pass
         try:
-            if sync_soft_delete:
+            # 中途取消时已见键不完整，不能据此做软删除
+            if sync_soft_delete and not cancelled:
                 for tname, keep_keys in (seen_keys_by_type or {}).items():
                     _sync_soft_delete_entities(
                         conn=conn,
@@ -1530,7 +2234,12 @@ def import_table_data(source_table: str, sid: str = None, target_entity_spec: Op
             conn.close()
         except Exception:
             pass
+        invalidate_entity_status(sid)
 
+    if not idx and total is None:
+        print(f"[import_table_data] No records (SQL/Filter) for {source_table}")
+    if prof is not None:
+        prof.meta["rows"] = idx
     return wrote
 
 def _sync_soft_delete_entities(conn, sid: str, type_name: str, key_field: str, keep_keys: set, now_ts: int) -> int:
@@ -1591,6 +2300,7 @@ def delete_table_data(type_name: str, sid: Optional[str] = None) -> int:
             n = int(cur.fetchone()[0] or 0)
             cur.execute("DELETE FROM entity WHERE type=%s AND sid=%s", (type_name, cur_sid))
         conn.commit()
+        invalidate_entity_status(cur_sid)
         return n
     except Exception as e:
         conn.rollback()
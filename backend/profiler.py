@@ -0,0 +1,219 @@
+# backend/profiler.py
+# -*- coding: utf-8 -*-
+"""
+入库耗时剖析（可选开启，默认关闭时各埋点只做一次线程局部变量读取）：
+- 按阶段累计：parse（读取/解析源数据）/ filter（筛选 SQL）/ map（规则求值）/ script（表级脚本）
+  / serialize（键值、排除项、data JSON 序列化）/ write（写入语句）/ commit（提交）；
+- 按 field_map 规则（id，多规则 || 拆为 id.序号）与规则类型累计耗时、调用次数、错误次数；
+- 缓存命中：源表解析缓存、sql.xxx 查找的行/索引缓存、date() 记忆、entity 查找命中等；
+- 剖析对象绑定到当前线程（activate），并发的入库任务互不干扰；
+- 结束后 dump 为 import_profiles/*.json，便于跨次对比。
+"""
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+PROFILE_DIR = Path("import_profiles")
+PHASES = ("parse", "filter", "map", "script", "serialize", "write", "commit")
+# 保留的剖析文件数，超出时删除最旧的
+KEEP_PROFILES = 200
+
+_LOCAL = threading.local()
+
+
+def _new_stat() -> Dict[str, Any]:
+    return {"calls": 0, "seconds": 0.0, "errors": 0}
+
+
+class ImportProfile:
+    def __init__(self, label: str = "", **meta):
+        self.label = label
+        self.meta: Dict[str, Any] = dict(meta)
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.phases: Dict[str, Dict[str, Any]] = {p: _new_stat() for p in PHASES}
+        self.rules: Dict[str, Dict[str, Any]] = {}
+        self.kinds: Dict[str, Dict[str, Any]] = {}
+        self.caches: Dict[str, Dict[str, int]] = {}
+        self.errors = 0
+        self._rule: Optional[str] = None
+
+    # ---------- 记录 ----------
+    def add_phase(self, name: str, seconds: float, calls: int = 1):
+        s = self.phases.setdefault(name, _new_stat())
+        s["calls"] += calls
+        s["seconds"] += seconds
+
+    def add_rule(self, rule_id: str, kind: str, seconds: float, calls: int, **info):
+        s = self.rules.get(rule_id)
+        if s is None:
+            s = self.rules[rule_id] = dict(_new_stat(), kind=kind, **info)
+        s["calls"] += calls
+        s["seconds"] += seconds
+        k = self.kinds.setdefault(kind, _new_stat())
+        k["calls"] += calls
+        k["seconds"] += seconds
+
+    @contextmanager
+    def rule(self, rule_id: str, kind: str, calls: int = 1, **info):
+        """计时一条规则的求值；期间的 error() 记到该规则及其类型上"""
+        prev = self._rule
+        self._rule = rule_id
+        self.rules.setdefault(rule_id, dict(_new_stat(), kind=kind, **info))
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_rule(rule_id, kind, time.perf_counter() - t0, calls)
+            self._rule = prev
+
+    def error(self, phase: Optional[str] = None):
+        self.errors += 1
+        if self._rule is not None:
+            r = self.rules.get(self._rule)
+            if r is not None:
+                r["errors"] += 1
+                self.kinds.setdefault(r["kind"], _new_stat())["errors"] += 1
+                return
+        if phase:
+            self.phases.setdefault(phase, _new_stat())["errors"] += 1
+
+    def cache(self, name: str, hit: bool, n: int = 1):
+        c = self.caches.setdefault(name, {"hits": 0, "misses": 0})
+        c["hits" if hit else "misses"] += n
+
+    def finish(self, **meta):
+        self.meta.update(meta)
+        self.finished_at = time.time()
+
+    # ---------- 输出 ----------
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        rows = int(self.meta.get("rows") or 0)
+
+        def _rows(d: Dict[str, Dict[str, Any]], key: str) -> List[Dict[str, Any]]:
+            out = []
+            for k, v in d.items():
+                if not v.get("calls") and not v.get("errors"):
+                    continue
+                item = {key: k}
+                item.update(v)
+                item["seconds"] = round(v["seconds"], 6)
+                item["ms_per_call"] = round(v["seconds"] * 1000.0 / v["calls"], 4) if v["calls"] else 0.0
+                out.append(item)
+            return sorted(out, key=lambda x: -x["seconds"])
+
+        caches = []
+        for k, v in self.caches.items():
+            n = v["hits"] + v["misses"]
+            caches.append({"cache": k, "hits": v["hits"], "misses": v["misses"],
+                           "hit_rate": round(v["hits"] / n, 4) if n else 0.0})
+        return {
+            "version": 1,
+            "label": self.label,
+            "meta": self.meta,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed": round(end - self.started_at, 3),
+            "rows_per_s": round(rows / (end - self.started_at), 1) if rows and end > self.started_at else 0.0,
+            "errors": self.errors,
+            "phases": _rows(self.phases, "phase"),
+            "kinds": _rows(self.kinds, "kind"),
+            "rules": _rows(self.rules, "rule_id"),
+            "caches": sorted(caches, key=lambda x: x["cache"]),
+        }
+
+    def dump(self, path: Optional[Path] = None) -> Path:
+        if path is None:
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(self.started_at))
+            safe = re.sub(r"[^\w一-龥.-]+", "_", self.label or "import")[:80]
+            path = PROFILE_DIR / f"{stamp}_{safe}.json"
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(self.to_dict(), ensure_ascii=False, indent=1), encoding="utf-8")
+        tmp.replace(path)
+        _prune()
+        return path
+
+
+# ---------- 线程绑定 ----------
+def current() -> Optional[ImportProfile]:
+    return getattr(_LOCAL, "profile", None)
+
+
+@contextmanager
+def activate(profile: Optional[ImportProfile]) -> Iterator[Optional[ImportProfile]]:
+    prev = current()
+    _LOCAL.profile = profile
+    try:
+        yield profile
+    finally:
+        _LOCAL.profile = prev
+
+
+@contextmanager
+def phase(name: str):
+    prof = current()
+    if prof is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        prof.add_phase(name, time.perf_counter() - t0)
+
+
+def count_error(phase_name: Optional[str] = None):
+    prof = current()
+    if prof is not None:
+        prof.error(phase_name)
+
+
+def count_cache(name: str, hit: bool, n: int = 1):
+    prof = current()
+    if prof is not None:
+        prof.cache(name, hit, n)
+
+
+# ---------- 剖析文件 ----------
+def _prune():
+    try:
+        files = sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for p in files[:max(0, len(files) - KEEP_PROFILES)]:
+            p.unlink()
+    except Exception as e:
+        print("[profiler prune error]", e)
+
+
+def list_profiles(limit: int = 50) -> List[Dict[str, Any]]:
+    """最近的剖析文件（新在前）：[{"path", "name", "mtime"}]"""
+    if not PROFILE_DIR.exists():
+        return []
+    files = sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)[:limit]
+    return [{"path": str(p), "name": p.stem, "mtime": p.stat().st_mtime} for p in files]
+
+
+def load_profile(path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except Exception as e:
+        print("[load_profile error]", path, e)
+        return None
+
+
+def compare_phases(a: Dict[str, Any], b: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """两次剖析按阶段对比：[{"phase", "a_seconds", "b_seconds", "delta", "ratio"}]"""
+    sa = {r["phase"]: r["seconds"] for r in a.get("phases") or []}
+    sb = {r["phase"]: r["seconds"] for r in b.get("phases") or []}
+    out = []
+    for p in [x for x in PHASES if x in sa or x in sb] + sorted((set(sa) | set(sb)) - set(PHASES)):
+        x, y = sa.get(p, 0.0), sb.get(p, 0.0)
+        out.append({"phase": p, "a_seconds": x, "b_seconds": y, "delta": round(y - x, 6),
+                    "ratio": round(y / x, 3) if x else None})
+    return out
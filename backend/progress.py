@@ -0,0 +1,200 @@
+# backend/progress.py
+# -*- coding: utf-8 -*-
+"""
+长任务进度与吞吐统计（入库任务、流程批量入库、归档构建、附件拷贝共用）：
+- 每条记录只做整数累加（add/update）；累计到自适应的计数门限时才取一次时钟，
+  距上次采样超过 SAMPLE_INTERVAL 秒则采样：区间速率做指数加权平均（EWMA），ETA 按 EWMA 速率估算，
+  不受慢启动、中途变速的影响（全程平均另见 avg_rate）；
+- 可选字节数（bytes/s，附件拷贝）、各阶段队列深度 / 完成数 / 错误数；
+- 每次采样把快照（snapshot）推给订阅者：Streamlit 进度条、入库任务的 live 记录等，
+  订阅者不会按条被调用。
+同一个 Progress 的计数应在同一线程中调用；快照可在任意线程读取。
+"""
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+SAMPLE_INTERVAL = 0.5
+EWMA_ALPHA = 0.3
+# 自适应计数门限：每个采样间隔约取 GATE_CHECKS 次时钟，门限不超过 GATE_MAX 条
+GATE_CHECKS = 4
+GATE_MAX = 10000
+
+
+class Progress:
+    def __init__(self, label: str = "", total: Optional[int] = None, unit: str = "条",
+                 interval: float = SAMPLE_INTERVAL, alpha: float = EWMA_ALPHA, every: Optional[int] = None):
+        """every: 固定每 every 条检查一次时钟（默认按速率自适应）"""
+        self.label = label
+        self.total = int(total) if total is not None else None
+        self.unit = unit
+        self.interval = float(interval)
+        self.alpha = float(alpha)
+        self.done = 0
+        self.bytes = 0
+        self.errors = 0
+        self.stages: Dict[str, Dict[str, int]] = {}
+        self.rate = 0.0
+        self.bytes_rate = 0.0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._every = max(1, int(every)) if every else None
+        self._step = self._every or 1
+        self._next = self._step
+        self._t0 = time.perf_counter()
+        self._t_end: Optional[float] = None
+        self._last_t = self._t0
+        self._last_done = 0
+        self._last_bytes = 0
+        self._samples = 0
+        self._subs: List[Callable[[Dict[str, Any]], None]] = []
+        self._snap: Optional[Dict[str, Any]] = None
+
+    # ---------- 计数（热路径） ----------
+    def add(self, n: int = 1, nbytes: int = 0):
+        self.done += n
+        if nbytes:
+            self.bytes += nbytes
+        if self.done >= self._next:
+            self._sample()
+
+    def update(self, done: int, total: Optional[int] = None):
+        """以绝对值上报进度（如 import_table_data 的 progress_cb）"""
+        self.done = int(done)
+        if total is not None:
+            self.total = int(total)
+        if self.done >= self._next:
+            self._sample()
+
+    def due(self, n: int = 1) -> bool:
+        """下一次 add(n) 是否会到达计数门限；调用方据此只在采样前刷新队列深度等较贵的统计"""
+        return self.done + n >= self._next
+
+    def error(self, n: int = 1, stage: Optional[str] = None):
+        self.errors += n
+        if stage:
+            self._stage(stage)["errors"] += n
+
+    def stage(self, name: str, depth: Optional[int] = None, done: int = 0):
+        """记录阶段队列深度（当前值）与完成数（增量）"""
+        s = self._stage(name)
+        if depth is not None:
+            s["depth"] = int(depth)
+        if done:
+            s["done"] += done
+
+    def _stage(self, name: str) -> Dict[str, int]:
+        s = self.stages.get(name)
+        if s is None:
+            s = self.stages[name] = {"depth": 0, "done": 0, "errors": 0}
+        return s
+
+    # ---------- 采样 / 发布 ----------
+    def _sample(self, force: bool = False):
+        now = time.perf_counter()
+        dt = now - self._last_t
+        if dt < self.interval and not force:
+            self._next = self.done + self._step
+            return
+        if dt > 0:
+            inst = (self.done - self._last_done) / dt
+            binst = (self.bytes - self._last_bytes) / dt
+            if self._samples:
+                a = self.alpha
+                self.rate = a * inst + (1 - a) * self.rate
+                self.bytes_rate = a * binst + (1 - a) * self.bytes_rate
+            else:
+                self.rate, self.bytes_rate = inst, binst
+            self._samples += 1
+        self._last_t, self._last_done, self._last_bytes = now, self.done, self.bytes
+        if self._every is None:
+            self._step = max(1, min(GATE_MAX, int(self.rate * self.interval / GATE_CHECKS)))
+        self._next = self.done + self._step
+        self._publish()
+
+    def subscribe(self, fn: Callable[[Dict[str, Any]], None]) -> "Progress":
+        self._subs.append(fn)
+        return self
+
+    def _publish(self):
+        snap = self._snap = self.snapshot()
+        for fn in self._subs:
+            try:
+                fn(snap)
+            except Exception as e:
+                print("[progress publish error]", e)
+
+    def publish(self):
+        """立即采样并推送（阶段切换、批量写入完成等时机）"""
+        self._sample(force=True)
+
+    def finish(self):
+        """结束计时并推送最终快照（速率取全程平均）"""
+        if self._t_end is not None:
+            return
+        self._t_end = time.perf_counter()
+        self.finished_at = time.time()
+        self._publish()
+
+    # ---------- 快照 ----------
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = max((self._t_end or time.perf_counter()) - self._t0, 0.0)
+        avg = self.done / elapsed if elapsed > 0 else 0.0
+        rate = avg if self._t_end is not None or not self._samples else self.rate
+        total = self.total
+        eta = int((total - self.done) / rate) if total and rate > 0 and total > self.done else 0
+        return {
+            "label": self.label,
+            "unit": self.unit,
+            "done": self.done,
+            "total": total,
+            "pct": min(1.0, self.done / total) if total else (1.0 if self._t_end is not None else 0.0),
+            "elapsed": round(elapsed, 3),
+            "rate": rate,
+            "avg_rate": avg,
+            "eta": eta,
+            "bytes": self.bytes,
+            "bytes_rate": (self.bytes / elapsed if elapsed > 0 else 0.0) if self._t_end is not None else self.bytes_rate,
+            "errors": self.errors,
+            "stages": {k: dict(v) for k, v in self.stages.items()},
+            "finished": self._t_end is not None,
+        }
+
+    def last_snapshot(self) -> Dict[str, Any]:
+        """最近一次发布的快照（未发布过则现算），供其它线程轮询"""
+        return self._snap or self.snapshot()
+
+
+# ---------- 格式化 ----------
+def fmt_eta(s) -> str:
+    try:
+        s = int(s)
+    except Exception:
+        return "--"
+    if s >= 3600:
+        return f"{s // 3600}小时{(s % 3600) // 60}分"
+    m, ss = divmod(max(s, 0), 60)
+    return f"{m}分{ss}秒" if m else f"{ss}秒"
+
+
+def fmt_rate(rate: float, unit: str = "条") -> str:
+    rate = float(rate or 0.0)
+    return f"{rate:.0f} {unit}/秒" if rate >= 100 else f"{rate:.1f} {unit}/秒"
+
+
+def progress_text(snap: Dict[str, Any], label: Optional[str] = None) -> str:
+    """「标签：done/total，速率[，字节速率]，预计剩余 …[，错误 n]」"""
+    from backend.blob_copy import fmt_bytes
+
+    label = snap.get("label") if label is None else label
+    total = snap.get("total")
+    parts = [f"{snap.get('done', 0)}/{total}" if total else f"{snap.get('done', 0)}",
+             fmt_rate(snap.get("rate", 0.0), snap.get("unit") or "条")]
+    if snap.get("bytes"):
+        parts.append(f"{fmt_bytes(int(snap.get('bytes_rate') or 0))}/秒")
+    if snap.get("finished"):
+        parts.append(f"耗时 {fmt_eta(snap.get('elapsed', 0))}")
+    elif total:
+        parts.append(f"预计剩余 {fmt_eta(snap.get('eta', 0))}")
+    if snap.get("errors"):
+        parts.append(f"错误 {snap['errors']}")
+    return (f"{label}：" if label else "") + "，".join(parts)
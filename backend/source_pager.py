@@ -0,0 +1,358 @@
+# backend/source_pager.py
+# -*- coding: utf-8 -*-
+"""
+源表分页访问（模拟打印 / 字段专注等详情页）：
+- 本地 dump：按 (路径, mtime, size) 把解析并数值化后的行落到暂存库 source_stage.db，
+  每个 dump 版本只解析一次（逐条流式写入），之后分页/筛选都在暂存库中完成；
+- 源库：直接按源表单列主键（无则回退有唯一索引且非空的 id 列）分页，均无则退化为 OFFSET；
+- keyset 分页：第 k 页 = 键 > 第 k-1 页最后一个键；各页起点按 (源, 表, 筛选, 页大小) 记忆，
+  顺序翻页只走键范围查询，跳页时先用 OFFSET 只取一个键作为起点；
+- 筛选：单字段 等于 / 包含（按文本比较，与原 Python 过滤 str(v) 一致）。
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+STAGE_DB = Path("source_stage.db")
+STAGE_BATCH = 2000
+# 源库计数缓存秒数
+COUNT_TTL = 30.0
+_MAX_VIEWS = 256
+
+_LOCAL = threading.local()
+_STAGE_LOCK = threading.Lock()
+_STAGED: Dict[str, Tuple[float, int]] = {}
+_CURSORS: Dict[Tuple[Any, ...], Dict[int, Any]] = {}
+_COUNTS: Dict[Tuple[Any, ...], Tuple[float, int]] = {}
+_DB_META: Dict[Tuple[str, str], Tuple[float, List[str], Optional[str]]] = {}
+_END = object()
+
+
+def _conn():
+    conn = getattr(_LOCAL, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(str(STAGE_DB), timeout=30, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        except Exception:
+            pass
+        _LOCAL.conn = conn
+    return conn
+
+
+def init_stage_db():
+    conn = _conn()
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS stage_tables (
+            tkey TEXT PRIMARY KEY,
+            mtime REAL,
+            size INTEGER,
+            n INTEGER DEFAULT 0,
+            staged_at REAL
+        )
+        """
+    )
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS stage_rows (
+            tkey TEXT NOT NULL,
+            rid INTEGER NOT NULL,
+            payload TEXT NOT NULL,
+            PRIMARY KEY (tkey, rid)
+        ) WITHOUT ROWID
+        """
+    )
+    conn.commit()
+
+
+def _spec_key(spec: Optional[Dict[str, Any]]) -> Tuple[Any, ...]:
+    if not spec or not str(spec.get("field") or "").strip():
+        return ()
+    return (str(spec["field"]).strip(), str(spec.get("value") or ""), bool(spec.get("contains", True)))
+
+
+def _remember(vkey: Tuple[Any, ...], page: int, after: Any):
+    if len(_CURSORS) >= _MAX_VIEWS and vkey not in _CURSORS:
+        _CURSORS.clear()
+    _CURSORS.setdefault(vkey, {})[page] = after
+
+
+# ---------------- 本地 dump 暂存 ----------------
+def _restage(conn, tkey: str, p: Path, stamp: Tuple[float, int]):
+    from backend.mapper_core import iter_sql_records
+    from backend.source_store import _convert
+    conn.execute("DELETE FROM stage_rows WHERE tkey=?", (tkey,))
+    buf: List[Tuple[str, int, str]] = []
+    n = 0
+    for rec in iter_sql_records(p):
+        n += 1
+        buf.append((tkey, n, json.dumps({k: _convert(v) for k, v in rec.items()}, ensure_ascii=False)))
+        if len(buf) >= STAGE_BATCH:
+            conn.executemany("INSERT INTO stage_rows(tkey, rid, payload) VALUES (?,?,?)", buf)
+            buf.clear()
+    if buf:
+        conn.executemany("INSERT INTO stage_rows(tkey, rid, payload) VALUES (?,?,?)", buf)
+    conn.execute(
+        "INSERT OR REPLACE INTO stage_tables(tkey, mtime, size, n, staged_at) VALUES (?,?,?,?,?)",
+        (tkey, stamp[0], stamp[1], n, time.time()),
+    )
+    conn.commit()
+
+
+def stage_table(table: str) -> Optional[str]:
+    """确保 source/sql/<table>.sql 已按当前版本暂存，返回暂存键；dump 不存在返回 None"""
+    from backend.source_fields import detect_sql_path
+    p = detect_sql_path(table)
+    try:
+        stt = p.stat()
+    except Exception:
+        return None
+    tkey = str(p.resolve())
+    stamp = (stt.st_mtime, stt.st_size)
+    if _STAGED.get(tkey) == stamp:
+        return tkey
+    with _STAGE_LOCK:
+        if _STAGED.get(tkey) == stamp:
+            return tkey
+        init_stage_db()
+        conn = _conn()
+        row = conn.execute("SELECT mtime, size FROM stage_tables WHERE tkey=?", (tkey,)).fetchone()
+        if not row or (float(row[0]), int(row[1])) != stamp:
+            try:
+                _restage(conn, tkey, p, stamp)
+            except Exception as e:
+                conn.rollback()
+                print("[stage_table error]", table, e)
+                return None
+        _STAGED[tkey] = stamp
+    return tkey
+
+
+def _file_where(spec_k: Tuple[Any, ...]) -> Tuple[str, List[Any]]:
+    if not spec_k:
+        return "", []
+    field, value, contains = spec_k
+    path = '$."' + field.replace('"', '') + '"'
+    if contains:
+        return " AND instr(CAST(json_extract(payload, ?) AS TEXT), ?) > 0", [path, value]
+    return " AND CAST(json_extract(payload, ?) AS TEXT) = ?", [path, value]
+
+
+def _file_page(table: str, page: int, size: int, spec_k: Tuple[Any, ...]) -> List[Dict[str, Any]]:
+    tkey = stage_table(table)
+    if not tkey:
+        return []
+    conn = _conn()
+    where, wp = _file_where(spec_k)
+    vkey = ("file", tkey, _STAGED.get(tkey), spec_k, size)
+    if page == 0:
+        after = 0
+    elif not spec_k:
+        # 未筛选时 rid 连续，页起点可直接算出
+        after = page * size
+    else:
+        after = _CURSORS.get(vkey, {}).get(page, _END)
+        if after is _END:
+            r = conn.execute(
+                f"SELECT rid FROM stage_rows WHERE tkey=?{where} ORDER BY rid LIMIT 1 OFFSET ?",
+                [tkey] + wp + [page * size - 1],
+            ).fetchone()
+            if not r:
+                return []
+            after = r[0]
+    rows = conn.execute(
+        f"SELECT rid, payload FROM stage_rows WHERE tkey=?{where} AND rid>? ORDER BY rid LIMIT ?",
+        [tkey] + wp + [after, size],
+    ).fetchall()
+    if spec_k and len(rows) == size:
+        _remember(vkey, page + 1, rows[-1][0])
+    return [json.loads(p) for _, p in rows]
+
+
+def _file_count(table: str, spec_k: Tuple[Any, ...]) -> int:
+    tkey = stage_table(table)
+    if not tkey:
+        return 0
+    conn = _conn()
+    if not spec_k:
+        r = conn.execute("SELECT n FROM stage_tables WHERE tkey=?", (tkey,)).fetchone()
+        return int(r[0] or 0) if r else 0
+    ckey = ("file", tkey, _STAGED.get(tkey), spec_k)
+    hit = _COUNTS.get(ckey)
+    if hit is not None:
+        return hit[1]
+    where, wp = _file_where(spec_k)
+    r = conn.execute(f"SELECT COUNT(*) FROM stage_rows WHERE tkey=?{where}", [tkey] + wp).fetchone()
+    n = int(r[0] or 0)
+    _COUNTS[ckey] = (time.time(), n)
+    return n
+
+
+# ---------------- 源库 ----------------
+def _q(name: str, pg: bool) -> str:
+    if pg:
+        return '"' + str(name).replace('"', '""') + '"'
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+def _db_meta(cur, table: str, conn_key: str, pg: bool) -> Tuple[List[str], Optional[str]]:
+    """
+    (列名, 分页键)；分页键取单列主键，否则取有单列唯一索引且 NOT NULL 的 id 列，
+    均无返回 None（走 OFFSET 分页：可能重复或为 NULL 的键无法做 keyset 分页）
+    """
+    mkey = (conn_key, table)
+    hit = _DB_META.get(mkey)
+    if hit and time.time() - hit[0] < COUNT_TTL * 10:
+        return hit[1], hit[2]
+    cur.execute(f"SELECT * FROM {table} WHERE 1=0")
+    cols = [d[0] for d in cur.description] if cur.description else []
+    # {索引名: [是否主键, [(列, 可为 NULL)]]}，只收唯一索引
+    idx: Dict[str, List[Any]] = {}
+    try:
+        if pg:
+            cur.execute(
+                """
+                SELECT i.indexrelid::text, i.indisprimary, a.attname, NOT a.attnotnull FROM pg_index i
+                JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+                WHERE i.indrelid = %s::regclass AND i.indisunique AND i.indpred IS NULL
+                """,
+                (table,),
+            )
+            rows = [(str(r[0]), bool(r[1]), str(r[2]), bool(r[3])) for r in (cur.fetchall() or [])]
+        else:
+            cur.execute(f"SHOW KEYS FROM {table} WHERE Non_unique=0")
+            rows = [(str(r[2]), r[2] == "PRIMARY", str(r[4]), str(r[9] or "").upper() == "YES")
+                    for r in (cur.fetchall() or [])]
+        for name, primary, col, nullable in rows:
+            idx.setdefault(name, [primary, []])[1].append((col, nullable))
+    except Exception as e:
+        print("[source_pager pk error]", table, e)
+        if pg:
+            cur.connection.rollback()
+    pk = next((c[0][0] for primary, c in idx.values() if primary and len(c) == 1), None)
+    id_unique = any(c == [("id", False)] for _, c in idx.values())
+    key = pk or ("id" if "id" in cols and id_unique else None)
+    _DB_META[mkey] = (time.time(), cols, key)
+    return cols, key
+
+
+def _db_where(spec_k: Tuple[Any, ...], cols: List[str], pg: bool) -> Optional[Tuple[str, List[Any]]]:
+    if not spec_k:
+        return "", []
+    field, value, contains = spec_k
+    if field not in cols:
+        return None
+    expr = f"CAST({_q(field, pg)} AS {'TEXT' if pg else 'CHAR'})"
+    if contains:
+        return (f" AND strpos({expr}, %s) > 0" if pg else f" AND INSTR({expr}, %s) > 0"), [value]
+    return f" AND {expr} = %s", [value]
+
+
+def _db_page(table: str, page: int, size: int, spec_k: Tuple[Any, ...], conn_key: str) -> List[Dict[str, Any]]:
+    from backend.sql_utils import get_source_conn, source_is_pg
+    pg = source_is_pg()
+    conn = get_source_conn()
+    try:
+        with conn.cursor() as cur:
+            cols, key = _db_meta(cur, table, conn_key, pg)
+            w = _db_where(spec_k, cols, pg)
+            if w is None:
+                return []
+            where, wp = w
+            if key is None:
+                cur.execute(f"SELECT * FROM {table} WHERE 1=1{where} LIMIT %s OFFSET %s", wp + [size, page * size])
+            else:
+                qk = _q(key, pg)
+                vkey = ("db", conn_key, table, spec_k, size)
+                after = None
+                if page > 0:
+                    after = _CURSORS.get(vkey, {}).get(page, _END)
+                    if after is _END:
+                        cur.execute(
+                            f"SELECT {qk} FROM {table} WHERE 1=1{where} ORDER BY {qk} LIMIT 1 OFFSET %s",
+                            wp + [page * size - 1],
+                        )
+                        r = cur.fetchone()
+                        if not r:
+                            return []
+                        after = r[0]
+                if after is None:
+                    cur.execute(f"SELECT * FROM {table} WHERE 1=1{where} ORDER BY {qk} LIMIT %s", wp + [size])
+                else:
+                    cur.execute(
+                        f"SELECT * FROM {table} WHERE 1=1{where} AND {qk} > %s ORDER BY {qk} LIMIT %s",
+                        wp + [after, size],
+                    )
+            names = [d[0] for d in cur.description] if cur.description else cols
+            rows = [dict(zip(names, r)) for r in (cur.fetchall() or [])]
+            if key is not None and len(rows) == size:
+                _remember(("db", conn_key, table, spec_k, size), page + 1, rows[-1].get(key))
+            return rows
+    finally:
+        conn.close()
+
+
+def _db_count(table: str, spec_k: Tuple[Any, ...], conn_key: str) -> int:
+    from backend.sql_utils import get_source_conn, source_is_pg
+    ckey = ("db", conn_key, table, spec_k)
+    hit = _COUNTS.get(ckey)
+    if hit is not None and time.time() - hit[0] < COUNT_TTL:
+        return hit[1]
+    pg = source_is_pg()
+    conn = get_source_conn()
+    try:
+        with conn.cursor() as cur:
+            cols, _ = _db_meta(cur, table, conn_key, pg)
+            w = _db_where(spec_k, cols, pg)
+            if w is None:
+                return 0
+            cur.execute(f"SELECT COUNT(*) FROM {table} WHERE 1=1{w[0]}", w[1])
+            n = int((cur.fetchone() or [0])[0] or 0)
+    finally:
+        conn.close()
+    _COUNTS[ckey] = (time.time(), n)
+    return n
+
+
+# ---------------- 对外 ----------------
+def fetch_page(kind: str, table: str, page: int, size: int, spec: Optional[Dict[str, Any]] = None,
+               conn_key: str = "") -> List[Dict[str, Any]]:
+    """
+    第 page 页（从 0 开始，每页 size 条）的源记录。
+    kind: 'file'（本地 dump，值已数值化）/ 'db'（源库原始值）；spec: {"field", "value", "contains"} 或 None。
+    出错时返回 []。
+    """
+    page = max(0, int(page or 0))
+    size = max(1, int(size or 1))
+    spec_k = _spec_key(spec)
+    try:
+        if kind == "db":
+            return _db_page(table, page, size, spec_k, conn_key)
+        return _file_page(table, page, size, spec_k)
+    except Exception as e:
+        print("[fetch_page error]", table, e)
+        return []
+
+
+def fetch_record(kind: str, table: str, index: int, spec: Optional[Dict[str, Any]] = None,
+                 conn_key: str = "") -> Dict[str, Any]:
+    """第 index 条记录（页大小 1 的一页），不存在返回 {}"""
+    rows = fetch_page(kind, table, index, 1, spec, conn_key)
+    return rows[0] if rows else {}
+
+
+def count_rows(kind: str, table: str, spec: Optional[Dict[str, Any]] = None, conn_key: str = "") -> int:
+    """记录数（源库计数按 COUNT_TTL 缓存；本地 dump 未筛选时取暂存行数，筛选计数按 dump 版本缓存）"""
+    spec_k = _spec_key(spec)
+    try:
+        if kind == "db":
+            return _db_count(table, spec_k, conn_key)
+        return _file_count(table, spec_k)
+    except Exception as e:
+        print("[count_rows error]", table, e)
+        return 0
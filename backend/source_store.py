@@ -0,0 +1,280 @@
+# backend/source_store.py
+# -*- coding: utf-8 -*-
+"""
+源表读取服务（进程级共享缓存）：
+- 文件源：按 (file, 路径, 文件 mtime/size) 缓存解析结果，dump 变更自动失效；
+- 源库：按 (db, 连接键, 表) 缓存 SELECT * 结果，DB_TTL 秒后重新读取；
+  读取走服务端游标（PG 命名游标 / MySQL SSCursor）+ fetchmany，iter_db_batches 也可供入库直接流式消费；
+- typed 视图：在原始字符串值上做 int/float 转换（原 _parse_all_inserts 语义），同样缓存；
+- access_cache（access_cache.db，分块压缩）回写可选，且由后台线程异步完成，不阻塞页面。
+返回的行列表为共享对象，调用方不应原地修改。
+"""
+import json
+import queue
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from backend.profiler import count_cache
+
+DB_TTL = 300.0
+DB_FETCH_BATCH = 2000
+WRITE_THROUGH = True
+
+_LOCK = threading.Lock()
+_KEY_LOCKS: Dict[Tuple[str, str, str], threading.Lock] = {}
+# key -> (stamp, rows)
+_ROWS: Dict[Tuple[str, str, str], Tuple[Any, List[Dict[str, Any]]]] = {}
+_TYPED: Dict[Tuple[str, str, str], Tuple[Any, List[Dict[str, Any]]]] = {}
+
+_WQ: "queue.Queue[Tuple[str, str, str]]" = queue.Queue()
+_PENDING: set = set()
+_WRITER: Optional[threading.Thread] = None
+
+
+def source_conn_key(cfg: Dict[str, Any]) -> str:
+    """与 access_cache 中一致的源库连接键"""
+    return f"pg|{str(cfg.get('host') or '')}|{str(cfg.get('port') or '')}|{str(cfg.get('database') or '')}|{str(cfg.get('schema') or '')}"
+
+
+def _key_lock(key: Tuple[str, str, str]) -> threading.Lock:
+    with _LOCK:
+        lk = _KEY_LOCKS.get(key)
+        if lk is None:
+            lk = _KEY_LOCKS[key] = threading.Lock()
+        return lk
+
+
+def _file_stamp(p: Path) -> Optional[Tuple[float, int]]:
+    try:
+        st = p.stat()
+        return (st.st_mtime, st.st_size)
+    except Exception:
+        return None
+
+
+# ---------------- access_cache 异步回写 ----------------
+def _writer_loop():
+    from backend.access_cache import set_access_cache
+    while True:
+        key = _WQ.get()
+        try:
+            with _LOCK:
+                _PENDING.discard(key)
+                hit = _ROWS.get(key)
+            if hit is not None:
+                kind, conn_key, table = key
+                set_access_cache(kind, "local" if kind == "file" else conn_key, table, hit[1])
+        except Exception as e:
+            print("[source_store write-through error]", e)
+        finally:
+            _WQ.task_done()
+
+
+def _schedule_write(key: Tuple[str, str, str]):
+    global _WRITER
+    if not WRITE_THROUGH:
+        return
+    with _LOCK:
+        if key in _PENDING:
+            return
+        _PENDING.add(key)
+        if _WRITER is None or not _WRITER.is_alive():
+            _WRITER = threading.Thread(target=_writer_loop, name="access-cache-writer", daemon=True)
+            _WRITER.start()
+    _WQ.put(key)
+
+
+def flush_write_through(timeout: Optional[float] = None):
+    """等待回写队列清空（脚本退出前调用）"""
+    end = time.time() + timeout if timeout else None
+    while _WQ.unfinished_tasks:
+        if end is not None and time.time() > end:
+            break
+        time.sleep(0.05)
+
+
+# ---------------- 读取 ----------------
+def file_rows(sql_path: Path, table: Optional[str] = None) -> List[Dict[str, Any]]:
+    """解析 dump 中全部 INSERT（字符串值），按路径 + mtime/size 缓存"""
+    from backend.mapper_core import _parse_sql_path
+    p = Path(sql_path)
+    stamp = _file_stamp(p)
+    if stamp is None:
+        return []
+    key = ("file", str(p.resolve()), table or p.stem)
+    hit = _ROWS.get(key)
+    if hit is not None and hit[0] == stamp:
+        count_cache("source_rows", True)
+        return hit[1]
+    with _key_lock(key):
+        hit = _ROWS.get(key)
+        if hit is not None and hit[0] == stamp:
+            count_cache("source_rows", True)
+            return hit[1]
+        count_cache("source_rows", False)
+        rows = _parse_sql_path(p)
+        _ROWS[key] = (stamp, rows)
+        _TYPED.pop(key, None)
+    if table:
+        _schedule_write(key)
+    return rows
+
+
+def db_rows(table: str, conn_key: Optional[str] = None, ttl: Optional[float] = None) -> List[Dict[str, Any]]:
+    """源库 SELECT * 结果，按连接键 + 表缓存 ttl 秒；连接失败时抛出异常"""
+    from backend.sql_utils import source_cfg
+    conn_key = conn_key or source_conn_key(source_cfg())
+    ttl = DB_TTL if ttl is None else ttl
+    key = ("db", conn_key, table)
+    now = time.time()
+    hit = _ROWS.get(key)
+    if hit is not None and now - hit[0] < ttl:
+        return hit[1]
+    with _key_lock(key):
+        hit = _ROWS.get(key)
+        if hit is not None and time.time() - hit[0] < ttl:
+            return hit[1]
+        rows: List[Dict[str, Any]] = []
+        for part in iter_db_batches(table):
+            rows.extend(part)
+        _ROWS[key] = (time.time(), rows)
+        _TYPED.pop(key, None)
+    _schedule_write(key)
+    return rows
+
+
+def _quote_ident(name: str, pg: bool) -> str:
+    if pg:
+        return '"' + str(name).replace('"', '""') + '"'
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+def _as_dump_text(v: Any) -> Any:
+    """源库值转为与 dump 解析结果一致的字符串（NULL → 空串）"""
+    if v is None:
+        return ""
+    if isinstance(v, str):
+        return v
+    if isinstance(v, bool):
+        return "true" if v else "false"
+    if isinstance(v, (bytes, bytearray, memoryview)):
+        return bytes(v).decode("utf-8", errors="replace")
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, ensure_ascii=False)
+    return str(v)
+
+
+def iter_db_batches(table: str, columns: Optional[Sequence[str]] = None,
+                    batch: Optional[int] = None, as_text: bool = False) -> Iterator[List[Dict[str, Any]]]:
+    """
+    服务端游标逐批读取源库表，每批为 dict 列表（不经缓存、不整表驻留内存）。
+    columns 非空时只 SELECT 这些列；PG 用命名游标，MySQL 用 SSCursor，均按 batch 条 fetchmany。
+    as_text=True 时值按 dump 解析的字符串形式输出（供入库映射）。
+    提前停止迭代时关闭连接，服务端游标随之释放。
+    """
+    from backend.sql_utils import get_source_conn, source_is_pg
+    pg = source_is_pg()
+    size = max(1, int(batch or DB_FETCH_BATCH))
+    cols_sql = ", ".join(_quote_ident(c, pg) for c in columns) if columns else "*"
+    conn = get_source_conn()
+    try:
+        if pg:
+            cur = conn.cursor(name=f"src_{uuid.uuid4().hex[:12]}")
+            cur.itersize = size
+        else:
+            import pymysql.cursors
+            cur = conn.cursor(pymysql.cursors.SSCursor)
+        try:
+            cur.execute(f"SELECT {cols_sql} FROM {table}")
+            cols: List[str] = []
+            while True:
+                part = cur.fetchmany(size)
+                if not part:
+                    break
+                if not cols:
+                    # 命名游标在首次 fetch 后才有 description
+                    cols = [d[0] for d in cur.description] if cur.description else list(columns or [])
+                if as_text:
+                    yield [{c: _as_dump_text(v) for c, v in zip(cols, r)} for r in part]
+                else:
+                    yield [dict(zip(cols, r)) for r in part]
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                pass
+    finally:
+        conn.close()
+
+
+def count_db_rows(table: str) -> Optional[int]:
+    """源库表行数（流式入库的进度总数），失败返回 None（行数未知，不等于空表）"""
+    from backend.sql_utils import get_source_conn
+    try:
+        conn = get_source_conn()
+    except Exception as e:
+        print("[count_db_rows error]", e)
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            return int((cur.fetchone() or [0])[0] or 0)
+    except Exception as e:
+        print("[count_db_rows error]", e)
+        return None
+    finally:
+        conn.close()
+
+
+def _convert(v: Any) -> Any:
+    if not isinstance(v, str):
+        return v
+    s = (v or "").strip()
+    if s.lower() in ("null", "none"):
+        return ""
+    try:
+        if s.startswith("-") or s.isdigit():
+            return int(s)
+    except Exception:
+        pass
+    try:
+        if "." in s:
+            return float(s)
+    except Exception:
+        pass
+    return s
+
+
+def typed_file_rows(sql_path: Path, table: Optional[str] = None) -> List[Dict[str, Any]]:
+    """file_rows 的数值化视图：数字串转 int/float，NULL/none 转空串"""
+    p = Path(sql_path)
+    raw = file_rows(p, table)
+    key = ("file", str(p.resolve()), table or p.stem)
+    hit = _ROWS.get(key)
+    stamp = hit[0] if hit else None
+    t = _TYPED.get(key)
+    if t is not None and t[0] == stamp:
+        return t[1]
+    rows = [{k: _convert(v) for k, v in r.items()} for r in raw]
+    _TYPED[key] = (stamp, rows)
+    return rows
+
+
+def invalidate(kind: Optional[str] = None, conn_key: Optional[str] = None, table: Optional[str] = None) -> int:
+    """按 kind/conn_key/table 清除缓存（均为空则全部清除），返回清除条数"""
+    n = 0
+    with _LOCK:
+        for k in list(_ROWS.keys()):
+            if kind and k[0] != kind:
+                continue
+            if conn_key and k[1] != conn_key:
+                continue
+            if table and k[2] != table:
+                continue
+            _ROWS.pop(k, None)
+            _TYPED.pop(k, None)
+            n += 1
+    return n
@@ -0,0 +1,88 @@
+# backend/sql_shards.py
+# -*- coding: utf-8 -*-
+"""
+dump 分片清单（scripts/split_sql.py 生成的 <dump>.shards.json）的读取与并行消费：
+- 清单中的字节区间按语句结尾对齐，源文件 size/mtime 与清单不一致时视为失效；
+- 每个分片独立解码（utf-8 → gbk → utf-8-sig，换行统一为 \\n，与整文件 read_text 一致）；
+- map_shards 在进程池中解析各分片，结果按分片顺序返回，拼接后即为整表结果；
+- 进程池不可用时回退为串行。
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+MANIFEST_SUFFIX = ".shards.json"
+SHARD_WORKERS = min(8, os.cpu_count() or 2)
+
+
+def manifest_path(sql_path) -> Path:
+    p = Path(sql_path)
+    return p.with_name(p.name + MANIFEST_SUFFIX)
+
+
+def load_shard_manifest(sql_path) -> Optional[Dict[str, Any]]:
+    """读取并校验分片清单；不存在、已过期或区间不连续时返回 None"""
+    p = Path(sql_path)
+    mp = manifest_path(p)
+    if not mp.exists():
+        return None
+    try:
+        m = json.loads(mp.read_text(encoding="utf-8"))
+        st = p.stat()
+        if int(m.get("size", -1)) != st.st_size or int(m.get("mtime_ns", -1)) != st.st_mtime_ns:
+            return None
+        shards = m.get("shards") or []
+        pos = 0
+        for s in shards:
+            if int(s["start"]) != pos or int(s["end"]) < pos:
+                return None
+            pos = int(s["end"])
+        if not shards or pos != st.st_size:
+            return None
+        return m
+    except Exception as e:
+        print("[load_shard_manifest error]", mp, e)
+        return None
+
+
+def read_shard_text(sql_path, shard: Dict[str, Any]) -> str:
+    with open(sql_path, "rb") as f:
+        f.seek(int(shard["start"]))
+        raw = f.read(int(shard["end"]) - int(shard["start"]))
+    for enc in ("utf-8", "gbk", "utf-8-sig"):
+        try:
+            txt = raw.decode(enc)
+            break
+        except Exception:
+            continue
+    else:
+        txt = raw.decode("utf-8", errors="ignore")
+    return txt.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _parse_shard(args) -> Any:
+    sql_path, shard, parser = args
+    return parser(read_shard_text(sql_path, shard))
+
+
+def map_shards(sql_path, parser: Callable[[str], Any], manifest: Optional[Dict[str, Any]] = None,
+               workers: Optional[int] = None) -> Optional[List[Any]]:
+    """
+    对每个分片执行 parser(分片文本)，按分片顺序返回结果列表。
+    parser 须为模块级函数（可被子进程导入）；无有效清单或只有一个分片时返回 None，由调用方整文件处理。
+    """
+    m = manifest or load_shard_manifest(sql_path)
+    if not m or len(m["shards"]) < 2:
+        return None
+    jobs = [(str(sql_path), s, parser) for s in m["shards"]]
+    workers = max(1, min(int(workers or SHARD_WORKERS), len(jobs)))
+    if workers > 1:
+        try:
+            import multiprocessing as mp
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as ex:
+                return list(ex.map(_parse_shard, jobs))
+        except Exception as e:
+            print("[map_shards pool error, fallback to serial]", e)
+    return [_parse_shard(j) for j in jobs]
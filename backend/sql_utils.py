@@ -1,7 +1,7 @@
 # backend/sql_utils.py
 import re
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, Optional, Tuple
 
 # 现有：SQL 文件解析工具
 
@@ -60,6 +60,17 @@ _RUNTIME_CFG: Dict[str, Any] = {
     "autocommit": False,
 }
 _RUNTIME_SCHEMA: Optional[str] = None  # 仅 PG 使用的空间(schema)
+# 运行库连接替身：(连接工厂, SQL 方言)；设置后 get_conn / is_pg 以它为准（本地测试、基准）
+_CONN_FACTORY: Optional[Tuple[Callable[[], Any], str]] = None
+
+def set_conn_factory(factory: Optional[Callable[[], Any]], kind: str = "mysql"):
+    """
+    用 factory() 代替真实运行库连接（如 backend.stand_in_db 的 SQLite 替身），kind 为其 SQL 方言；
+    factory=None 恢复按运行时配置连接。不影响 update_runtime_db 保存的配置。
+    """
+    global _CONN_FACTORY
+    k = (kind or "").strip().lower()
+    _CONN_FACTORY = (factory, "pg" if k == "pg" else "mysql") if factory is not None else None
 
 def update_runtime_db(kind: str, cfg: Dict[str, Any]):
     """更新当前数据库类型与连接参数。kind: 'mysql' 或 'pg'。cfg 为连接配置，可包含 'schema'。"""
@@ -97,9 +108,17 @@ def update_source_db(kind: str, cfg: Dict[str, Any]):
 def current_cfg() -> Dict[str, Any]:
     return dict(_RUNTIME_CFG)
 
+def source_cfg() -> Dict[str, Any]:
+    return dict(_SOURCE_CFG)
+
 def is_pg() -> bool:
+    if _CONN_FACTORY is not None:
+        return _CONN_FACTORY[1] == "pg"
     return _RUNTIME_DB_KIND == "pg"
 
+def source_is_pg() -> bool:
+    return _SOURCE_DB_KIND == "pg"
+
 _SCHEMA_SAFE_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
 
 def _apply_pg_search_path(conn):
@@ -128,7 +147,9 @@ def _apply_source_pg_search_path(conn):
         cur.close()
 
 def get_conn():
-    """根据运行时配置返回数据库连接。MySQL 使用 pymysql，PostgreSQL 使用 psycopg2。"""
+    """根据运行时配置返回数据库连接。MySQL 使用 pymysql，PostgreSQL 使用 psycopg2；设置了连接替身时返回替身。"""
+    if _CONN_FACTORY is not None:
+        return _CONN_FACTORY[0]()
     if is_pg():
         import psycopg2
         conn = psycopg2.connect(
@@ -176,6 +197,13 @@ def get_source_conn():
             autocommit=_SOURCE_CFG.get("autocommit", False),
         )
 
+def json_text_expr(json_col: str, key: str) -> str:
+    """返回取 data JSON 指定键文本值的 SQL 表达式（用于 IN (...) 批量匹配）"""
+    k = str(key).strip()
+    if is_pg():
+        return f"{json_col}->>'{k}'"
+    return f"JSON_UNQUOTE(JSON_EXTRACT({json_col}, '$.{k}'))"
+
 def json_equals_clause(json_col: str, key: str) -> str:
     """返回比较 data JSON 指定键等于占位符的 SQL 片段。
     - MySQL: JSON_UNQUOTE(JSON_EXTRACT(data, '$.key'))=%s
@@ -0,0 +1,108 @@
+# backend/stand_in_db.py
+# -*- coding: utf-8 -*-
+"""
+运行库的 SQLite 替身（本地测试 / 基准用，无需 MySQL/PG 服务）：
+- StandInConn 提供 pymysql 形状的连接与游标（%s 占位符、cursor() 上下文、commit/rollback），
+  并注册 JSON_UNQUOTE，使 mapper_core 生成的 MySQL 方言（JSON_EXTRACT / JSON_UNQUOTE）可直接执行；
+- init_stand_in_db 建 entity 表及常用索引；install 经 sql_utils.set_conn_factory 接入 get_conn。
+    from backend.stand_in_db import init_stand_in_db, install
+    init_stand_in_db("entity_stand_in.db"); install("entity_stand_in.db")
+"""
+import sqlite3
+from typing import Any, Iterable, Optional
+
+
+class _Cursor:
+    def __init__(self, cur):
+        self._cur = cur
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cur.close()
+
+    @staticmethod
+    def _sql(sql: str) -> str:
+        return sql.replace("%s", "?")
+
+    def execute(self, sql: str, params: Optional[Iterable[Any]] = None):
+        return self._cur.execute(self._sql(sql), tuple(params or ()))
+
+    def executemany(self, sql: str, seq: Iterable[Iterable[Any]]):
+        return self._cur.executemany(self._sql(sql), [tuple(p) for p in seq])
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def fetchmany(self, size: Optional[int] = None):
+        return self._cur.fetchmany(size or 1)
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    @property
+    def rowcount(self) -> int:
+        return self._cur.rowcount
+
+    def close(self):
+        self._cur.close()
+
+
+class StandInConn:
+    """SQLite 上的 pymysql 形状连接，JSON_UNQUOTE 语义同 MySQL（总是返回文本）"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # json_extract 返回 SQL 值；MySQL 的 JSON_UNQUOTE 总是返回文本
+        self._conn.create_function("JSON_UNQUOTE", 1, lambda v: None if v is None else str(v), deterministic=True)
+
+    def cursor(self):
+        return _Cursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+def init_stand_in_db(path: str):
+    """建 entity 表与索引（含 key_field='id' 的按键查找索引，避免逐条 upsert 扫整类实体）"""
+    conn = StandInConn(path)._conn
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entity (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                uuid TEXT NOT NULL,
+                sid TEXT NOT NULL,
+                name TEXT NOT NULL,
+                type TEXT NOT NULL,
+                data TEXT NOT NULL,
+                del INTEGER DEFAULT 0,
+                input_date INTEGER DEFAULT 0,
+                update_date INTEGER DEFAULT 0
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entity_type_sid ON entity(type, sid)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entity_uuid ON entity(uuid)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entity_key_id ON entity(type, sid, JSON_UNQUOTE(JSON_EXTRACT(data, '$.id')))")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def install(path: str):
+    """运行库连接改为 path 上的替身（MySQL 方言）；sql_utils.set_conn_factory(None) 恢复"""
+    from backend.sql_utils import set_conn_factory
+    set_conn_factory(lambda: StandInConn(path), "mysql")
@@ -0,0 +1,127 @@
+# backend/user_directory.py
+# -*- coding: utf-8 -*-
+"""
+用户/部门目录：
+- 源侧 sys_user / sys_dept 经 source_store 读取（dump 按 mtime、源库按 TTL），行对象变化即重建快照；
+  提供 id→{name, dept_id}、姓名→{name, dept_id}、部门 id→部门名 的字典。
+- 运行库 usr 表的 data.source_id→uuid 一次查询整表加载，USR_TTL 秒内复用；写入/删除 usr 后调用 invalidate_usr。
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+USR_TTL = 60.0
+
+_EMPTY: List[Dict[str, Any]] = []
+_LOCK = threading.Lock()
+_SNAPSHOT: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_USR_CACHE: Dict[Tuple[Any, ...], Tuple[float, Dict[str, str]]] = {}
+
+
+def _typed_rows(kind: str, conn_key: str, table: str) -> List[Dict[str, Any]]:
+    from backend import source_store
+    if kind == "db":
+        try:
+            return source_store.db_rows(table, conn_key or None)
+        except Exception as e:
+            print("[user_directory read error]", table, e)
+            return _EMPTY
+    from backend.source_fields import detect_sql_path
+    p = detect_sql_path(table)
+    if not p.exists():
+        return _EMPTY
+    return source_store.typed_file_rows(p, table)
+
+
+def _build(users: List[Dict[str, Any]], depts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    m: Dict[str, Dict[str, str]] = {}
+    nmap: Dict[str, Dict[str, str]] = {}
+    for r in users:
+        uid = str(r.get("user_id") or "").strip()
+        if not uid:
+            continue
+        name = str(r.get("nick_name") or "").strip()
+        dept_id = str(r.get("dept_id") or "").strip()
+        prev = m.get(uid)
+        if prev:
+            if not prev.get("dept_id") and dept_id:
+                m[uid] = {"name": name, "dept_id": dept_id}
+        else:
+            m[uid] = {"name": name, "dept_id": dept_id}
+        if name:
+            prev = nmap.get(name)
+            if dept_id:
+                nmap[name] = {"name": name, "dept_id": dept_id}
+            elif not prev:
+                nmap[name] = {"name": name, "dept_id": dept_id}
+    dmap = {str(r.get("dept_id") or "").strip(): str(r.get("dept_name") or r.get("name") or "").strip() for r in depts}
+    return {"users": m, "users_by_name": nmap, "depts": dmap}
+
+
+def directory(kind: str = "file", conn_key: str = "") -> Dict[str, Any]:
+    """返回 {"users", "users_by_name", "depts"}；sys_user/sys_dept 变化时自动重建"""
+    users = _typed_rows(kind, conn_key, "sys_user")
+    depts = _typed_rows(kind, conn_key, "sys_dept")
+    stamp = (id(users), id(depts))
+    key = (kind, conn_key or "")
+    hit = _SNAPSHOT.get(key)
+    if hit is not None and hit["stamp"] == stamp:
+        return hit
+    with _LOCK:
+        hit = _SNAPSHOT.get(key)
+        if hit is not None and hit["stamp"] == stamp:
+            return hit
+        snap = _build(users, depts)
+        snap["stamp"] = stamp
+        # 持有源行引用，保证 stamp 中的 id 不被复用
+        snap["sources"] = (users, depts)
+        _SNAPSHOT[key] = snap
+        return snap
+
+
+def invalidate():
+    with _LOCK:
+        _SNAPSHOT.clear()
+
+
+# ---------------- 运行库 usr ----------------
+def _usr_key() -> Tuple[Any, ...]:
+    from backend.sql_utils import current_cfg, is_pg
+    cfg = current_cfg()
+    return ("pg" if is_pg() else "mysql", cfg.get("host"), cfg.get("port"), cfg.get("database"), cfg.get("schema"))
+
+
+def usr_uuid_map(ttl: Optional[float] = None) -> Dict[str, str]:
+    """usr.data.source_id → usr.uuid（同一 source_id 取首条），一次查询加载"""
+    from backend.sql_utils import get_conn, json_text_expr
+    key = _usr_key()
+    ttl = USR_TTL if ttl is None else ttl
+    hit = _USR_CACHE.get(key)
+    if hit is not None and time.time() - hit[0] < ttl:
+        return hit[1]
+    out: Dict[str, str] = {}
+    try:
+        conn = get_conn()
+    except Exception as e:
+        print("[usr_uuid_map error]", e)
+        return out
+    try:
+        expr = json_text_expr("data", "source_id")
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT uuid, {expr} FROM usr WHERE {expr} IS NOT NULL")
+            for uuid, sid_val in cur.fetchall() or []:
+                out.setdefault(str(sid_val), uuid)
+        _USR_CACHE[key] = (time.time(), out)
+    except Exception as e:
+        print("[usr_uuid_map error]", e)
+    finally:
+        conn.close()
+    return out
+
+
+def usr_uuid_by_source_id(src_id: Any) -> Optional[str]:
+    return usr_uuid_map().get(str(src_id or "")) if src_id not in (None, "") else None
+
+
+def invalidate_usr():
+    _USR_CACHE.clear()
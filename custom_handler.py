@@ -14,7 +14,7 @@ custom_handler.py
 
 import re
 import pymysql
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from version3 import MYSQL_CFG  # 直接读取配置
 
 # ========== 通用工具函数 ==========
@@ -103,6 +103,59 @@ def fetch_field_uuid(table: str, key_field: str, key_value: Any) -> Optional[str
     return None
 
 
+def _match_key(v: Any) -> str:
+    """与逐值 = 查询的库排序规则一致的比较键：忽略大小写与末尾空格"""
+    return str(v).rstrip(" ").lower()
+
+
+def fetch_field_uuids(table: str, key_field: str, key_values) -> Dict[str, str]:
+    """
+    fetch_field_uuid 的批量版本：一次连接 + 分批 IN 查询。
+    返回 {str(key_value): uuid}，未命中的值不在结果中；命中结果同样写入 _CACHE。
+    IN 查询结果按 _match_key 对回请求值（库端比较忽略大小写与末尾空格，返回的是库中原值）。
+    """
+    out: Dict[str, str] = {}
+    todo = []
+    for v in dict.fromkeys(str(x) for x in (key_values or [])):
+        hit = _CACHE.get(_cache_key(table, key_field, v, "uuid"))
+        if hit:
+            out[v] = hit
+        else:
+            todo.append(v)
+    if not todo:
+        return out
+
+    wanted: Dict[str, List[str]] = {}
+    for v in todo:
+        wanted.setdefault(_match_key(v), []).append(v)
+    conn = None
+    try:
+        conn = pymysql.connect(**MYSQL_CFG)
+        with conn.cursor() as cur:
+            for i in range(0, len(todo), 500):
+                part = todo[i:i + 500]
+                ph = ",".join(["%s"] * len(part))
+                sql = f"""
+                    SELECT uuid, JSON_UNQUOTE(JSON_EXTRACT(data, CONCAT('$.', %s)))
+                    FROM entity
+                    WHERE type=%s AND JSON_UNQUOTE(JSON_EXTRACT(data, CONCAT('$.', %s))) IN ({ph})
+                """
+                cur.execute(sql, [key_field, table, key_field] + part)
+                for uuid, kv in cur.fetchall() or []:
+                    if not uuid:
+                        continue
+                    for k in wanted.get(_match_key(kv), []):
+                        if k not in out:
+                            out[k] = uuid
+                            _CACHE[_cache_key(table, key_field, k, "uuid")] = uuid
+    except Exception as e:
+        print(f"[fetch_field_uuids] 查询失败: {table}.{key_field} ({len(todo)} 个值) -> {e}")
+    finally:
+        if conn:
+            conn.close()
+    return out
+
+
 def resolve_relation(record: Dict[str, Any], prefix: str, ref_table: str, key_field: str, name_field: str):
     """
     通用外键解析辅助函数。
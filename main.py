@@ -1,7 +1,90 @@
-from fastapi import FastAPI
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from backend.db import init_db, list_mapped_tables, get_target_entity
+from backend.jobs import (
+    init_jobs_db, submit_import_job, submit_import_batch, cancel_job, get_job, list_jobs, clear_finished_jobs
+)
+from backend.mapper_core import (
+    COLUMNAR_CHUNK, apply_records_mapping, entity_status_by_sid, preview_source_records, query_source_sql
+)
+from backend.presets import init_presets_db, get_last_runtime, get_last_source
+from backend.sql_utils import update_runtime_db, update_source_db, current_cfg, is_pg
+
+try:
+    from version3 import SID
+except Exception:
+    SID = "default_sid"
 
 app = FastAPI()
 
+# 与 Streamlit 端共享同一份运行时配置（最近一次在页面中应用的配置）
+_STATE: Dict[str, Any] = {"sid": SID}
+
+
+@app.on_event("startup")
+def _startup():
+    init_db()
+    init_presets_db()
+    init_jobs_db()
+    last = get_last_runtime()
+    if last:
+        try:
+            update_runtime_db(last.get("kind") or "mysql", last)
+        except Exception as e:
+            print("[api startup runtime error]", e)
+        _STATE["sid"] = last.get("sid") or last.get("schema") or SID
+    last_src = get_last_source()
+    if last_src and str(last_src.get("kind", "")) == "pg":
+        try:
+            update_source_db("pg", last_src)
+        except Exception as e:
+            print("[api startup source error]", e)
+    # 本地测试：STAND_IN_DB 指向 SQLite 文件时，运行库改用替身（backend/stand_in_db.py，MySQL 方言）
+    stand_in = os.environ.get("STAND_IN_DB")
+    if stand_in:
+        from backend.stand_in_db import init_stand_in_db, install
+        init_stand_in_db(stand_in)
+        install(stand_in)
+
+
+class RuntimeDbReq(BaseModel):
+    kind: str = "mysql"
+    cfg: Dict[str, Any] = {}
+    sid: Optional[str] = None
+
+
+class ImportJobReq(BaseModel):
+    source_table: str
+    target_entity: Optional[str] = None
+    sid: Optional[str] = None
+    import_mode: str = "upsert"
+    sync_soft_delete: bool = False
+
+
+class ImportBatchReq(BaseModel):
+    tables: Optional[List[str]] = None
+    sid: Optional[str] = None
+    import_mode: str = "upsert"
+    sync_soft_delete: bool = False
+
+
+class SqlQueryReq(BaseModel):
+    sql: str
+    main_table: str = ""
+    parameters: Optional[Dict[str, Any]] = None
+    limit: int = 200
+
+
+def _sid(sid: Optional[str]) -> str:
+    return sid or _STATE.get("sid") or SID
+
 
 @app.get("/")
 async def root():
@@ -11,3 +94,105 @@ async def root():
 @app.get("/hello/{name}")
 async def say_hello(name: str):
     return {"message": f"Hello {name}"}
+
+
+# ---------------- 运行时配置 ----------------
+@app.get("/runtime")
+def get_runtime():
+    cfg = current_cfg()
+    cfg.pop("password", None)
+    return {"kind": "pg" if is_pg() else "mysql", "cfg": cfg, "sid": _sid(None)}
+
+
+@app.put("/runtime")
+def put_runtime(req: RuntimeDbReq):
+    update_runtime_db(req.kind, req.cfg)
+    if req.sid:
+        _STATE["sid"] = req.sid
+    return get_runtime()
+
+
+# ---------------- 入库任务 ----------------
+@app.post("/jobs/import")
+def start_import(req: ImportJobReq):
+    job_id = submit_import_job(
+        req.source_table,
+        target_entity=req.target_entity or get_target_entity(req.source_table),
+        sid=_sid(req.sid),
+        import_mode=req.import_mode,
+        sync_soft_delete=req.sync_soft_delete,
+    )
+    return get_job(job_id)
+
+
+@app.post("/jobs/import-batch")
+def start_import_batch(req: ImportBatchReq):
+    rows = list_mapped_tables()
+    if req.tables:
+        wanted = set(req.tables)
+        rows = [r for r in rows if r["source_table"] in wanted]
+    ids = submit_import_batch(rows, sid=_sid(req.sid), import_mode=req.import_mode,
+                              sync_soft_delete=req.sync_soft_delete)
+    return {"job_ids": ids}
+
+
+@app.get("/jobs")
+def jobs(limit: int = 50, active_only: bool = False):
+    return list_jobs(limit=limit, active_only=active_only)
+
+
+@app.get("/jobs/{job_id}")
+def job_detail(job_id: str):
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel")
+def job_cancel(job_id: str):
+    if not get_job(job_id):
+        raise HTTPException(status_code=404, detail="job not found")
+    return {"cancelled": cancel_job(job_id)}
+
+
+@app.delete("/jobs")
+def jobs_clear():
+    return {"deleted": clear_finished_jobs()}
+
+
+# ---------------- 映射预览（NDJSON 流式返回） ----------------
+@app.get("/tables/{source_table}/preview")
+async def preview_mapping(source_table: str, entity: Optional[str] = None, limit: int = 20):
+    target = entity or get_target_entity(source_table) or None
+    records, err = await run_in_threadpool(preview_source_records, source_table, target, limit)
+    if err:
+        raise HTTPException(status_code=400, detail=err)
+
+    async def _gen():
+        for i in range(0, len(records), COLUMNAR_CHUNK):
+            chunk = records[i:i + COLUMNAR_CHUNK]
+            mapped = await run_in_threadpool(apply_records_mapping, source_table, chunk, "", target)
+            for rec, (out, name, type_override) in zip(chunk, mapped):
+                yield json.dumps(
+                    {"source": rec, "mapped": out, "name": name, "type": type_override or target},
+                    ensure_ascii=False, default=str,
+                ) + "\n"
+
+    return StreamingResponse(_gen(), media_type="application/x-ndjson")
+
+
+# ---------------- 筛选 SQL ----------------
+@app.post("/sql/query")
+async def sql_query(req: SqlQueryReq):
+    rows = await run_in_threadpool(query_source_sql, req.sql, req.main_table, req.parameters)
+    if rows and isinstance(rows, list) and "error" in rows[0]:
+        raise HTTPException(status_code=400, detail=rows[0]["error"])
+    total = len(rows or [])
+    return {"total": total, "rows": (rows or [])[:max(0, int(req.limit))]}
+
+
+# ---------------- 实体状态 ----------------
+@app.get("/entity-status")
+def entity_status(sid: Optional[str] = None):
+    return entity_status_by_sid(_sid(sid))
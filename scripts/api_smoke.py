@@ -0,0 +1,111 @@
+"""
+API smoke test.
+
+Drives the FastAPI app in main.py through fastapi.testclient against local stand-ins only:
+a throwaway working directory (mapping_config.db, source/sql) and the SQLite runtime stand-in
+from backend/stand_in_db.py, plugged in through STAND_IN_DB. No MySQL/PG server is needed.
+
+Checks:
+  jobs      POST /jobs/import, poll GET /jobs/{id} until finished; every source row is written
+  preview   GET /tables/{table}/preview streams `limit` NDJSON lines with mapped records
+  status    GET /entity-status reports the imported count for the target entity
+
+Exits 1 on the first failed check.
+
+    python scripts/api_smoke.py
+    python scripts/api_smoke.py --rows 500 --keep
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SRC_TABLE = "smoke_src"
+TARGET_ENTITY = "smoke_entity"
+SID = "smoke_sid"
+
+
+def write_fixture(rows: int):
+    from backend.db import init_db, save_table_mapping, upsert_field_mapping
+    os.makedirs(os.path.join("source", "sql"), exist_ok=True)
+    head = f'INSERT INTO public."{SRC_TABLE}" ("id", "name", "code") VALUES ('
+    with open(os.path.join("source", "sql", f"{SRC_TABLE}.sql"), "w", encoding="utf-8") as f:
+        for i in range(1, rows + 1):
+            f.write(head + f"{i}, 'name {i}', '{i % 3:02d}');\n")
+    init_db()
+    save_table_mapping(SRC_TABLE, TARGET_ENTITY)
+    upsert_field_mapping(SRC_TABLE, "id", "data.id", "", 1, 0, TARGET_ENTITY)
+    upsert_field_mapping(SRC_TABLE, "name", "name", "", 1, 1, TARGET_ENTITY)
+    upsert_field_mapping(SRC_TABLE, "code", "data.label", "concat(code, '-', id)", 1, 2, TARGET_ENTITY)
+
+
+def _check(ok: bool, what: str):
+    print(f"  {'ok  ' if ok else 'FAIL'} {what}")
+    if not ok:
+        raise SystemExit(1)
+
+
+def run(rows: int, workdir: Optional[str] = None, keep: bool = False, timeout: float = 60.0):
+    own_dir = workdir is None
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix="api_smoke_"))
+    os.makedirs(workdir, exist_ok=True)
+    prev_cwd = os.getcwd()
+    os.chdir(workdir)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.environ["STAND_IN_DB"] = os.path.join(workdir, "entity_stand_in.db")
+    try:
+        write_fixture(rows)
+        from fastapi.testclient import TestClient
+        import main
+
+        print(f"api smoke: {rows} rows, workdir {workdir}")
+        with TestClient(main.app) as client:
+            r = client.post("/jobs/import", json={"source_table": SRC_TABLE, "sid": SID})
+            _check(r.status_code == 200, f"start job -> {r.status_code}")
+            job = r.json()
+            deadline = time.time() + timeout
+            while job.get("status") in ("queued", "running") and time.time() < deadline:
+                time.sleep(0.1)
+                job = client.get(f"/jobs/{job['id']}").json()
+            _check(job.get("status") == "done", f"job finished with status {job.get('status')} ({job.get('error') or ''})")
+            _check(int(job.get("wrote") or 0) == rows, f"job wrote {job.get('wrote')}/{rows}")
+
+            limit = min(5, rows)
+            with client.stream("GET", f"/tables/{SRC_TABLE}/preview", params={"limit": limit}) as resp:
+                _check(resp.status_code == 200, f"preview -> {resp.status_code}")
+                lines = [json.loads(x) for x in resp.iter_lines() if x.strip()]
+            _check(len(lines) == limit, f"preview streamed {len(lines)}/{limit} lines")
+            first = lines[0]["mapped"] if lines else {}
+            _check(first.get("label") == "01-1", f"preview mapped label {first.get('label')!r}")
+
+            r = client.get("/entity-status", params={"sid": SID})
+            count = (r.json().get(TARGET_ENTITY) or {}).get("count")
+            _check(r.status_code == 200 and count == rows, f"entity-status count {count}/{rows}")
+        print("api smoke: all checks passed")
+    finally:
+        from backend.sql_utils import set_conn_factory
+        set_conn_factory(None)
+        os.chdir(prev_cwd)
+        if own_dir and not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="FastAPI smoke test against local stand-in databases")
+    ap.add_argument("--rows", type=int, default=50)
+    ap.add_argument("--workdir", default=None, help="working directory (default: a temp dir, removed afterwards)")
+    ap.add_argument("--keep", action="store_true", help="keep the temp working directory")
+    ap.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for the import job")
+    args = ap.parse_args()
+    run(args.rows, args.workdir, args.keep, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+Mapping throughput benchmark.
+
+Generates synthetic source/sql dumps and a field_map configuration that exercises every
+rule kind, then times the pipeline phases against a local SQLite stand-in for the runtime
+`entity` table:
+
+  parse   source_store.file_rows (cold): INSERT scan + value parsing
+  map     apply_records_mapping in COLUMNAR_CHUNK batches
+  write   upsert_entity_rows into an empty entity table (insert path)
+  import  import_table_data end to end over the written rows (lookup + update path)
+
+Everything runs in a scratch working directory, so mapping_config.db, access_cache.db and
+source/sql there are throwaway. The stand-in (backend/stand_in_db.py) speaks the MySQL dialect
+that mapper_core emits (%s placeholders, JSON_EXTRACT / JSON_UNQUOTE), so no database server is needed.
+
+Results are compared with a stored baseline (bench_baseline.json next to this script) and the
+process exits 1 when a phase is slower than the baseline (or peak RSS is larger) by more than
+--tolerance. Use --update-baseline to record the current numbers; baselines are per machine,
+so record them on the runner that does the comparison.
+
+    python scripts/bench_mapping.py --rows 20000 --cols 24
+    python scripts/bench_mapping.py --update-baseline
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+SRC_TABLE = "bench_src"
+ORG_TABLE = "bench_org"
+TARGET_ENTITY = "bench_entity"
+ORG_ENTITY = "bench_org_entity"
+SID = "bench_sid"
+ORGS = 200
+
+_SURNAMES = "赵钱孙李周吴郑王冯陈褚卫蒋沈韩杨朱秦尤许何吕施张"
+_WORDS = ["科技", "投资", "基金", "管理", "咨询", "资本", "控股", "实业", "发展", "创新", "数据", "能源"]
+_SUFFIX = ["有限公司", "股份有限公司", "合伙企业（有限合伙）", "资产管理中心"]
+
+
+# ---------------- synthetic data ----------------
+def _q(s: str) -> str:
+    return "'" + s.replace("'", "''") + "'"
+
+
+def _company(rng: random.Random) -> str:
+    return rng.choice(_SURNAMES) + "".join(rng.sample(_WORDS, 2)) + rng.choice(_SUFFIX)
+
+
+def _columns(cols: int) -> List[str]:
+    base = ["id", "name", "alias", "code", "amount", "reg_date", "org_id", "remark", "memo"]
+    return base + [f"c{k}" for k in range(max(0, cols - len(base)))]
+
+
+def _row_values(i: int, names: List[str], rng: random.Random) -> List[str]:
+    out = []
+    for c in names:
+        if c == "id":
+            out.append(str(i))
+        elif c == "name":
+            out.append(_q(_company(rng)))
+        elif c == "alias":
+            out.append("NULL" if rng.random() < 0.4 else _q(rng.choice(_WORDS) + str(i)))
+        elif c == "code":
+            out.append(_q(rng.choice(["01", "02", "03", "09"])))
+        elif c == "amount":
+            out.append(f"{rng.uniform(0, 1e7):.2f}")
+        elif c == "reg_date":
+            out.append(_q(f"20{rng.randint(10, 24):02d}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} "
+                          f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"))
+        elif c == "org_id":
+            out.append(str(rng.randint(1, ORGS)))
+        elif c == "remark":
+            # quotes, ');' and an INSERT keyword inside a string value
+            out.append(_q(f"It's {rng.choice(_WORDS)}); INSERT INTO x VALUES (1); 备注{i}"))
+        elif c == "memo":
+            out.append("e" + _q(f"第一行\\n第二行 {i}\\t{rng.choice(_WORDS)}"))
+        else:
+            r = rng.random()
+            if r < 0.15:
+                out.append("NULL")
+            elif r < 0.5:
+                out.append(str(rng.randint(0, 10 ** 6)))
+            else:
+                out.append(_q(rng.choice(_WORDS) * rng.randint(1, 4)))
+    return out
+
+
+def write_dump(path: str, table: str, names: List[str], rows: int, seed: int,
+               row_fn=None) -> int:
+    rng = random.Random(seed)
+    head = f'INSERT INTO public."{table}" (' + ", ".join(f'"{c}"' for c in names) + ") VALUES ("
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(1, rows + 1):
+            vals = row_fn(i, rng) if row_fn else _row_values(i, names, rng)
+            f.write(head + ", ".join(vals) + ");\n")
+    return os.path.getsize(path)
+
+
+def _org_row(i: int, rng: random.Random) -> List[str]:
+    return [str(i), _q(_company(rng)), _q(rng.choice(["华东", "华北", "华南", "西部"]))]
+
+
+# rule kind -> (source_field, target_paths, rule)
+RULES = [
+    ("passthrough", "id", "data.id", ""),
+    ("passthrough", "name", "name", ""),
+    ("field", "title", "data.title", "record.name"),
+    ("literal", "origin", "data.origin", "'bench'"),
+    ("concat", "label", "data.label", "concat(code, '-', id)"),
+    ("coalesce", "alias", "data.alias", "coalesce(alias, remark)"),
+    ("date", "reg_date", "data.reg_day", "date(%Y-%m-%d, reg_date)"),
+    ("dict_get", "code", "data.status", "py:{'01': '存续', '02': '注销', '03': '吊销'}.get(record.code, '未知')"),
+    ("multi", "pair", "data.pair_a,data.pair_b", "record.name || record.code"),
+    ("py", "amount", "data.amount_cents", "py:round(float(amount or 0) * 100)"),
+    ("sql", "org_name", "data.org_name", f"sql.{ORG_TABLE}(sql.{ORG_TABLE}.id=record.org_id).org_name"),
+    ("entity", "org_uuid", "data.org_uuid", f"entity({ORG_ENTITY}:data.id=record.org_id).uuid"),
+]
+
+
+def write_config(names: List[str], kinds: Optional[List[str]] = None):
+    from backend.db import init_db, save_table_mapping, upsert_field_mapping
+    init_db()
+    save_table_mapping(SRC_TABLE, TARGET_ENTITY)
+    order = 0
+    for kind, src, targets, rule in RULES:
+        if kinds and kind not in kinds and kind != "passthrough":
+            continue
+        upsert_field_mapping(SRC_TABLE, src, targets, rule, 1, order, TARGET_ENTITY)
+        order += 1
+    for c in names:
+        if c.startswith("c") and c[1:].isdigit():
+            upsert_field_mapping(SRC_TABLE, c, f"data.{c}", "", 1, order, TARGET_ENTITY)
+            order += 1
+
+
+# ---------------- SQLite stand-in for the runtime database ----------------
+def init_stand_in(path: str):
+    from backend.stand_in_db import StandInConn, init_stand_in_db
+    init_stand_in_db(path)
+    conn = StandInConn(path)
+    try:
+        with conn.cursor() as cur:
+            cur.executemany(
+                "INSERT INTO entity(uuid, sid, name, type, data, del, input_date, update_date) VALUES (%s,%s,%s,%s,%s,0,0,0)",
+                [(f"org{i:07d}", SID, f"org{i}", ORG_ENTITY, json.dumps({"id": str(i)})) for i in range(1, ORGS + 1)],
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def install_stand_in(path: str):
+    from backend.stand_in_db import install
+    install(path)
+
+
+# ---------------- measurement ----------------
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(kb / (1024.0 * 1024.0) if sys.platform == "darwin" else kb / 1024.0, 1)
+    except Exception:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / (1024.0 * 1024.0), 1)
+    except Exception:
+        return None
+
+
+def _phase(results: Dict[str, Any], name: str, rows: int, t0: float):
+    dt = max(time.perf_counter() - t0, 1e-9)
+    results["phases"][name] = {
+        "seconds": round(dt, 3),
+        "rows_per_s": round(rows / dt, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(f"  {name:<7} {dt:8.3f}s  {rows / dt:12.1f} rows/s  peak RSS {results['phases'][name]['peak_rss_mb']} MB")
+
+
+def run(rows: int, cols: int, seed: int = 7, workdir: Optional[str] = None, keep: bool = False,
+        kinds: Optional[List[str]] = None) -> Dict[str, Any]:
+    own_dir = workdir is None
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix="bench_mapping_"))
+    os.makedirs(os.path.join(workdir, "source", "sql"), exist_ok=True)
+    prev_cwd = os.getcwd()
+    os.chdir(workdir)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    try:
+        names = _columns(cols)
+        size = write_dump(os.path.join("source", "sql", f"{SRC_TABLE}.sql"), SRC_TABLE, names, rows, seed)
+        write_dump(os.path.join("source", "sql", f"{ORG_TABLE}.sql"), ORG_TABLE, ["id", "org_name", "region"],
+                   ORGS, seed + 1, row_fn=_org_row)
+        write_config(names, kinds)
+        stand_in = os.path.join(workdir, "entity_stand_in.db")
+        init_stand_in(stand_in)
+        install_stand_in(stand_in)
+
+        import backend.source_store as source_store
+        from backend import mapper_core as mc
+        source_store.WRITE_THROUGH = False
+
+        results: Dict[str, Any] = {
+            "profile": profile_key(rows, cols),
+            "rows": rows, "cols": len(names), "dump_bytes": size,
+            "python": sys.version.split()[0], "phases": {},
+        }
+        print(f"bench: {rows} rows x {len(names)} cols, dump {size / 1048576:.1f} MiB, workdir {workdir}")
+
+        t0 = time.perf_counter()
+        records = source_store.file_rows(os.path.join("source", "sql", f"{SRC_TABLE}.sql"), SRC_TABLE)
+        _phase(results, "parse", len(records), t0)
+
+        chunk = mc.COLUMNAR_CHUNK
+        t0 = time.perf_counter()
+        mapped: List[Any] = []
+        for i in range(0, len(records), chunk):
+            mapped.extend(mc.apply_records_mapping(SRC_TABLE, records[i:i + chunk], py_script="",
+                                                   target_entity=TARGET_ENTITY))
+        _phase(results, "map", len(mapped), t0)
+
+        now_ts = int(time.time())
+        upsert_rows = []
+        for rec, name, _type in mapped:
+            rec = dict(rec)
+            meta = mc._extract_entity_meta(rec, now_ts=now_ts)
+            upsert_rows.append({
+                "type_name": TARGET_ENTITY, "key_field": "id", "key_value": rec.get("id"),
+                "name_val": (rec.get("__name__") or name or "").strip(),
+                "data_json": json.dumps(rec, ensure_ascii=False), "meta": meta, "import_mode": "upsert",
+            })
+        t0 = time.perf_counter()
+        wrote, failures = mc.upsert_entity_rows(upsert_rows, SID)
+        _phase(results, "write", wrote, t0)
+        if failures:
+            print(f"  write: {len(failures)} rows skipped")
+
+        t0 = time.perf_counter()
+        imported = mc.import_table_data(SRC_TABLE, sid=SID, target_entity_spec=TARGET_ENTITY, import_mode="upsert")
+        _phase(results, "import", imported, t0)
+
+        results["peak_rss_mb"] = peak_rss_mb()
+        return results
+    finally:
+        os.chdir(prev_cwd)
+        if own_dir and not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ---------------- baseline ----------------
+def profile_key(rows: int, cols: int) -> str:
+    return f"rows={rows},cols={cols}"
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(results: Dict[str, Any], path: str = BASELINE_PATH):
+    data = load_baseline(path)
+    data[results["profile"]] = {
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": results["python"],
+        "peak_rss_mb": results["peak_rss_mb"],
+        "phases": {k: {"rows_per_s": v["rows_per_s"]} for k, v in results["phases"].items()},
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions as human-readable lines; empty when everything is within tolerance."""
+    base = baseline.get(results["profile"])
+    if not base:
+        return []
+    problems = []
+    for name, cur in results["phases"].items():
+        ref = (base.get("phases") or {}).get(name)
+        if not ref or not ref.get("rows_per_s"):
+            continue
+        floor = ref["rows_per_s"] * (1.0 - tolerance)
+        if cur["rows_per_s"] < floor:
+            problems.append(f"{name}: {cur['rows_per_s']:.1f} rows/s < {floor:.1f} "
+                            f"(baseline {ref['rows_per_s']:.1f}, -{tolerance:.0%})")
+    ref_rss, cur_rss = base.get("peak_rss_mb"), results.get("peak_rss_mb")
+    if ref_rss and cur_rss and cur_rss > ref_rss * (1.0 + tolerance):
+        problems.append(f"peak RSS: {cur_rss:.1f} MB > {ref_rss * (1.0 + tolerance):.1f} "
+                        f"(baseline {ref_rss:.1f}, +{tolerance:.0%})")
+    return problems
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark parse / map / write throughput of the mapping pipeline.")
+    ap.add_argument("--rows", type=int, default=20000, help="rows in the synthetic source dump")
+    ap.add_argument("--cols", type=int, default=24, help="columns per row (at least the 9 built-in ones)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--rules", default="", help="comma-separated rule kinds to include (default: all): "
+                    + ",".join(sorted({k for k, *_ in RULES})))
+    ap.add_argument("--workdir", default=None, help="scratch directory (default: a temp dir, removed afterwards)")
+    ap.add_argument("--keep", action="store_true", help="keep the temp workdir")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed regression fraction (default 0.25)")
+    ap.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    ap.add_argument("--json", default=None, help="also write the results to this file")
+    args = ap.parse_args(argv)
+
+    kinds = [k.strip() for k in args.rules.split(",") if k.strip()] or None
+    results = run(args.rows, args.cols, seed=args.seed, workdir=args.workdir, keep=args.keep, kinds=kinds)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        if kinds:
+            print("not updating the baseline from a --rules subset")
+            return 2
+        save_baseline(results, args.baseline)
+        print(f"baseline updated: {args.baseline} [{results['profile']}]")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if kinds or results["profile"] not in baseline:
+        print(f"no baseline for {results['profile']}{' with a --rules subset' if kinds else ''}; not compared")
+        return 0
+    problems = compare(results, baseline, args.tolerance)
+    if problems:
+        print("REGRESSION")
+        for p in problems:
+            print("  " + p)
+        return 1
+    print(f"OK: within {args.tolerance:.0%} of baseline [{results['profile']}]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
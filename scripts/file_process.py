@@ -1,5 +1,11 @@
 import os
 import re
+from functools import partial
+
+try:
+    from sql_stream import CHUNK_SIZE, rewrite_file
+except ImportError:  # imported as scripts.file_process
+    from scripts.sql_stream import CHUNK_SIZE, rewrite_file
 
 
 def strip_ident_quotes(s: str) -> str:
@@ -356,41 +362,19 @@ def process_insert_statement(stmt: str, target_sid: str, mode: str = 'insert', f
     return new_stmt + stmt_tail
 
 
-def process_file(in_path: str, out_path: str, target_sid: str, mode: str = 'insert', fix: bool = False, fix2: bool = False):
-    with open(in_path, 'r', encoding='utf-8') as f:
-        src = f.read()
-
-    out_parts = []
-    i = 0
-    n = len(src)
-    while i < n:
-        m = re.search(r"(?is)INSERT\s+INTO\s+", src[i:])
-        if not m:
-            out_parts.append(src[i:])
-            break
-        start = i + m.start()
-        out_parts.append(src[i:start])
-        end = find_stmt_end(src, start)
-        if end < 0:
-            stmt = src[start:]
-            new_stmt = process_insert_statement(stmt, target_sid, mode, fix=fix, fix2=fix2)
-            out_parts.append(new_stmt)
-            break
-        stmt = src[start:end]
-        new_stmt = process_insert_statement(stmt, target_sid, mode, fix=fix, fix2=fix2)
-        out_parts.append(new_stmt)
-        i = end
-
-    out = ''.join(out_parts)
+def process_file(in_path: str, out_path: str, target_sid: str, mode: str = 'insert', fix: bool = False, fix2: bool = False,
+                 workers: int = 1, chunk_size: int = CHUNK_SIZE):
+    # Streams the dump statement by statement (see sql_stream.py): linear time, bounded memory.
+    # workers > 1 rewrites statement-aligned byte ranges in separate processes.
+    transform = partial(process_insert_statement, target_sid=target_sid, mode=mode, fix=fix, fix2=fix2)
+    stats = rewrite_file(in_path, out_path, transform, workers=workers, chunk_size=chunk_size)
     # Fix for standard SQL compatibility (PostgreSQL)
     # 1. Unescape backslashes because PG standard strings treat backslashes literally.
-    # out = out.replace('\\\\', '\\')
-    
+    #    (rewrite_file(..., collapse_backslashes=True) applies out.replace('\\\\', '\\') while streaming)
+
     # 2. Replace MySQL-style escaped single quotes (\') with standard SQL escaped single quotes ('')
     # out = out.replace("\\'", "''")
-    
-    with open(out_path, 'w', encoding='utf-8') as f:
-        f.write(out)
+    return stats
 
 
 def main():
@@ -420,12 +404,15 @@ def main():
     #fix=False, fix2=True
     #新增的 fix2 行为：基础转换 + 补文件后缀 + 修时间戳，但不交换 type/doc_type。
 
+    # workers > 1: 按语句边界切分后多进程改写（大文件、规则较重时才有收益）
+    workers = 1
+
     if not os.path.exists(in_path):
         raise FileNotFoundError(f'Input file not found: {in_path}')
         
     print(f"Processing '{in_path}' -> '{out_path}' with sid={target_sid}, mode={mode}, fix={fix}, fix2={fix2}...")
-    process_file(in_path, out_path, target_sid, mode, fix=fix, fix2=fix2)
-    print("Done.")
+    stats = process_file(in_path, out_path, target_sid, mode, fix=fix, fix2=fix2, workers=workers)
+    print(f"Done. {stats['statements']} statements in {stats['elapsed']:.1f}s")
 
 
 if __name__ == '__main__':
@@ -1,5 +1,11 @@
 import os
 import re
+from functools import partial
+
+try:
+    from sql_stream import CHUNK_SIZE, rewrite_file
+except ImportError:  # imported as scripts.remove_fieldv2
+    from scripts.sql_stream import CHUNK_SIZE, rewrite_file
 
 
 def strip_ident_quotes(s: str) -> str:
@@ -315,34 +321,14 @@ def process_insert_statement(stmt: str, target_sid: str, mode: str = 'insert') -
     return new_stmt + stmt_tail
 
 
-def process_file(in_path: str, out_path: str, target_sid: str, mode: str = 'insert'):
-    with open(in_path, 'r', encoding='utf-8') as f:
-        src = f.read()
-
-    out_parts = []
-    i = 0
-    n = len(src)
-    while i < n:
-        m = re.search(r"(?is)INSERT\s+INTO\s+", src[i:])
-        if not m:
-            out_parts.append(src[i:])
-            break
-        start = i + m.start()
-        out_parts.append(src[i:start])
-        end = find_stmt_end(src, start)
-        if end < 0:
-            stmt = src[start:]
-            new_stmt = process_insert_statement(stmt, target_sid, mode)
-            out_parts.append(new_stmt)
-            break
-        stmt = src[start:end]
-        new_stmt = process_insert_statement(stmt, target_sid, mode)
-        out_parts.append(new_stmt)
-        i = end
-
-    out = ''.join(out_parts)
-    
-    out = out.replace('\\\\', '\\')
+def process_file(in_path: str, out_path: str, target_sid: str, mode: str = 'insert',
+                 workers: int = 1, chunk_size: int = CHUNK_SIZE):
+    # Streams the dump statement by statement (see sql_stream.py): linear time, bounded memory.
+    # workers > 1 rewrites statement-aligned byte ranges in separate processes.
+    # collapse_backslashes=True is out.replace('\\\\', '\\') applied to the streamed output.
+    transform = partial(process_insert_statement, target_sid=target_sid, mode=mode)
+    stats = rewrite_file(in_path, out_path, transform, workers=workers,
+                         collapse_backslashes=True, chunk_size=chunk_size)
     # Fix for standard SQL compatibility (PostgreSQL)
     # 1. Replace MySQL-style escaped single quotes (\') with standard SQL escaped single quotes ('')
     # out = out.replace(r"\'", "''")
@@ -364,8 +350,7 @@ def process_file(in_path: str, out_path: str, target_sid: str, mode: str = 'inse
     
     # Note: We do NOT replace \\\\ because MySQL \\\\ -> PG \\\\ -> PG stores \\ -> JSON sees \ (correct)
     
-    with open(out_path, 'w', encoding='utf-8') as f:
-        f.write(out)
+    return stats
 
 
 def main():
@@ -383,11 +368,15 @@ def main():
     # 'update': UPDATE entity SET ... WHERE uuid=... (only if uuid exists)
     # 'upsert': INSERT ... ON CONFLICT(uuid) DO UPDATE SET ... (Postgres style)
     mode = 'insert'
+
+    # workers > 1: 按语句边界切分后多进程改写（大文件、规则较重时才有收益）
+    workers = 1
     
     if not os.path.exists(in_path):
         raise FileNotFoundError(f'Input file not found: {in_path}')
-    process_file(in_path, out_path, target_sid, mode)
-    print(f'Processed: {in_path} -> {out_path} (sid={target_sid}, mode={mode})')
+    stats = process_file(in_path, out_path, target_sid, mode, workers=workers)
+    print(f'Processed: {in_path} -> {out_path} (sid={target_sid}, mode={mode}, '
+          f"{stats['statements']} statements in {stats['elapsed']:.1f}s)")
 
 
 if __name__ == '__main__':
@@ -2,10 +2,15 @@ import os
 import sys
 import shutil
 import json
+import time
+import hashlib
+import argparse
 import pprint
 import traceback
 import pdb
+import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 # Try importing msgpack for inline data
 try:
@@ -127,160 +132,236 @@ def inspect_xl_meta(path):
         print("Breakpoint triggered. Type 'c' to continue, or inspect variables.")
         pdb.set_trace()
 
-def restore_minio_files(source_dir: str, dest_dir: str):
+MANIFEST_NAME = ".restore_manifest.jsonl"
+RESTORE_WORKERS = 8
+COPY_CHUNK = 1024 * 1024
+HEAD_BYTES = 1024
+
+
+class _HashingWriter:
+    """File-like wrapper that hashes and counts everything written through it."""
+
+    def __init__(self, f):
+        self.f = f
+        self.h = hashlib.sha256()
+        self.size = 0
+
+    def write(self, b):
+        self.h.update(b)
+        self.size += len(b)
+        return self.f.write(b)
+
+
+def _part_no(p: Path) -> int:
+    try:
+        return int(p.name.split(".", 1)[1])
+    except Exception:
+        return 0
+
+
+def _object_parts(obj_dir: Path):
+    """
+    Parts of the latest data dir of an object, in numeric order (part.1, part.2, ..., part.10).
+    Objects with several version data dirs are restored from the most recently modified one.
+    """
+    groups = {}
+    for p in obj_dir.rglob("part.*"):
+        if p.is_file():
+            groups.setdefault(p.parent, []).append(p)
+    if not groups:
+        return []
+    data_dir = max(groups.keys(), key=lambda d: d.stat().st_mtime)
+    return sorted(groups[data_dir], key=_part_no)
+
+
+def _inline_data(obj_dir: Path):
+    """Extract inline object data from xl.meta (small objects only, so it is read whole)."""
+    with open(obj_dir / "xl.meta", "rb") as f:
+        meta_bytes = f.read()
+    if not meta_bytes.startswith(b"XL2 "):
+        raise ValueError("xl.meta does not start with XL2")
+    unpacker = msgpack.Unpacker(None, max_buffer_size=10*1024*1024)
+    unpacker.feed(meta_bytes[8:])
+    xl_meta = None
+    fallback_data = None
+    for obj in unpacker:
+        if isinstance(obj, dict):
+            if 'Versions' in obj:
+                xl_meta = obj
+                break
+            elif 'MetaSys' in obj:
+                xl_meta = obj
+            else:
+                for k, v in obj.items():
+                    if isinstance(v, bytes) and len(v) > 100:
+                        if fallback_data is None or len(v) > len(fallback_data):
+                            fallback_data = v
+        elif isinstance(obj, bytes) and len(obj) > 100:
+            if fallback_data is None or len(obj) > len(fallback_data):
+                fallback_data = obj
+    if xl_meta:
+        for v in xl_meta.get('Versions', []):
+            if v.get('Type') == 1:
+                meta_sys = v.get('MetaSys', {})
+                is_inline = False
+                for k, val in meta_sys.items():
+                    k_str = k.decode('utf-8') if isinstance(k, bytes) else k
+                    if k_str == 'x-minio-internal-inline-data' and (val == True or val == b'true'):
+                        is_inline = True
+                if is_inline:
+                    if v.get('Data'):
+                        return v.get('Data'), "inline"
+                    raise ValueError("marked inline but no Data found")
+        raise ValueError("no inline version found")
+    if fallback_data:
+        return fallback_data, "fallback"
+    raise ValueError("no Versions or valid inline data found")
+
+
+def restore_object(obj_dir: Path, out_file: Path) -> dict:
+    """
+    Restore one MinIO object directory to out_file.
+    Parts are streamed in chunks; only the first HEAD_BYTES are inspected for the MinIO header.
+    Output is written to a temp file and renamed, so an interrupted run never leaves a partial file.
+    Returns {"status", "mode", "size", "sha256"}.
+    """
+    out_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_file.with_name(out_file.name + ".restoring")
+    parts = _object_parts(obj_dir)
+    try:
+        with open(tmp, "wb") as f_raw:
+            w = _HashingWriter(f_raw)
+            if parts:
+                mode = f"parts:{len(parts)}"
+                for i, p in enumerate(parts):
+                    with open(p, "rb") as f_in:
+                        if i == 0:
+                            w.write(strip_minio_header(f_in.read(HEAD_BYTES)))
+                        shutil.copyfileobj(f_in, w, COPY_CHUNK)
+            else:
+                if not HAS_MSGPACK:
+                    raise RuntimeError("inline data suspected, but msgpack not installed")
+                data, mode = _inline_data(obj_dir)
+                w.write(strip_minio_header(data))
+        os.replace(tmp, out_file)
+    finally:
+        if tmp.exists():
+            try:
+                tmp.unlink()
+            except Exception:
+                pass
+    return {"status": "restored", "mode": mode, "size": w.size, "sha256": w.h.hexdigest()}
+
+
+def load_manifest(manifest_path) -> dict:
+    """Read a restore manifest (JSON lines) into {object: entry}; later lines win."""
+    entries = {}
+    p = Path(manifest_path)
+    if not p.exists():
+        return entries
+    with open(p, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                e = json.loads(line)
+            except Exception:
+                continue
+            if e.get("object"):
+                entries[e["object"]] = e
+    return entries
+
+
+def _iter_objects(source_path: Path):
+    for root, dirs, files in os.walk(source_path):
+        if "xl.meta" in files:
+            yield Path(root)
+            # An object dir's sub dirs are its data dirs, never nested objects
+            dirs[:] = []
+
+
+def restore_minio_files(source_dir: str, dest_dir: str, workers: int = RESTORE_WORKERS, manifest=None):
     """
     Traverse source_dir, identify MinIO object directories, and restore files to dest_dir.
     Preserves directory structure relative to source_dir.
+    Objects are restored by a worker pool; every finished object is appended to the manifest
+    (default: <dest_dir>/.restore_manifest.jsonl) as {"object", "path", "size", "sha256", "mode"}.
+    Re-running skips objects already in the manifest whose output still has the recorded size.
     """
+    workers = max(1, int(workers))
     source_path = Path(source_dir).resolve()
     dest_path = Path(dest_dir).resolve()
     dest_path.mkdir(parents=True, exist_ok=True)
-    
+    manifest_path = Path(manifest) if manifest else dest_path / MANIFEST_NAME
+    done = load_manifest(manifest_path)
+
     print(f"Scanning {source_path}...")
-    print(f"Restoring to {dest_path}...")
-    
-    count_restored = 0
-    count_skipped = 0
-    
-    for root, dirs, files in os.walk(source_path):
-        if "xl.meta" in files:
-            # This 'root' is likely an Object Directory (e.g. .../file.pdf)
-            obj_dir = Path(root)
-            
-            # Calculate relative path from source_dir to this object directory
-            # e.g. source_dir/A/B/file.pdf -> rel_path = A/B/file.pdf
-            try:
-                rel_path = obj_dir.relative_to(source_path)
-            except ValueError:
-                continue
-            
-            # Destination file path
-            out_file = dest_path / rel_path
-            
-            # 增量判断：如果目标文件已存在，则直接跳过
-            if out_file.exists():
-                print(f"[Skip] {rel_path} (Already exists)")
-                count_skipped += 1
-                continue
+    print(f"Restoring to {dest_path} with {workers} workers (manifest: {manifest_path})...")
 
-            # Ensure parent directory exists
-            out_file.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 1. Check for part.1 in subdirectories (Standard large file)
-            parts = list(obj_dir.rglob("part.*"))
-            if parts:
-                # Sort parts just in case (though typically just part.1)
-                parts.sort(key=lambda p: p.name)
-                
-                print(f"[Restore] {rel_path} (from {len(parts)} parts)")
-                try:
-                    with open(out_file, "wb") as f_out:
-                        for i, p in enumerate(parts):
-                            with open(p, "rb") as f_in:
-                                if i == 0:
-                                    # Check for 32-byte header in the first chunk
-                                    # Read a bit more than 32 bytes to check signatures
-                                    chunk_size = 1024
-                                    first_chunk = f_in.read(chunk_size)
-                                    
-                                    stripped_chunk = strip_minio_header(first_chunk)
-                                    f_out.write(stripped_chunk)
-                                    
-                                    # Copy the rest of the file
-                                    shutil.copyfileobj(f_in, f_out)
-                                else:
-                                    shutil.copyfileobj(f_in, f_out)
-                    count_restored += 1
-                except Exception as e:
-                    print(f"  [Error] Failed to join parts for {rel_path}: {e}")
-                    traceback.print_exc()
-                    pdb.set_trace()
-            
-            else:
-                # 2. Inline data
-                if HAS_MSGPACK:
-                    try:
-                        with open(obj_dir / "xl.meta", "rb") as f:
-                            meta_bytes = f.read()
-                            if meta_bytes.startswith(b"XL2 "):
-                                try:
-                                    unpacker = msgpack.Unpacker(None, max_buffer_size=10*1024*1024)
-                                    unpacker.feed(meta_bytes[8:]) 
-                                    xl_meta = None
-                                    fallback_data = None
-                                    
-                                    # Iterate through all objects in the msgpack stream
-                                    for i, obj in enumerate(unpacker):
-                                        if isinstance(obj, dict):
-                                            if 'Versions' in obj:
-                                                xl_meta = obj
-                                                break
-                                            elif 'MetaSys' in obj:
-                                                # Some versions might have a different structure
-                                                xl_meta = obj # Potential candidate
-                                            else:
-                                                # Check for fallback data in values (e.g. {None: bytes})
-                                                for k, v in obj.items():
-                                                    if isinstance(v, bytes) and len(v) > 100:
-                                                        # Heuristic: file content is usually large
-                                                        if fallback_data is None or len(v) > len(fallback_data):
-                                                            fallback_data = v
-                                        elif isinstance(obj, bytes) and len(obj) > 100:
-                                            # Also check top-level bytes objects
-                                            if fallback_data is None or len(obj) > len(fallback_data):
-                                                fallback_data = obj
-                                    
-                                    if xl_meta:
-                                        versions = xl_meta.get('Versions', [])
-                                        for v in versions:
-                                            if v.get('Type') == 1: # Object
-                                                meta_sys = v.get('MetaSys', {})
-                                                is_inline = False
-                                                for k, val in meta_sys.items():
-                                                    k_str = k.decode('utf-8') if isinstance(k, bytes) else k
-                                                    if k_str == 'x-minio-internal-inline-data':
-                                                        if val == True or val == b'true':
-                                                            is_inline = True
-                                                
-                                                if is_inline:
-                                                    data = v.get('Data')
-                                                    if data:
-                                                        print(f"[Restore] {rel_path} (Inline)")
-                                                        data = strip_minio_header(data)
-                                                        with open(out_file, "wb") as f_out:
-                                                            f_out.write(data)
-                                                        count_restored += 1
-                                                    else:
-                                                        print(f"  [Warn] {rel_path} marked inline but no Data found.")
-                                    elif fallback_data:
-                                        print(f"[Restore] {rel_path} (Fallback extraction)")
-                                        fallback_data = strip_minio_header(fallback_data)
-                                        with open(out_file, "wb") as f_out:
-                                            f_out.write(fallback_data)
-                                        count_restored += 1
-                                    else:
-                                        print(f"  [Warn] {rel_path} no Versions or valid inline data found.")
-                                    
-                                except Exception as e:
-                                    print(f"  [Error] Failed to unpack msgpack for {rel_path}: {e}")
-                                    traceback.print_exc()
-                                    pdb.set_trace()
-                            else:
-                                print(f"  [Skip] {rel_path}/xl.meta does not start with XL2")
-
-                    except Exception as e:
-                        print(f"  [Error] Processing {rel_path}: {e}")
-                        traceback.print_exc()
-                        pdb.set_trace()
-                else:
-                    print(f"  [Skip] {rel_path} (Inline data suspected, but msgpack not installed)")
-                    count_skipped += 1
-    
+    stats = {"restored": 0, "skipped": 0, "failed": 0, "bytes": 0}
+    start = time.time()
+    lock = threading.Lock()
+    mf = open(manifest_path, "a", encoding="utf-8")
+
+    def _record(entry):
+        with lock:
+            mf.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            mf.flush()
+
+    def _job(obj_dir: Path, rel: str, out_file: Path):
+        try:
+            res = restore_object(obj_dir, out_file)
+        except Exception as e:
+            return {"object": rel, "status": "failed", "error": str(e)}
+        res.update({"object": rel, "path": str(out_file), "ts": int(time.time())})
+        return res
+
+    def _collect(fut):
+        res = fut.result()
+        if res["status"] == "failed":
+            stats["failed"] += 1
+            print(f"  [Error] {res['object']}: {res['error']}")
+            return
+        stats["restored"] += 1
+        stats["bytes"] += res["size"]
+        _record(res)
+        print(f"[Restore] {res['object']} ({res['mode']}, {res['size']} bytes)")
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            inflight = set()
+            for obj_dir in _iter_objects(source_path):
+                rel = obj_dir.relative_to(source_path).as_posix()
+                out_file = dest_path / rel
+                prev = done.get(rel)
+                if prev and out_file.exists() and out_file.stat().st_size == prev.get("size"):
+                    stats["skipped"] += 1
+                    continue
+                if not prev and out_file.exists():
+                    # 增量判断：已存在但不在清单中的文件（旧版本恢复结果），补记清单后跳过
+                    _record({"object": rel, "path": str(out_file), "size": out_file.stat().st_size,
+                             "sha256": None, "mode": "existing", "status": "existing", "ts": int(time.time())})
+                    stats["skipped"] += 1
+                    continue
+                while len(inflight) >= workers * 4:
+                    finished, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                    for f in finished:
+                        _collect(f)
+                inflight.add(ex.submit(_job, obj_dir, rel, out_file))
+            for f in list(inflight):
+                _collect(f)
+    finally:
+        mf.close()
+
+    elapsed = max(time.time() - start, 0.001)
     print("-" * 40)
-    print(f"Restored: {count_restored}")
-    if count_skipped > 0:
-        print(f"Skipped: {count_skipped} (Already exists or missing 'msgpack')")
+    print(f"Restored: {stats['restored']} ({stats['bytes'] / 1024 / 1024:.1f} MB, {stats['bytes'] / 1024 / 1024 / elapsed:.1f} MB/s)")
+    print(f"Skipped: {stats['skipped']} (already restored)")
+    if stats["failed"]:
+        print(f"Failed: {stats['failed']}")
     print(f"Output Directory: {dest_path}")
+    return stats
 
 if __name__ == "__main__":
     if len(sys.argv) >= 2:
@@ -295,12 +376,11 @@ if __name__ == "__main__":
             sys.exit(0)
 
     # Restore mode
-    SRC = "source/file/caitou"
-    DST = "source/files/caitou"
-    
-    if len(sys.argv) >= 2:
-        SRC = sys.argv[1]
-    if len(sys.argv) >= 3:
-        DST = sys.argv[2]
-        
-    restore_minio_files(SRC, DST)
+    parser = argparse.ArgumentParser(description="Restore files from a MinIO data directory")
+    parser.add_argument("src", nargs="?", default="source/file/caitou")
+    parser.add_argument("dst", nargs="?", default="source/files/caitou")
+    parser.add_argument("--workers", type=int, default=RESTORE_WORKERS)
+    parser.add_argument("--manifest", default=None, help="manifest path (default: <dst>/.restore_manifest.jsonl)")
+    args = parser.parse_args()
+
+    restore_minio_files(args.src, args.dst, workers=args.workers, manifest=args.manifest)
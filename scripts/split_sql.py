@@ -1,11 +1,32 @@
-
 import os
-import re
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from sql_stream import CHUNK_SIZE, iter_sql_pieces, statement_shards
+
+# Manifest written next to the dump; backend/sql_shards.py reads the same name.
+MANIFEST_SUFFIX = ".shards.json"
+SHARD_MB = 64
+COPY_WORKERS = 4
+
+
+def _read_chunks(f, size: int = CHUNK_SIZE):
+    while True:
+        b = f.read(size)
+        if not b:
+            return
+        yield b
+
 
 def split_sql_file(in_path: str, base_out_path: str, sql_size: int):
     """
     Reads a SQL file and splits it into multiple files, each containing `sql_size` INSERT statements.
-    
+
+    Statements are found with the quote-aware scanner in sql_stream.py, so multi-line INSERTs and
+    ';' / "INSERT" inside string values are handled. Parts are written as the input is streamed.
+
     Args:
         in_path: Path to the input SQL file.
         base_out_path: Base path for output files. Suffixes will be added (e.g., _part1.sql, _part2.sql).
@@ -18,65 +39,125 @@ def split_sql_file(in_path: str, base_out_path: str, sql_size: int):
     # Prepare output filename pattern
     # If base_out_path is "data.sql", output will be "data_part1.sql", "data_part2.sql", etc.
     root, ext = os.path.splitext(base_out_path)
-    
+
     current_part = 1
     current_count = 0
-    current_lines = []
-    
-    # Simple regex to identify the start of an INSERT statement
-    # Assumes standard SQL formatting where INSERT starts a new logical command
-    # NOTE: This regex might need adjustment if INSERT is not at the start of a line or if there are comments
-    # But for standard dumps, it usually works. 
-    # To be more robust, we can just count lines starting with INSERT.
-    insert_pattern = re.compile(r"^\s*INSERT\s+INTO", re.IGNORECASE)
+    f_out = None
+
+    def _open_part():
+        return open(f"{root}_part{current_part}{ext}", 'wb')
 
     try:
-        with open(in_path, 'r', encoding='utf-8') as f_in:
-            for line in f_in:
-                # Check if this line starts a new INSERT statement
-                if insert_pattern.match(line):
-                    # If we reached the limit, write the current batch to a file
-                    if current_count >= sql_size:
-                        out_file = f"{root}_part{current_part}{ext}"
-                        with open(out_file, 'w', encoding='utf-8') as f_out:
-                            f_out.writelines(current_lines)
-                        print(f"Created: {out_file} (Statements: {current_count})")
-                        
-                        # Reset for next part
-                        current_part += 1
-                        current_count = 0
-                        current_lines = []
-                    
+        with open(in_path, 'rb') as f_in:
+            for is_stmt, piece in iter_sql_pieces(_read_chunks(f_in)):
+                if is_stmt and current_count >= sql_size:
+                    f_out.close()
+                    print(f"Created: {f_out.name} (Statements: {current_count})")
+                    current_part += 1
+                    current_count = 0
+                    f_out = None
+                if f_out is None:
+                    f_out = _open_part()
+                f_out.write(piece)
+                if is_stmt:
                     current_count += 1
-                
-                current_lines.append(line)
-            
-            # Write any remaining lines
-            if current_lines:
-                out_file = f"{root}_part{current_part}{ext}"
-                with open(out_file, 'w', encoding='utf-8') as f_out:
-                    f_out.writelines(current_lines)
-                print(f"Created: {out_file} (Statements: {current_count})")
+        if f_out is not None:
+            f_out.close()
+            print(f"Created: {f_out.name} (Statements: {current_count})")
 
     except Exception as e:
+        if f_out is not None:
+            f_out.close()
         print(f"An error occurred: {e}")
 
+
+def _copy_range(in_path: str, out_path: str, start: int, end: int):
+    with open(in_path, 'rb') as src, open(out_path, 'wb') as dst:
+        src.seek(start)
+        left = end - start
+        while left > 0:
+            b = src.read(min(CHUNK_SIZE, left))
+            if not b:
+                break
+            dst.write(b)
+            left -= len(b)
+
+
+def write_shard_manifest(in_path: str, shards: int = 0, shard_mb: float = SHARD_MB,
+                         write_parts: bool = False, workers: int = COPY_WORKERS) -> dict:
+    """
+    Shard a dump into statement-aligned byte ranges and write <dump>.shards.json:
+      {"version": 1, "source", "size", "mtime_ns", "created_at",
+       "shards": [{"index", "start", "end", "statements", ["path"]}]}
+    shards > 0 asks for that many ranges, otherwise ranges are about shard_mb MiB.
+    write_parts also copies every range to <root>_shardNNNN<ext> (in parallel).
+    """
+    st = os.stat(in_path)
+    if shards and shards > 0:
+        ranges = statement_shards(in_path, parts=shards)
+    else:
+        ranges = statement_shards(in_path, shard_bytes=int(shard_mb * 1024 * 1024))
+
+    if write_parts:
+        root, ext = os.path.splitext(in_path)
+        for r in ranges:
+            r["path"] = os.path.basename(f"{root}_shard{r['index']:04d}{ext}")
+        base = os.path.dirname(os.path.abspath(in_path))
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+            list(ex.map(lambda r: _copy_range(in_path, os.path.join(base, r["path"]), r["start"], r["end"]), ranges))
+
+    manifest = {
+        "version": 1,
+        "source": os.path.basename(in_path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "created_at": int(time.time()),
+        "shards": ranges,
+    }
+    out = in_path + MANIFEST_SUFFIX
+    tmp = out + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, out)
+    return manifest
+
+
 def main():
     base = os.path.dirname(os.path.abspath(__file__))
-    
+
     # Configuration
     in_file = 'entity_processed.sql'  # Change this to your input file name
-    in_path = os.path.join(base, in_file)
-    
-    # Output base name (will become entity_processed_part1.sql, etc.)
-    out_path = os.path.join(base, in_file)
-    
-    # Number of INSERT statements per file
+
+    # Number of INSERT statements per file (legacy --statements mode)
     sql_size = 2000
 
-    print(f"Splitting '{in_path}' into chunks of {sql_size} statements...")
-    split_sql_file(in_path, out_path, sql_size)
-    print("Done.")
+    ap = argparse.ArgumentParser(description="Split a SQL dump on statement boundaries.")
+    ap.add_argument("in_file", nargs="?", default=in_file)
+    ap.add_argument("--statements", type=int, default=0,
+                    help=f"write _partN files of N INSERT statements each (e.g. {sql_size})")
+    ap.add_argument("--shards", type=int, default=0, help="number of byte-range shards for the manifest")
+    ap.add_argument("--shard-mb", type=float, default=SHARD_MB, help="target shard size when --shards is not given")
+    ap.add_argument("--write-parts", action="store_true", help="also copy each shard to its own file")
+    args = ap.parse_args()
+
+    in_path = args.in_file if os.path.isabs(args.in_file) else os.path.join(base, args.in_file)
+    if not os.path.exists(in_path):
+        print(f"Error: Input file '{in_path}' not found.")
+        return
+
+    if args.statements > 0:
+        # Output base name (will become entity_processed_part1.sql, etc.)
+        print(f"Splitting '{in_path}' into chunks of {args.statements} statements...")
+        split_sql_file(in_path, in_path, args.statements)
+        print("Done.")
+        return
+
+    t0 = time.time()
+    m = write_shard_manifest(in_path, shards=args.shards, shard_mb=args.shard_mb, write_parts=args.write_parts)
+    total = sum(s["statements"] for s in m["shards"])
+    print(f"Sharded '{in_path}': {len(m['shards'])} shards, {total} statements, "
+          f"{time.time() - t0:.1f}s -> {in_path + MANIFEST_SUFFIX}")
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,305 @@
+"""
+Streaming statement-rewrite engine shared by file_process.py and remove_fieldv2.py.
+
+The input is read in chunks. INSERT statements are located with the same rules as
+find_stmt_end: a statement starts at "INSERT INTO" and ends at the first ';' outside
+single quotes, where '' is an escaped quote. Each statement is passed to a transform
+and the result is written out immediately. Text between statements is copied as-is.
+Memory use is bounded by the chunk size plus the largest single statement, and every
+input character is scanned once.
+
+Multi-process mode cuts the file at statement ends. Each byte range is rewritten in its
+own process and the partial outputs are concatenated in order.
+"""
+import codecs
+import io
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AnyStr, Callable, Dict, Iterable, Iterator, List, Tuple
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+_PATTERNS: Dict[type, Tuple[Any, Any, Any, Any, Any]] = {}
+
+
+def _patterns(kind: type):
+    p = _PATTERNS.get(kind)
+    if p is None:
+        insert = r"(?is)INSERT\s+INTO\s+"
+        # a suffix of the buffer that could still grow into a full "INSERT INTO " match
+        partial = r"(?is)I(?:N(?:S(?:E(?:R(?:T(?:\s+(?:I(?:N(?:T(?:O\s*)?)?)?)?)?)?)?)?)?)?\Z"
+        quote_or_semi = r"[';]"
+        if kind is bytes:
+            p = (re.compile(insert.encode()), re.compile(partial.encode()), re.compile(quote_or_semi.encode()), b"'", b";")
+        else:
+            p = (re.compile(insert), re.compile(partial), re.compile(quote_or_semi), "'", ";")
+        _PATTERNS[kind] = p
+    return p
+
+
+def iter_sql_pieces(chunks: Iterable[AnyStr]) -> Iterator[Tuple[bool, AnyStr]]:
+    """
+    Split a stream of str (or bytes) chunks into (is_statement, piece) tuples.
+    Pieces cover the input exactly and in order. A trailing unterminated INSERT is
+    yielded as a statement, as process_file did with find_stmt_end() == -1.
+    """
+    it = iter(chunks)
+    first = next(it, None)
+    if first is None:
+        return
+    kind = type(first)
+    insert_re, partial_re, qs_re, QUOTE, SEMI = _patterns(kind)
+    empty = first[:0]
+
+    in_stmt = False
+    in_sq = False
+    stmt_parts: List[AnyStr] = []
+    carry = empty
+    pending = first
+    eof = False
+    while True:
+        s = carry + pending if carry else pending
+        carry = empty
+        n = len(s)
+        i = 0
+        start = 0
+        while True:
+            if not in_stmt:
+                m = insert_re.search(s, i)
+                if m:
+                    if m.start() > i:
+                        yield False, s[i:m.start()]
+                    in_stmt, in_sq = True, False
+                    start = i = m.start()
+                    continue
+                if eof:
+                    if i < n:
+                        yield False, s[i:]
+                    return
+                pm = partial_re.search(s, i)
+                p = pm.start() if pm else n
+                if p > i:
+                    yield False, s[i:p]
+                carry = s[p:]
+                break
+            # inside a statement: look for ';' outside single quotes
+            if not in_sq:
+                m = qs_re.search(s, i)
+                if m is None:
+                    i = n
+                elif s[m.start():m.start() + 1] == SEMI:
+                    end = m.start() + 1
+                    stmt_parts.append(s[start:end])
+                    yield True, empty.join(stmt_parts)
+                    stmt_parts = []
+                    in_stmt = False
+                    i = end
+                    continue
+                else:
+                    in_sq = True
+                    i = m.start() + 1
+                    continue
+            else:
+                j = s.find(QUOTE, i)
+                if j < 0:
+                    i = n
+                elif j + 1 < n:
+                    if s[j + 1:j + 2] == QUOTE:
+                        i = j + 2
+                    else:
+                        in_sq = False
+                        i = j + 1
+                    continue
+                elif eof:
+                    in_sq = False
+                    i = j + 1
+                    continue
+                else:
+                    # quote is the last character: need the next chunk to tell '' from a closing quote
+                    i = j
+            if eof:
+                stmt_parts.append(s[start:])
+                yield True, empty.join(stmt_parts)
+                return
+            stmt_parts.append(s[start:i])
+            carry = s[i:]
+            break
+        nxt = next(it, None)
+        if nxt is None:
+            eof = True
+            pending = empty
+        else:
+            pending = nxt
+
+
+class CollapseBackslashes:
+    """Writer filter equivalent to out.replace('\\\\\\\\', '\\\\') on the whole output, applied piecewise."""
+
+    def __init__(self, write: Callable[[str], Any]):
+        self._write = write
+        self._tail = ""
+
+    def write(self, s: str):
+        s = self._tail + s
+        k = len(s) - len(s.rstrip("\\"))
+        # keep a trailing backslash run back: it may continue in the next piece
+        self._tail = s[len(s) - k:] if k else ""
+        body = s[:len(s) - k] if k else s
+        if body:
+            self._write(body.replace("\\\\", "\\"))
+
+    def flush(self):
+        if self._tail:
+            self._write(self._tail.replace("\\\\", "\\"))
+            self._tail = ""
+
+
+def rewrite_stream(chunks: Iterable[str], transform: Callable[[str], str], write: Callable[[str], Any]) -> int:
+    """Rewrite every INSERT statement with transform, copying other text; returns the statement count."""
+    count = 0
+    for is_stmt, piece in iter_sql_pieces(chunks):
+        if is_stmt:
+            write(transform(piece))
+            count += 1
+        else:
+            write(piece)
+    return count
+
+
+def _read_chunks(f, size: int) -> Iterator[Any]:
+    while True:
+        b = f.read(size)
+        if not b:
+            return
+        yield b
+
+
+def statement_cut_points(in_path: str, parts: int, chunk_size: int = CHUNK_SIZE) -> List[int]:
+    """
+    Byte offsets that split the file into about `parts` ranges, each cut right after a
+    statement's ';'. The scan runs on bytes: the delimiters are ASCII, so the cut points
+    match the text-mode parse, and each cut falls on a UTF-8 character boundary.
+    """
+    total = os.path.getsize(in_path)
+    if parts <= 1 or total == 0:
+        return [0, total]
+    targets = [total * k // parts for k in range(1, parts)]
+    cuts = [0]
+    pos = 0
+    with open(in_path, "rb") as f:
+        for is_stmt, piece in iter_sql_pieces(_read_chunks(f, chunk_size)):
+            pos += len(piece)
+            if is_stmt and targets and pos >= targets[0] and pos < total:
+                cuts.append(pos)
+                while targets and targets[0] <= pos:
+                    targets.pop(0)
+                if not targets:
+                    break
+    cuts.append(total)
+    return cuts
+
+
+def statement_shards(in_path: str, parts: int = 1, shard_bytes: int = 0,
+                     chunk_size: int = CHUNK_SIZE) -> List[Dict[str, int]]:
+    """
+    One scan over the file: statement-aligned byte ranges of about shard_bytes each
+    (or total / parts when shard_bytes is 0), with the statement count of each range.
+    Returns [{"index", "start", "end", "statements"}] covering the whole file.
+    """
+    total = os.path.getsize(in_path)
+    if shard_bytes <= 0:
+        shard_bytes = max(1, -(-total // max(1, int(parts or 1))))
+    shards: List[Dict[str, int]] = []
+    start = pos = count = 0
+    next_cut = shard_bytes
+    with open(in_path, "rb") as f:
+        for is_stmt, piece in iter_sql_pieces(_read_chunks(f, chunk_size)):
+            pos += len(piece)
+            if not is_stmt:
+                continue
+            count += 1
+            if pos >= next_cut and pos < total:
+                shards.append({"index": len(shards), "start": start, "end": pos, "statements": count})
+                start, count = pos, 0
+                next_cut = pos + shard_bytes
+    if total > start or not shards:
+        shards.append({"index": len(shards), "start": start, "end": total, "statements": count})
+    return shards
+
+
+def _decoded_range(in_path: str, start: int, end: int, encoding: str, chunk_size: int) -> Iterator[str]:
+    """Decode bytes [start, end) the way text-mode open() would (universal newlines)."""
+    dec = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+    with open(in_path, "rb") as f:
+        f.seek(start)
+        left = end - start
+        while left > 0:
+            b = f.read(min(chunk_size, left))
+            if not b:
+                break
+            left -= len(b)
+            s = dec.decode(b, final=left <= 0)
+            if s:
+                yield s
+        tail = dec.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+def _rewrite_range(args) -> int:
+    in_path, out_part, start, end, transform, collapse_backslashes, encoding, chunk_size = args
+    with open(out_part, "w", encoding=encoding) as out:
+        w = CollapseBackslashes(out.write) if collapse_backslashes else None
+        n = rewrite_stream(_decoded_range(in_path, start, end, encoding, chunk_size), transform,
+                           w.write if w else out.write)
+        if w:
+            w.flush()
+    return n
+
+
+def rewrite_file(in_path: str, out_path: str, transform: Callable[[str], str], workers: int = 1,
+                 collapse_backslashes: bool = False, encoding: str = "utf-8",
+                 chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Stream in_path through transform into out_path.
+    workers > 1 uses a process pool over statement-aligned byte ranges; the transform must be
+    picklable (a module-level function or a functools.partial of one).
+    Returns {"statements", "bytes_in", "bytes_out", "elapsed", "workers"}.
+    """
+    t0 = time.time()
+    workers = max(1, int(workers or 1))
+    if workers == 1:
+        with open(in_path, "r", encoding=encoding) as f, open(out_path, "w", encoding=encoding) as out:
+            w = CollapseBackslashes(out.write) if collapse_backslashes else None
+            n = rewrite_stream(_read_chunks(f, chunk_size), transform, w.write if w else out.write)
+            if w:
+                w.flush()
+    else:
+        cuts = statement_cut_points(in_path, workers, chunk_size)
+        ranges = [(cuts[k], cuts[k + 1]) for k in range(len(cuts) - 1) if cuts[k + 1] > cuts[k]]
+        part_paths = [f"{out_path}.part{k}" for k in range(len(ranges))]
+        jobs = [(in_path, part_paths[k], a, b, transform, collapse_backslashes, encoding, chunk_size)
+                for k, (a, b) in enumerate(ranges)]
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, max(1, len(jobs)))) as ex:
+                n = sum(ex.map(_rewrite_range, jobs))
+            with open(out_path, "wb") as out:
+                for pp in part_paths:
+                    with open(pp, "rb") as f:
+                        shutil.copyfileobj(f, out, chunk_size)
+        finally:
+            for pp in part_paths:
+                try:
+                    os.remove(pp)
+                except OSError:
+                    pass
+    return {
+        "statements": n,
+        "bytes_in": os.path.getsize(in_path),
+        "bytes_out": os.path.getsize(out_path),
+        "elapsed": time.time() - t0,
+        "workers": workers,
+    }
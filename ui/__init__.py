@@ -0,0 +1,6 @@
+# ui/__init__.py
+# -*- coding: utf-8 -*-
+"""
+Streamlit 页面模块：app.py 只保留页面配置、一次性初始化、侧边栏与路由，
+各页面按 ?page= 在首次访问时才导入（之后由 sys.modules 复用，重跑不再重新定义页面函数）。
+"""
@@ -0,0 +1,258 @@
+# ui/common.py
+# -*- coding: utf-8 -*-
+"""
+页面共用的小工具：顶部导航、本地 SQL 行读取、字段补种、用户/部门目录、进度条订阅者、附件拷贝设置等。
+"""
+import re
+
+import streamlit as st
+
+from backend.db import get_field_mappings, upsert_field_mapping
+from backend.source_fields import detect_source_fields, detect_sql_path
+from backend.blob_copy import copy_stats, fmt_bytes
+from backend.progress import progress_text
+
+
+try:
+    from version3 import SID, uuid as gen_uuid10
+except Exception:
+    SID = "default_sid"
+    import time, random, os
+    def gen_uuid10():
+        t = int(time.time()) % 1000
+        us = int(time.time() * 1e6) % 100
+        pid = os.getpid() % 100
+        rnd = random.randint(0, 46655)
+        n = (t << 24) | (us << 16) | (pid << 8) | (rnd & 0xFF)
+        chars = "0123456789abcdefghijklmnopqrstuvwxyz"
+        s = ""; x = n
+        while x:
+            x, r = divmod(x, 36)
+            s = chars[r] + s
+        s = (s or "0") + "".join(chars[random.randint(0,35)] for _ in range(3))
+        return s[-10:].rjust(10, "0")
+
+# ================= 工具函数 =================
+
+def render_top_tabs(active: str):
+    tabs = [
+        ("home", "🏠主页"),
+        ("mapped", "🧩 映射结果管理"),
+        ("multi_mapping", "🧩 多映射管理中心"),
+        ("flow", "🧰 流程管理"),
+        ("user_dept", "👥 用户部门管理"),
+        ("file", "📃 文件管理"),
+    ]
+    st.markdown(
+        """
+        <style>
+        .top-tabs { display:flex; gap:8px; flex-wrap: wrap; margin:8px 0 14px; }
+        .top-tabs a { font-size:15px; padding:8px 14px; line-height:1.3; border-radius:8px; border:1px solid #d0d0d0; background:#f7f7f7; text-decoration:none; color:#222; }
+        .top-tabs a.active { background:#264653; color:#fff; border-color:#264653; }
+        </style>
+        """,
+        unsafe_allow_html=True,
+    )
+    html = ["<div class='top-tabs'>"]
+    for key, label in tabs:
+        is_active = (key == (active or "")) or (key == "home" and (active or "") in ("list", "home"))
+        cls = "active" if is_active else ""
+        target_page = "home" if key == "home" else key
+        html.append(f"<a class='{cls}' href='?page={target_page}'>{label}</a>")
+    html.append("</div>")
+    st.markdown("".join(html), unsafe_allow_html=True)
+
+# 读取本地 SQL 文件的 INSERT 行
+def _read_sql_rows(table: str):
+    """读取源表全部行（源库或本地 dump），经 source_store 进程级缓存；返回的行勿原地修改"""
+    from backend import source_store
+    if st.session_state.get("source_input_kind") == "db":
+        try:
+            return list(source_store.db_rows(table, source_store.source_conn_key(st.session_state.source_db_cfg)))
+        except Exception as e:
+            st.error(f"源库连接失败：{e}")
+            return []
+    p = detect_sql_path(table)
+    if not p.exists():
+        return []
+    return list(source_store.file_rows(p, table))
+
+# 选择字段列用于展示
+def _pick_cols(rows, cols):
+    return [{k: r.get(k, "") for k in cols} for r in rows]
+
+def _st_progress_sink(bar, label: str, lo: float = 0.0, hi: float = 1.0, text_el=None):
+    """Progress 订阅者：把采样快照画到 st.progress 的 lo~hi 区段；给了 text_el 时文字写到该占位"""
+    def _sink(snap):
+        pct = min(1.0, max(0.0, lo + (hi - lo) * float(snap.get("pct") or 0.0)))
+        if text_el is None:
+            bar.progress(pct, text=progress_text(snap, label))
+        else:
+            bar.progress(pct)
+            text_el.write(progress_text(snap, label))
+    return _sink
+
+# function _ensure_all_fields_seeded(table_name: str, target_entity: str)
+def _ensure_all_fields_seeded(table_name: str, target_entity: str):
+    """
+    仅在首次访问某表-实体组合时执行一次字段初始化。
+    - 按 (table_name, target_entity) 维度初始化
+    - 已存在映射的字段不会被覆盖
+    """
+    cache_key = f"seeded_{table_name}_{target_entity or ''}"
+    if st.session_state.get(cache_key):
+        return
+
+    # 按当前实体读取已存在的字段映射
+    existing_mappings = get_field_mappings(table_name, target_entity or None)
+    existing_fields = {m["source_field"] for m in existing_mappings}
+
+    # 从源 SQL 检测字段
+    src_fields = detect_source_fields(table_name)
+
+    # 仅为该实体缺失的字段做 upsert，target_paths 默认 data.<同名>
+    for f in src_fields:
+        if f not in existing_fields:
+            upsert_field_mapping(table_name, f, f"data.{f}", "", 1, 0, target_entity or "")
+
+    st.session_state[cache_key] = True
+
+
+def _parse_nth_insert(table_name: str, index: int = 0):
+    p = detect_sql_path(table_name)
+    if not p.exists():
+        return None
+    txt = p.read_text(encoding="utf-8", errors="ignore")
+    inserts = list(re.finditer(
+        r"insert\s+into\s+public\.\"?(?P<table>[\w\u4e00-\u9fa5]+)\"?"
+        r"\s*\((?P<cols>[^)]*)\)\s*values\s*\((?P<vals>[\s\S]*?)\)\s*;",
+        txt, re.IGNORECASE
+    ))
+    if not inserts or index >= len(inserts):
+        return None
+    m = inserts[index]
+    cols = [c.strip().strip('"') for c in m.group("cols").split(",")]
+    raw = m.group("vals")
+    out, buf, in_str, i = [], [], False, 0
+    while i < len(raw):
+        ch = raw[i]
+        if in_str:
+            if ch == "'":
+                if i + 1 < len(raw) and raw[i + 1] == "'":
+                    buf.append("'"); i += 2
+                else:
+                    in_str = False; i += 1
+            else:
+                buf.append(ch); i += 1
+        else:
+            if ch == "'": in_str = True; i += 1
+            elif ch == ",": out.append("".join(buf).strip()); buf = []; i += 1
+            else: buf.append(ch); i += 1
+    out.append("".join(buf).strip())
+    # 转换值并返回 dict
+    def _convert(v: str):
+        s = (v or "").strip()
+        if s.lower() in ("null", "none"):
+            return ""
+        # 尝试数字
+        try:
+            if s.startswith("-") or s.isdigit():
+                return int(s)
+        except Exception:
+            pass
+        try:
+            if "." in s:
+                return float(s)
+        except Exception:
+            pass
+        return s
+    vals = [_convert(x) for x in out]
+    if len(cols) != len(vals):
+        return None
+    return dict(zip(cols, vals))
+
+
+def _parse_all_inserts(table_name: str):
+    """与 _read_sql_rows 共用解析缓存；本地 dump 的值做 int/float 数值化"""
+    if st.session_state.get("source_input_kind") == "db":
+        rows = _read_sql_rows(table_name)
+        return rows
+    p = detect_sql_path(table_name)
+    if not p.exists():
+        return []
+    from backend import source_store
+    return list(source_store.typed_file_rows(p, table_name))
+
+
+def _user_directory():
+    """当前源的用户/部门目录快照（sys_user/sys_dept 变化时自动重建）"""
+    from backend.user_directory import directory
+    from backend.source_store import source_conn_key
+    if st.session_state.get("source_input_kind") == "db":
+        return directory("db", source_conn_key(st.session_state.source_db_cfg))
+    return directory("file", "")
+
+def _user_dept_maps():
+    d = _user_directory()
+    return d["users"], d["depts"]
+
+def _enrich_nodes_with_user(nodes):
+    d = _user_directory()
+    umap, dmap, name_map = d["users"], d["depts"], d["users_by_name"]
+    out = []
+    for nd in nodes:
+        t = nd.get("task") or {}
+        assignee_id = str((t.get("assignee_") or nd.get("assignee") or "")).strip()
+        info = umap.get(assignee_id)
+        if not info and assignee_id:
+            info = name_map.get(assignee_id)
+        if info:
+            nd["assignee_val"] = info.get("name","")
+            dep = dmap.get(info.get("dept_id",""), "")
+            if not dep and info.get("name"):
+                aux = name_map.get(info.get("name",""))
+                dep = dmap.get((aux or {}).get("dept_id",""), "") or dep
+            nd["dept"] = dep
+        out.append(nd)
+    return out
+
+def _guess_table_display_name(table_name: str) -> str:
+    """从 DDL/注释猜测中文名称：匹配 -- 名称: xxx 或 /* name: xxx */，否则返回源表名"""
+    p = detect_sql_path(table_name)
+    if not p.exists():
+        return table_name
+    txt = p.read_text(encoding="utf-8", errors="ignore")
+    m = re.search(r"--\s*(?:名称|name)\s*[:：]\s*([^\r\n]+)", txt, re.I)
+    if m:
+        return m.group(1).strip()
+    m = re.search(r"/\*\s*(?:名称|name)\s*[:：]\s*([^\*]+)\*/", txt, re.I)
+    if m:
+        return m.group(1).strip()
+    # 退化：看 create table 的注释行
+    m = re.search(r"comment\s+on\s+table\s+[\w\.\"']+\s+is\s+'([^']+)'", txt, re.I)
+    if m:
+        return m.group(1).strip()
+    return table_name
+
+# ================= 附件拷贝（按内容去重） =================
+_COPY_MODE_LABEL = {"auto": "去重（reflink/硬链接）", "copy": "完整拷贝"}
+
+def _copy_mode_selector(key: str) -> str:
+    """
+    附件拷贝方式（按会话保存在 st.session_state[key]，不改进程级 blob_copy.COPY_MODE）；
+    调用方在主线程读取后经 dedup_copy(mode=...) 传给拷贝线程。
+    """
+    from backend import blob_copy
+    modes = list(_COPY_MODE_LABEL.keys())
+    cur = blob_copy.COPY_MODE if blob_copy.COPY_MODE in modes else "auto"
+    return st.selectbox("附件拷贝方式", options=modes, index=modes.index(cur),
+                        format_func=lambda m: _COPY_MODE_LABEL.get(m, m), key=key)
+
+def _render_copy_stats():
+    cs = copy_stats()
+    if not cs.get("files"):
+        return
+    st.caption(
+        f"附件 {cs['files']} 个：拷贝 {cs['copied']}，硬链接 {cs['linked']}，reflink {cs['reflinked']}，已存在 {cs['existing']}；"
+        f"实际写入 {fmt_bytes(cs['bytes_written'])}，节省 {fmt_bytes(cs['bytes_saved'])}"
+    )
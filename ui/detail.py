@@ -0,0 +1,554 @@
+# ui/detail.py
+# -*- coding: utf-8 -*-
+"""
+单表配置页：表配置、表级脚本、字段映射编辑、模拟打印与字段专注模式。
+"""
+import json
+
+import streamlit as st
+
+from backend.db import (
+    delete_field_mapping, get_field_mappings, get_priority, get_table_script, get_target_entity,
+    list_tables, rename_table_target_entity, save_table_mapping, save_table_script,
+    update_field_mapping, update_many_field_mappings, upsert_field_mapping
+)
+from backend.source_fields import detect_field_comments
+from backend.mapper_core import _extract_entity_meta, apply_record_mapping, clear_sql_cache
+from ui.common import SID, _ensure_all_fields_seeded
+
+
+def render_table_detail(table_name: str):
+    comment_map = detect_field_comments(table_name)
+    st.title(f"表配置：{table_name}")
+
+    # 浮动导航（详情页快速跳转）
+    st.markdown(
+        """
+        <style>
+        .fixed-nav { position: fixed; top: 100px; right: 24px; background: rgba(30,30,30,0.9); color:#fff; padding: 10px 12px; border-radius: 10px; box-shadow: 0 4px 12px rgba(0,0,0,0.15); z-index: 9999; font-size: 13px; }
+        .fixed-nav .title { font-weight: 600; margin-bottom: 8px; }
+        .fixed-nav a { display:block; color:#fff; text-decoration: none; padding: 4px 0; }
+        .fixed-nav a:hover { text-decoration: underline; }
+        </style>
+        <div class="fixed-nav">
+          <div class="title">🔎 快速导航</div>
+          <a href="#sec-config">表配置</a>
+          <a href="#sec-script">表级脚本</a>
+          <a href="#sec-mapping">字段映射</a>
+          <a href="#sec-add">新增映射</a>
+          <a href="#sec-print">模拟打印</a>
+          <a href="#sec-focus">字段专注</a>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+    # 读取当前 entity（优先会话，其次 URL，再次表默认）
+    current_entity = (
+        st.session_state.get("current_entity")
+        or st.query_params.get("entity", "")
+        or get_target_entity(table_name)
+    )
+    st.session_state["current_entity"] = current_entity
+
+    # ✅ 按当前实体做首次字段初始化（仅该实体缺失的字段）
+    _ensure_all_fields_seeded(table_name, current_entity or "")
+
+    # 缓存字段映射（按 table + entity 缓存）
+    cache_key = f"table_cache_{table_name}_{current_entity or ''}"
+    if cache_key not in st.session_state:
+        st.session_state[cache_key] = get_field_mappings(table_name, current_entity or None)
+    mappings = st.session_state[cache_key]
+
+    # 表级配置（当前管理目标 + 该目标的优先级）
+    st.markdown("<div id=\"sec-config\"></div>", unsafe_allow_html=True)
+    col1, col2, col3 = st.columns([3, 1, 3])
+    with col1:
+        # 用当前 entity 作为默认，允许调整（保存时按当前 entity upsert）
+        target_entity = st.text_input("当前管理目标 entity", value=current_entity)
+    with col2:
+        # 针对当前目标读取优先级
+        priority = st.number_input("优先级", value=get_priority(table_name, target_entity), step=1)
+    with col3:
+        cur_desc = ""
+        try:
+            rows = list_tables(include_disabled=True)
+            for r in rows:
+                if isinstance(r, tuple):
+                    if r[0] == table_name and (r[1] or "") == (target_entity or ""):
+                        cur_desc = r[4] or ""
+                        break
+                else:
+                    if (r.get("source_table") or "") == table_name and (r.get("target_entity") or "") == (target_entity or ""):
+                        cur_desc = r.get("description") or ""
+                        break
+        except Exception:
+            cur_desc = ""
+        desc_val = st.text_input("描述", value=cur_desc, key=f"desc_{table_name}_{target_entity}")
+
+    if st.button("保存表配置", use_container_width=True):
+        old_entity = (current_entity or "").strip()
+        new_entity = (target_entity or "").strip()
+
+        if not new_entity:
+            st.warning("目标 entity 不能为空。")
+        elif not old_entity:
+            # 详情页不允许创建新目标，请到『多映射管理中心』
+            st.warning("当前表未绑定目标。请到『🧩 多映射管理中心』创建目标实体。")
+        elif new_entity != old_entity:
+            # 执行原子重命名：同时迁移 table_map 和 field_map
+            try:
+                rename_table_target_entity(table_name, old_entity, new_entity)
+            except Exception as e:
+                st.error(f"重命名失败：{e}")
+            else:
+                # 切换会话与缓存到新目标
+                st.session_state["current_entity"] = new_entity
+                st.session_state.pop(cache_key, None)
+                new_cache_key = f"table_cache_{table_name}_{new_entity}"
+                st.session_state[new_cache_key] = get_field_mappings(table_name, new_entity)
+
+                # 同步更新 URL 的 query 参数，避免下一次被旧值覆盖
+                try:
+                    st.query_params["page"] = "detail"
+                    st.query_params["table"] = table_name
+                    st.query_params["entity"] = new_entity
+                except Exception:
+                    st.experimental_set_query_params(page="detail", table=table_name, entity=new_entity)
+
+                try:
+                    save_table_mapping(table_name, new_entity, priority, desc_val or "")
+                except Exception:
+                    pass
+
+                st.success(f"已重命名：{old_entity} → {new_entity}")
+                st.rerun()
+        else:
+            # 同名：仅保存优先级
+            save_table_mapping(table_name, new_entity, priority, desc_val or "")
+            st.success("表配置已保存")
+
+    st.caption(f"当前管理目标：{target_entity or '(未指定，使用表默认)'}")
+    st.markdown("---")
+
+    # 表级 Python 脚本
+    st.markdown("<div id=\"sec-script\"></div>", unsafe_allow_html=True)
+    st.subheader("表级 Python 脚本")
+    st.caption("在字段映射后执行，可直接修改 record。")
+    # 读取当前 entity 的脚本
+    current_script = get_table_script(table_name, target_entity or st.session_state.get("current_entity") or "") or ""
+    py_script = st.text_area("自定义脚本", value=current_script, height=150)
+    cols = st.columns([1, 1, 6])
+    with cols[0]:
+        if st.button("保存脚本"):
+            ok = save_table_script(table_name, py_script or "", target_entity=target_entity or st.session_state.get("current_entity") or "")
+            if ok:
+                st.success("脚本已保存（当前 entity）")
+            else:
+                st.warning("当前 entity 未创建映射，请到『🧩 多映射管理中心』创建目标实体")
+    with cols[1]:
+        if st.button("清空脚本"):
+            ok = save_table_script(table_name, "", target_entity=target_entity or st.session_state.get("current_entity") or "")
+            if ok:
+                st.success("脚本已清空（当前 entity）"); st.rerun()
+            else:
+                st.warning("当前 entity 未创建映射，请到『🧩 多映射管理中心』创建目标实体")
+
+    st.markdown("---")
+
+    st.subheader("SQL 缓存")
+    ccols = st.columns([3, 1, 6])
+    with ccols[0]:
+        cache_tbl = st.text_input("表名（留空清理全部）", key=f"cache_tbl_{table_name}")
+    with ccols[1]:
+        if st.button("清理一次", key=f"clear_sql_cache_{table_name}"):
+            tbl = (cache_tbl or "").strip() or None
+            info = clear_sql_cache(tbl)
+            st.success(f"已清理：rows={info.get('rows',0)}, idx={info.get('idx',0)}")
+            st.rerun()
+
+    # 字段映射（压缩行 + 单行保存 + 一键保存）
+    st.markdown("<div id=\"sec-mapping\"></div>", unsafe_allow_html=True)
+    st.subheader("字段映射配置（压缩行显示）")
+    st.caption("每条一行：修改后点💾保存；底部支持一键保存全部。")
+
+    edited_data = []
+
+    head = st.columns([2, 3, 4, 1, 1, 1])
+    head[0].markdown("**字段**")
+    head[1].markdown("**target_paths**")
+    head[2].markdown("**rule**")
+    head[3].markdown("**状态**")
+    head[4].markdown("**保存**")
+    head[5].markdown("**删除**")
+
+    for idx, m in enumerate(mappings):
+        sfield = m["source_field"]
+        t_key = f"tp_{table_name}_{idx}"
+        r_key = f"rule_{table_name}_{idx}"
+
+        cols = st.columns([2, 3, 4, 1, 1, 1])
+        with cols[0]:
+            label = sfield or "(自定义)"
+            note = comment_map.get(sfield, "")
+            st.text(f"{label}{f'（{note}）' if note else ''}")
+
+        new_tpath = cols[1].text_input(label="", value=m["target_paths"], key=t_key, placeholder="target_paths")
+        new_rule  = cols[2].text_input(label="", value=m["rule"],         key=r_key, placeholder="rule")
+
+        changed = (new_tpath != m["target_paths"]) or (new_rule != m["rule"]) 
+        if changed:
+            m["target_paths"] = new_tpath
+            m["rule"] = new_rule
+            m["__changed__"] = True
+
+        with cols[3]:
+            st.markdown("🟠" if m.get("__changed__") else "✅")
+
+        with cols[4]:
+            if st.button("💾", key=f"save_row_{table_name}_{idx}"):
+                update_field_mapping(table_name, sfield, m["target_paths"], m["rule"], target_entity or "")
+                m.pop("__changed__", None)
+                st.session_state[cache_key][idx] = m
+                st.success(f"{sfield or '(自定义)'} 已保存")
+                st.rerun()
+
+        with cols[5]:
+            if st.button("🗑", key=f"del_row_{table_name}_{idx}"):
+                delete_field_mapping(table_name, sfield, target_entity or "")
+                st.session_state[cache_key] = [x for x in st.session_state[cache_key] if x["source_field"] != sfield]
+                st.success(f"{sfield or '(自定义)'} 已删除")
+                st.rerun()
+
+        edited_data.append(m)
+
+    st.markdown("---")
+    if st.button("💾 一键保存全部修改", use_container_width=True):
+        to_save = [m for m in edited_data if m.get("__changed__")]
+        if to_save:
+            update_many_field_mappings(table_name, to_save, target_entity or "")
+            for m in to_save:
+                m.pop("__changed__", None)
+            st.session_state[cache_key] = edited_data
+            st.success("✅ 所有修改已保存")
+        else:
+            st.info("没有需要保存的字段。")
+
+    st.markdown("---")
+    # 新增自定义映射
+    st.markdown("<div id=\"sec-add\"></div>", unsafe_allow_html=True)
+    st.subheader("新增自定义映射")
+    with st.form(f"add_{table_name}"):
+        src = st.text_input("source_field（可空）")
+        tgt = st.text_input("target_paths（例：data.name）")
+        rule_new = st.text_input("rule（可空）")
+        if st.form_submit_button("添加"):
+            # 查重：当前 (table + entity) 是否已有一条空 source_field 的映射
+            src_norm = (src or "").strip()
+            existing_list = st.session_state.get(cache_key) or get_field_mappings(table_name, target_entity or None)
+            has_empty_custom = any((m.get("source_field") or "") == "" for m in existing_list)
+
+            if src_norm == "" and has_empty_custom:
+                st.warning("当前已存在一条 source_field 为空的自定义映射，请填写 source_field 或修改现有记录。")
+            else:
+                upsert_field_mapping(table_name, src_norm, tgt, rule_new, target_entity=target_entity or "")
+                # 刷新当前 table+entity 的缓存，确保新映射立刻可见
+                st.session_state[cache_key] = get_field_mappings(table_name, target_entity or None)
+                st.success("已新增映射")
+                st.rerun()
+
+    st.markdown("---")
+
+    # 模拟打印
+    st.markdown("<div id=\"sec-print\"></div>", unsafe_allow_html=True)
+    st.subheader("模拟打印")
+    # 样例记录按页从暂存库 / 源库读取（source_pager），不再整表解析进 session
+    from backend.source_pager import count_rows, fetch_page
+    src_kind = "db" if st.session_state.get("source_input_kind") == "db" else "file"
+    src_conn_key = ""
+    if src_kind == "db":
+        from backend.source_store import source_conn_key
+        src_conn_key = source_conn_key(st.session_state.source_db_cfg)
+    
+    # ✅ 自动加载并执行已保存的 SQL 筛选 (防止刷新后丢失)
+    sql_filter_key = f"sql_filter_{table_name}"
+    find_filter_key = f"find_filter_{table_name}"
+    if sql_filter_key not in st.session_state:
+         from backend.db import get_table_filter_sql
+         saved_sql = get_table_filter_sql(table_name, target_entity or st.session_state.get("current_entity") or "")
+         if saved_sql and saved_sql.strip():
+             # print(f"[DEBUG] Auto-executing saved filter SQL for {table_name}")
+             from backend.mapper_core import query_source_sql
+             res = query_source_sql(saved_sql, table_name)
+             if res and isinstance(res, list) and len(res) > 0 and "error" in res[0]:
+                 st.warning(f"自动加载筛选失败: {res[0]['error']}")
+             else:
+                 st.session_state[sql_filter_key] = res
+                 # 同步到高级 SQL 文本框的 session
+                 st.session_state[f"adv_sql_{table_name}"] = saved_sql
+
+    find_spec_key = f"find_spec_{table_name}"
+
+    def _view_list():
+        """高级 SQL 筛选结果（及其上的查找结果）为内存列表；否则返回 None，走源表分页"""
+        if st.session_state.get(sql_filter_key):
+            return st.session_state.get(find_filter_key) or st.session_state.get(sql_filter_key)
+        return None
+
+    def _view_total() -> int:
+        lst = _view_list()
+        if lst is not None:
+            return len(lst)
+        return count_rows(src_kind, table_name, st.session_state.get(find_spec_key), src_conn_key)
+
+    def _view_page(page: int, size: int):
+        lst = _view_list()
+        if lst is not None:
+            return lst[page * size:(page + 1) * size]
+        return fetch_page(src_kind, table_name, page, size, st.session_state.get(find_spec_key), src_conn_key)
+
+    def _view_record(i: int):
+        rows = _view_page(i, 1) if i >= 0 else []
+        return rows[0] if rows else {}
+
+    # 查找筛选区域
+    st.caption("查找指定记录：填写字段名与值，支持非唯一匹配")
+    sf1, sf2, sf3, sf4 = st.columns([2, 2, 1, 1])
+    with sf1:
+        q_field = st.text_input("字段名", key=f"q_field_{table_name}")
+    with sf2:
+        q_value = st.text_input("字段值", key=f"q_value_{table_name}")
+    with sf3:
+        q_contains = st.checkbox("包含匹配", value=True, key=f"q_contains_{table_name}")
+    with sf4:
+        do_query = st.button("查询", key=f"do_query_{table_name}")
+
+    idx_key = f"sample_idx_{table_name}"
+
+    if do_query:
+        fld = (q_field or "").strip()
+        val = (q_value or "").strip()
+        if fld and val:
+            def _match(rec):
+                rv = rec.get(fld)
+                if rv is None:
+                    return False
+                s = str(rv)
+                return (val in s) if q_contains else (s == val)
+            if st.session_state.get(sql_filter_key):
+                base_list = st.session_state.get(sql_filter_key)
+                st.session_state[find_filter_key] = [r for r in base_list if _match(r)]
+                hit_n, base_n = len(st.session_state[find_filter_key]), len(base_list)
+            else:
+                # 源表查找：在暂存库 / 源库中按字段筛选，只记住筛选条件
+                spec = {"field": fld, "value": val, "contains": bool(q_contains)}
+                hit_n = count_rows(src_kind, table_name, spec, src_conn_key)
+                base_n = count_rows(src_kind, table_name, None, src_conn_key)
+                if hit_n:
+                    st.session_state[find_spec_key] = spec
+                else:
+                    st.session_state.pop(find_spec_key, None)
+            st.session_state[idx_key] = 0
+            st.info(f"筛选到 {hit_n} 条记录（总 {base_n} 条）")
+        else:
+            st.warning("请填写字段名与字段值后再查询。")
+
+    # 清除筛选
+    if st.button("清除查找筛选", key=f"clear_query_{table_name}"):
+        st.session_state.pop(find_filter_key, None)
+        st.session_state.pop(find_spec_key, None)
+        st.session_state[idx_key] = 0
+
+    # ================= 高级 SQL 筛选 =================
+    with st.expander("高级 SQL 筛选 (Advanced SQL Filter)", expanded=False):
+        st.caption("支持完整 SQL 语法 (JOIN, GROUP BY, etc.)。数据源为 source/sql 下的 SQL 文件。")
+        st.caption("可选：首行支持 `-- params: {\"k\": \"v\"}`，并在 SQL 内用 `:k` 引用参数。")
+        
+        # Load saved SQL if session state not set
+        if f"adv_sql_{table_name}" not in st.session_state:
+             from backend.db import get_table_filter_sql
+             saved_sql = get_table_filter_sql(table_name, current_entity)
+             if saved_sql:
+                 st.session_state[f"adv_sql_{table_name}"] = saved_sql
+                 
+        adv_sql = st.text_area("SQL 语句", value=st.session_state.get(f"adv_sql_{table_name}", f"SELECT * FROM {table_name}"), height=100)
+        cur_idx = int(st.session_state.get(idx_key, 0) or 0)
+        sample_for_params = _view_record(cur_idx) if "record." in (adv_sql or "") else {}
+        preview_sql = adv_sql
+        if "record." in (preview_sql or ""):
+            from backend.mapper_core import substitute_record_in_sql
+            preview_sql = substitute_record_in_sql(preview_sql, sample_for_params)
+            st.caption(f"预览：`record.xxx` 基于当前样例记录第 {cur_idx + 1} 条替换后执行/保存。")
+        with st.expander("参数与SQL预览", expanded=False):
+            if "record." in (adv_sql or ""):
+                st.caption("record 参数（来自当前样例记录）")
+                st.code(json.dumps({k: sample_for_params.get(k) for k in sample_for_params.keys()}, ensure_ascii=False, indent=2))
+            st.caption("实际执行 SQL")
+            st.code(preview_sql or "")
+        if st.button("执行并保存筛选", key=f"btn_adv_sql_{table_name}"):
+            run_sql = adv_sql
+            if "record." in (run_sql or ""):
+                cur_idx = int(st.session_state.get(idx_key, 0) or 0)
+                sample_for_params = _view_record(cur_idx)
+                from backend.mapper_core import substitute_record_in_sql
+                run_sql = substitute_record_in_sql(run_sql, sample_for_params)
+                st.session_state[f"adv_sql_{table_name}"] = run_sql
+            else:
+                st.session_state[f"adv_sql_{table_name}"] = adv_sql
+            
+            # Save to DB
+            from backend.db import save_table_filter_sql
+            save_table_filter_sql(table_name, run_sql, current_entity)
+            
+            from backend.mapper_core import query_source_sql
+            res = query_source_sql(run_sql, table_name)
+            if res and isinstance(res, list) and len(res) > 0 and "error" in res[0]:
+                st.error(f"查询错误: {res[0]['error']}")
+            else:
+                st.session_state[sql_filter_key] = res
+                st.session_state.pop(find_filter_key, None)
+                st.session_state.pop(find_spec_key, None)
+                st.session_state[idx_key] = 0
+                st.success(f"筛选到 {len(res)} 条记录，配置已保存")
+
+    idx_key = f"sample_idx_{table_name}"
+    if idx_key not in st.session_state:
+        st.session_state[idx_key] = 0
+    sample_index = st.session_state[idx_key]
+
+    # 当前视图：优先过滤结果
+    total_n = _view_total()
+    st.caption(f"当前预览索引：{sample_index + 1}/{max(total_n, 1)}（总 {count_rows(src_kind, table_name, None, src_conn_key)} 条）")
+
+    cols_pg = st.columns([1, 1, 6])
+    with cols_pg[0]:
+        if st.button("⬅️ 上一条"):
+            if sample_index > 0:
+                st.session_state[idx_key] -= 1; st.rerun()
+    with cols_pg[1]:
+        if st.button("下一条 ➡️"):
+            if sample_index + 1 < total_n:
+                st.session_state[idx_key] += 1; st.rerun()
+
+    # 取当前样例（只读取这一条）
+    sample = _view_record(sample_index) if (0 <= sample_index < total_n) else {}
+    with st.expander("SQL 样例记录", expanded=False):
+        st.code(json.dumps(sample, ensure_ascii=False, indent=2))
+
+    st.caption(f"基于当前预览记录（第 {sample_index + 1} 条）进行模拟入库结果")
+    if st.button("生成模拟打印"):
+        py_now = get_table_script(table_name, target_entity or st.session_state.get("current_entity") or "") or ""
+        data_rec, out_name, type_override = apply_record_mapping(
+            table_name, sample, py_now, target_entity=target_entity or st.session_state.get("current_entity") or ""
+        )
+
+        # ⬇️ 抽 meta 并从 data_rec 中剔除
+        meta = _extract_entity_meta(data_rec)
+
+        preview = {
+            "uuid": "(mock uuid)",
+            "sid": SID,
+            "type": type_override or (target_entity or table_name),
+            "name": out_name or "",
+            "del": int(meta["del"]),
+            "input_date": int(meta["input_date"]),
+            "update_date": int(meta["update_date"]),
+            "data": data_rec
+        }
+        st.success("生成成功：")
+        st.code(json.dumps(preview, ensure_ascii=False, indent=2))
+
+    # 字段专注模式
+    st.markdown("<div id=\"sec-focus\"></div>", unsafe_allow_html=True)
+    st.subheader("字段专注模式")
+    st.caption("填写字段名（用逗号分隔）。支持两种格式：name（外层），data.xxx（映射后的 data 内部字段，支持多级）。")
+    focus_fields_key = f"focus_fields_{table_name}"
+    focus_page_key = f"focus_page_{table_name}"
+    focus_page_size_key = f"focus_page_size_{table_name}"
+
+    ff_cols = st.columns([5, 1, 1, 1])
+    with ff_cols[0]:
+        fields_input = st.text_input("字段列表", value=st.session_state.get(focus_fields_key, "name"))
+    with ff_cols[1]:
+        page_size = st.number_input("每页数量", value=int(st.session_state.get(focus_page_size_key, 20)), min_value=5, max_value=200, step=5)
+    with ff_cols[2]:
+        gen_focus = st.button("生成")
+    with ff_cols[3]:
+        clear_focus = st.button("清空")
+
+    # 解析字段列表
+    def _parse_fields(s: str):
+        return [x.strip() for x in (s or "").split(",") if x.strip()]
+
+    if clear_focus:
+        st.session_state.pop(focus_fields_key, None)
+        st.session_state.pop(focus_page_key, None)
+        st.session_state.pop(focus_page_size_key, None)
+
+    if gen_focus:
+        flds = _parse_fields(fields_input)
+        if not flds:
+            st.warning("请填写至少一个字段。")
+        else:
+            st.session_state[focus_fields_key] = fields_input
+            st.session_state[focus_page_key] = 0
+            st.session_state[focus_page_size_key] = int(page_size)
+
+    # 若已有字段配置，按分页打印所有记录的字段值
+    if focus_fields_key in st.session_state:
+        flds = _parse_fields(st.session_state[focus_fields_key])
+        page = int(st.session_state.get(focus_page_key, 0))
+        size = int(st.session_state.get(focus_page_size_key, 20))
+
+        # 当前视图：优先过滤结果；只读取并映射当前页
+        total_n = _view_total()
+        total_pages = max(1, (total_n + size - 1) // size)
+        start = page * size
+        end = min(start + size, total_n)
+
+        # 顶部分页信息与跳转
+        pg_cols = st.columns([1, 1, 4])
+        with pg_cols[0]:
+            if st.button("⬅️ 上一页", disabled=(page <= 0)):
+                st.session_state[focus_page_key] = max(0, page - 1); st.rerun()
+        with pg_cols[1]:
+            if st.button("下一页 ➡️", disabled=(page + 1 >= total_pages)):
+                st.session_state[focus_page_key] = min(total_pages - 1, page + 1); st.rerun()
+        with pg_cols[2]:
+            st.caption(f"当前页：{page + 1}/{total_pages}，范围 {start + 1}-{end}，总 {total_n} 条")
+
+        # 计算当前页的映射并抽取字段
+        py_now = get_table_script(table_name, target_entity or st.session_state.get("current_entity") or "") or ""
+        rows = []
+        def _get_data_path(d: dict, path: str):
+            v = d
+            for seg in [x for x in path.split(".") if x]:
+                if isinstance(v, dict):
+                    v = v.get(seg, "")
+                else:
+                    return ""
+            return v if v is not None else ""
+
+        for i, rec in enumerate(_view_page(page, size) if total_n else [], start=start):
+            data_rec, out_name, type_override = apply_record_mapping(
+                table_name, rec, py_now, target_entity=target_entity or st.session_state.get("current_entity") or ""
+            )
+            name_val = (data_rec.get("__name__") or out_name or "")
+            row = {"#": i + 1}
+            for f in flds:
+                if f == "name":
+                    row[f] = name_val
+                elif f.startswith("data."):
+                    row[f] = _get_data_path(data_rec, f[5:])
+                else:
+                    # 未知格式，尝试直接取映射后的顶层字段
+                    row[f] = data_rec.get(f, "")
+            rows.append(row)
+
+        st.dataframe(rows, use_container_width=True)
+
+    if st.button("返回列表"):
+        st.session_state.page = "list"
+        st.session_state.current_table = ""
+        st.session_state.current_entity = ""
+        st.rerun()
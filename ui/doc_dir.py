@@ -0,0 +1,1078 @@
+# ui/doc_dir.py
+# -*- coding: utf-8 -*-
+"""
+文件管理 - 文档归档（新版）：归档配置、目录/附件预览与写入 file/search 表。
+"""
+import json
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+import streamlit as st
+
+from backend.db import delete_doc_dir_cfg, list_doc_dir_cfgs, list_mapped_tables, save_doc_dir_cfg
+from backend.mapper_core import entity_status_by_sid
+from backend.blob_copy import dedup_copy, reset_copy_stats
+from backend.progress import Progress
+from ui.common import (
+    SID, _copy_mode_selector, _parse_all_inserts, _read_sql_rows, _render_copy_stats, _st_progress_sink,
+    gen_uuid10
+)
+
+
+def render_doc_dir_tab():
+    st.subheader("Java版本 - 文档归档配置")
+    st.info("用于配置文档归档目录结构、文件筛选与预览")
+
+    cfgs = list_doc_dir_cfgs()
+    cfg_options = {"(新增配置)": None}
+    for c in cfgs:
+        label = f"[{c.get('id')}] {c.get('name')} - {c.get('source_table')}->{c.get('target_entity')}"
+        cfg_options[label] = c
+    sel_key = st.selectbox("选择或新增归档配置", list(cfg_options.keys()))
+    sel_cfg = cfg_options[sel_key]
+
+    def _render_dir_template(tpl: str, row: Dict[str, Any]) -> str:
+        import datetime
+
+        def _val(k: str):
+            v = row.get(k, "")
+            if v is None:
+                return ""
+            return str(v)
+
+        def _parse_time(v: str):
+            s = str(v or "").strip()
+            if not s:
+                return None
+            try:
+                if s.isdigit():
+                    ts = int(s)
+                    if ts > 10**12:
+                        ts = int(ts / 1000)
+                    return datetime.datetime.fromtimestamp(ts)
+            except Exception:
+                pass
+            try:
+                return datetime.datetime.fromisoformat(s.replace("Z", ""))
+            except Exception:
+                return None
+
+        out = re.sub(r"sql\.([A-Za-z0-9_]+)", lambda m: _val(m.group(1)), tpl or "")
+
+        def _date_repl(m):
+            fmt = m.group(1).strip()
+            raw_arg = m.group(2).strip()
+            if raw_arg.startswith("sql."):
+                arg_val = _val(raw_arg[4:])
+            else:
+                arg_val = raw_arg.strip("'\"")
+            dt = _parse_time(arg_val)
+            if dt:
+                try:
+                    return dt.strftime(fmt)
+                except Exception:
+                    return arg_val
+            return arg_val
+
+        out = re.sub(r"date\(\s*([^,]+)\s*,\s*([^)]+)\)", _date_repl, out)
+        return out
+
+    def _split_files(raw: str):
+        parts = [p.strip() for p in str(raw or "").split(",") if p.strip()]
+        out = []
+        for p in parts:
+            name, url = (p.split("@", 1) + [""])[:2]
+            name = name.strip()
+            url = url.strip()
+            if not name and url:
+                name = url.rsplit("/", 1)[-1].strip()
+            out.append({"name": name or "unnamed", "url": url, "raw": p})
+        return out
+
+    def _extract_files(val: Any):
+        if val is None:
+            return []
+        if isinstance(val, str):
+            s = val.strip()
+            if s.startswith("[") or s.startswith("{"):
+                try:
+                    j = json.loads(s)
+                    return _extract_files(j)
+                except Exception:
+                    return _split_files(val)
+            return _split_files(val)
+        if isinstance(val, dict):
+            name = val.get("name") or val.get("filename") or val.get("title")
+            url = val.get("url") or val.get("file") or ""
+            return [{"name": name or "unnamed", "url": url, "raw": val, "uuid": val.get("uuid")}]
+        if isinstance(val, list):
+            items = []
+            for it in val:
+                if isinstance(it, dict):
+                    name = it.get("name") or it.get("filename") or it.get("title")
+                    url = it.get("url") or it.get("file") or ""
+                    items.append({"name": name or "unnamed", "url": url, "raw": it, "uuid": it.get("uuid")})
+                else:
+                    items.extend(_split_files(str(it)))
+            return items
+        return _split_files(str(val))
+
+    def _get_upload_root():
+        try:
+            v = st.session_state.get("upload_root")
+            if v:
+                return str(v).strip()
+        except Exception:
+            pass
+        try:
+            from pathlib import Path
+            txt = Path("outer_packet/config_data.json").read_text(encoding="utf-8")
+            cfg = json.loads(txt) if txt else {}
+            if isinstance(cfg, dict):
+                v = cfg.get("upload_root") or ""
+                if v:
+                    return str(v).strip()
+        except Exception:
+            pass
+        return "/Users/songyihong/PEPM/lpp/upload/files"
+
+    def _resolve_source_file(src_url: str):
+        try:
+            from pathlib import Path
+            url = str(src_url or "").strip()
+            if url.startswith("`") and url.endswith("`"):
+                url = url[1:-1].strip()
+            url = url.strip()
+            if not url:
+                return None
+            if url.startswith("/upload/"):
+                rel = url[len("/upload/"):]
+                p = Path("/Users/songyihong/PEPM/lpp/upload") / rel
+                return p if p.exists() else p
+            base = Path("/Users/songyihong/PycharmProjects/FastAPIProject/source/files/caitou")
+            candidates = []
+            if "defaultFile/" in url:
+                rel = url.split("defaultFile/", 1)[1].strip("/")
+                candidates.append(base / "defaultFile" / rel)
+                parts = rel.split("/")
+                if len(parts) >= 3:
+                    h = parts[1]
+                    fname = parts[-1]
+                    candidates.append(base / h / fname)
+                    if "." in fname:
+                        candidates.append(base / f"{h}.{fname.rsplit('.', 1)[1]}")
+            else:
+                rel = url.strip("/")
+                candidates.append(base / rel)
+            for p in candidates:
+                if p.exists():
+                    return p
+            return candidates[0] if candidates else None
+        except Exception:
+            return None
+
+    def _copy_source_file(src_url: str, sid_val: str, fuid: str, copy_mode: Optional[str] = None) -> int:
+        try:
+            import shutil
+            from pathlib import Path
+            url = str(src_url or "").strip()
+            if url.startswith("`") and url.endswith("`"):
+                url = url[1:-1].strip()
+            url = url.strip()
+            if not url:
+                return 0
+            target_dir = Path("/Users/songyihong/PEPM/lpp/upload") / sid_val / fuid
+            target_dir.mkdir(parents=True, exist_ok=True)
+            target_path = target_dir / fuid
+            if url.startswith("/upload/"):
+                src_path = _resolve_source_file(url)
+                if src_path.exists():
+                    return int(dedup_copy(src_path, target_path, mode=copy_mode)[0])
+                return 0
+            if "defaultFile/" in url:
+                rel = url.split("defaultFile/", 1)[1].strip("/")
+            else:
+                rel = url.strip("/")
+            src_path = Path("/Users/songyihong/PycharmProjects/FastAPIProject/source/files/caitou") / rel
+            if src_path.exists():
+                return int(dedup_copy(src_path, target_path, mode=copy_mode)[0])
+            try:
+                from urllib.request import urlopen
+                if url.startswith("http://") or url.startswith("https://"):
+                    with urlopen(url) as resp, open(target_path, "wb") as f:
+                        f.write(resp.read())
+                    return int(target_path.stat().st_size)
+                return 0
+            except Exception:
+                return 0
+        except Exception:
+            return 0
+
+    def _parse_file_meta(it: Dict[str, Any]):
+        name = str(it.get("name",""))
+        url = str(it.get("url",""))
+        ext = ""
+        if "." in name:
+            ext = name.rsplit(".", 1)[1]
+        elif url and "." in url.rsplit("/", 1)[-1]:
+            ext = url.rsplit("/", 1)[-1].rsplit(".", 1)[-1]
+        m = re.search(r"/defaultFile/(\d{8})/([^/]+)/", url)
+        ymd = (m.group(1) if m else "")
+        token = (m.group(2) if m else "")
+        return {
+            "name": name,
+            "url": url,
+            "ext": ext,
+            "yyyymmdd": ymd,
+            "token": token
+        }
+
+    def _infra_match_row(it: Dict[str, Any]):
+        meta = _parse_file_meta(it)
+        try:
+            rows = _read_sql_rows("infra_file")
+        except Exception:
+            rows = []
+        full_name = str(meta.get("name",""))
+        url = str(meta.get("url",""))
+        ymd = str(meta.get("yyyymmdd",""))
+        token = str(meta.get("token",""))
+        r = next((x for x in rows if str(x.get("url","")) == url), None)
+        if r:
+            return r
+        if ymd:
+            if token:
+                r = next((x for x in rows if str(x.get("name","")) == full_name and str(x.get("path","")) .startswith(f"defaultFile/{ymd}/") and token in str(x.get("path",""))), None)
+                if r:
+                    return r
+            r = next((x for x in rows if str(x.get("name","")) == full_name and str(x.get("path","")) .startswith(f"defaultFile/{ymd}/")), None)
+            if r:
+                return r
+        r = next((x for x in rows if str(x.get("name","")) == full_name), None)
+        return r or {}
+
+    def _usr_uuid_by_source_id(src_id: str):
+        from backend.user_directory import usr_uuid_by_source_id
+        return usr_uuid_by_source_id(src_id)
+
+    def _infer_file_people(it: Dict[str, Any]):
+        infra = _infra_match_row(it)
+        c_uuid = None
+        u_uuid = None
+        usr_update_epoch = None
+        if infra:
+            c_uuid = _usr_uuid_by_source_id(infra.get("creator"))
+            u_uuid = _usr_uuid_by_source_id(infra.get("updater"))
+            ts = str(infra.get("update_time") or "")
+            try:
+                from datetime import datetime
+                usr_update_epoch = int(datetime.strptime(ts.split(".")[0], "%Y-%m-%d %H:%M:%S").timestamp())
+            except Exception:
+                usr_update_epoch = None
+        return c_uuid, u_uuid, usr_update_epoch
+
+    def _fetch_record(table_name: str, rec_id: str):
+        rec_id = str(rec_id or "").strip()
+        if not rec_id:
+            return None
+        if st.session_state.get("source_input_kind") == "db":
+            try:
+                from backend.sql_utils import get_source_conn
+                conn = get_source_conn()
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute(f"SELECT * FROM {table_name} WHERE id=%s LIMIT 1", (rec_id,))
+                        row = cur.fetchone()
+                        cols = [d[0] for d in (cur.description or [])]
+                    if not row:
+                        return None
+                    if isinstance(row, dict):
+                        return row
+                    if cols:
+                        return dict(zip(cols, row))
+                    return {f"col_{i}": v for i, v in enumerate(row)}
+                finally:
+                    conn.close()
+            except Exception:
+                return None
+        rows = _parse_all_inserts(table_name)
+        for r in rows or []:
+            if str(r.get("id", "")) == rec_id or str(r.get("uuid", "")) == rec_id:
+                return r
+        return None
+
+    def _read_entity_rows(entity_type: str):
+        from backend.sql_utils import get_conn
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT uuid,data FROM entity WHERE type=%s", (entity_type,))
+                rows = cur.fetchall() or []
+            out = []
+            for r in rows:
+                uuid_val = r[0]
+                data = {}
+                if r[1]:
+                    try:
+                        data = json.loads(r[1])
+                    except Exception:
+                        data = {}
+                row = {"uuid": uuid_val}
+                if isinstance(data, dict):
+                    row.update(data)
+                out.append(row)
+            return out
+        except Exception:
+            return []
+        finally:
+            conn.close()
+
+    def _list_entity_types():
+        from backend.sql_utils import get_conn
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT DISTINCT type FROM entity ORDER BY type")
+                rows = cur.fetchall() or []
+            return [r[0] for r in rows if r and r[0]]
+        except Exception:
+            return []
+        finally:
+            conn.close()
+
+    def _read_custom_rows(table: str, filter_sql: str):
+        if st.session_state.get("source_input_kind") != "db":
+            try:
+                from backend.mapper_core import query_source_sql
+                sql = f"SELECT * FROM {table}"
+                if filter_sql:
+                    sql += f" WHERE {filter_sql}"
+                res = query_source_sql(sql, table)
+                if res and isinstance(res, list) and "error" in res[0]:
+                    st.error(f"SQL筛选错误：{res[0]['error']}")
+                    return []
+                return res or []
+            except Exception as e:
+                st.error(f"SQL文件读取失败：{e}")
+                return []
+        from backend.sql_utils import get_source_conn
+        conn = get_source_conn()
+        try:
+            with conn.cursor() as cur:
+                sql = f"SELECT * FROM {table}"
+                if filter_sql:
+                    sql += f" WHERE {filter_sql}"
+                cur.execute(sql)
+                fetched = cur.fetchall() or []
+                cols = [d[0] for d in (cur.description or [])]
+            if fetched and isinstance(fetched[0], dict):
+                return list(fetched)
+            if cols:
+                return [dict(zip(cols, row)) for row in fetched]
+            return []
+        except Exception as e:
+            st.error(f"源库查询失败：{e}")
+            return []
+        finally:
+            conn.close()
+
+    def _get_by_path(obj: Dict[str, Any], path: str):
+        parts = str(path or "").split(".")
+        cur = obj
+        for p in parts:
+            if not isinstance(cur, dict):
+                return None
+            cur = cur.get(p)
+        if parts and parts[0] == "data" and (cur is None or not isinstance(cur, dict)):
+            cur = obj
+            for p in parts[1:]:
+                if not isinstance(cur, dict):
+                    return None
+                cur = cur.get(p)
+            return cur
+        return cur
+
+    def _row_match_filter(row: Dict[str, Any], filter_sql: str) -> bool:
+        def _coerce_bool(v: Any):
+            s = str(v).strip().lower()
+            if s in ("是", "1", "true", "yes", "y"):
+                return True
+            if s in ("否", "0", "false", "no", "n"):
+                return False
+            return None
+        expr = str(filter_sql or "").strip()
+        if not expr:
+            return True
+        parts = re.split(r"\s+AND\s+", expr, flags=re.I)
+        for part in parts:
+            s = part.strip()
+            if not s:
+                continue
+            m = re.match(r"(.+?)\s+(NOT\s+IN|IN)\s*\((.+)\)\s*$", s, flags=re.I)
+            op = None
+            key = None
+            val = None
+            if m:
+                key, op, val = m.group(1).strip(), m.group(2).upper().replace(" ", ""), m.group(3).strip()
+            else:
+                m = re.match(r"(.+?)\s*(=|!=|<>)\s*(.+)", s)
+                if m:
+                    key, op, val = m.group(1).strip(), m.group(2), m.group(3).strip()
+                else:
+                    m = re.match(r"(.+?)\s+LIKE\s+(.+)", s, flags=re.I)
+                    if m:
+                        key, op, val = m.group(1).strip(), "LIKE", m.group(2).strip()
+            if not key:
+                return False
+            if val and ((val.startswith("'") and val.endswith("'")) or (val.startswith('"') and val.endswith('"'))):
+                val = val[1:-1]
+            rv = _get_by_path(row, key)
+            if rv is None and key.startswith("data."):
+                rv = _get_by_path(row, key.split("data.", 1)[1])
+            if op in ("IN", "NOTIN"):
+                items = [x.strip() for x in str(val or "").split(",") if x.strip()]
+                cleaned = []
+                for it in items:
+                    if (it.startswith("'") and it.endswith("'")) or (it.startswith('"') and it.endswith('"')):
+                        it = it[1:-1]
+                    cleaned.append(it)
+                hit = str(rv) in cleaned
+                if (op == "IN" and not hit) or (op == "NOTIN" and hit):
+                    return False
+            elif op == "LIKE":
+                pat = re.escape(str(val or "")).replace(r"\%", ".*").replace(r"\_", ".")
+                if rv is None or re.fullmatch(pat, str(rv)) is None:
+                    return False
+            elif op in ("=", "!=" , "<>"):
+                bv = _coerce_bool(val)
+                rvb = _coerce_bool(rv)
+                if (bv is not None) and (rvb is not None):
+                    if (rvb == bv) == (op in ("!=", "<>")):
+                        return False
+                else:
+                    if (str(rv) == str(val)) == (op in ("!=", "<>")):
+                        return False
+            else:
+                return False
+        return True
+
+    def _is_expr_filter(target_filter: str) -> bool:
+        val = str(target_filter or "").strip()
+        return bool(val) and any(x in val for x in ("data.", "=", "!=", "<>", "LIKE", "like", "AND", "and"))
+
+    def _match_target_entity(ent_uuid: str, target_filter: str, ent_rows: Dict[str, Any] = None) -> bool:
+        val = str(target_filter or "").strip()
+        if not val:
+            return True
+        if _is_expr_filter(val):
+            # ent_rows：批量预取的 {uuid: 实体行}，避免逐条查询
+            ent_row = ent_rows.get(str(ent_uuid or "")) if ent_rows is not None else _fetch_entity_by_uuid(ent_uuid)
+            if not ent_row:
+                return False
+            return _row_match_filter(ent_row, val)
+        if "," in val:
+            allowed = [x.strip() for x in val.split(",") if x.strip()]
+            return str(ent_uuid or "") in allowed
+        return str(ent_uuid or "") == val
+
+    def _build_sql_file_id_conds(table: str, rec_id: str) -> str:
+        try:
+            from backend.source_fields import detect_source_fields
+            cols = set(detect_source_fields(table))
+        except Exception:
+            cols = set()
+        conds = []
+        if "id" in cols:
+            conds.append(f"id='{rec_id}'")
+        if "uuid" in cols:
+            conds.append(f"uuid='{rec_id}'")
+        return " OR ".join(conds)
+
+    def _fetch_sql_file_record(table: str, rec_id: str, filter_sql: str):
+        try:
+            from backend.mapper_core import query_source_sql
+            conds = _build_sql_file_id_conds(table, rec_id)
+            if not conds:
+                st.error("SQL文件中未找到 id/uuid 字段")
+                return None
+            sql = f"SELECT * FROM {table} WHERE ({conds})"
+            if filter_sql:
+                sql += f" AND ({filter_sql})"
+            res = query_source_sql(sql, table)
+            if res and isinstance(res, list) and "error" in res[0]:
+                st.error(f"SQL筛选错误：{res[0]['error']}")
+                return None
+            return res[0] if res else None
+        except Exception as e:
+            st.error(f"SQL文件读取失败：{e}")
+            return None
+
+    def _fetch_custom_record(table: str, rec_id: str, filter_sql: str):
+        if st.session_state.get("source_input_kind") != "db":
+            return _fetch_sql_file_record(table, rec_id, filter_sql)
+        from backend.sql_utils import get_source_conn
+        conn = get_source_conn()
+        try:
+            with conn.cursor() as cur:
+                sql = f"SELECT * FROM {table} WHERE (id=%s OR uuid=%s)"
+                params = [rec_id, rec_id]
+                if filter_sql:
+                    sql += f" AND ({filter_sql})"
+                cur.execute(sql, params)
+                row = cur.fetchone()
+                cols = [d[0] for d in (cur.description or [])]
+            if not row:
+                return None
+            if isinstance(row, dict):
+                return row
+            if cols:
+                return dict(zip(cols, row))
+            return None
+        except Exception as e:
+            st.error(f"源库查询失败：{e}")
+            return None
+        finally:
+            conn.close()
+
+    def _fetch_entity_record(entity_type: str, rec_id: str):
+        from backend.sql_utils import get_conn, json_equals_clause
+        rec_id = str(rec_id or "").strip()
+        if not rec_id:
+            return None
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT uuid,data FROM entity WHERE type=%s AND (uuid=%s OR {json_equals_clause('data', match_entity_field)}) LIMIT 1",
+                    (entity_type, rec_id, rec_id)
+                )
+                row = cur.fetchone()
+                if not row:
+                    return None
+                data = {}
+                if row[1]:
+                    try:
+                        data = json.loads(row[1])
+                    except Exception:
+                        data = {}
+                res = {"uuid": row[0]}
+                if isinstance(data, dict):
+                    res.update(data)
+                return res
+        except Exception:
+            return None
+        finally:
+            conn.close()
+
+    def _fetch_entity_by_uuid(ent_uuid: str):
+        from backend.sql_utils import get_conn
+        ent_uuid = str(ent_uuid or "").strip()
+        if not ent_uuid:
+            return None
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT uuid,data FROM entity WHERE uuid=%s LIMIT 1", (ent_uuid,))
+                row = cur.fetchone()
+            if not row:
+                return None
+            data = {}
+            if row[1]:
+                try:
+                    data = json.loads(row[1])
+                except Exception:
+                    data = {}
+            res = {"uuid": row[0]}
+            if isinstance(data, dict):
+                res.update(data)
+            return res
+        except Exception:
+            return None
+        finally:
+            conn.close()
+
+    def _normalize_dir_path(path: str) -> str:
+        s = str(path or "").replace("+", "").replace("'", "").replace('"', "")
+        s = re.sub(r"\s+", " ", s).strip()
+        return s
+
+    def _get_table_columns(table: str):
+        from backend.bulk_writer import table_columns
+        return table_columns(table)
+
+    def _insert_rows(table: str, rows: List[Dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        from backend.bulk_writer import bulk_insert
+        wrote, err = bulk_insert(table, rows)
+        if err:
+            st.error(f"{table} 写入失败：{err}")
+        return wrote
+
+    def _find_entity_uuid(entity_type: str, match_field: str, match_value: Any):
+        from backend.sql_utils import get_conn, json_equals_clause
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT uuid FROM entity WHERE type=%s AND {json_equals_clause('data', match_field)} LIMIT 1",
+                    (entity_type, str(match_value))
+                )
+                row = cur.fetchone()
+                if row and row[0]:
+                    return row[0]
+        except Exception:
+            return None
+        finally:
+            conn.close()
+        return None
+
+    def _build_archive_rows(rows: List[Dict[str, Any]], parent_uid: str, source_table: str, source_entity_type: str, do_copy: bool, write_search: bool = True, progress: Optional[Progress] = None):
+        sid_val = st.session_state.get("current_sid", SID)
+        folder_map: Dict[str, str] = {}
+        folder_file_rows = []
+        file_rows = []
+        search_rows = []
+        from backend.mapper_core import resolve_entity_uuids, fetch_entities_by_uuid
+        # 先收集全部匹配值，批量解析目标实体 uuid；表达式型目标过滤所需的实体也一次预取
+        by_match = not (source_table == "entity" and not (target_entity and source_entity_type and source_entity_type != target_entity))
+        uuid_map = resolve_entity_uuids(target_entity, match_entity_field, [_get_by_path(r, sql_field) for r in rows or []]) if by_match else {}
+        def _eid_of(r):
+            return uuid_map.get(str(_get_by_path(r, sql_field))) if by_match else r.get("uuid")
+        ent_rows = None
+        if target_filter and _is_expr_filter(target_filter):
+            ent_rows = fetch_entities_by_uuid([_eid_of(r) for r in rows or []])
+        for r in rows or []:
+            if progress is not None:
+                progress.add()
+            ent_uuid = _eid_of(r)
+            if not ent_uuid:
+                continue
+            if target_filter and not _match_target_entity(ent_uuid, target_filter, ent_rows):
+                continue
+            raw_dir = _render_dir_template(dir_template, r)
+            norm_dir = _normalize_dir_path(raw_dir)
+            parts = [p for p in norm_dir.split("/") if p.strip()]
+            cur_parent = parent_uid or "root"
+            path_acc = ""
+            for p in parts:
+                path_acc = f"{path_acc}/{p}" if path_acc else p
+                key = f"{cur_parent}:{path_acc}"
+                if key in folder_map:
+                    cur_parent = folder_map[key]
+                    continue
+                folder_uuid = gen_uuid10()
+                folder_map[key] = folder_uuid
+                folder_file_rows.append({
+                    "uuid": folder_uuid,
+                    "name": p,
+                    "file": "",
+                    "doc_type": "",
+                    "flag": "",
+                    "size": 0,
+                    "data": json.dumps({}, ensure_ascii=False),
+                    "path": json.dumps({}, ensure_ascii=False),
+                    "quote": json.dumps({}, ensure_ascii=False),
+                    "sid": sid_val,
+                    "eid": ent_uuid,
+                    "type": "dir",
+                    "uid": cur_parent,
+                    "create_people": "root",
+                    "create_date": int(time.time()),
+                    "update_people": "root",
+                    "update_date": int(time.time()),
+                    "del": 0,
+                    "state": 0,
+                    "filecrypt": 0,
+                    "oss": 0,
+                    "privilege": ""
+                })
+                if write_search:
+                    search_rows.append({
+                        "uuid": gen_uuid10(),
+                        "eid": ent_uuid,
+                        "url": None,
+                        "title": p,
+                        "content": f"\"{p}\"",
+                        "type": "file",
+                        "is_dir": 0,
+                        "file_data": json.dumps({"uuid": folder_uuid}, ensure_ascii=False),
+                        "sid": sid_val
+                    })
+                cur_parent = folder_uuid
+            files_raw = r.get(src_field, "")
+            if source_table == "entity":
+                items = _extract_files(files_raw)
+            else:
+                items = _split_files(files_raw)
+            if file_filter:
+                try:
+                    pat = re.compile(file_filter)
+                    items = [x for x in items if pat.search(x.get("name") or x.get("raw") or "")]
+                except Exception:
+                    pass
+            for it in items:
+                name = it.get("name") or "unnamed"
+                url = it.get("url") or ""
+                ext = _parse_file_meta(it).get("ext") or ""
+                fuid = gen_uuid10()
+                now_ts = int(time.time())
+                c_uuid, u_uuid, usr_update_epoch = _infer_file_people(it)
+                rel_url = f"/upload/{sid_val}/{fuid}/{fuid}"
+                file_rows.append({
+                    "uuid": fuid,
+                    "name": name,
+                    "file": rel_url,
+                    "doc_type": ext,
+                    "flag": "",
+                    "size": 0,
+                    "data": json.dumps({}, ensure_ascii=False),
+                    "path": json.dumps({}, ensure_ascii=False),
+                    "quote": json.dumps({}, ensure_ascii=False),
+                    "sid": sid_val,
+                    "eid": ent_uuid,
+                    "type": target_entity,
+                    "uid": cur_parent,
+                    "create_people": (c_uuid or "root"),
+                    "create_date": now_ts,
+                    "update_people": (u_uuid or "root"),
+                    "update_date": (usr_update_epoch or now_ts),
+                    "del": 0,
+                    "state": 0,
+                    "filecrypt": 0,
+                    "oss": 0,
+                    "privilege": ""
+                })
+                if do_copy:
+                    # 拷贝交给 _copy_archive_files 的流水线，写库前完成并回填 size
+                    file_rows[-1]["_copy_url"] = url
+                if write_search:
+                    search_rows.append({
+                        "uuid": gen_uuid10(),
+                        "eid": ent_uuid,
+                        "url": rel_url,
+                        "title": name,
+                        "content": f"\"{ext}\"",
+                        "type": "file",
+                        "is_dir": 0,
+                        "file_data": json.dumps({"uuid": fuid}, ensure_ascii=False),
+                        "sid": sid_val
+                    })
+        return folder_file_rows, file_rows, search_rows
+
+    def _copy_archive_files(file_rows: List[Dict[str, Any]], progress: Optional[Progress] = None) -> Dict[str, Any]:
+        """并发拷贝 _build_archive_rows(do_copy=True) 标记的附件，完成的行按批写入 file 表"""
+        from backend.copy_pipeline import run_copy_pipeline, COPY_WORKERS
+        # 拷贝线程中不能读 session_state：在此取本会话选择的拷贝方式
+        copy_mode = st.session_state.get("doc_dir_copy_mode")
+        def _work(r):
+            r = dict(r)
+            url = r.pop("_copy_url", "")
+            r["size"] = _copy_source_file(url, r["sid"], r["uuid"], copy_mode) if url else 0
+            return r
+        return run_copy_pipeline(
+            ((r["uuid"], r) for r in file_rows), _work, lambda rows: _insert_rows("file", rows),
+            workers=int(st.session_state.get("file_thr_workers", COPY_WORKERS)),
+            batch_size=int(st.session_state.get("file_batch_size", 200)) or 200,
+            progress=progress, total=len(file_rows),
+        )
+
+    mapped_rows = list_mapped_tables()
+    opts = []
+    status_map = entity_status_by_sid(st.session_state.get("current_sid", SID))
+    for r in mapped_rows:
+        cnt = (status_map.get(r.get("target_entity","")) or {}).get("count", 0)
+        if cnt > 0:
+            opts.append({"src": r.get("source_table",""), "ent": r.get("target_entity",""), "cnt": cnt})
+    labels = [f"{o['src']} ({o['ent']},{o['cnt']})" for o in opts]
+    entity_types = _list_entity_types()
+    entity_labels = [f"entity:{t} (entity)" for t in entity_types]
+    custom_label = "自定义源表 (源库)"
+    labels = [custom_label] + entity_labels + labels
+    with st.form("doc_dir_form"):
+        cid = sel_cfg.get("id") if sel_cfg else None
+        col1, col2 = st.columns(2)
+        with col1:
+            name_val = st.text_input("配置名称", value=sel_cfg.get("name") if sel_cfg else "")
+            default_src = sel_cfg.get("source_table") if sel_cfg else ""
+            if labels:
+                try:
+                    if default_src.startswith("custom:"):
+                        idx = labels.index(custom_label)
+                    elif default_src.startswith("entity:"):
+                        idx = labels.index(f"{default_src} (entity)")
+                    elif default_src:
+                        idx = next(i for i, lb in enumerate(labels) if lb.startswith(f"{default_src} "))
+                    else:
+                        idx = 1 if labels and labels[0] == custom_label and len(labels) > 1 else 0
+                except Exception:
+                    idx = 1 if labels and labels[0] == custom_label and len(labels) > 1 else 0
+                sel_label = st.selectbox("源表", options=labels, index=idx, key=f"doc_dir_src_{cid or 'new'}")
+                if sel_label == custom_label:
+                    src_table = "custom"
+                    source_entity_type = ""
+                    source_table_value = "custom:"
+                elif sel_label.startswith("entity:"):
+                    src_table = "entity"
+                    source_entity_type = sel_label.split(" ", 1)[0].split("entity:", 1)[1]
+                    source_table_value = f"entity:{source_entity_type}"
+                else:
+                    src_table = sel_label.split(" ")[0]
+                    source_entity_type = ""
+                    source_table_value = src_table
+            else:
+                src_table = st.text_input("源表", value=default_src)
+                source_table_value = src_table
+                source_entity_type = ""
+            if src_table == "custom":
+                custom_default = ""
+                if default_src.startswith("custom:"):
+                    custom_default = default_src.split("custom:", 1)[1]
+                custom_table = st.text_input("自定义源表名", value=custom_default)
+                source_table_value = f"custom:{custom_table}"
+                if custom_table:
+                    if st.session_state.get("source_input_kind") == "db":
+                        try:
+                            from backend.sql_utils import get_source_conn
+                            conn = get_source_conn()
+                            try:
+                                with conn.cursor() as cur:
+                                    cur.execute("SELECT 1 FROM information_schema.tables WHERE table_name=%s LIMIT 1", (custom_table,))
+                                    if not cur.fetchone():
+                                        st.warning("未找到该自定义源表")
+                            finally:
+                                conn.close()
+                        except Exception:
+                            pass
+                    else:
+                        try:
+                            from backend.source_fields import detect_sql_path
+                            if not detect_sql_path(custom_table).exists():
+                                st.warning("未找到对应的 SQL 文件")
+                        except Exception:
+                            pass
+            data_filter = st.text_input("数据筛选条件", value=sel_cfg.get("custom_filter") if sel_cfg else "")
+            custom_filter = data_filter
+            src_field = st.text_input("源字段", value=sel_cfg.get("source_field") if sel_cfg else "upload_files")
+            target_entity = st.text_input("目标实体", value=sel_cfg.get("target_entity") if sel_cfg else "")
+            sql_field = st.text_input("sql_field", value=sel_cfg.get("sql_field") if sel_cfg else "id")
+            match_entity_field = st.text_input("匹配的entity_field", value=sel_cfg.get("match_entity_field") if sel_cfg else "id")
+            target_filter = st.text_input("目标实体筛选条件（uuid 或 data.xxx）", value=sel_cfg.get("target_filter") if sel_cfg else "")
+            if src_table == "entity":
+                st.info(f"当前源表为 entity:{source_entity_type}，将从实体数据中读取源字段（如 fjsc），并按实体 uuid 入库。")
+        with col2:
+            parent_uid = st.text_input("父级 UID", value=sel_cfg.get("parent_uid") if sel_cfg else "")
+            dir_template = st.text_area("目录层级模板", value=sel_cfg.get("dir_template") if sel_cfg else "sql.name+'-'+date(%Y-%m-%d,sql.fund_expire_time)/")
+            file_filter = st.text_input("文件过滤正则", value=sel_cfg.get("file_filter") if sel_cfg else "")
+            write_search = st.checkbox("写入 search", value=bool((sel_cfg.get("write_search", 1) if sel_cfg else 1)))
+            _copy_mode_selector("doc_dir_copy_mode")
+            remark = st.text_input("备注", value=sel_cfg.get("remark") if sel_cfg else "")
+
+        test_record_id = st.text_input("测试记录ID (选填，仅用于预览)", value="")
+        if src_table == "entity":
+            st.caption(f"entity 模式下可填写实体 uuid 或 data.{match_entity_field} 的值")
+
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            submitted = st.form_submit_button("保存配置")
+        with c2:
+            preview_btn = st.form_submit_button("预览生成结果")
+        with c3:
+            exec_btn = st.form_submit_button("执行入库")
+
+        if submitted:
+            if not name_val or not src_table:
+                st.error("配置名称和源表不能为空")
+            elif src_table == "custom" and not source_table_value.split("custom:", 1)[1]:
+                st.error("请填写自定义源表名")
+            else:
+                new_id = save_doc_dir_cfg({
+                    "id": cid,
+                    "name": name_val,
+                    "source_table": source_table_value,
+                    "source_field": src_field,
+                    "target_entity": target_entity,
+                    "parent_uid": parent_uid,
+                    "dir_template": dir_template,
+                    "file_filter": file_filter,
+                    "remark": remark,
+                    "sql_field": sql_field,
+                    "match_entity_field": match_entity_field,
+                    "custom_filter": custom_filter,
+                    "target_filter": target_filter,
+                    "write_search": write_search
+                })
+                st.success(f"保存成功! ID: {new_id}")
+                st.rerun()
+
+        if preview_btn:
+            if not test_record_id:
+                st.warning("请输入测试记录ID进行预览")
+            else:
+                if src_table == "entity":
+                    row = _fetch_entity_record(source_entity_type, test_record_id)
+                    if row and custom_filter and not _row_match_filter(row, custom_filter):
+                        row = None
+                elif src_table == "custom":
+                    custom_table = source_table_value.split("custom:", 1)[1]
+                    row = _fetch_custom_record(custom_table, test_record_id, custom_filter)
+                else:
+                    if custom_filter and st.session_state.get("source_input_kind") != "db":
+                        row = _fetch_sql_file_record(src_table, test_record_id, custom_filter)
+                    elif custom_filter:
+                        row = _fetch_custom_record(src_table, test_record_id, custom_filter)
+                    else:
+                        row = _fetch_record(src_table, test_record_id)
+                if not row:
+                    st.error("未找到对应记录")
+                else:
+                    st.write("原始记录", row)
+                    rendered_dir = _render_dir_template(dir_template, row)
+                    st.write("生成目录路径", rendered_dir)
+                    files_raw = row.get(src_field, "")
+                    items = _extract_files(files_raw) if src_table == "entity" else _split_files(files_raw)
+                    if file_filter:
+                        try:
+                            pat = re.compile(file_filter)
+                            passed = [x for x in items if pat.search(x.get("name") or x.get("raw") or "")]
+                            skipped = [x for x in items if x not in passed]
+                            st.write("匹配通过", passed)
+                            st.write("未匹配跳过", skipped)
+                        except Exception as e:
+                            st.error(f"正则错误: {e}")
+                    else:
+                        st.write("文件列表", items)
+                    found_files = []
+                    for it in items:
+                        url = it.get("url") or ""
+                        src_path = _resolve_source_file(url)
+                        if src_path and src_path.exists():
+                            found_files.append({"name": it.get("name") or "unnamed", "url": url, "path": str(src_path)})
+                    st.write("本地可找到的文件", found_files)
+                if src_table == "entity":
+                    if target_entity and source_entity_type and source_entity_type != target_entity:
+                        match_val = _get_by_path(row, sql_field)
+                        ent_uuid = _find_entity_uuid(target_entity, match_entity_field, match_val)
+                    else:
+                        match_val = _get_by_path(row, sql_field)
+                        ent_uuid = row.get("uuid")
+                else:
+                    match_val = _get_by_path(row, sql_field)
+                    ent_uuid = _find_entity_uuid(target_entity, match_entity_field, match_val)
+                diag = {
+                    "target_entity": target_entity,
+                    "sql_field": sql_field,
+                    "match_val": match_val,
+                    "match_entity_field": match_entity_field,
+                    "resolved_eid": ent_uuid,
+                    "target_filter": target_filter,
+                }
+                if ent_uuid:
+                    ent_row = _fetch_entity_by_uuid(ent_uuid)
+                    if ent_row:
+                        diag["target_data"] = {
+                            "uuid": ent_row.get("uuid"),
+                            "id": ent_row.get("id"),
+                            "h709j6b8": ent_row.get("h709j6b8")
+                        }
+                        diag["target_filter_match"] = _match_target_entity(ent_uuid, target_filter)
+                st.write("目标实体匹配诊断", diag)
+
+                rows_for_preview = [row]
+                folder_rows, file_rows, search_rows = _build_archive_rows(rows_for_preview, parent_uid, src_table, source_entity_type, False, write_search=write_search)
+                st.write("即将写入 file（文件夹）", folder_rows)
+                st.write("即将写入 file（文件）", file_rows)
+                if write_search:
+                    st.write("即将写入 search", search_rows)
+                else:
+                    st.info("当前配置已关闭 search 写入，本次仅写入 file。")
+
+        if exec_btn:
+            if not src_table or not target_entity:
+                st.warning("请填写源表和目标实体")
+            else:
+                if test_record_id:
+                    rows = []
+                    if src_table == "entity":
+                        r = _fetch_entity_record(source_entity_type, test_record_id)
+                        if r and custom_filter and not _row_match_filter(r, custom_filter):
+                            r = None
+                    elif src_table == "custom":
+                        custom_table = source_table_value.split("custom:", 1)[1]
+                        r = _fetch_custom_record(custom_table, test_record_id, custom_filter)
+                    else:
+                        if custom_filter and st.session_state.get("source_input_kind") != "db":
+                            r = _fetch_sql_file_record(src_table, test_record_id, custom_filter)
+                        elif custom_filter:
+                            r = _fetch_custom_record(src_table, test_record_id, custom_filter)
+                        else:
+                            r = _fetch_record(src_table, test_record_id)
+                    if r:
+                        rows = [r]
+                else:
+                    if src_table == "entity":
+                        rows = _read_entity_rows(source_entity_type)
+                        if custom_filter:
+                            rows = [r for r in rows if _row_match_filter(r, custom_filter)]
+                    elif src_table == "custom":
+                        custom_table = source_table_value.split("custom:", 1)[1]
+                        rows = _read_custom_rows(custom_table, custom_filter)
+                    elif custom_filter:
+                        rows = _read_custom_rows(src_table, custom_filter)
+                    elif st.session_state.get("source_input_kind") == "db":
+                        try:
+                            from backend.sql_utils import get_source_conn
+                            conn = get_source_conn()
+                            try:
+                                with conn.cursor() as cur:
+                                    cur.execute(f"SELECT * FROM {src_table}")
+                                    fetched = cur.fetchall() or []
+                                    cols = [d[0] for d in (cur.description or [])]
+                                if fetched and isinstance(fetched[0], dict):
+                                    rows = list(fetched)
+                                elif cols:
+                                    rows = [dict(zip(cols, row)) for row in fetched]
+                                else:
+                                    rows = []
+                            finally:
+                                conn.close()
+                        except Exception:
+                            rows = []
+                    else:
+                        rows = _parse_all_inserts(src_table)
+                if not rows:
+                    st.warning("未找到可写入记录")
+                else:
+                    prog = st.progress(0)
+                    prog_txt = st.empty()
+                    prog_txt.write("开始构建归档写入数据…")
+                    build_prog = Progress(total=len(rows)).subscribe(_st_progress_sink(prog, "构建归档写入数据", 0.0, 0.3, prog_txt))
+                    reset_copy_stats()
+                    folder_rows, file_rows, search_rows = _build_archive_rows(rows, parent_uid, src_table, source_entity_type, True, write_search=write_search, progress=build_prog)
+                    build_prog.finish()
+                    prog_txt.write("写入目录…")
+                    n1 = _insert_rows("file", folder_rows) if folder_rows else 0
+                    copy_prog = Progress(unit="个").subscribe(_st_progress_sink(prog, "拷贝附件并写入 file 表", 0.3, 0.9, prog_txt))
+                    copy_res = _copy_archive_files(file_rows, progress=copy_prog)
+                    n1 += copy_res["written"]
+                    if copy_res["failures"]:
+                        st.warning(f"{copy_res['failed']} 个附件处理失败：" + "；".join(f"{x['key']}: {x['error']}" for x in copy_res["failures"][:5]))
+                    if write_search and search_rows:
+                        prog.progress(95)
+                        prog_txt.write("写入 search 表…")
+                        n2 = _insert_rows("search", search_rows)
+                    else:
+                        prog.progress(100)
+                        prog_txt.write("已跳过 search 写入")
+                        n2 = 0
+                    prog.progress(100)
+                    prog_txt.write("写入完成")
+                    st.success(f"写入完成：file {n1} 条，search {n2} 条")
+                    _render_copy_stats()
+
+    if sel_cfg:
+        if st.button("删除当前配置", key=f"del_doc_dir_{cid}"):
+            delete_doc_dir_cfg(cid)
+            st.success("删除成功")
+            st.rerun()
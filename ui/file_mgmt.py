@@ -0,0 +1,1690 @@
+# ui/file_mgmt.py
+# -*- coding: utf-8 -*-
+"""
+文件管理页（📃）：文件写入实体（老版）与文档归档（新版）两个标签页。
+"""
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import streamlit as st
+
+from backend.db import list_mapped_tables
+from backend.mapper_core import entity_status_by_sid
+from backend.blob_copy import dedup_copy
+from backend.progress import Progress
+from ui.common import (
+    SID, _copy_mode_selector, _parse_all_inserts, _read_sql_rows, _render_copy_stats, _st_progress_sink,
+    gen_uuid10, render_top_tabs
+)
+from ui.doc_dir import render_doc_dir_tab
+
+
+# PEPM file 表写入字段（与 _build_file_row 产出一致）
+_FILE_COLS = ["uuid","name","file","doc_type","flag","size","data","path","quote","sid","eid","type","uid","create_people","create_date","update_people","update_date","del","state","filecrypt","oss","privilege"]
+
+def render_file_mgmt_legacy():
+    st.title("📃 文件管理")
+    render_top_tabs('file')
+    sid = st.session_state.get("current_sid", SID)
+    st.subheader("文件映射管理")
+    cols = st.columns([2,2,2,2])
+    mapped_rows = list_mapped_tables()
+    opts = []
+    status_map = entity_status_by_sid(sid)
+    for r in mapped_rows:
+        cnt = (status_map.get(r.get("target_entity","")) or {}).get("count", 0)
+        if cnt > 0:
+            opts.append({"src": r.get("source_table",""), "ent": r.get("target_entity",""), "cnt": cnt})
+    labels = [f"{o['src']} ({o['ent']},{o['cnt']})" for o in opts] or [p.stem for p in Path("source/sql").glob("*.sql")]
+    with cols[0]:
+        sel_label = st.selectbox("source_table", options=labels, index=0 if labels else None)
+        src_table = (sel_label.split(" ")[0] if labels else sel_label)
+    with cols[1]:
+        src_field = st.text_input("source_field", value="upload_files")
+    with cols[2]:
+        # 从标签解析实体类型（严格取括号内第一个逗号前的内容）
+        def_ent = "fund"
+        try:
+            if "(" in sel_label and ")" in sel_label:
+                inner = sel_label.split("(", 1)[1].split(")", 1)[0]
+                def_ent = inner.split(",", 1)[0].strip()
+        except Exception:
+            def_ent = next((o["ent"] for o in opts if sel_label.startswith(o["src"])), "fund") if labels else "fund"
+        entity_type = st.text_input("entity", value=def_ent, key=f"filemap_entity_{sel_label}")
+    with cols[3]:
+        sql_field = st.text_input("sql_field", value="id")
+    match_cols = st.columns([1,1])
+    with match_cols[0]:
+        match_entity_field = st.text_input("匹配的entity_field", value="id")
+    with match_cols[1]:
+        st.caption("匹配规则：entity.data[匹配的entity_field] == 记录[sql_field]")
+    def _parse_files(val: str):
+        items = []
+        for part in [x.strip() for x in str(val or "").split(",") if x.strip()]:
+            raw_name, raw_url = (part.split("@", 1) + [""])[:2]
+            url = raw_url.strip()
+            fname = ""
+            if url:
+                tail = url.rsplit("/", 1)[-1].strip()
+                fname = raw_name.strip() if raw_name.strip() else tail
+            if not fname:
+                fname = raw_name.strip() or "unnamed"
+            if "." in fname:
+                base = ".".join(fname.split(".")[:-1])
+                ext = fname.split(".")[-1]
+            else:
+                base, ext = fname, ""
+                if "." in url.rsplit("/", 1)[-1]:
+                    possible_ext = url.rsplit("/", 1)[-1].split(".")[-1]
+                    if possible_ext and len(possible_ext) < 6:
+                        ext = possible_ext
+            m = re.search(r"/defaultFile/(\d{8})/([^/]+)/", url)
+            ymd = (m.group(1) if m else "")
+            token = (m.group(2) if m else "")
+            yyyymm = (ymd[:6] if ymd else time.strftime("%Y%m"))
+            items.append({"name": base, "url": url, "yyyymm": yyyymm, "ext": ext, "yyyymmdd": ymd, "token": token})
+        return items
+
+    def _get_upload_root():
+        try:
+            v = st.session_state.get("upload_root")
+            if v:
+                return str(v).strip()
+        except Exception:
+            pass
+        try:
+            from pathlib import Path
+            txt = Path("outer_packet/config_data.json").read_text(encoding="utf-8")
+            cfg = json.loads(txt) if txt else {}
+            if isinstance(cfg, dict):
+                v = cfg.get("upload_root") or ""
+                if v:
+                    return str(v).strip()
+        except Exception:
+            pass
+        return "/Users/songyihong/PEPM/lpp/upload/files"
+
+    def _build_file_row(eid: str, it: Dict[str, Any], fuid: str, entity_field: str, doc_uuid: str, doc_name: str, mode: str, adaptive: bool = False):
+        if adaptive:
+            rel = f"/upload/{sid}/{fuid}/{fuid}"
+        else:
+            rel = f"../upload/files/{sid}/{it['yyyymm']}/{fuid}/{fuid}"
+        src_info = it.get("source_info") or {}
+        full_name = it.get("name","") + (f".{it.get('ext','')}" if it.get("ext") else "")
+        data = json.dumps({
+            "path": None,
+            "source_id": src_info.get("id"),
+            "source_url": src_info.get("url"),
+            "source_path": src_info.get("path"),
+            "name": full_name
+        }, ensure_ascii=False)
+        def _resolve_config_uid() -> str:
+            if mode != "文档目录":
+                return "entity" if adaptive else "root"
+            cid = ((doc_uuid or "").strip() or "mahndrn6w7")
+            name = (doc_name or "").strip()
+            if not name:
+                return "root"
+            uid_val = "root"
+            try:
+                from backend.sql_utils import get_conn
+                conn = get_conn()
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT data FROM entity WHERE uuid=%s LIMIT 1", (cid,))
+                        row = cur.fetchone()
+                        if row and row[0]:
+                            try:
+                                cfg = json.loads(row[0])
+                            except Exception:
+                                cfg = {}
+                            items = {}
+                            if isinstance(cfg, dict):
+                                items = cfg.get("item") or (cfg.get("data") or {}).get("item") or {}
+                            if isinstance(items, dict):
+                                for key, meta in items.items():
+                                    nm = str((meta or {}).get("name", "")).strip()
+                                    if nm == name:
+                                        uid_val = str((meta or {}).get("key") or (meta or {}).get("id") or key)
+                                        break
+                finally:
+                    conn.close()
+            except Exception:
+                pass
+            return uid_val
+        uid = _resolve_config_uid()
+        cid_val = (None if mode=="数据字段" else ((doc_uuid or "").strip() or "mahndrn6w7"))
+        path = json.dumps({"config": {"cid": cid_val, "uid": uid}, "eid": eid}, ensure_ascii=False)
+        quote = json.dumps({"mod": {eid: ([entity_field] if entity_field else [])}}, ensure_ascii=False) if mode=="数据字段" else ""
+        now_ts = int(time.time())
+        ext = it.get("ext", "")
+        return {
+            "uuid": fuid, "name": it["name"], "file": rel, "doc_type": entity_type,
+            "flag": "", "size": 0, "data": data, "path": path, "quote": quote,
+            "sid": sid, "eid": eid, "type": ext, "uid": uid,
+            "create_people": "root", "create_date": now_ts, "update_people": "root", "update_date": now_ts,
+            "del": 0, "state": 0, "filecrypt": 0, "oss": 0, "privilege": ""
+        }
+
+    def _save_local_file(it: Dict[str, Any], fuid: str, adaptive: bool = False) -> int:
+        try:
+            import shutil
+            from pathlib import Path
+            url = str(it.get("url") or "")
+            if not url:
+                return 0
+            if "defaultFile/" in url:
+                rel = url.split("defaultFile/", 1)[1].strip("/")
+            else:
+                rel = url.strip("/")
+            if adaptive:
+                target_dir = Path(_get_upload_root()).parent / sid / fuid
+                target_dir.mkdir(parents=True, exist_ok=True)
+                target_path = target_dir / fuid
+            else:
+                target_dir = Path(_get_upload_root()) / sid / it["yyyymm"] / fuid
+                target_dir.mkdir(parents=True, exist_ok=True)
+                target_path = target_dir / fuid
+            src_path = Path(_get_upload_root()) / rel
+            try:
+                if src_path.exists():
+                    dedup_copy(src_path, target_path)
+                else:
+                    try:
+                        from urllib.request import urlopen
+                        with urlopen(url) as resp, open(target_path, "wb") as f:
+                            f.write(resp.read())
+                    except Exception:
+                        pass
+            except Exception:
+                pass
+            try:
+                return target_path.stat().st_size
+            except Exception:
+                return 0
+        except Exception:
+            return 0
+
+    def _write_files(files: list):
+        from backend.bulk_writer import bulk_insert
+        wrote, err = bulk_insert("file", files, columns=_FILE_COLS)
+        if err:
+            st.error(f"写入 file 失败：{err}")
+        return wrote
+
+    def _update_entity_files(eid: str, files: list, entity_field: str, mode: str) -> int:
+        from backend.sql_utils import get_conn
+        conn = get_conn()
+        wrote = 0
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT data FROM entity WHERE uuid=%s", (eid,))
+                row = cur.fetchone()
+                data = {}
+                if row and row[0]:
+                    try:
+                        data = json.loads(row[0])
+                    except Exception:
+                        data = {}
+                if mode == "数据字段":
+                    arr = data.get(entity_field, [])
+                    if not isinstance(arr, list):
+                        arr = []
+                    arr.extend([{"name": f.get("name",""), "url": f.get("file",""), "uuid": f.get("uuid","")} for f in files])
+                    data[entity_field] = arr
+                else:
+                    config = data.get("config", {}) if isinstance(data, dict) else {}
+                    if not isinstance(config, dict):
+                        config = {}
+                    auto_archive = config.get("auto_archive", [])
+                    if not isinstance(auto_archive, list):
+                        auto_archive = []
+                    for f in files:
+                        auto_archive.append(f.get("uuid"))
+                    config["auto_archive"] = auto_archive
+                    data["config"] = config
+                cur.execute("UPDATE entity SET data=%s WHERE uuid=%s", (json.dumps(data, ensure_ascii=False), eid))
+                wrote += 1
+            conn.commit()
+            return wrote
+        except Exception as e:
+            conn.rollback(); st.error(f"更新 entity.data 失败：{e}")
+            return wrote
+        finally:
+            conn.close()
+
+    def _delete_entity_files(eid: str):
+        import shutil
+        from pathlib import Path
+        from backend.sql_utils import get_conn
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT uuid,file FROM file WHERE eid=%s", (eid,))
+                rows = cur.fetchall() or []
+                for r in rows:
+                    try:
+                        rel = str(r[1] or "")
+                        parts = rel.split("/")
+                        if len(parts) >= 7 and parts[0] == ".." and parts[1] == "upload" and parts[2] == "files":
+                            sid_v = parts[3]
+                            yyyymm_v = parts[4]
+                            fdir = parts[5]
+                            base = Path(_get_upload_root()) / sid_v / yyyymm_v / fdir
+                            shutil.rmtree(base, ignore_errors=True)
+                        elif len(parts) >= 5 and parts[1] == "upload":
+                            sid_v = parts[2]
+                            fuid_v = parts[3]
+                            base = Path(_get_upload_root()).parent / sid_v / fuid_v
+                            shutil.rmtree(base, ignore_errors=True)
+                    except Exception:
+                        continue
+                cur.execute("DELETE FROM file WHERE eid=%s", (eid,))
+            conn.commit()
+            return len(rows)
+        except Exception as e:
+            conn.rollback(); st.error(f"删除失败：{e}")
+            return 0
+        finally:
+            conn.close()
+
+    def _build_entity_file_map(entity_rows, file_rows):
+        m = {}
+        for r in entity_rows:
+            if not r.get("data"):
+                continue
+            try:
+                data = json.loads(r.get("data") or "{}")
+            except Exception:
+                data = {}
+            mv = str((data or {}).get(match_entity_field, "") or "")
+            if not mv:
+                continue
+            m.setdefault(mv, []).append(r)
+        idx = {}
+        for f in file_rows:
+            mv = str(f.get("match_value") or "")
+            if not mv:
+                continue
+            idx.setdefault(mv, []).append(f)
+        return m, idx
+
+    def _build_auto_file_rows(src_rows):
+        file_rows = []
+        for r in src_rows:
+            mv = str(r.get(sql_field, "") or "")
+            if not mv:
+                continue
+            files = _parse_files(r.get(src_field, ""))
+            if not files:
+                continue
+            for f in files:
+                f["match_value"] = mv
+                f["source_row"] = r
+                file_rows.append(f)
+        return file_rows
+
+    def _render_file_map_mode(mode: str):
+        from backend.db import list_file_map_cfgs
+        ef_col = st.columns([2,2])
+        if mode == "数据字段":
+            with ef_col[0]:
+                entity_field = st.text_input("entity_field", value="fjsc")
+            doc_uuid = ""
+            doc_name = ""
+        else:
+            with ef_col[0]:
+                doc_uuid = st.text_input("doc_uuid", value="")
+            with ef_col[1]:
+                doc_name = st.text_input("doc_name", value="")
+            entity_field = ""
+        cfg_rows = list_file_map_cfgs()
+        if cfg_rows:
+            for r in cfg_rows:
+                if not r.get("status"):
+                    r["status"] = ""
+        st.markdown("---")
+        st.subheader("文件映射配置")
+        cfg_labels = []
+        for r in cfg_rows:
+            mode_here = "文档目录" if r.get("mode") == "doc" else "数据字段"
+            cfg_labels.append(f"[{r['id']}] {r['source_table']} / {r['source_field']} -> {r['entity']} ({mode_here})")
+        sel_cfg_label = st.selectbox("选择配置", options=["(新增)"] + cfg_labels, key=f"file_cfg_sel_{mode}")
+        sel_cfg = None
+        if sel_cfg_label != "(新增)":
+            try:
+                sel_id = int(sel_cfg_label.split("]")[0][1:])
+                sel_cfg = next((r for r in cfg_rows if int(r.get("id")) == sel_id), None)
+            except Exception:
+                sel_cfg = None
+        save_cols = st.columns([1,1,1,1,2])
+        with save_cols[0]:
+            do_save = st.button("保存配置", key=f"file_save_{mode}")
+        with save_cols[1]:
+            do_preview = st.button("预览匹配", key=f"file_preview_{mode}")
+        with save_cols[2]:
+            do_write = st.button("执行写入", key=f"file_write_{mode}")
+        with save_cols[3]:
+            do_del = st.button("执行删除", key=f"file_del_{mode}")
+        with save_cols[4]:
+            do_rm_cfg = st.button("删除配置", key=f"file_rm_cfg_{mode}")
+        if do_save:
+            status = "已保存"
+            mode_val = ("doc" if mode == "文档目录" else "data")
+            cfg = {
+                "source_table": src_table,
+                "source_field": src_field,
+                "entity": entity_type,
+                "mode": mode_val,
+                "entity_field": entity_field,
+                "doc_uuid": doc_uuid,
+                "doc_name": doc_name,
+                "sql_field": sql_field,
+                "match_entity_field": match_entity_field,
+                "saved_at": int(time.time()),
+                "status": status,
+            }
+            from backend.db import upsert_file_map_cfg
+            rid = upsert_file_map_cfg(cfg)
+            st.success(f"配置已保存（ID={rid}）")
+            st.rerun()
+        if do_preview:
+            if not src_table or not src_field:
+                st.warning("请输入 source_table 和 source_field")
+            else:
+                rows = _parse_all_inserts(src_table)
+                if not rows:
+                    st.warning("未找到 source_table 数据")
+                else:
+                    matched = []
+                    for r in rows:
+                        files = _parse_files(r.get(src_field, ""))
+                        if not files:
+                            continue
+                        for f in files:
+                            f["source_row"] = r
+                            matched.append(f)
+                    st.info(f"找到文件 {len(matched)} 条")
+                    st.dataframe(matched[:200], use_container_width=True)
+        if do_write:
+            if not src_table or not src_field:
+                st.warning("请输入 source_table 和 source_field")
+            else:
+                rows = _parse_all_inserts(src_table)
+                if not rows:
+                    st.warning("未找到 source_table 数据")
+                else:
+                    files = _build_auto_file_rows(rows)
+                    if not files:
+                        st.warning("未找到文件")
+                    else:
+                        ents = _read_sql_rows(entity_type)
+                        emap, idx = _build_entity_file_map(ents, files)
+                        view = []
+                        for mv, e_rows in emap.items():
+                            for e in e_rows:
+                                view.append({"match_value": mv, "entity": e})
+                        if not view:
+                            st.warning("未找到 entity.data 匹配记录")
+                        else:
+                            all_files = []
+                            files_by_eid = {}
+                            for x in view:
+                                e = x.get("entity")
+                                mv = x.get("match_value")
+                                for it in idx.get(mv, []):
+                                    fuid = gen_uuid10()
+                                    size = _save_local_file(it, fuid, adaptive=False)
+                                    row = _build_file_row(e["uuid"], it, fuid, entity_field, doc_uuid, doc_name, mode, adaptive=False)
+                                    row["size"] = size
+                                    all_files.append(row)
+                                    files_by_eid.setdefault(e["uuid"], []).append(row)
+                            if not all_files:
+                                st.info("无可写入文件")
+                            else:
+                                n1 = _write_files(all_files)
+                                n2 = 0
+                                for eid, files in files_by_eid.items():
+                                    n2 += _update_entity_files(eid, files, entity_field, mode)
+                                from backend.db import update_file_map_status
+                                update_file_map_status(sel_cfg.get("id"), f"已入库({n1})")
+                                st.success(f"完成：写入 file {n1} 条，更新 entity {n2} 条")
+        if do_write and mode == "文档目录":
+            adaptive = st.checkbox("适配 JAVA 目录", value=True, key="java_dir_adapt")
+            if adaptive:
+                rows = _parse_all_inserts(src_table)
+                if not rows:
+                    st.warning("未找到 source_table 数据")
+                else:
+                    files = _build_auto_file_rows(rows)
+                    if not files:
+                        st.warning("未找到文件")
+                    else:
+                        ents = _read_sql_rows(entity_type)
+                        emap, idx = _build_entity_file_map(ents, files)
+                        all_files = []
+                        files_by_eid = {}
+                        for e in ents:
+                            try:
+                                data = json.loads(e.get("data") or "{}")
+                            except Exception:
+                                data = {}
+                            mv = str((data or {}).get(match_entity_field, "") or "")
+                            for it in idx.get(mv, []):
+                                fuid = gen_uuid10()
+                                size = _save_local_file(it, fuid, adaptive=True)
+                                row = _build_file_row(e.get("uuid"), it, fuid, entity_field, doc_uuid, doc_name, mode, adaptive=True)
+                                row["size"] = size
+                                all_files.append(row)
+                                files_by_eid.setdefault(e.get("uuid"), []).append(row)
+                        if not all_files:
+                            st.info("无可写入文件")
+                        else:
+                            n1 = _write_files(all_files)
+                            n2_total = 0
+                            for eid, files in files_by_eid.items():
+                                n2_total += _update_entity_files(eid, files, entity_field, mode)
+                            from backend.db import update_file_map_status
+                            update_file_map_status(sel_cfg.get("id"), f"已入库({n1})")
+                            st.success(f"按实体写入（适应JAVA）完成：file {n1} 条，更新 entity {n2_total} 条")
+        if do_del:
+            from custom_handler import fetch_field_uuids
+            total = 0
+            del_view = view if "view" in locals() else []
+            uuid_map = fetch_field_uuids(entity_type, match_entity_field, [r.get(sql_field, "") for r in del_view])
+            for r in del_view:
+                key_val = r.get(sql_field, "")
+                e_uuid = uuid_map.get(str(key_val))
+                if not e_uuid:
+                    continue
+                total += _delete_entity_files(e_uuid)
+            if total:
+                st.success(f"已删除 file {total} 条")
+        if do_rm_cfg:
+            from backend.db import delete_file_map_cfg_by_id
+            ok = delete_file_map_cfg_by_id(sel_cfg.get("id") if sel_cfg else 0)
+            if ok:
+                st.success("已删除配置")
+                st.rerun()
+            else:
+                st.info("未找到配置")
+
+    
+    def _render_file_map_mode(mode: str):
+        ef_col = st.columns([2,2])
+        if mode == "数据字段":
+            with ef_col[0]:
+                entity_field = st.text_input("entity_field", value="fjsc")
+            doc_uuid = ""
+            doc_name = ""
+        else:
+            with ef_col[0]:
+                doc_uuid = st.text_input("doc_uuid", value="")
+            with ef_col[1]:
+                doc_name = st.text_input("doc_name", value="")
+            entity_field = ""
+    def _parse_files(val: str):
+        items = []
+        for part in [x.strip() for x in str(val or "").split(",") if x.strip()]:
+            raw_name, raw_url = (part.split("@", 1) + [""])[:2]
+            url = raw_url.strip()
+            fname = ""
+            if url:
+                tail = url.rsplit("/", 1)[-1].strip()
+                # 优先使用 raw_name 作为文件名，如果没有才用 URL 尾部
+                fname = raw_name.strip() if raw_name.strip() else tail
+            if not fname:
+                fname = raw_name.strip() or "unnamed"
+            if "." in fname:
+                base = ".".join(fname.split(".")[:-1])
+                ext = fname.split(".")[-1]
+            else:
+                base, ext = fname, ""
+                # 如果 URL 有后缀，尝试补全 ext
+                if "." in url.rsplit("/", 1)[-1]:
+                    possible_ext = url.rsplit("/", 1)[-1].split(".")[-1]
+                    if possible_ext and len(possible_ext) < 6: # 简单校验
+                        ext = possible_ext
+            
+            m = re.search(r"/defaultFile/(\d{8})/([^/]+)/", url)
+            ymd = (m.group(1) if m else "")
+            token = (m.group(2) if m else "")
+            yyyymm = (ymd[:6] if ymd else time.strftime("%Y%m"))
+            items.append({"name": base, "url": url, "yyyymm": yyyymm, "ext": ext, "yyyymmdd": ymd, "token": token})
+        return items
+    def _infra_match_row(it):
+        try:
+            rows = _read_sql_rows("infra_file")
+        except Exception:
+            rows = []
+        full_name = str(it.get("name","")) + (f".{it.get('ext','')}" if it.get("ext") else "")
+        url = str(it.get("url",""))
+        ymd = str(it.get("yyyymmdd",""))
+        token = str(it.get("token",""))
+        r = next((x for x in rows if str(x.get("url","")) == url), None)
+        if r:
+            return r
+        if ymd:
+            if token:
+                r = next((x for x in rows if str(x.get("name","")) == full_name and str(x.get("path","")) .startswith(f"defaultFile/{ymd}/") and token in str(x.get("path",""))), None)
+                if r:
+                    return r
+            r = next((x for x in rows if str(x.get("name","")) == full_name and str(x.get("path","")) .startswith(f"defaultFile/{ymd}/")), None)
+            if r:
+                return r
+        return {}
+    def _get_upload_root():
+        try:
+            v = st.session_state.get("upload_root")
+            if v:
+                return str(v).strip()
+        except Exception:
+            pass
+        try:
+            from pathlib import Path
+            txt = Path("outer_packet/config_data.json").read_text(encoding="utf-8")
+            cfg = json.loads(txt) if txt else {}
+            if isinstance(cfg, dict):
+                v = cfg.get("upload_root") or ""
+                if v:
+                    return str(v).strip()
+        except Exception:
+            pass
+        return "/Users/songyihong/PEPM/lpp/upload/files"
+    def _set_upload_root(v: str):
+        p = str(v or "").strip()
+        st.session_state["upload_root"] = p
+        try:
+            from pathlib import Path
+            txt = Path("outer_packet/config_data.json").read_text(encoding="utf-8")
+            cfg = json.loads(txt) if txt else {}
+        except Exception:
+            cfg = {}
+        if not isinstance(cfg, dict):
+            cfg = {}
+        cfg["upload_root"] = p
+        try:
+            from pathlib import Path
+            Path("outer_packet/config_data.json").write_text(json.dumps(cfg, ensure_ascii=False, indent=2), encoding="utf-8")
+        except Exception:
+            pass
+    def _build_file_row(eid: str, it: Dict[str, Any], fuid: str, adaptive: bool = False):
+        if adaptive:
+            rel = f"/upload/{sid}/{fuid}/{fuid}"
+        else:
+            rel = f"../upload/files/{sid}/{it['yyyymm']}/{fuid}/{fuid}"
+        src_info = it.get("source_info") or {}
+        
+        # 修正 data 中的 name：必须与 file 表中的 name (即 raw_name) 一致
+        # 注意：这里的 data 存入 entity 表，应该反映真实的原始文件名（无扩展名或有扩展名取决于需求，通常是纯名）
+        # 用户需求：写入的文件名用 @ 前面的部分
+        # it["name"] 已经是处理过的 base name，it["ext"] 是后缀
+        # 但 file 表需要完整的文件名（带后缀），所以这里 data 里的 name 也最好保持一致
+        # 不过根据之前的逻辑，it["name"] 是 base, 下面的 full_name 是 base.ext
+        
+        # 修正 file 表的 name：
+        full_name = it.get("name","") + (f".{it.get('ext','')}" if it.get("ext") else "")
+        
+        data = json.dumps({
+            "path": None, 
+            "source_id": src_info.get("id"), 
+            "source_url": src_info.get("url"), 
+            "source_path": src_info.get("path"),
+            "name": full_name  # 显式存入 name 到 data
+        }, ensure_ascii=False)
+        
+        def _resolve_config_uid() -> str:
+            if mode != "文档目录":
+                return "entity" if adaptive else "root"
+            cid = ((doc_uuid or "").strip() or "mahndrn6w7")
+            name = (doc_name or "").strip()
+            if not name:
+                return "root"
+            uid_val = "root"
+            try:
+                from backend.sql_utils import get_conn
+                conn = get_conn()
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT data FROM entity WHERE uuid=%s LIMIT 1", (cid,))
+                        row = cur.fetchone()
+                        if row and row[0]:
+                            try:
+                                cfg = json.loads(row[0])
+                            except Exception:
+                                cfg = {}
+                            items = {}
+                            if isinstance(cfg, dict):
+                                items = cfg.get("item") or (cfg.get("data") or {}).get("item") or {}
+                            if isinstance(items, dict):
+                                for key, meta in items.items():
+                                    nm = str((meta or {}).get("name", "")).strip()
+                                    if nm == name:
+                                        uid_val = str((meta or {}).get("key") or (meta or {}).get("id") or key)
+                                        break
+                finally:
+                    conn.close()
+            except Exception:
+                pass
+            if uid_val == "root":
+                try:
+                    from pathlib import Path
+                    txt = Path("outer_packet/config_data.json").read_text(encoding="utf-8")
+                    cfg2 = json.loads(txt)
+                    items2 = (cfg2.get("item") or {}) if isinstance(cfg2, dict) else {}
+                    for key, meta in items2.items():
+                        nm = str((meta or {}).get("name", "")).strip()
+                        if nm == name:
+                            uid_val = str((meta or {}).get("key") or (meta or {}).get("id") or key)
+                            break
+                except Exception:
+                    pass
+            return uid_val
+        uid = _resolve_config_uid()
+        cid_val = (None if mode=="数据字段" else ((doc_uuid or "").strip() or "mahndrn6w7"))
+        path = json.dumps({"config": {"cid": cid_val, "uid": uid}, "eid": eid}, ensure_ascii=False)
+        quote = json.dumps({"mod": {eid: ([entity_field] if entity_field else [])}}, ensure_ascii=False) if mode=="数据字段" else ""
+        now_ts = int(time.time())
+        ext = it.get("ext", "")
+        def _infra_find_by_filename(full_name: str):
+            try:
+                rows = _read_sql_rows("infra_file")
+                for r in rows:
+                    if str(r.get("name","")) == full_name:
+                        return r
+            except Exception:
+                return None
+            return None
+        def _usr_uuid_by_source_id(src_id: str):
+            from backend.user_directory import usr_uuid_by_source_id
+            return usr_uuid_by_source_id(src_id)
+        full_name = it.get("name","") + (f".{ext}" if ext else "")
+        infra = _infra_find_by_filename(full_name)
+        c_uuid = None
+        u_uuid = None
+        usr_update_epoch = None
+        if infra:
+            c_uuid = _usr_uuid_by_source_id(infra.get("creator"))
+            u_uuid = _usr_uuid_by_source_id(infra.get("updater"))
+            ts = str(infra.get("update_time") or "")
+            try:
+                from datetime import datetime
+                usr_update_epoch = int(datetime.strptime(ts.split(".")[0], "%Y-%m-%d %H:%M:%S").timestamp())
+            except Exception:
+                usr_update_epoch = None
+        return {
+            "uuid": fuid, "name": it["name"], "file": rel, "doc_type": entity_type,
+            "flag": "", "size": 0, "data": data, "path": path, "quote": quote,
+            "sid": sid, "eid": eid, "type": ext, "uid": uid,
+            "create_people": (c_uuid or "root"), "create_date": now_ts, "update_people": (u_uuid or "root"), "update_date": (usr_update_epoch or now_ts),
+            "del": 0, "state": 0, "filecrypt": 0, "oss": 0, "privilege": ""
+            , "_usr_update_epoch": usr_update_epoch
+        }
+    def _save_local_file(it: Dict[str, Any], fuid: str, adaptive: bool = False, copy_mode: Optional[str] = None):
+        import os, shutil
+        from pathlib import Path
+        root = Path(_get_upload_root())
+        if adaptive:
+            if root.name == "files":
+                base = root.parent / sid / fuid
+            else:
+                base = root / sid / fuid
+        else:
+            base = root / sid / it["yyyymm"] / fuid
+        base.mkdir(parents=True, exist_ok=True)
+        ext = it.get("ext", "")
+        dst_path = base / fuid
+        size = 0
+        try:
+            src_row = _infra_match_row(it)
+            it["source_info"] = {"id": src_row.get("id"), "url": src_row.get("url"), "path": src_row.get("path"), "size": src_row.get("size", 0)}
+            expect_size = int((it["source_info"] or {}).get("size") or _infra_expect_size(it.get("name",""), ext) or 0)
+            src_path = _find_local_file(it.get("name",""), ext, expect_size, expected_token=str(it.get("token","")), expected_ymd=str(it.get("yyyymmdd","")))
+            if src_path:
+                size = dedup_copy(src_path, dst_path, preserve_meta=False, mode=copy_mode)[0]
+            else:
+                open(dst_path, "wb").close()
+        except Exception:
+            try:
+                open(dst_path, "wb").close()
+            except Exception:
+                pass
+        return int(size)
+    def _write_files(rows: list):
+        from backend.bulk_writer import bulk_insert
+        int_cols = ("size", "create_date", "update_date", "del", "state", "filecrypt", "oss")
+        data = [{**r, **{k: int(r[k]) for k in int_cols}} for r in rows]
+        wrote, err = bulk_insert("file", data, columns=_FILE_COLS)
+        if err:
+            st.error(f"写入失败：{err}")
+        return wrote
+    def _update_entity_files(eid: str, files: list, adaptive: bool = False):
+        from backend.mapper_core import update_entity_data_by_uuid
+        
+        # 统一名称逻辑：始终带后缀
+        def _fmt_name(x):
+            nm = x.get("name", "")
+            ext = x.get("type", "") # 这里的 type 是后缀
+            # 如果名字里没有包含后缀，则补全
+            if ext and not nm.endswith(f".{ext}"):
+                return f"{nm}.{ext}"
+            return nm
+
+        names = [_fmt_name(x) for x in files]
+        uids = [x["uuid"] for x in files]
+        patch = {}
+        if entity_field:
+            patch[f"{entity_field}_upload"] = " ".join(names)
+            patch[f"{entity_field}_label"] = names
+            if adaptive:
+                # Java 风格：需要完整的 URL 和带后缀的 name
+                patch[f"{entity_field}"] = [{"url": x["file"], "name": _fmt_name(x), "uuid": x["uuid"]} for x in files]
+            else:
+                patch[f"{entity_field}"] = uids
+        return update_entity_data_by_uuid(eid, patch)
+    _LOCAL_FILE_INDEX = {}
+    def _infra_expect_size(name: str, ext: str) -> int:
+        try:
+            full_name = str(name or "") + (f".{ext}" if ext else "")
+            rows = _read_sql_rows("infra_file")
+            for r in rows or []:
+                if str(r.get("name","")) == full_name:
+                    try:
+                        return int(r.get("size") or 0)
+                    except Exception:
+                        return 0
+        except Exception:
+            return 0
+        return 0
+    def _find_local_file(name: str, ext: str, expected_size: int = 0, expected_token: str = "", expected_ymd: str = "") -> str:
+        from backend.file_index import find_local_file
+        key = f"{name}.{ext}" if ext else name
+        cache_key = f"{key}::{expected_size or 0}::{expected_token or ''}::{expected_ymd or ''}"
+        if cache_key in _LOCAL_FILE_INDEX:
+            return _LOCAL_FILE_INDEX[cache_key]
+        # 走 source/files 的持久化索引（按名查找 + token/日期路径过滤），不再每次 rglob
+        try:
+            found = find_local_file(name, ext, expected_token=expected_token, expected_ymd=expected_ymd)
+        except Exception as e:
+            print("[_find_local_file error]", e)
+            found = ""
+        # 未找到不缓存：文件可能稍后恢复到本地，下次查找由索引按需重扫
+        if found:
+            _LOCAL_FILE_INDEX[cache_key] = found
+        return found
+    def _show_file_preview(items: list):
+        if not items:
+            return
+        rows = []
+        for it in items:
+            name = it.get("name") or ""
+            ext = it.get("ext") or ""
+            local_path = _find_local_file(name, ext)
+            file_url = f"file://{local_path}" if local_path else ""
+            rows.append({"name": name, "type": ext, "file_url": file_url})
+        md = "| 文件名 | 类型 | 本地文件 |\n|---|---|---|\n"
+        for r in rows:
+            link = f"[{r['name']}]({r['file_url']})" if r["file_url"] else r["name"]
+            md += f"| {r['name']} | {r['type']} | {link} |\n"
+        st.markdown(md)
+    rec_cols = st.columns([2,1,1,1])
+    with rec_cols[0]:
+        rec_id = st.text_input("记录ID（仅处理该记录）", value="")
+    upload_default = _get_upload_root()
+    upload_root_input = st.text_input("文件写入根路径", value=upload_default, key="upload_root_input")
+    if st.button("保存写入路径", key="save_upload_root"):
+        _set_upload_root(upload_root_input or upload_default)
+        st.success("写入路径已保存")
+    if st.button("重建本地文件索引", key="file_index_rescan"):
+        from backend.file_index import scan as _scan_file_index
+        _st = _scan_file_index(full=True)
+        _LOCAL_FILE_INDEX.clear()
+        st.success(f"索引已重建：目录 {_st['dirs']}，条目 {_st['entries']}，耗时 {_st['elapsed']:.1f}s")
+    if st.button("导入恢复清单", key="file_index_manifest", help="导入 scripts/restore_minio.py 生成的 .restore_manifest.jsonl：并入文件索引并预填哈希缓存"):
+        from backend.file_index import ingest_manifest
+        from backend.blob_copy import seed_hashes_from_manifest
+        _mfs = list(Path("source/files").glob(".restore_manifest.jsonl")) + list(Path("source/files").glob("*/.restore_manifest.jsonl"))
+        if not _mfs:
+            st.info("source/files 下未找到恢复清单")
+        else:
+            _n_idx = sum(ingest_manifest(m) for m in _mfs)
+            _n_hash = sum(seed_hashes_from_manifest(m) for m in _mfs)
+            _LOCAL_FILE_INDEX.clear()
+            st.success(f"已导入 {len(_mfs)} 个清单：索引 {_n_idx} 个文件，预填哈希 {_n_hash} 个")
+    st.caption("性能设置")
+    _copy_mode_selector("file_copy_mode")
+    _render_copy_stats()
+    perf_cols = st.columns([1,1,1])
+    with perf_cols[0]:
+        max_workers = st.number_input("并发拷贝线程", value=4, min_value=1, max_value=32, step=1, key="file_thr_workers")
+    with perf_cols[1]:
+        batch_size = st.number_input("数据库批大小", value=200, min_value=50, max_value=1000, step=50, key="file_batch_size")
+    with perf_cols[2]:
+        progress_step = st.number_input("进度步长(条)", value=50, min_value=1, max_value=10000, step=10, key="file_progress_step", help="每处理多少条检查一次进度；进度条按采样间隔（约 0.5 秒）刷新")
+    resume_cols = st.columns([1,1])
+    with resume_cols[0]:
+        st.checkbox("断点续传（跳过已完成文件）", value=True, key="file_copy_resume")
+    with resume_cols[1]:
+        if st.button("清除断点记录", key="file_copy_manifest_clear"):
+            from backend.copy_pipeline import clear_manifest
+            st.success(f"已清除断点记录 {clear_manifest(prefix=f'file:{sid}:')} 条")
+    with rec_cols[1]:
+        preview_btn = st.button("解析预览", key="file_map_preview")
+    with rec_cols[2]:
+        write_preview_btn = st.button("写入预览", key="file_map_write_preview")
+    with rec_cols[3]:
+        apply_btn = st.button("一键写入", key="file_map_apply")
+    apply_by_entity_btn = st.button("按实体写入", key="file_map_apply_by_entity")
+    apply_by_entity_adaptive_btn = st.button("按实体写入（适应JAVA版本）", key="file_map_apply_by_entity_adaptive")
+    save_cfg_btn = st.button("保存映射配置", key="file_map_save")
+    if save_cfg_btn:
+        cfg = {
+            "source_table": src_table,
+            "source_field": src_field,
+            "entity": entity_type,
+            "mode": mode,
+            "entity_field": entity_field,
+            "doc_uuid": (doc_uuid if mode=="文档目录" else None),
+            "doc_name": (doc_name if mode=="文档目录" else None),
+            "sql_field": sql_field,
+            "match_entity_field": match_entity_field,
+            "saved_at": int(time.time()),
+            "status": "未入库",
+        }
+        from backend.db import upsert_file_map_cfg
+        cfg_id = upsert_file_map_cfg(cfg)
+        st.success(f"已保存到文件入库管理（配置ID：{cfg_id}）")
+
+    if preview_btn:
+        rows = _read_sql_rows(src_table)
+        view = rows
+        if rec_id:
+            view = [r for r in rows if str(r.get("id","")) == str(rec_id)]
+        show = []
+        from custom_handler import fetch_field_uuids
+        uuid_map = fetch_field_uuids(entity_type, match_entity_field, [r.get(sql_field, "") for r in view[:10]])
+        for r in view[:10]:
+            key_val = r.get(sql_field, "")
+            e_uuid = uuid_map.get(str(key_val))
+            vs = _parse_files(r.get(src_field, ""))
+            show.append({"id": r.get("id"), "match_val": key_val, "entity_uuid": e_uuid, "count": len(vs), "first": (vs[0] if vs else {})})
+        st.dataframe(show, use_container_width=True)
+        try:
+            prv = []
+            for r in view[:3]:
+                prv.extend(_parse_files(r.get(src_field, "")))
+            _show_file_preview(prv[:12])
+        except Exception:
+            pass
+    if write_preview_btn:
+        rows = _read_sql_rows(src_table)
+        view = rows if not rec_id else [r for r in rows if str(r.get("id","")) == str(rec_id)]
+        if not view:
+            st.warning("未找到对应记录")
+        else:
+            from custom_handler import fetch_field_uuids
+            rows_preview = []
+            prv_items = []
+            uuid_map = fetch_field_uuids(entity_type, match_entity_field, [r.get(sql_field, "") for r in view])
+            for r in view:
+                key_val = r.get(sql_field, "")
+                e_uuid = uuid_map.get(str(key_val))
+                src_val = str(r.get(src_field, "") or "")
+                items = _parse_files(src_val)
+                prv_items.extend(items)
+                for it in items:
+                    fuid = gen_uuid10()
+                    if e_uuid:
+                        src_row = _infra_match_row(it)
+                        it["source_info"] = {"id": src_row.get("id"), "url": src_row.get("url"), "path": src_row.get("path"), "size": src_row.get("size", 0)}
+                        file_row = _build_file_row(e_uuid, it, fuid)
+                        expect_size = int((it["source_info"] or {}).get("size") or _infra_expect_size(file_row["name"], file_row["type"]) or 0)
+                        local_path = _find_local_file(file_row["name"], file_row["type"], expect_size, expected_token=str(it.get("token","")), expected_ymd=str(it.get("yyyymmdd",""))) 
+                        file_url = f"file://{local_path}" if local_path else ""
+                        rows_preview.append({
+                            "record_id": r.get("id"),
+                            "entity_uuid": e_uuid,
+                            "uuid": file_row["uuid"],
+                            "name": file_row["name"],
+                            "type": file_row["type"],
+                            "uid": file_row["uid"],
+                            "path": file_row["path"],
+                            "doc_type": file_row["doc_type"],
+                            "file_url": file_url,
+                        })
+                    else:
+                        src_row2 = _infra_match_row(it)
+                        it["source_info"] = {"id": src_row2.get("id"), "url": src_row2.get("url"), "path": src_row2.get("path"), "size": src_row2.get("size", 0)}
+                        expect_size2 = int((it["source_info"] or {}).get("size") or _infra_expect_size(it.get("name",""), it.get("ext","")) or 0)
+                        local_path = _find_local_file(it.get("name",""), it.get("ext",""), expect_size2, expected_token=str(it.get("token","")), expected_ymd=str(it.get("yyyymmdd","")))
+                        file_url = f"file://{local_path}" if local_path else ""
+                        rows_preview.append({
+                            "record_id": r.get("id"),
+                            "entity_uuid": None,
+                            "uuid": fuid,
+                            "name": it.get("name"),
+                            "type": it.get("ext"),
+                            "uid": None,
+                            "path": "",
+                            "doc_type": entity_type,
+                            "file_url": file_url,
+                        })
+            md = "| 记录ID | 实体UUID | 文件名 | 类型 | 目录UID | 本地文件 |\n|---|---|---|---|---|---|\n"
+            for r in rows_preview[:200]:
+                link = f"[{r.get('name','')}]({r.get('file_url','')})" if r.get("file_url") else r.get("name","")
+                md += f"| {r.get('record_id','')} | {r.get('entity_uuid','')} | {r.get('name','')} | {r.get('type','')} | {r.get('uid','')} | {link} |\n"
+            st.markdown(md)
+            try:
+                _show_file_preview(prv_items[:12])
+            except Exception:
+                pass
+    def _touch_usr_dates(rows: list):
+        from backend.bulk_writer import bulk_update_case
+        # 按原逐条 UPDATE 的顺序取值：同一用户以最后一次为准
+        latest = {}
+        for r in rows:
+            ts_epoch = r.get("_usr_update_epoch")
+            if not ts_epoch:
+                continue
+            for k in ("create_people","update_people"):
+                uu = r.get(k)
+                if uu and uu != "root":
+                    latest[str(uu)] = int(ts_epoch)
+        _, err = bulk_update_case("usr", "uuid", "update_date", latest)
+        if err:
+            print("[_touch_usr_dates error]", err)
+    def _run_file_copy(items_all: list, adaptive: bool, label: str, job: str, touch_usr: bool = False):
+        """
+        items_all: [(实体uuid, 文件项)]；拷贝经有界流水线并发执行，file 行按批写库。
+        返回 (写入 file 条数, {实体uuid: [已写入文件摘要]})，断点续传时已完成的文件直接回放。
+        """
+        from backend.copy_pipeline import run_copy_pipeline
+        total_items = len(items_all)
+        prog = st.progress(0)
+        step = max(1, int(st.session_state.get("file_progress_step", 50)))
+        tracker = Progress(total=total_items, unit="个", every=step).subscribe(_st_progress_sink(prog, label))
+        files_by_eid = {}
+        # 拷贝线程中不能读 session_state：在此取本会话选择的拷贝方式
+        copy_mode = st.session_state.get("file_copy_mode")
+        def _work(arg):
+            eid, it = arg
+            fuid = gen_uuid10()
+            size = _save_local_file(it, fuid, adaptive=adaptive, copy_mode=copy_mode)
+            row = _build_file_row(eid, it, fuid, adaptive=adaptive)
+            row["size"] = size
+            return row
+        def _sink(rows):
+            n = _write_files(rows)
+            if n and touch_usr:
+                _touch_usr_dates(rows)
+            return n
+        seq = {}
+        def _on_row(key, row, resumed):
+            files_by_eid.setdefault(row.get("eid"), []).append(
+                {"uuid": row.get("uuid"), "name": row.get("name"), "type": row.get("type"), "file": row.get("file"), "_seq": seq.get(key, 0)}
+            )
+        def _items():
+            for i, (eid, it) in enumerate(items_all):
+                key = f"{eid}|{it.get('url') or ''}|{it.get('name') or ''}.{it.get('ext') or ''}"
+                seq.setdefault(key, i)
+                yield key, (eid, it)
+        items = _items()
+        stats = run_copy_pipeline(
+            items, _work, _sink,
+            job=(job if st.session_state.get("file_copy_resume", True) else None),
+            workers=int(st.session_state.get("file_thr_workers", 4)),
+            batch_size=int(st.session_state.get("file_batch_size", 200)) or 200,
+            on_row=_on_row, progress=tracker, total=total_items,
+        )
+        if stats["resumed"]:
+            st.caption(f"断点续传：跳过已完成文件 {stats['resumed']} 个")
+        if stats["failures"]:
+            st.warning(f"{stats['failed']} 个文件处理失败（已重试）：" + "；".join(f"{x['key']}: {x['error']}" for x in stats["failures"][:5]))
+        # 完成顺序不定，按源顺序恢复每个实体的文件列表
+        for files in files_by_eid.values():
+            files.sort(key=lambda x: x.pop("_seq", 0))
+        return stats["written"] + stats["resumed"], files_by_eid
+    def _file_copy_job(mode: str) -> str:
+        return f"file:{sid}:{src_table}:{entity_type}:{mode}"
+    if apply_btn:
+        rows = _read_sql_rows(src_table)
+        view = rows if not rec_id else [r for r in rows if str(r.get("id","")) == str(rec_id)]
+        if not view:
+            st.warning("未找到对应记录")
+        else:
+            from custom_handler import fetch_field_uuids
+            items_all = []
+            uuid_map = fetch_field_uuids(entity_type, match_entity_field, [r.get(sql_field, "") for r in view])
+            for r in view:
+                key_val = r.get(sql_field, "")
+                entity_uuid = uuid_map.get(str(key_val))
+                if not entity_uuid:
+                    continue
+                src_val = str(r.get(src_field, "") or "")
+                for it in _parse_files(src_val):
+                    items_all.append((entity_uuid, it))
+            n1, files_by_eid = _run_file_copy(items_all, False, "解析与写入", _file_copy_job("apply"), touch_usr=True) if items_all else (0, {})
+            if not files_by_eid:
+                st.warning("无可写入的文件（可能实体未匹配或源字段为空）")
+            else:
+                n2_total = 0
+                for eid, files in files_by_eid.items():
+                    n2_total += _update_entity_files(eid, files)
+                st.success(f"写入 file {n1} 条，更新 entity {n2_total} 条（本地路径：{_get_upload_root()}/{sid}/<YYYYMM>/<uuid>/）")
+    if apply_by_entity_btn:
+        from backend.sql_utils import get_conn, json_equals_clause
+        rows = _read_sql_rows(src_table)
+        idx = {}
+        for r in rows:
+            val = str(r.get(sql_field, "") or "")
+            items = _parse_files(str(r.get(src_field, "") or ""))
+            if not items:
+                continue
+            idx.setdefault(val, []).extend(items)
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                ents = []
+                if rec_id:
+                    cur.execute(
+                        f"SELECT uuid,data FROM entity WHERE type=%s AND {json_equals_clause('data', match_entity_field)}",
+                        (entity_type, str(rec_id))
+                    )
+                else:
+                    cur.execute("SELECT uuid,data FROM entity WHERE type=%s", (entity_type,))
+                rows_ent = cur.fetchall() or []
+                for e in rows_ent:
+                    try:
+                        eu, dj = e[0], e[1]
+                        ents.append({"uuid": eu, "data": dj})
+                    except Exception:
+                        continue
+        finally:
+            conn.close()
+        if not ents:
+            st.info("无匹配实体")
+        else:
+            items_all = []
+            for e in ents:
+                try:
+                    data = json.loads(e.get("data") or "{}")
+                except Exception:
+                    data = {}
+                mv = str((data or {}).get(match_entity_field, "") or "")
+                for it in idx.get(mv, []) or []:
+                    items_all.append((e.get("uuid"), it))
+            n1, files_by_eid = _run_file_copy(items_all, False, "按实体解析", _file_copy_job("entity")) if items_all else (0, {})
+            if not files_by_eid:
+                st.info("无可写入文件")
+            else:
+                n2_total = 0
+                for eid, files in files_by_eid.items():
+                    n2_total += _update_entity_files(eid, files)
+                st.success(f"按实体写入完成：file {n1} 条，更新 entity {n2_total} 条")
+    if apply_by_entity_adaptive_btn:
+        from backend.sql_utils import get_conn, json_equals_clause
+        rows = _read_sql_rows(src_table)
+        idx = {}
+        for r in rows:
+            val = str(r.get(sql_field, "") or "")
+            items = _parse_files(str(r.get(src_field, "") or ""))
+            if not items:
+                continue
+            idx.setdefault(val, []).extend(items)
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                ents = []
+                if rec_id:
+                    cur.execute(
+                        f"SELECT uuid,data FROM entity WHERE type=%s AND {json_equals_clause('data', match_entity_field)}",
+                        (entity_type, str(rec_id))
+                    )
+                else:
+                    cur.execute("SELECT uuid,data FROM entity WHERE type=%s", (entity_type,))
+                rows_ent = cur.fetchall() or []
+                for e in rows_ent:
+                    try:
+                        eu, dj = e[0], e[1]
+                        ents.append({"uuid": eu, "data": dj})
+                    except Exception:
+                        continue
+        finally:
+            conn.close()
+        if not ents:
+            st.info("无匹配实体")
+        else:
+            items_all = []
+            for e in ents:
+                try:
+                    data = json.loads(e.get("data") or "{}")
+                except Exception:
+                    data = {}
+                mv = str((data or {}).get(match_entity_field, "") or "")
+                for it in idx.get(mv, []) or []:
+                    items_all.append((e.get("uuid"), it))
+            n1, files_by_eid = _run_file_copy(items_all, True, "按实体解析（适应版本）", _file_copy_job("adaptive")) if items_all else (0, {})
+            if not files_by_eid:
+                st.info("无可写入文件")
+            else:
+                n2_total = 0
+                for eid, files in files_by_eid.items():
+                    n2_total += _update_entity_files(eid, files, adaptive=True)
+                st.success(f"按实体写入（适应JAVA版本）完成：file {n1} 条，更新 entity {n2_total} 条")
+    if st.button("刷新", key="file_map_refresh"):
+        st.rerun()
+
+    act_row2 = st.columns([1,1])
+    with act_row2[0]:
+        del_preview_btn = st.button("预览删除", key="file_del_preview")
+    with act_row2[1]:
+        del_apply_btn = st.button("一键删除", key="file_del_apply")
+    def _delete_entity_files(eid: str):
+        from backend.sql_utils import get_conn
+        import json, shutil
+        from pathlib import Path
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT uuid,file,sid FROM file WHERE eid=%s", (eid,))
+                rows = cur.fetchall() or []
+                uuids = []
+                paths = []
+                for r in rows:
+                    try:
+                        fuid = r[0]
+                        rel = r[1] or ""
+                        uuids.append(str(fuid))
+                        parts = str(rel).split("/")
+                        if len(parts) >= 7 and parts[0] == ".." and parts[1] == "upload" and parts[2] == "files":
+                            sid_v = parts[3]
+                            yyyymm_v = parts[4]
+                            fdir = parts[5]
+                            base = Path(_get_upload_root()) / sid_v / yyyymm_v / fdir
+                            paths.append(base)
+                        # Java-style: /upload/sid/fuid/filename (parts=["", "upload", sid, fuid, filename])
+                        elif len(parts) >= 5 and parts[1] == "upload":
+                            sid_v = parts[2]
+                            fuid_v = parts[3]
+                            base = Path(_get_upload_root()).parent / sid_v / fuid_v
+                            paths.append(base)
+                    except Exception:
+                        continue
+                for p in paths:
+                    try:
+                        shutil.rmtree(p, ignore_errors=True)
+                    except Exception:
+                        pass
+                cur.execute("DELETE FROM file WHERE eid=%s", (eid,))
+                cur.execute("SELECT data FROM entity WHERE uuid=%s", (eid,))
+                erow = cur.fetchone()
+                if erow:
+                    now_ts = int(time.time())
+                    try:
+                        data = json.loads(erow[0] or "{}")
+                    except Exception:
+                        data = {}
+                    keys = list(data.keys())
+                    for k in keys:
+                        v = data.get(k)
+                        if k.endswith("_upload") or k.endswith("_label"):
+                            data.pop(k, None)
+                        elif isinstance(v, list):
+                            if all(isinstance(x, str) and len(x) == 10 for x in v):
+                                data.pop(k, None)
+                            elif all(isinstance(x, dict) and "url" in x and "uuid" in x for x in v):
+                                data.pop(k, None)
+                    cur.execute("UPDATE entity SET data=%s, update_date=%s WHERE uuid=%s", (json.dumps(data, ensure_ascii=False), now_ts, eid))
+            conn.commit()
+            return len(rows), len(paths)
+        except Exception as e:
+            conn.rollback(); st.error(f"删除失败：{e}")
+            return 0, 0
+        finally:
+            conn.close()
+    force_del_btn = st.button("强制删除（清理垃圾）", key="file_force_del")
+    if force_del_btn:
+        from backend.sql_utils import get_conn
+        import shutil
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT uuid,file,sid,doc_type,quote FROM file WHERE doc_type=%s", (entity_type,))
+                rows = cur.fetchall() or []
+                paths = []
+                uuids = []
+                for r in rows:
+                    try:
+                        fuid = str(r[0])
+                        rel = str(r[1] or "")
+                        uuids.append(fuid)
+                        parts = rel.split("/")
+                        if len(parts) >= 7 and parts[0] == ".." and parts[1] == "upload" and parts[2] == "files":
+                            sid_v = parts[3]
+                            yyyymm_v = parts[4]
+                            fdir = parts[5]
+                            base = Path(_get_upload_root()) / sid_v / yyyymm_v / fdir
+                            paths.append(base)
+                        # Java-style: /upload/sid/fuid/filename (parts=["", "upload", sid, fuid, filename])
+                        elif len(parts) >= 5 and parts[1] == "upload":
+                            sid_v = parts[2]
+                            fuid_v = parts[3]
+                            base = Path(_get_upload_root()).parent / sid_v / fuid_v
+                            paths.append(base)
+                    except Exception:
+                        continue
+                for p in paths:
+                    try:
+                        shutil.rmtree(p, ignore_errors=True)
+                    except Exception:
+                        pass
+                cur.execute("DELETE FROM file WHERE doc_type=%s", (entity_type,))
+                cur.execute("SELECT uuid,data FROM entity WHERE type=%s", (entity_type,))
+                rows_ent = cur.fetchall() or []
+                updated = 0
+                for e in rows_ent:
+                    try:
+                        eu, dj = e[0], e[1]
+                        try:
+                            data = json.loads(dj or "{}")
+                        except Exception:
+                            data = {}
+                        if entity_field:
+                            data.pop(entity_field, None)
+                            data.pop(f"{entity_field}_upload", None)
+                            data.pop(f"{entity_field}_label", None)
+                        cur.execute("UPDATE entity SET data=%s WHERE uuid=%s", (json.dumps(data, ensure_ascii=False), str(eu)))
+                        updated += 1
+                    except Exception:
+                        continue
+            conn.commit()
+            from backend.copy_pipeline import clear_manifest
+            clear_manifest(prefix=f"file:{sid}:")
+            st.success("已强制清理：删除 file 条目并清除实体字段映射")
+        except Exception as e:
+            conn.rollback(); st.error(f"强制删除失败：{e}")
+        finally:
+            conn.close()
+    if del_preview_btn:
+        rows = _read_sql_rows(src_table)
+        view = rows if not rec_id else [r for r in rows if str(r.get("id","")) == str(rec_id)]
+        if not view:
+            st.warning("未找到对应记录")
+        else:
+            from custom_handler import fetch_field_uuids
+            summary = []
+            from backend.sql_utils import get_conn
+            conn = get_conn()
+            try:
+                with conn.cursor() as cur:
+                    uuid_map = fetch_field_uuids(entity_type, match_entity_field, [r.get(sql_field, "") for r in view])
+                    for r in view:
+                        key_val = r.get(sql_field, "")
+                        e_uuid = uuid_map.get(str(key_val))
+                        if not e_uuid:
+                            continue
+                        cur.execute("SELECT COUNT(1) FROM file WHERE eid=%s", (e_uuid,))
+                        row = cur.fetchone()
+                        c = row[0] if row else 0
+                        summary.append({"record_id": r.get("id"), "entity_uuid": e_uuid, "count": c})
+                if summary:
+                    md = "| 记录ID | 实体UUID | 待删除条数 |\n|---|---|---|\n"
+                    for s in summary:
+                        md += f"| {s['record_id']} | {s['entity_uuid']} | {s['count']} |\n"
+                    st.markdown(md)
+                else:
+                    st.info("无可删除的匹配实体")
+            finally:
+                conn.close()
+    if del_apply_btn:
+        rows = _read_sql_rows(src_table)
+        view = rows if not rec_id else [r for r in rows if str(r.get("id","")) == str(rec_id)]
+        if not view:
+            st.warning("未找到对应记录")
+        else:
+            from custom_handler import fetch_field_uuids
+            total_db = 0
+            total_fs = 0
+            uuid_map = fetch_field_uuids(entity_type, match_entity_field, [r.get(sql_field, "") for r in view])
+            for r in view:
+                key_val = r.get(sql_field, "")
+                e_uuid = uuid_map.get(str(key_val))
+                if not e_uuid:
+                    continue
+                n_db, n_fs = _delete_entity_files(e_uuid)
+                total_db += n_db
+                total_fs += n_fs
+            if total_db or total_fs:
+                from backend.copy_pipeline import clear_manifest
+                clear_manifest(prefix=f"file:{sid}:{src_table}:")
+                st.success(f"已删除 file {total_db} 条，并清理本地目录 {total_fs} 个；已清空匹配实体中的文件字段")
+            else:
+                st.info("无可删除的匹配实体")
+
+    st.subheader("📦 文件入库管理")
+    from backend.db import list_file_map_cfgs
+    cfgs = list_file_map_cfgs()
+    if not cfgs:
+        st.info("暂无保存的映射配置，可在上方点击‘保存映射配置’后使用此区域进行入库或删除。")
+    else:
+        def _cfg_label(c: dict) -> str:
+            base = f"{c['source_table']}.{c['source_field']} → {c['entity']}"
+            ef = str(c.get('entity_field') or '').strip()
+            if ef:
+                base += f".{ef}"
+            else:
+                dn = str(c.get('doc_name') or '').strip()
+                du = str(c.get('doc_uuid') or '').strip()
+                if dn and du:
+                    base += f"@{dn}（{du}）"
+                elif dn:
+                    base += f"@{dn}"
+                elif du:
+                    base += f"@{du}"
+            tail = f"（{c['mode']}）"
+            sqlf = str(c.get('sql_field') or '').strip()
+            matchf = str(c.get('match_entity_field') or '').strip()
+            etype = str(c.get('entity') or '').strip()
+            if sqlf or matchf:
+                tail += f"【sql.{sqlf or '-'}={etype}.data.{matchf or '-'}】"
+            desc = str(c.get("description") or "").strip()
+            if desc:
+                tail += f"【{desc}】"
+            return base + tail
+        options = [
+            {
+                "label": _cfg_label(c),
+                "id": c["id"],
+            }
+            for c in cfgs
+        ]
+        labels = [o["label"] for o in options]
+        sel = st.selectbox("选择入库配置", options=labels, index=0)
+        sel_id = next((o["id"] for o in options if o["label"] == sel), cfgs[0]["id"]) if options else 0
+        rec_id2 = st.text_input("记录ID（为空则全表）", key="file_imp_rec_id")
+        row1 = st.columns([1,1,1,1,1,1.5])
+        with row1[0]:
+            do_prev = st.button("入库预览", key="file_imp_prev")
+        with row1[1]:
+            do_apply = st.button("执行入库", key="file_imp_apply")
+        with row1[2]:
+            do_del = st.button("删除文件", key="file_imp_del")
+        with row1[3]:
+            do_rm_cfg = st.button("删除配置", key="file_imp_rm_cfg")
+        with row1[4]:
+            do_apply_by_entity = st.button("按实体写入", key="file_imp_apply_by_entity")
+        with row1[5]:
+            do_apply_by_entity_adaptive = st.button("按实体写入（适应JAVA版本）", key="file_imp_apply_by_entity_adaptive")
+
+        if do_prev or do_apply or do_del or do_apply_by_entity or do_apply_by_entity_adaptive:
+            cfg = next((c for c in cfgs if c["id"] == sel_id), cfgs[0])
+            # 注入上下文供已有逻辑复用
+            mode = cfg.get("mode")
+            entity_field = cfg.get("entity_field") or ""
+            doc_uuid = cfg.get("doc_uuid") or ""
+            doc_name = cfg.get("doc_name") or ""
+            src_table = cfg.get("source_table")
+            src_field = cfg.get("source_field")
+            entity_type = cfg.get("entity")
+            sql_field = cfg.get("sql_field")
+            match_entity_field = cfg.get("match_entity_field")
+            rows = _read_sql_rows(src_table)
+            view = rows if not rec_id2 else [r for r in rows if str(r.get("id","")) == str(rec_id2)]
+            from custom_handler import fetch_field_uuids
+            if do_prev:
+                rows_preview = []
+                prv_items = []
+                uuid_map = fetch_field_uuids(entity_type, match_entity_field, [r.get(sql_field, "") for r in view])
+                for r in view:
+                    key_val = r.get(sql_field, "")
+                    e_uuid = uuid_map.get(str(key_val))
+                    src_val = str(r.get(src_field, "") or "")
+                    items = _parse_files(src_val)
+                    prv_items.extend(items)
+                    for it in items:
+                        fuid = gen_uuid10()
+                        file_row = _build_file_row(e_uuid or "", it, fuid)
+                        file_url = ""
+                        local_path = _find_local_file(file_row["name"], file_row["type"]) 
+                        if local_path:
+                            file_url = f"file://{local_path}"
+                        rows_preview.append({
+                            "record_id": r.get("id"),
+                            "entity_uuid": e_uuid,
+                            "uuid": file_row["uuid"],
+                            "name": file_row["name"],
+                            "type": file_row["type"],
+                            "uid": file_row["uid"],
+                            "path": file_row["path"],
+                            "doc_type": file_row["doc_type"],
+                            "file_url": file_url,
+                        })
+                md = "| 记录ID | 实体UUID | 文件名 | 类型 | 目录UID | 本地文件 |\n|---|---|---|---|---|---|\n"
+                for r in rows_preview[:200]:
+                    link = f"[{r.get('name','')}]({r.get('file_url','')})" if r.get("file_url") else r.get("name","")
+                    md += f"| {r.get('record_id','')} | {r.get('entity_uuid','')} | {r.get('name','')} | {r.get('type','')} | {r.get('uid','')} | {link} |\n"
+                st.markdown(md)
+            if do_apply:
+                items_all = []
+                uuid_map = fetch_field_uuids(entity_type, match_entity_field, [r.get(sql_field, "") for r in view])
+                for r in view:
+                    key_val = r.get(sql_field, "")
+                    e_uuid = uuid_map.get(str(key_val))
+                    if not e_uuid:
+                        continue
+                    src_val = str(r.get(src_field, "") or "")
+                    for it in _parse_files(src_val):
+                        items_all.append((e_uuid, it))
+                n1, files_by_eid = _run_file_copy(items_all, False, "入库", _file_copy_job(f"cfg{sel_id}")) if items_all else (0, {})
+                if not files_by_eid:
+                    st.info("无可写入文件")
+                else:
+                    n2_total = 0
+                    for eid, files in files_by_eid.items():
+                        n2_total += _update_entity_files(eid, files)
+                    from backend.db import update_file_map_status
+                    update_file_map_status(sel_id, f"已入库({n1})")
+                    st.success(f"入库完成：file {n1} 条，更新 entity {n2_total} 条")
+            if do_apply_by_entity:
+                idx = {}
+                for r in rows:
+                    val = str(r.get(sql_field, "") or "")
+                    items = _parse_files(str(r.get(src_field, "") or ""))
+                    if not items:
+                        continue
+                    idx.setdefault(val, []).extend(items)
+                from backend.sql_utils import get_conn, json_equals_clause
+                conn = get_conn()
+                ents = []
+                try:
+                    with conn.cursor() as cur:
+                        if rec_id2:
+                            cur.execute(
+                                f"SELECT uuid,data FROM entity WHERE type=%s AND {json_equals_clause('data', match_entity_field)}",
+                                (entity_type, str(rec_id2))
+                            )
+                        else:
+                            cur.execute("SELECT uuid,data FROM entity WHERE type=%s", (entity_type,))
+                        rows_ent = cur.fetchall() or []
+                        for e in rows_ent:
+                            try:
+                                ents.append({"uuid": e[0], "data": e[1]})
+                            except Exception:
+                                continue
+                finally:
+                    conn.close()
+                if not ents:
+                    st.info("无匹配实体")
+                else:
+                    items_all = []
+                    for e in ents:
+                        try:
+                            data = json.loads(e.get("data") or "{}")
+                        except Exception:
+                            data = {}
+                        mv = str((data or {}).get(match_entity_field, "") or "")
+                        for it in idx.get(mv, []):
+                            items_all.append((e.get("uuid"), it))
+                    n1, files_by_eid = _run_file_copy(items_all, False, "按实体入库", _file_copy_job(f"cfg{sel_id}:entity")) if items_all else (0, {})
+                    if not files_by_eid:
+                        st.info("无可写入文件")
+                    else:
+                        n2_total = 0
+                        for eid, files in files_by_eid.items():
+                            n2_total += _update_entity_files(eid, files)
+                        from backend.db import update_file_map_status
+                        update_file_map_status(sel_id, f"已入库({n1})")
+                        st.success(f"按实体写入完成：file {n1} 条，更新 entity {n2_total} 条")
+            if do_apply_by_entity_adaptive:
+                idx = {}
+                for r in rows:
+                    val = str(r.get(sql_field, "") or "")
+                    items = _parse_files(str(r.get(src_field, "") or ""))
+                    if not items:
+                        continue
+                    idx.setdefault(val, []).extend(items)
+                from backend.sql_utils import get_conn, json_equals_clause
+                conn = get_conn()
+                ents = []
+                try:
+                    with conn.cursor() as cur:
+                        if rec_id2:
+                            cur.execute(
+                                f"SELECT uuid,data FROM entity WHERE type=%s AND {json_equals_clause('data', match_entity_field)}",
+                                (entity_type, str(rec_id2))
+                            )
+                        else:
+                            cur.execute("SELECT uuid,data FROM entity WHERE type=%s", (entity_type,))
+                        rows_ent = cur.fetchall() or []
+                        for e in rows_ent:
+                            try:
+                                ents.append({"uuid": e[0], "data": e[1]})
+                            except Exception:
+                                continue
+                finally:
+                    conn.close()
+                if not ents:
+                    st.info("无匹配实体")
+                else:
+                    items_all = []
+                    for e in ents:
+                        try:
+                            data = json.loads(e.get("data") or "{}")
+                        except Exception:
+                            data = {}
+                        mv = str((data or {}).get(match_entity_field, "") or "")
+                        for it in idx.get(mv, []):
+                            items_all.append((e.get("uuid"), it))
+                    n1, files_by_eid = _run_file_copy(items_all, True, "按实体写入（适应JAVA）", _file_copy_job(f"cfg{sel_id}:adaptive")) if items_all else (0, {})
+                    if not files_by_eid:
+                        st.info("无可写入文件")
+                    else:
+                        n2_total = 0
+                        for eid, files in files_by_eid.items():
+                            n2_total += _update_entity_files(eid, files, adaptive=True)
+                        from backend.db import update_file_map_status
+                        update_file_map_status(sel_id, f"已入库({n1})")
+                        st.success(f"按实体写入（适应JAVA）完成：file {n1} 条，更新 entity {n2_total} 条")
+            if do_del:
+                total_db, total_fs = 0, 0
+                uuid_map = fetch_field_uuids(entity_type, match_entity_field, [r.get(sql_field, "") for r in view])
+                for r in view:
+                    key_val = r.get(sql_field, "")
+                    e_uuid = uuid_map.get(str(key_val))
+                    if not e_uuid:
+                        continue
+                    n_db, n_fs = _delete_entity_files(e_uuid)
+                    total_db += n_db; total_fs += n_fs
+                from backend.copy_pipeline import clear_manifest
+                clear_manifest(prefix=f"file:{sid}:{src_table}:")
+                st.success(f"已删除 file {total_db} 条，清理目录 {total_fs} 个")
+        if do_rm_cfg:
+            from backend.db import delete_file_map_cfg_by_id
+            ok = delete_file_map_cfg_by_id(sel_id)
+            if ok:
+                st.success("已删除配置")
+                st.rerun()
+            else:
+                st.info("未找到配置")
+
+    st.subheader("🧹 按 doc_type 批量删除")
+    doc_type_del = st.text_input("doc_type", key="file_doc_type_del2")
+    cols_doc = st.columns([1,1])
+    with cols_doc[0]:
+        btn_doc_preview = st.button("预览数量", key="file_doc_type_preview")
+    with cols_doc[1]:
+        btn_doc_delete = st.button("按 doc_type 删除", key="file_doc_type_del_btn2")
+    if btn_doc_preview:
+        dtv = str(doc_type_del or "").strip()
+        if not dtv:
+            st.warning("请输入 doc_type")
+        else:
+            from backend.sql_utils import get_conn
+            conn = get_conn()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT COUNT(1) FROM file WHERE doc_type=%s", (dtv,))
+                    row = cur.fetchone()
+                    cnt = int(row[0] if row else 0)
+                st.info(f"可删除 file {cnt} 条")
+            except Exception as e:
+                st.error(f"预览失败：{e}")
+            finally:
+                conn.close()
+    if btn_doc_delete:
+        dtv = str(doc_type_del or "").strip()
+        if not dtv:
+            st.warning("请输入 doc_type")
+        else:
+            from backend.sql_utils import get_conn
+            import shutil
+            from pathlib import Path
+            conn = get_conn()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT uuid,file FROM file WHERE doc_type=%s", (dtv,))
+                    rows = cur.fetchall() or []
+                    paths = []
+                    for r in rows:
+                        try:
+                            rel = str(r[1] or "")
+                            parts = rel.split("/")
+                            if len(parts) >= 7 and parts[0] == ".." and parts[1] == "upload" and parts[2] == "files":
+                                sid_v = parts[3]
+                                yyyymm_v = parts[4]
+                                fdir = parts[5]
+                                base = Path(_get_upload_root()) / sid_v / yyyymm_v / fdir
+                                paths.append(base)
+                            elif len(parts) >= 5 and parts[1] == "upload":
+                                sid_v = parts[2]
+                                fuid_v = parts[3]
+                                base = Path(_get_upload_root()).parent / sid_v / fuid_v
+                                paths.append(base)
+                        except Exception:
+                            continue
+                    for p in paths:
+                        try:
+                            shutil.rmtree(p, ignore_errors=True)
+                        except Exception:
+                            pass
+                    cur.execute("DELETE FROM file WHERE doc_type=%s", (dtv,))
+                conn.commit()
+                st.success(f"已删除 doc_type={dtv} 的 file {len(rows)} 条，并清理本地目录 {len(paths)} 个")
+            except Exception as e:
+                conn.rollback(); st.error(f"删除失败：{e}")
+            finally:
+                conn.close()
+
+def render_file_mgmt():
+    st.title("📃 文件管理")
+    render_top_tabs('file')
+    sid = st.session_state.get("current_sid", SID)
+    st.subheader("文件映射管理")
+    tabs = st.tabs(["文件写入实体(老版)", "文件归档(新版)"])
+    with tabs[0]:
+        render_file_mgmt_legacy()
+    with tabs[1]:
+        render_doc_dir_tab()
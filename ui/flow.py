@@ -0,0 +1,2037 @@
+# ui/flow.py
+# -*- coding: utf-8 -*-
+"""
+流程管理页（🧰）：流程实例索引、实例 JSON 预览、流程入库 bundle 构建与批量入库。
+"""
+import json
+import time
+from typing import Any, Dict
+
+import streamlit as st
+
+from backend.db import (
+    get_flow_entity_map, get_table_script, get_target_entity, list_flow_entity_maps, save_table_mapping,
+    upsert_flow_entity_map
+)
+from backend.mapper_core import _extract_entity_meta, _upsert_entity_row, apply_record_mapping
+from backend.progress import Progress
+from ui.common import (
+    SID, _enrich_nodes_with_user, _parse_all_inserts, _pick_cols, _read_sql_rows, _st_progress_sink,
+    _user_dept_maps, render_top_tabs
+)
+
+
+def _flow_index():
+    """当前源（本地 dump / 源库）的流程实例索引，底层数据变化时自动重建"""
+    from backend.flow_store import flow_index
+    from backend.source_store import source_conn_key
+    if st.session_state.get("source_input_kind") == "db":
+        return flow_index("db", source_conn_key(st.session_state.source_db_cfg))
+    return flow_index("file", "")
+
+def _flow_source_index(tbl: str):
+    """业务源表按 process_instance_id 的索引（与 _parse_all_inserts 行一致）"""
+    from backend.flow_store import source_row_index
+    from backend.source_store import source_conn_key
+    if st.session_state.get("source_input_kind") == "db":
+        return source_row_index("db", source_conn_key(st.session_state.source_db_cfg), tbl)
+    return source_row_index("file", "", tbl)
+
+def _flow_import_initializer():
+    """流程入库工作线程挂载当前 Streamlit 会话上下文（线程内需读取 session_state）"""
+    try:
+        import threading
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except Exception:
+        return None
+    def _init():
+        try:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        except Exception:
+            pass
+    return _init
+
+def _flow_import_prewarm():
+    """在脚本线程内预先构建共享索引/映射，避免工作线程并发重复构建"""
+    _flow_index()
+    _user_dept_maps()
+    for fm in list_flow_entity_maps() or []:
+        if fm.get("source_table"):
+            _flow_source_index(fm.get("source_table"))
+
+def _render_flow_import_result(stats, label: str = "批量入库"):
+    msg = f"{label}完成：写入 {stats.get('wrote', 0)} 条，耗时 {stats.get('elapsed', 0):.1f} 秒（{stats.get('rate', 0):.1f} 实例/秒）"
+    if stats.get("cancelled"):
+        msg += "（已中断）"
+    if stats.get("failed"):
+        st.warning(msg + f"，失败 {stats['failed']} 个实例")
+        with st.expander("失败明细"):
+            st.dataframe(stats.get("failures") or [], use_container_width=True)
+    else:
+        st.success(msg)
+
+# 综合构建流程实例摘要（基于本地 SQL 文件）
+def _build_instance_rows():
+    from backend.flow_store import def_code_of as _code_of
+    fidx = _flow_index()
+    hi = fidx["procinst_rows"]
+    def_by_code = fidx["def_by_code"]
+    cat_name_by_code = fidx["cat_name"]
+    g_task = fidx["by_pid"]["act_ru_task"]
+    g_exec = fidx["by_pid"]["act_ru_execution"]
+    g_var  = fidx["by_pid"]["act_ru_variable"]
+    g_htask= fidx["by_pid"]["act_hi_taskinst"]
+    g_hact = fidx["by_pid"]["act_hi_actinst"]
+    g_copy = fidx["by_pid"]["bpm_process_instance_copy"]
+
+    rows = []
+    for r in hi:
+        pid = r.get("id_", "")
+        def_id = r.get("proc_def_id_", "")
+        code = _code_of(def_id)
+        di = def_by_code.get(code, {})
+        cat_name = cat_name_by_code.get(code, code)
+
+        tasks = g_task.get(pid, [])
+        execs = g_exec.get(pid, [])
+        vars_ = g_var.get(pid, [])
+        htasks= g_htask.get(pid, [])
+        hacts = g_hact.get(pid, [])
+        cps   = g_copy.get(pid, [])
+
+        open_names = sorted({t.get("name_","") for t in tasks if t.get("name_")})
+        assignees  = sorted({t.get("assignee_","") for t in tasks if t.get("assignee_")})
+        act_ids    = sorted({e.get("act_id_","") for e in execs if e.get("act_id_")})
+
+        # 变量摘要：仅取前 5 个 name_=value
+        def _val(v):
+            return v.get("text_") or v.get("double_") or v.get("long_") or ""
+        var_pairs = [f"{v.get('name_','')}={_val(v)}" for v in vars_ if v.get("name_")]
+        var_summary = ", ".join(var_pairs[:5])
+
+        users = sorted({x.get("user_id") for x in cps if x.get("user_id")})
+
+        rows.append({
+            "proc_inst_id": pid,
+            "proc_def_id": def_id,
+            "def_code": code,
+            "category": cat_name,
+            "flow_define_name": r.get("name_",""),
+            "business_key": r.get("business_key_",""),
+            "start_time": r.get("start_time_",""),
+            "end_time": r.get("end_time_",""),
+            "open_task_count": len(tasks),
+            "open_task_names": ",".join(open_names),
+            "open_assignees": ",".join(assignees),
+            "current_activities": ",".join(act_ids),
+            "hist_task_count": len(htasks),
+            "hist_act_count": len(hacts),
+            "copy_count": len(cps),
+            "copy_users": ",".join(map(str, users)),
+            "def_desc": di.get("description",""),
+            "form_type": di.get("form_type",""),
+            "form_id": di.get("form_id",""),
+            "vars": var_summary,
+        })
+    # 按开始时间倒序
+    rows.sort(key=lambda x: str(x.get("start_time","")), reverse=True)
+    return rows
+
+# 构建单个流程实例的 JSON 预览（基于 Flowable/Activiti act_* 与 bpm_* 本地 SQL）
+def _build_instance_json(proc_inst_id: str) -> Dict[str, Any]:
+    pid = str(proc_inst_id or "").strip()
+    if not pid:
+        return {}
+    from backend.flow_store import def_code_of as _code_of, instance_rows
+    fidx = _flow_index()
+    hist = fidx["procinst"].get(pid)
+    if not hist:
+        return {"procInstId": pid, "error": "not found in act_hi_procinst"}
+
+    def_id = hist.get("proc_def_id_", "")
+    def_code = _code_of(def_id)
+
+    # 运行时/历史明细（按实例 id 索引）
+    ru_task = instance_rows(fidx, "act_ru_task", pid)
+    ru_exec = instance_rows(fidx, "act_ru_execution", pid)
+    ru_var  = instance_rows(fidx, "act_ru_variable", pid)
+    hi_task = instance_rows(fidx, "act_hi_taskinst", pid)
+    hi_act  = instance_rows(fidx, "act_hi_actinst", pid)
+    hi_var  = instance_rows(fidx, "act_hi_varinst", pid)
+    hi_cmts = instance_rows(fidx, "act_hi_comment", pid)
+    copies  = instance_rows(fidx, "bpm_process_instance_copy", pid)
+
+    # 定义与分类
+    def_info = fidx["def_by_code"].get(def_code, {})
+    cat_name_by_code = fidx["cat_name"]
+    category_name = cat_name_by_code.get(def_code, def_code)
+    flow_define_name = str(hist.get("name_", "") or "")
+
+    # 表单信息
+    form_preview = {}
+    form_type = str(def_info.get("form_type",""))
+    form_id = def_info.get("form_id")
+    if form_type == "10" and form_id:
+        fi = fidx["form_by_id"].get(str(form_id))
+        if fi:
+            form_preview = {
+                "id": fi.get("id",""),
+                "name": fi.get("name",""),
+                "status": fi.get("status",""),
+                "remark": fi.get("remark",""),
+                "fields": fi.get("fields",""),
+                "conf": fi.get("conf",""),
+            }
+    else:
+        form_preview = {
+            "form_type": form_type,
+            "form_id": form_id or "",
+            "form_fields": def_info.get("form_fields",""),
+            "form_conf": def_info.get("form_conf",""),
+        }
+
+    # 变量归并为 name -> value
+    def _var_value(v):
+        return v.get("text_") or v.get("double_") or v.get("long_") or ""
+    runtime_vars = {str(v.get("name_","")): _var_value(v) for v in ru_var if v.get("name_")}
+    hist_vars    = {str(v.get("name_","")): _var_value(v) for v in hi_var if v.get("name_")}
+
+    # 运行时任务与执行树精选字段
+    run_tasks = _pick_cols(ru_task, ["id_","name_","assignee_","owner_","create_time_","due_date_","category_","priority_","proc_inst_id_"])
+    run_execs = _pick_cols(ru_exec, ["id_","parent_id_","super_exec_","act_id_","is_active_","is_concurrent_","is_scope_","proc_inst_id_"])
+    # 历史任务与节点轨迹精选字段
+    hist_tasks = _pick_cols(hi_task, [
+        "id_","task_id_","name_","assignee_","owner_",
+        "start_time_","end_time_","duration_",
+        "delete_reason_","proc_inst_id_","parent_task_id_"
+    ])
+    hist_acts  = _pick_cols(hi_act,  ["id_","act_id_","act_name_","assignee_","start_time_","end_time_","task_id_","proc_inst_id_"])
+    
+    # 历史变量完整列表（用于后续按 task_id 查找）
+    hist_vars_list = [
+        {
+            "name_": v.get("name_", ""),
+            "value": _var_value(v),
+            "task_id_": v.get("task_id_", ""),
+            "execution_id_": v.get("execution_id_", ""),
+            "create_time_": v.get("create_time_", ""),
+            "last_updated_time_": v.get("last_updated_time_", ""),
+        }
+        for v in hi_var
+    ]
+
+    # 抄送记录精选字段
+    copy_rows = _pick_cols(copies, ["id","user_id","start_user_id","task_id","task_name","category","process_instance_id","process_instance_name","create_time","update_time"]) 
+
+    # 汇总 JSON
+    # 活动流水线（按开始时间排序）
+    pipeline = []
+    # 实例内二级索引：task id / execution id -> 行（保持原有顺序与“取首条”语义）
+    def _group_by(rows, key):
+        g = {}
+        for r in rows:
+            g.setdefault(str(r.get(key, "")), []).append(r)
+        return g
+    hi_task_by_id = _group_by(hi_task, "id_")
+    ru_task_by_id = _group_by(ru_task, "id_")
+    cmts_by_task = _group_by(hi_cmts, "task_id_")
+    ru_var_by_task = _group_by(ru_var, "task_id_")
+    ru_var_by_exec = _group_by(ru_var, "execution_id_")
+    hi_var_by_task = _group_by(hi_var, "task_id_")
+    hi_var_by_exec = _group_by(hi_var, "execution_id_")
+    acts_sorted = sorted(hi_act, key=lambda a: str(a.get("start_time_", "") or ""))
+    for a in acts_sorted:
+        ex = str(a.get("execution_id_", ""))
+        tid = str(a.get("task_id_", ""))
+        activity = {
+            "id_": a.get("id_", ""),
+            "act_id_": a.get("act_id_", ""),
+            "act_name_": a.get("act_name_", ""),
+            "act_type_": a.get("act_type_", ""),
+            "assignee_": a.get("assignee_", ""),
+            "start_time_": a.get("start_time_", ""),
+            "end_time_": a.get("end_time_", ""),
+            "duration_": a.get("duration_", ""),
+            "task_id_": tid,
+        }
+        task_detail = (hi_task_by_id.get(tid) or [None])[0]
+        if not task_detail:
+            task_detail = (ru_task_by_id.get(tid) or [None])[0]
+        comments = [
+            {
+                "id_": c.get("id_", ""),
+                "time_": c.get("time_", ""),
+                "user_id_": c.get("user_id_", ""),
+                "action_": c.get("action_", ""),
+                "message_": c.get("message_", ""),
+            }
+            for c in cmts_by_task.get(tid, [])
+        ]
+        rv_list = []
+        if tid:
+            rv_list.extend(ru_var_by_task.get(tid, []))
+        rv_list.extend(ru_var_by_exec.get(ex, []))
+
+        var_run = [
+            {
+                "name_": v.get("name_", ""),
+                "value": _var_value(v),
+                "create_time_": v.get("create_time_", ""),
+                "last_updated_time_": v.get("last_updated_time_", ""),
+            }
+            for v in rv_list
+        ]
+
+        hv_list = []
+        if tid:
+            hv_list.extend(hi_var_by_task.get(tid, []))
+        hv_list.extend(hi_var_by_exec.get(ex, []))
+
+        var_hist = [
+            {
+                "name_": v.get("name_", ""),
+                "value": _var_value(v),
+                "create_time_": v.get("create_time_", ""),
+                "last_updated_time_": v.get("last_updated_time_", ""),
+            }
+            for v in hv_list
+        ]
+        pipeline.append({
+            "activity": activity,
+            "task": task_detail or {},
+            "comments": comments,
+            "variables": {"runtime": var_run, "history": var_hist},
+        })
+
+    # segments：将 sequenceFlow / exclusiveGateway 归入前后节点之间的“经由”链路，使关系更直观
+    def _is_node(act_type: str) -> bool:
+        t = (act_type or "").lower()
+        return t in ("startevent", "usertask", "endevent")
+    def _is_via(act_type: str) -> bool:
+        t = (act_type or "").lower()
+        return t in ("sequenceflow", "exclusivegateway")
+    def _fmt_node(a: Dict[str, Any]) -> Dict[str, Any]:
+        if not a:
+            return {}
+        return {
+            "key": a.get("act_id_",""),
+            "name": a.get("act_name_",""),
+            "type": a.get("act_type_",""),
+            "assignee": a.get("assignee_",""),
+            "start": a.get("start_time_",""),
+            "end": a.get("end_time_",""),
+            "duration": a.get("duration_",""),
+        }
+    def _fmt_via(a: Dict[str, Any]) -> Dict[str, Any]:
+        if not a:
+            return {}
+        return {
+            "key": a.get("act_id_",""),
+            "type": a.get("act_type_",""),
+            "name": a.get("act_name_",""),
+            "time": a.get("start_time_",""),
+        }
+    def _trim_task(t: Dict[str, Any]) -> Dict[str, Any]:
+        if not t:
+            return {}
+        keys = [
+            "id_","parent_task_id_",
+            "name_","assignee_","owner_","start_time_","end_time_",
+            "duration_","priority_","category_","delete_reason_",
+        ]
+        return {k: t.get(k, "") for k in keys}
+    def _values_imp(entry: Dict[str, Any]) -> Dict[str, Any]:
+        out = {}
+        vv = []
+        vhist = entry.get("variables", {}).get("history", [])
+        vrun  = entry.get("variables", {}).get("runtime", [])
+        vv.extend(vhist or [])
+        vv.extend(vrun or [])
+        def getv(name: str):
+            for v in vv:
+                if str(v.get("name_","")) == name:
+                    return v.get("value","")
+            return ""
+        out["TASK_STATUS"] = getv("TASK_STATUS")
+        out["TASK_REASON"] = getv("TASK_REASON")
+        out["loopCounter"] = getv("loopCounter")
+        assg = ""
+        for v in vv:
+            n = str(v.get("name_",""))
+            if n.endswith("_assignee"):
+                assg = v.get("value","")
+                break
+        out["assignee_var"] = assg
+        return out
+    def _last_comment(comments: Dict[str, Any]) -> Dict[str, Any]:
+        cs = list(comments or [])
+        if not cs:
+            return {}
+        cs.sort(key=lambda c: str(c.get("time_","")))
+        last = cs[-1]
+        return {"time": last.get("time_",""), "user_id": last.get("user_id_",""), "message": last.get("message_",""), "action": last.get("action_","")}
+    def _actors(entry: Dict[str, Any]) -> Dict[str, Any]:
+        s = set()
+        act = entry.get("activity", {})
+        t = entry.get("task", {})
+        s.add(str(act.get("assignee_","")))
+        s.add(str(t.get("assignee_","")))
+        s.add(str(t.get("owner_","")))
+        for c in entry.get("comments", []) or []:
+            s.add(str(c.get("user_id_","")))
+        s = {x for x in s if x and x != ""}
+        return {"ids": sorted(list(s))}
+    segments = []
+    i = 0
+    while i < len(pipeline):
+        seg_from_entry = pipeline[i]
+        a = seg_from_entry["activity"]
+        if not _is_node(a.get("act_type_","")):
+            i += 1
+            continue
+        via = []
+        j = i + 1
+        while j < len(pipeline):
+            aj = pipeline[j]["activity"]
+            if _is_via(aj.get("act_type_","")):
+                via.append(_fmt_via(aj))
+                j += 1
+                continue
+            # 遇到下一节点则结束当前分段
+            break
+        seg_to_entry = pipeline[j] if j < len(pipeline) else {"activity": {}}
+        to_node = seg_to_entry.get("activity", {})
+        for k in range(len(via)):
+            if (via[k].get("type", "")).lower() == "sequenceflow" and not via[k].get("name"):
+                guess = next((x.get("act_name_") for x in hi_act if str(x.get("act_id_", "")) == via[k].get("key", "") and x.get("act_name_")), "")
+                if not guess:
+                    guess = to_node.get("act_name_", "")
+                via[k]["name"] = guess or via[k].get("name", "")
+        segments.append({
+            "from": _fmt_node(a),
+            "via": via,
+            "to": _fmt_node(to_node) if to_node else {},
+            "to_task": _trim_task(seg_to_entry.get("task", {})) if to_node else {},
+            "to_values": _values_imp(seg_to_entry) if to_node else {},
+            "to_comment_last": _last_comment(seg_to_entry.get("comments", []) or []) if to_node else {},
+            "to_actor_ids": _actors(seg_to_entry).get("ids", []) if to_node else [],
+        })
+        i = j if j > i else i + 1
+
+    # 任务ID → 最近一条批注
+    comments_by_task = {}
+    try:
+        tids = {str(t.get("id_","")) for t in hi_task if t.get("id_")}
+        for tid in tids:
+            cs = cmts_by_task.get(tid, [])
+            comments_by_task[tid] = _last_comment(cs)
+    except Exception:
+        comments_by_task = {}
+
+    out = {
+        "procInstId": pid,
+        "procDefId": def_id,
+        "defCode": def_code,
+        "processName": category_name,
+        "flow_define_name": flow_define_name,
+        "businessKey": hist.get("business_key_",""),
+        "startTime": hist.get("start_time_",""),
+        "endTime": hist.get("end_time_",""),
+        "starterUserId": hist.get("start_user_id_",""),
+        "definition": {
+            "description": def_info.get("description",""),
+            "modelId": def_info.get("model_id",""),
+            "icon": def_info.get("icon",""),
+            "formType": form_type,
+            "formId": form_id or "",
+            "categoryName": category_name,
+            "flowDefineName": flow_define_name,
+            "formPreview": form_preview,
+        },
+        "runtime": {
+            "tasks": run_tasks,
+            "executions": run_execs,
+            "variables": runtime_vars,
+        },
+        "history": {
+            "tasks": hist_tasks,
+            "activities": hist_acts,
+            "variables": hist_vars,
+            "all_variables": hist_vars_list,
+            "comments_by_task": comments_by_task,
+        },
+        "copies": copy_rows,
+        "pipeline": pipeline,
+        "segments": segments,
+    }
+    return out
+
+def _build_flow_import_bundle(pid: str, match: Dict[str, Any] = None, map_record: bool = True) -> Dict[str, Any]:
+    """
+    构建单个流程实例的入库数据；match 为业务源表中对应记录（不传则按 process_instance_id 索引查找）。
+    map_record=False 时不再对 match 执行字段映射（调用方已映射，只需要流程字段）。
+    """
+    data = _build_instance_json(pid)
+    rt_vars_list = data.get("runtime", {}).get("variables", [])
+    hi_vars_list = data.get("history", {}).get("variables", [])
+    def _var_map(vs):
+        if isinstance(vs, dict):
+            return vs
+        m = {}
+        for v in vs or []:
+            if isinstance(v, dict):
+                n = str(v.get("name_",""))
+                if n:
+                    m[n] = v.get("value","")
+        return m
+    rt_vars_map = _var_map(rt_vars_list)
+    hi_vars_map = _var_map(hi_vars_list)
+    biz_name = str(rt_vars_map.get("businessName") or hi_vars_map.get("businessName") or "")
+    def _fmt_duration_auto(v):
+        if v in (None, ""):
+            return ""
+        s = str(v).strip()
+        try:
+            x = float(s)
+        except Exception:
+            return s
+        secs = x / 1000.0 if x >= 1000 else x
+        secs = int(secs)
+        d = secs // 86400; secs %= 86400
+        h = secs // 3600; secs %= 3600
+        m = secs // 60; secs %= 60
+        parts = []
+        if d: parts.append(f"{d} 天")
+        if h: parts.append(f"{h} 小时")
+        if m: parts.append(f"{m} 分钟")
+        if secs and not parts:
+            parts.append(f"{secs} 秒")
+        return " ".join(parts) or "0 秒"
+    def _fmt_time(v):
+        if v in (None, ""):
+            return ""
+        s = str(v).strip()
+        try:
+            x = float(s)
+            ms = int(x) if x >= 1e11 else int(x * 1000)
+            from datetime import datetime
+            dt = datetime.fromtimestamp(ms / 1000.0)
+            return dt.strftime("%Y-%m-%d %H:%M:%S")
+        except Exception:
+            try:
+                from datetime import datetime
+                t = s.replace("T", " ").replace("Z", "")
+                dt = datetime.fromisoformat(t)
+                return dt.strftime("%Y-%m-%d %H:%M:%S")
+            except Exception:
+                return s
+    def _ts_num(v):
+        s = str(v or "").strip()
+        if not s:
+            return 0
+        try:
+            x = float(s)
+            ms = int(x) if x >= 1e11 else int(x * 1000)
+            return ms
+        except Exception:
+            try:
+                from datetime import datetime
+                t = s.replace("T", " ").replace("Z", "")
+                return int(datetime.fromisoformat(t).timestamp() * 1000)
+            except Exception:
+                return 0
+    segs = data.get("segments", []) or []
+    nodes = []
+    for idx in range(len(segs)):
+        seg = segs[idx]
+        frm = seg.get("from", {})
+        via = seg.get("via", []) or []
+        to_ = seg.get("to", {})
+        if idx == 0:
+            nodes.append({
+                "id": frm.get("key",""),
+                "type": frm.get("type",""),
+                "name": frm.get("name",""),
+                "assignee": frm.get("assignee",""),
+                "start": frm.get("start",""),
+                "end": frm.get("end",""),
+                "duration": frm.get("duration",""),
+                "next": {"to": to_.get("key",""), "via": via},
+            })
+        next_obj = {}
+        if idx + 1 < len(segs):
+            nxt = segs[idx + 1]
+            nxt_from = nxt.get("from", {})
+            if nxt_from.get("key") == to_.get("key"):
+                next_obj = {"to": nxt.get("to", {}).get("key",""), "via": nxt.get("via", []) or []}
+        lc = seg.get("to_comment_last", {})
+        nodes.append({
+            "id": to_.get("key",""),
+            "type": to_.get("type",""),
+            "name": to_.get("name",""),
+            "assignee": to_.get("assignee",""),
+            "start": to_.get("start",""),
+            "end": to_.get("end",""),
+            "duration": to_.get("duration",""),
+            "lastComment": {"time": lc.get("time",""), "userId": lc.get("user_id",""), "message": lc.get("message","")},
+            "task": seg.get("to_task", {}) or {},
+            "value": seg.get("to_values", {}) or {},
+            "actor_ids": seg.get("to_actor_ids", []) or [],
+            "next": next_obj,
+        })
+    nodes = _enrich_nodes_with_user(nodes)
+    assignees = {}
+    for seg in segs:
+        k = seg.get("to", {}).get("key","")
+        a = seg.get("to_task", {}).get("assignee_","")
+        if k:
+            assignees[k] = a
+    history_vars = {
+        "processStatus": str(hi_vars_map.get("processStatus","")),
+        "taskStatus": str(hi_vars_map.get("taskStatus") or hi_vars_map.get("TASK_STATUS") or ""),
+        "taskReason": str(hi_vars_map.get("taskReason") or hi_vars_map.get("TASK_REASON") or ""),
+        "nrOfInstances": str(hi_vars_map.get("nrOfInstances","")),
+        "nrOfActiveInstances": str(hi_vars_map.get("nrOfActiveInstances","")),
+        "nrOfCompletedInstances": str(hi_vars_map.get("nrOfCompletedInstances","")),
+        "isSign": str(hi_vars_map.get("isSign","")),
+        "assignees": assignees,
+    }
+    starter_code = str(data.get("starterUserId") or ((nodes[0] or {}).get("assignee") or ((nodes[0] or {}).get("task") or {}).get("assignee_") or "")).strip() if nodes else str(data.get("starterUserId") or "")
+    preview_obj = {
+        "meta": {
+            "businessName": biz_name,
+            "processName": data.get("defCode",""),
+            "flowDefineName": data.get("flow_define_name",""),
+            "startTime": data.get("startTime",""),
+            "endTime": data.get("endTime",""),
+            "icon": data.get("definition", {}).get("icon", ""),
+            "starterCode": starter_code,
+        },
+        "variables": {"runtime": {}, "history": history_vars},
+        "nodes": nodes,
+    }
+    def _flow_table(flow_name: str):
+        fm = get_flow_entity_map(flow_name)
+        return fm.get("source_table") or {
+            "合伙协议": "ct_partner_agreement",
+            "募集协议审批流程": "ct_fund_base_info",
+            "托管协议流程审批": "ct_fund_custody_agmt",
+            "其他流程": "ct_agreement_other",
+            "项目合规性审查": "ct_project_base_info",
+            "基金出资记录": "ct_invest_record",
+            "项目退出": "ct_fund_quit_record",
+            "会议管理审批流程": "ct_meeting_manage",
+            "业务审批": "ct_fund_meet_manage",
+            "基金公示审核": "ct_fund_publicity_review",
+            "股权直投业务审批": "ct_project_meet_manage",
+            "股权直投，其他协议": "ct_project_agreement_other",
+        }.get(flow_name)
+    fields_obj = {}
+    fdef = str(data.get("flow_define_name",""))
+    tbl = _flow_table(fdef)
+    entity = ""
+    out_name = ""
+    type_override = ""
+    used_match = None
+    # 默认实体类型来自流程映射，即使没有样例匹配
+    fm0 = get_flow_entity_map(fdef)
+    if fm0.get("target_entity"):
+        entity = fm0.get("target_entity")
+    if tbl:
+        mm = match if match is not None else _flow_source_index(tbl).get(str(pid))
+        if mm and map_record:
+            script = get_table_script(tbl, entity or None) or ""
+            mapped, out_name, type_override = apply_record_mapping(tbl, mm, script, target_entity=entity or "")
+            _ = _extract_entity_meta(mapped)
+            fields_obj = mapped or {}
+        if mm:
+            used_match = mm
+    src = json.dumps(preview_obj, ensure_ascii=False)
+    esc = src.replace("'", "''")
+    fields_obj = fields_obj or {}
+    # fields_obj["source_flow"] = esc
+    parsed = preview_obj
+    meta_info = parsed.get("meta", {}) or {}
+    try:
+        stxt = _fmt_time(meta_info.get("startTime", ""))
+        fields_obj["sqsj"] = stxt
+    except Exception:
+        fields_obj["sqsj"] = ""
+    try:
+        etxt = _fmt_time(meta_info.get("endTime", ""))
+        fields_obj["jssj"] = etxt
+    except Exception:
+        fields_obj["jssj"] = ""
+    fields_obj["lcbh"] = str(pid or "")
+    hist = (parsed.get("variables", {}) or {}).get("history", {}) or {}
+    nodes_md = []
+    nds_sorted = []
+    nodes_src = (parsed.get("nodes", []) or [])
+    for nd in nodes_src:
+        t = nd.get("task", {}) or {}
+        name0 = (t.get("name_") or nd.get("name", "") or "").strip()
+        if name0 in ("开始", "结束"):
+            continue
+        nds_sorted.append(nd)
+    if not nds_sorted and nodes_src:
+        nds_sorted = nodes_src
+    # 排序：从新到旧（开始时间优先，降序）
+    nds_sorted.sort(key=lambda n: _ts_num((n.get("task") or {}).get("start_time_") or n.get("start", "") or (n.get("task") or {}).get("end_time_") or n.get("end", "")), reverse=True)
+    # 追加未出现在节点中的纯任务（如仅在 act_hi_taskinst 存在的子任务）
+    hist_tasks_list = (data.get("history", {}) or {}).get("tasks", []) or []
+    all_vars_list = (data.get("history", {}) or {}).get("all_variables", [])
+    present_ids = {str(((nd.get("task") or {}).get("id_")) or "").strip() for nd in nds_sorted}
+    extra_nodes = []
+    cm_map = ((data.get("history", {}) or {}).get("comments_by_task", {}) or {})
+    for ht in hist_tasks_list:
+        tid = str(ht.get("id_") or "").strip()
+        if not tid or tid in present_ids:
+            continue
+
+        task_vars = {}
+        if tid:
+            matched_vars = [v for v in all_vars_list if str(v.get("task_id_") or "") == tid]
+            for v in matched_vars:
+                nm = str(v.get("name_") or "")
+                if nm:
+                    task_vars[nm] = v.get("value")
+
+        extra_nodes.append({
+            "id": ht.get("task_id_", ""),
+            "type": "userTask",
+            "name": ht.get("name_", ""),
+            "assignee": ht.get("assignee_", ""),
+            "start": ht.get("start_time_", ""),
+            "end": ht.get("end_time_", ""),
+            "duration": ht.get("duration_", ""),
+            "lastComment": cm_map.get(tid, {}) or {},
+            "task": {
+                "id_": ht.get("id_", ""),
+                "parent_task_id_": ht.get("parent_task_id_", ""),
+                "name_": ht.get("name_", ""),
+                "assignee_": ht.get("assignee_", ""),
+                "owner_": ht.get("owner_", ""),
+                "start_time_": ht.get("start_time_", ""),
+                "end_time_": ht.get("end_time_", ""),
+                "duration_": ht.get("duration_", ""),
+                "priority_": ht.get("priority_", ""),
+                "category_": ht.get("category_", ""),
+                "delete_reason_": ht.get("delete_reason_", ""),
+            },
+            "value": task_vars,
+            "actor_ids": [str(ht.get("assignee_", ""))],
+            "next": {},
+        })
+    if extra_nodes:
+        nds_sorted.extend(extra_nodes)
+        nds_sorted = _enrich_nodes_with_user(nds_sorted)
+    # 父子任务展示：优先展示父任务，再展示其子任务
+    task_map = {}
+    for nd in nds_sorted:
+        t = nd.get("task") or {}
+        tid = str(t.get("id_") or "").strip()
+        if tid:
+            task_map[tid] = nd
+    from collections import defaultdict
+    children_map = defaultdict(list)
+    for nd in nds_sorted:
+        t = nd.get("task") or {}
+        p = str(t.get("parent_task_id_") or "").strip()
+        if p:
+            children_map[p].append(nd)
+    visited = set()
+
+    import re
+    def _split_msg(s: str):
+        s0 = (s or '').strip()
+        inline_extra = ''
+        suggest = ''
+        parts = re.split(r"[，,]?\s*(?:理由为|原因是)\s*[:：]", s0)
+        if len(parts) >= 2:
+            inline_extra = (parts[0] or '').strip().rstrip('，。')
+            suggest = (parts[1] or '').strip().rstrip('，。')
+            return inline_extra, suggest
+        suggest = s0
+        return inline_extra, suggest
+
+    def _fmt_block(nd: Dict[str, Any], label_child: bool = False):
+        t = nd.get("task", {}) or {}
+        lc = nd.get("lastComment", {}) or {}
+        rawm = (str(lc.get('message') or '') + ' ' + str(t.get('delete_reason_') or '')).lower()
+        mk = '⚪'
+        for kw in ['同意','通过','批准','审核通过']:
+            if kw in rawm:
+                mk = '🟢'
+                break
+        if mk == '⚪':
+            for kw in ['驳回','退回','拒绝','不通过','不同意']:
+                if kw in rawm:
+                    mk = '🔴'
+                    break
+        task_name = (t.get('name_') or nd.get('name','') or '').strip()
+        assignee = (t.get('assignee_') or nd.get('assignee','') or '').strip()
+        start_txt = _fmt_time(t.get('start_time_') or nd.get('start',''))
+        end_txt = _fmt_time(t.get('end_time_') or nd.get('end',''))
+        dur_text = _fmt_duration_auto(t.get('duration_')) or _fmt_duration_auto(nd.get('duration'))
+        msg = (lc.get('message') or '').strip()
+        inline_extra, msg_suggest = _split_msg(msg)
+
+        # 优先使用 TASK_REASON，如果没有则回退到 message 解析
+        tr = ""
+        v_tmp = nd.get("value") or {}
+        if isinstance(v_tmp, dict):
+            tr = str(v_tmp.get("TASK_REASON") or "").strip()
+        
+        suggest_text = tr if tr else msg_suggest
+
+        if (not any([assignee, start_txt, end_txt, (dur_text or ''), msg])) and (task_name in ('结束','')):
+            return []
+        status_text = ("审批通过" if mk=='🟢' else ("审批未通过" if mk=='🔴' else ""))
+        if (not str(meta_info.get('endTime','')).strip()) and mk == '⚪':
+            status_text = "审批中"
+        # 单行状态：父任务用“审批任务：xxx”，子任务用“xxx→子任务”
+        header = (f"**审批任务：{task_name} {mk}{(inline_extra or status_text)}**" if not label_child
+                  else f"**{task_name}→子任务 {mk}{(inline_extra or status_text)}**")
+        out = [header, ""]
+        av = str(nd.get("assignee_val") or "").strip()
+        dp = str(nd.get("dept") or "").strip()
+        disp = (f"{av}（{dp}）" if av and dp else (av or assignee))
+        if disp:
+            out.append(f"审批人：{disp}")
+            out.append("")
+        line = []
+        if start_txt:
+            line.append(f"创建时间：{start_txt}")
+        if end_txt:
+            line.append(f"审批时间： {end_txt}")
+        if dur_text:
+            line.append(f"耗时： {dur_text}")
+        if line:
+            out.append(" ".join(line))
+            out.append("")
+        out.append(f"审批建议：{suggest_text}" if suggest_text else "审批建议：")
+        out.append("")
+        return out
+
+    for nd in nds_sorted:
+        t = nd.get("task", {}) or {}
+        tid = str(t.get("id_") or "").strip()
+        if not tid or tid in visited:
+            continue
+        parent_id = str(t.get("parent_task_id_") or "").strip()
+        if parent_id:
+            pnd = task_map.get(parent_id)
+            if pnd and str((pnd.get('task') or {}).get('id_') or '').strip() not in visited:
+                nodes_md.extend(_fmt_block(pnd, label_child=False))
+                visited.add(str((pnd.get('task') or {}).get('id_') or '').strip())
+            nodes_md.extend(_fmt_block(nd, label_child=True))
+            visited.add(tid)
+            continue
+        nodes_md.extend(_fmt_block(nd, label_child=False))
+        visited.add(tid)
+        for ch in children_map.get(tid, []):
+            ctid = str((ch.get('task') or {}).get('id_') or '').strip()
+            if ctid and ctid not in visited:
+                nodes_md.extend(_fmt_block(ch, label_child=True))
+                visited.add(ctid)
+    # 最终状态优先来源：流程变量 name_='PROCESS_STATUS'
+    ps_raw = str(hi_vars_map.get("PROCESS_STATUS") or hi_vars_map.get("processStatus") or "").strip()
+    status_map = {'0':'待提交','1':'审批中','2':'审批通过','3':'审批不通过','4':'已取消','5':'已回退'}
+    if ps_raw in status_map:
+        concl = status_map[ps_raw]
+    else:
+        # 兜底：若流程状态缺失，尝试从历史 taskStatus 文本推断
+        hs_raw = str(hist.get('taskStatus','')).strip()
+        code_map = {
+            '0':'待审批','1':'审批中','2':'审批通过','3':'审批不通过','4':'已取消','5':'已回退','6':'委派中','7':'审批通过中','8':'自动抄送'
+        }
+        concl = code_map.get(hs_raw)
+        if not concl:
+            hs = hs_raw.lower()
+            hmk = ''
+            for kw in ['通过','同意','批准','审核通过']:
+                if kw in hs:
+                    hmk = '审核通过'
+                    break
+            if not hmk:
+                for kw in ['驳回','拒绝','不通过','不同意']:
+                    if kw in hs:
+                        hmk = '审核未通过'
+                        break
+            concl = '审批通过' if hmk=='审核通过' else ('审批未通过' if hmk=='审核未通过' else hs_raw)
+    ended_raw = meta_info.get('endTime','')
+    ended_flag = bool(str(ended_raw).strip())
+    head_icon = '🟢' if concl in ('审批通过','审批通过中') else ('🔴' if concl in ('审批未通过','审批不通过') else '⚪')
+    header1 = f"**结束流程：在 {_fmt_time(ended_raw)} 结束**"
+    header2 = f"{head_icon} {concl}"
+    nds = parsed.get("nodes", []) or []
+    umap, _ = _user_dept_maps()
+    scode = str(meta_info.get("starterCode") or "").strip()
+    sname = (umap.get(scode) or {}).get("name", "")
+    starter = sname or (str(nds[0].get("assignee_val") or ((nds[0].get("task") or {}).get("assignee_") or nds[0].get("assignee") or "")).strip() if nds else "")
+    flow_name = str(meta_info.get("flowDefineName") or meta_info.get("processName") or "").strip()
+    start_md = f"**发起流程：【{starter}】在 {_fmt_time(meta_info.get('startTime',''))} 发起【 {flow_name} 】流程**"
+    flow_md = "\n".join(([header1, header2, ""] if ended_flag else []) + nodes_md + ["", start_md]).strip()
+    fields_obj["flow_md"] = flow_md
+    fields_obj["flow_md_label"] = flow_md
+    # 统一补全：确保 data 中包含 name/type/id
+    if (fields_obj.get("__name__") in (None, "")):
+        fields_obj["__name__"] = biz_name
+    type_name = (type_override or entity or tbl or fdef or "flow_instance")
+    fields_obj["name"] = biz_name
+    # 仅针对流程入库：当映射未提供 bt 或为空时，用 businessName 填充
+    if not str(fields_obj.get("bt", "")).strip():
+        fields_obj["bt"] = biz_name
+    fields_obj["type"] = type_name
+    key_field = "id"
+    key_val = fields_obj.get("id") or (used_match or {}).get("id") or str(pid or "")
+    fields_obj["id"] = key_val
+    
+    # 强制回写状态到 fields_obj，供批量入库提取
+    fields_obj["lcspzt"] = concl
+    fields_obj["lcspzt_label"] = concl
+
+    meta = _extract_entity_meta(fields_obj)
+    final_name = biz_name
+    return {
+        "fields_obj": fields_obj,
+        "flow_md": flow_md,
+        "concl": concl,
+        "meta": meta,
+        "type_name": type_name,
+        "key_field": key_field,
+        "key_val": key_val,
+        "final_name": final_name,
+        "tbl": tbl,
+        "entity": entity,
+        "out_name": out_name,
+        "type_override": type_override,
+        "match": used_match,
+    }
+
+def render_flow_mgmt():
+    st.title("🧰 流程管理")
+    render_top_tabs('flow')
+    super_tabs = st.tabs(["表单转换管理", "表单转换入库", "后台数据"])
+    
+    with super_tabs[0]:
+        st.subheader("表单转换管理")
+        kw = st.text_input("关键词（实例ID/业务键/定义编码）", key="form_conv_kw")
+        code_filter = st.text_input("按定义编码过滤（如 ContractApproval）", key="form_conv_code")
+        rows = _build_instance_rows()
+        flow_names_inst = {r.get("flow_define_name","") for r in rows if r.get("flow_define_name")}
+        flow_names_cfg = {x.get("flow_define_name","") for x in list_flow_entity_maps()}
+        flow_names = sorted({s for s in (flow_names_inst | flow_names_cfg) if s})
+        def _fmt_flow_opt(x: str) -> str:
+            if x == "全部" or not x:
+                return x
+            fm = get_flow_entity_map(x)
+            tgt = fm.get("target_entity") or "-"
+            src = fm.get("source_table") or "-"
+            return f"{x}（目标:{tgt} 源表:{src}）"
+        flow_filter = st.selectbox("按流程名称过滤（flowDefineName）", options=["全部"] + flow_names, index=0, key="form_conv_flowname", format_func=_fmt_flow_opt)
+        def _match(r):
+            s = (kw or "").strip().lower()
+            ok_kw = (not s) or s in str(r.get("proc_inst_id","")) .lower() or s in str(r.get("business_key","")) .lower() or s in str(r.get("def_code","")) .lower()
+            ok_code = (not code_filter) or str(r.get("def_code","")) == code_filter
+            ok_flow = (flow_filter in ("全部", "", None)) or str(r.get("flow_define_name","")) == flow_filter
+            return ok_kw and ok_code and ok_flow
+        view = [r for r in rows if _match(r)]
+        ids = [r.get("proc_inst_id") for r in view]
+        pid = st.selectbox("选择实例ID", options=ids or [""], index=0 if ids else None, key="form_conv_pid")
+        if pid:
+            data = _build_instance_json(pid)
+            rt_vars_list = data.get("runtime", {}).get("variables", [])
+            hi_vars_list = data.get("history", {}).get("variables", [])
+            def _var_map(vs):
+                if isinstance(vs, dict):
+                    return vs
+                m = {}
+                for v in vs or []:
+                    if isinstance(v, dict):
+                        n = str(v.get("name_",""))
+                        if n:
+                            m[n] = v.get("value","")
+                return m
+            rt_vars_map = _var_map(rt_vars_list)
+            hi_vars_map = _var_map(hi_vars_list)
+            biz_name = str(rt_vars_map.get("businessName") or hi_vars_map.get("businessName") or "")
+            if st.button("查看预览", key=f"preview_{pid}"):
+                st.session_state["flow_preview_pid"] = pid
+            if st.session_state.get("flow_preview_pid") == pid:
+                segs = data.get("segments", []) or []
+                nodes = []
+                for idx in range(len(segs)):
+                    seg = segs[idx]
+                    frm = seg.get("from", {})
+                    via = seg.get("via", []) or []
+                    to_ = seg.get("to", {})
+                    if idx == 0:
+                        nodes.append({
+                            "id": frm.get("key",""),
+                            "type": frm.get("type",""),
+                            "name": frm.get("name",""),
+                            "assignee": frm.get("assignee",""),
+                            "start": frm.get("start",""),
+                            "end": frm.get("end",""),
+                            "duration": frm.get("duration",""),
+                            "next": {"to": to_.get("key",""), "via": via},
+                        })
+                    next_obj = {}
+                    if idx + 1 < len(segs):
+                        nxt = segs[idx + 1]
+                        nxt_from = nxt.get("from", {})
+                        if nxt_from.get("key") == to_.get("key"):
+                            next_obj = {"to": nxt.get("to", {}).get("key",""), "via": nxt.get("via", []) or []}
+                    lc = seg.get("to_comment_last", {}) or {}
+                    nodes.append({
+                        "id": to_.get("key",""),
+                        "type": to_.get("type",""),
+                        "name": to_.get("name",""),
+                        "assignee": to_.get("assignee",""),
+                        "start": to_.get("start",""),
+                        "end": to_.get("end",""),
+                        "duration": to_.get("duration",""),
+                        "lastComment": {"time": lc.get("time",""), "userId": lc.get("user_id",""), "message": lc.get("message","")},
+                        "task": seg.get("to_task", {}) or {},
+                        "value": seg.get("to_values", {}) or {},
+                        "actor_ids": seg.get("to_actor_ids", []) or [],
+                        "next": next_obj,
+                    })
+                assignees = {}
+                for seg in segs:
+                    k = seg.get("to", {}).get("key","")
+                    a = seg.get("to_task", {}).get("assignee_","")
+                    if k:
+                        assignees[k] = a
+                history_vars = {
+                    "processStatus": str(hi_vars_map.get("processStatus","")),
+                    "taskStatus": str(hi_vars_map.get("taskStatus") or hi_vars_map.get("TASK_STATUS") or ""),
+                    "taskReason": str(hi_vars_map.get("taskReason") or hi_vars_map.get("TASK_REASON") or ""),
+                    "nrOfInstances": str(hi_vars_map.get("nrOfInstances","")),
+                    "nrOfActiveInstances": str(hi_vars_map.get("nrOfActiveInstances","")),
+                    "nrOfCompletedInstances": str(hi_vars_map.get("nrOfCompletedInstances","")),
+                    "isSign": str(hi_vars_map.get("isSign","")),
+                    "assignees": assignees,
+                }
+
+                def _flow_table_map():
+                    return {
+                        "合伙协议": "ct_partner_agreement",
+                        "募集协议审批流程": "ct_fund_base_info",
+                        "托管协议流程审批": "ct_fund_custody_agmt",
+                        "其他流程": "ct_agreement_other",
+                        "项目合规性审查": "ct_project_base_info",
+                        "基金出资记录": "ct_invest_record",
+                        "项目退出": "ct_fund_quit_record",
+                        "会议管理审批流程": "ct_meeting_manage",
+                        "业务审批": "ct_fund_meet_manage",
+                        "基金公示审核": "ct_fund_publicity_review",
+                        "股权直投业务审批": "ct_project_meet_manage",
+                        "股权直投，其他协议": "ct_project_agreement_other",
+                    }
+                def _flow_table(flow_name: str):
+                    fm = get_flow_entity_map(flow_name)
+                    return fm.get("source_table") or _flow_table_map().get(flow_name)
+
+                fields_obj = {}
+                fdef = str(data.get("flow_define_name",""))
+                tbl = _flow_table(fdef)
+                if tbl:
+                    recs = _parse_all_inserts(tbl)
+                    match = next((r for r in recs if str(r.get("process_instance_id","")) == str(pid)), None)
+                    if match:
+                        fm = get_flow_entity_map(fdef)
+                        entity = (fm.get("target_entity") or get_target_entity(tbl) or "")
+                        script = get_table_script(tbl, entity or None) or ""
+                        mapped, _, _ = apply_record_mapping(tbl, match, script, target_entity=entity or "")
+                        _ = _extract_entity_meta(mapped)
+                        fields_obj = mapped or {}
+                preview_obj = {
+                    "meta": {
+                        "businessName": biz_name,
+                        "processName": data.get("defCode",""),
+                        "flowDefineName": data.get("flow_define_name",""),
+                        "startTime": data.get("startTime",""),
+                        "endTime": data.get("endTime",""),
+                        "icon": data.get("definition", {}).get("icon", ""),
+                    },
+                    "variables": {"runtime": {}, "history": history_vars, "fields": fields_obj},
+                    "nodes": nodes,
+                }
+                st.json(preview_obj)
+
+        st.markdown("---")
+        st.subheader("流程字段映射管理")
+        fmap = {
+            "合伙协议": "ct_partner_agreement",
+            "募集协议审批流程": "ct_fund_base_info",
+            "托管协议流程审批": "ct_fund_custody_agmt",
+            "其他流程": "ct_agreement_other",
+            "项目合规性审查": "ct_project_base_info",
+            "基金出资记录": "ct_invest_record",
+            "项目退出": "ct_fund_quit_record",
+            "会议管理审批流程": "ct_meeting_manage",
+            "业务审批": "ct_fund_meet_manage",
+            "基金公示审核": "ct_fund_publicity_review",
+            "股权直投业务审批": "ct_project_meet_manage",
+            "股权直投，其他协议": "ct_project_agreement_other",
+        }
+        for k, v in fmap.items():
+            fm = get_flow_entity_map(k)
+            curr_entity = fm.get("target_entity") or get_target_entity(v) or ""
+            curr_table = fm.get("source_table") or v
+            key_ent = f"flow_entity_custom_{k}"
+            key_src = f"flow_source_custom_{k}"
+            curr_link_entity = (str(st.session_state.get(key_ent) or "").strip() or str(curr_entity or "").strip())
+            curr_link_table = (str(st.session_state.get(key_src) or "").strip() or str(curr_table or "").strip())
+            c1, c2, c3, c4, c5 = st.columns([2, 2, 2, 2, 1])
+            with c1:
+                st.text(k)
+            with c2:
+                link = f"?page=detail&table={curr_link_table}"
+                if curr_link_entity:
+                    link += f"&entity={curr_link_entity}"
+                st.markdown(f'🗂️ <a href="{link}" target="_blank"><code>{curr_link_table}</code></a>', unsafe_allow_html=True)
+            with c3:
+                custom_src = st.text_input("source_table", value=curr_table, key=key_src)
+            with c4:
+                custom_ent = st.text_input("entity", value=curr_entity, key=key_ent)
+            with c5:
+                if st.button("保存", key=f"flow_entity_save_{k}"):
+                    src_val = (str(st.session_state.get(key_src) or custom_src or "").strip())
+                    ent_val = (str(st.session_state.get(key_ent) or custom_ent or "").strip())
+                    if src_val or ent_val:
+                        if ent_val:
+                            save_table_mapping(src_val, ent_val, 0, "")
+                        upsert_flow_entity_map(k, src_val, ent_val)
+                        st.success("已保存流程映射")
+                        st.rerun()
+
+    with super_tabs[1]:
+        st.subheader("表单转换入库")
+        rows = _build_instance_rows()
+        flow_names_inst = {r.get("flow_define_name","") for r in rows if r.get("flow_define_name")}
+        flow_names_cfg = {x.get("flow_define_name","") for x in list_flow_entity_maps()}
+        flow_names = sorted({s for s in (flow_names_inst | flow_names_cfg) if s})
+        def _fmt_flow_opt2(x: str) -> str:
+            if not x:
+                return x
+            fm = get_flow_entity_map(x)
+            tgt = fm.get("target_entity") or "-"
+            src = fm.get("source_table") or "-"
+            return f"{x}（目标:{tgt} 源表:{src}）"
+        flow_sel = st.selectbox("流程类型(flowDefineName)", options=flow_names or [""], format_func=_fmt_flow_opt2)
+        def _match_flow(r):
+            return str(r.get("flow_define_name","")) == str(flow_sel)
+        view = [r for r in rows if _match_flow(r)]
+        pids = [r.get("proc_inst_id") for r in view]
+        idx_key = f"flow_pid_idx_{flow_sel}"
+        if idx_key not in st.session_state:
+            st.session_state[idx_key] = 0
+        index = st.session_state[idx_key]
+        nav = st.columns([1, 1, 3])
+        with nav[0]:
+            if st.button("⬅️ 上一条", key=f"flow_prev_{flow_sel}"):
+                if index > 0:
+                    st.session_state[idx_key] = index - 1
+                    st.rerun()
+        with nav[1]:
+            if st.button("下一条 ➡️", key=f"flow_next_{flow_sel}"):
+                if index + 1 < len(pids):
+                    st.session_state[idx_key] = index + 1
+                    st.rerun()
+        with nav[2]:
+            typed_pid = st.text_input("指定实例ID", value="", key=f"flow_pid_input_{flow_sel}")
+        final_pid = (typed_pid or "").strip() or (pids[index] if (0 <= index < len(pids)) else "")
+        if final_pid and st.button("生成模拟打印", key=f"mock_print_{final_pid}"):
+            data = _build_instance_json(final_pid)
+            rt_vars_list = data.get("runtime", {}).get("variables", [])
+            hi_vars_list = data.get("history", {}).get("variables", [])
+            def _var_map(vs):
+                if isinstance(vs, dict):
+                    return vs
+                m = {}
+                for v in vs or []:
+                    if isinstance(v, dict):
+                        n = str(v.get("name_",""))
+                        if n:
+                            m[n] = v.get("value","")
+                return m
+            rt_vars_map = _var_map(rt_vars_list)
+            hi_vars_map = _var_map(hi_vars_list)
+            biz_name = str(rt_vars_map.get("businessName") or hi_vars_map.get("businessName") or "")
+            segs = data.get("segments", []) or []
+            nodes = []
+            for idx in range(len(segs)):
+                seg = segs[idx]
+                frm = seg.get("from", {})
+                via = seg.get("via", []) or []
+                to_ = seg.get("to", {})
+                if idx == 0:
+                    nodes.append({
+                        "id": frm.get("key",""),
+                        "type": frm.get("type",""),
+                        "name": frm.get("name",""),
+                        "assignee": frm.get("assignee",""),
+                        "start": frm.get("start",""),
+                        "end": frm.get("end",""),
+                        "duration": frm.get("duration",""),
+                        "next": {"to": to_.get("key",""), "via": via},
+                    })
+                next_obj = {}
+                if idx + 1 < len(segs):
+                    nxt = segs[idx + 1]
+                    nxt_from = nxt.get("from", {})
+                    if nxt_from.get("key") == to_.get("key"):
+                        next_obj = {"to": nxt.get("to", {}).get("key",""), "via": nxt.get("via", []) or []}
+                lc = seg.get("to_comment_last", {}) or {}
+                nodes.append({
+                    "id": to_.get("key",""),
+                    "type": to_.get("type",""),
+                    "name": to_.get("name",""),
+                    "assignee": to_.get("assignee",""),
+                    "start": to_.get("start",""),
+                    "end": to_.get("end",""),
+                    "duration": to_.get("duration",""),
+                    "lastComment": {"time": lc.get("time",""), "userId": lc.get("user_id",""), "message": lc.get("message","")},
+                    "task": seg.get("to_task", {}) or {},
+                    "value": seg.get("to_values", {}) or {},
+                    "actor_ids": seg.get("to_actor_ids", []) or [],
+                    "next": next_obj,
+                })
+            nodes = _enrich_nodes_with_user(nodes)
+            assignees = {}
+            for seg in segs:
+                k = seg.get("to", {}).get("key","")
+                a = seg.get("to_task", {}).get("assignee_","")
+                if k:
+                    assignees[k] = a
+            history_vars = {
+                "processStatus": str(hi_vars_map.get("processStatus","")),
+                "taskStatus": str(hi_vars_map.get("taskStatus") or hi_vars_map.get("TASK_STATUS") or ""),
+                "taskReason": str(hi_vars_map.get("taskReason") or hi_vars_map.get("TASK_REASON") or ""),
+                "nrOfInstances": str(hi_vars_map.get("nrOfInstances","")),
+                "nrOfActiveInstances": str(hi_vars_map.get("nrOfActiveInstances","")),
+                "nrOfCompletedInstances": str(hi_vars_map.get("nrOfCompletedInstances","")),
+                "isSign": str(hi_vars_map.get("isSign","")),
+                "assignees": assignees,
+            }
+            starter_code = str(data.get("starterUserId") or ((nodes[0] or {}).get("assignee") or ((nodes[0] or {}).get("task") or {}).get("assignee_") or "")).strip() if nodes else str(data.get("starterUserId") or "")
+            preview_obj = {
+                "meta": {
+                    "businessName": biz_name,
+                    "processName": data.get("defCode",""),
+                    "flowDefineName": data.get("flow_define_name",""),
+                    "startTime": data.get("startTime",""),
+                    "endTime": data.get("endTime",""),
+                    "icon": data.get("definition", {}).get("icon", ""),
+                    "starterCode": starter_code,
+                },
+                "variables": {"runtime": {}, "history": history_vars},
+                "nodes": nodes,
+            }
+            def _flow_table(flow_name: str):
+                fm = get_flow_entity_map(flow_name)
+                return fm.get("source_table") or {
+                    "合伙协议": "ct_partner_agreement",
+                    "募集协议审批流程": "ct_fund_base_info",
+                    "托管协议流程审批": "ct_fund_custody_agmt",
+                    "其他流程": "ct_agreement_other",
+                    "项目合规性审查": "ct_project_base_info",
+                    "基金出资记录": "ct_invest_record",
+                    "项目退出": "ct_fund_quit_record",
+                    "会议管理审批流程": "ct_meeting_manage",
+                    "业务审批": "ct_fund_meet_manage",
+                    "基金公示审核": "ct_fund_publicity_review",
+                    "股权直投业务审批": "ct_project_meet_manage",
+                    "股权直投，其他协议": "ct_project_agreement_other",
+                }.get(flow_name)
+            fields_obj = {}
+            fdef = str(data.get("flow_define_name",""))
+            tbl = _flow_table(fdef)
+            entity = ""
+            out_name = ""
+            type_override = ""
+            if tbl:
+                recs = _parse_all_inserts(tbl)
+                match = next((r for r in recs if str(r.get("process_instance_id","")) == str(final_pid)), None)
+                if match:
+                    fm = get_flow_entity_map(fdef)
+                    entity = (fm.get("target_entity") or get_target_entity(tbl) or "")
+                    script = get_table_script(tbl, entity or None) or ""
+                    mapped, out_name, type_override = apply_record_mapping(tbl, match, script, target_entity=entity or "")
+                    _ = _extract_entity_meta(mapped)
+                    fields_obj = mapped or {}
+            src = json.dumps(preview_obj, ensure_ascii=False)
+            esc = src.replace("'", "''")
+            if fields_obj is None:
+                fields_obj = {}
+            # fields_obj["source_flow"] = esc
+            parsed = preview_obj
+            meta_info = parsed.get("meta", {}) or {}
+            hist = (parsed.get("variables", {}) or {}).get("history", {}) or {}
+            nodes_md = []
+            def _fmt_time(v):
+                if v in (None, ""):
+                    return ""
+                s = str(v).strip()
+                try:
+                    x = float(s)
+                    ms = int(x) if x >= 1e11 else int(x * 1000)
+                    from datetime import datetime
+                    dt = datetime.fromtimestamp(ms / 1000.0)
+                    return dt.strftime("%Y-%m-%d %H:%M:%S")
+                except Exception:
+                    try:
+                        from datetime import datetime
+                        t = s.replace("T", " ").replace("Z", "")
+                        dt = datetime.fromisoformat(t)
+                        return dt.strftime("%Y-%m-%d %H:%M:%S")
+                    except Exception:
+                        return s
+            def _fmt_duration_auto(v):
+                if v in (None, ""):
+                    return ""
+                s = str(v).strip()
+                try:
+                    x = float(s)
+                except Exception:
+                    return s
+                secs = x / 1000.0 if x >= 1000 else x
+                secs = int(secs)
+                d = secs // 86400; secs %= 86400
+                h = secs // 3600; secs %= 3600
+                m = secs // 60; secs %= 60
+                parts = []
+                if d: parts.append(f"{d} 天")
+                if h: parts.append(f"{h} 小时")
+                if m: parts.append(f"{m} 分钟")
+                if secs and not parts:
+                    parts.append(f"{secs} 秒")
+                return " ".join(parts) or "0 秒"
+            def _ts_num(v):
+                s = str(v or "").strip()
+                if not s:
+                    return 0
+                try:
+                    x = float(s)
+                    ms = int(x) if x >= 1e11 else int(x * 1000)
+                    return ms
+                except Exception:
+                    try:
+                        from datetime import datetime
+                        t = s.replace("T", " ").replace("Z", "")
+                        return int(datetime.fromisoformat(t).timestamp() * 1000)
+                    except Exception:
+                        return 0
+            nds_sorted = []
+            nodes_src = (parsed.get("nodes", []) or [])
+            for nd in nodes_src:
+                t = nd.get("task", {}) or {}
+                name0 = (t.get("name_") or nd.get("name", "") or "").strip()
+                if name0 in ("开始", "结束"):
+                    continue
+                nds_sorted.append(nd)
+            if not nds_sorted and nodes_src:
+                nds_sorted = nodes_src
+            # 排序：从新到旧（开始时间优先，降序）
+            nds_sorted.sort(key=lambda n: _ts_num((n.get("task") or {}).get("start_time_") or n.get("start", "") or (n.get("task") or {}).get("end_time_") or n.get("end", "")), reverse=True)
+            hist_tasks_list = (data.get("history", {}) or {}).get("tasks", []) or []
+            present_ids = {str(((nd.get("task") or {}).get("id_")) or "").strip() for nd in nds_sorted}
+            extra_nodes = []
+            cm_map = ((data.get("history", {}) or {}).get("comments_by_task", {}) or {})
+            for ht in hist_tasks_list:
+                tid = str(ht.get("id_") or "").strip()
+                if not tid or tid in present_ids:
+                    continue
+                extra_nodes.append({
+                    "id": ht.get("task_id_", ""),
+                    "type": "userTask",
+                    "name": ht.get("name_", ""),
+                    "assignee": ht.get("assignee_", ""),
+                    "start": ht.get("start_time_", ""),
+                    "end": ht.get("end_time_", ""),
+                    "duration": ht.get("duration_", ""),
+                    "lastComment": cm_map.get(tid, {}) or {},
+                    "task": {
+                        "id_": ht.get("id_", ""),
+                        "parent_task_id_": ht.get("parent_task_id_", ""),
+                        "name_": ht.get("name_", ""),
+                        "assignee_": ht.get("assignee_", ""),
+                        "owner_": ht.get("owner_", ""),
+                        "start_time_": ht.get("start_time_", ""),
+                        "end_time_": ht.get("end_time_", ""),
+                        "duration_": ht.get("duration_", ""),
+                        "priority_": ht.get("priority_", ""),
+                        "category_": ht.get("category_", ""),
+                        "delete_reason_": ht.get("delete_reason_", ""),
+                    },
+                    "value": {},
+                    "actor_ids": [str(ht.get("assignee_", ""))],
+                    "next": {},
+                })
+            if extra_nodes:
+                nds_sorted.extend(extra_nodes)
+                nds_sorted = _enrich_nodes_with_user(nds_sorted)
+                nds_sorted.sort(key=lambda n: _ts_num((n.get("task") or {}).get("start_time_") or n.get("start", "") or (n.get("task") or {}).get("end_time_") or n.get("end", "")), reverse=True)
+            # 父子任务展示：优先展示父任务，再展示其子任务（单行状态）
+            task_map = {}
+            for nd in nds_sorted:
+                t0 = nd.get("task") or {}
+                tid0 = str(t0.get("id_") or "").strip()
+                if tid0:
+                    task_map[tid0] = nd
+            from collections import defaultdict
+            children_map = defaultdict(list)
+            for nd in nds_sorted:
+                t0 = nd.get("task") or {}
+                p0 = str(t0.get("parent_task_id_") or "").strip()
+                if p0:
+                    children_map[p0].append(nd)
+            visited = set()
+            import re
+            def _split_msg(s: str):
+                s0 = (s or '').strip()
+                inline_extra = ''
+                suggest = ''
+                parts = re.split(r"[，,]?\s*(?:理由为|原因是)\s*[:：]", s0)
+                if len(parts) >= 2:
+                    inline_extra = (parts[0] or '').strip().rstrip('，。')
+                    suggest = (parts[1] or '').strip().rstrip('，。')
+                    return inline_extra, suggest
+                suggest = s0
+                return inline_extra, suggest
+            def _fmt_block(nd: Dict[str, Any], label_child: bool = False):
+                t = nd.get("task", {}) or {}
+                lc = nd.get("lastComment", {}) or {}
+                rawm = (str(lc.get('message') or '') + ' ' + str(t.get('delete_reason_') or '')).lower()
+                mk = '⚪'
+                for kw in ['同意','通过','批准','审核通过']:
+                    if kw in rawm:
+                        mk = '🟢'
+                        break
+                if mk == '⚪':
+                    for kw in ['驳回','退回','拒绝','不通过','不同意']:
+                        if kw in rawm:
+                            mk = '🔴'
+                            break
+                task_name = (t.get('name_') or nd.get('name','') or '').strip()
+                assignee = (t.get('assignee_') or nd.get('assignee','') or '').strip()
+                start_txt = _fmt_time(t.get('start_time_') or nd.get('start',''))
+                end_txt = _fmt_time(t.get('end_time_') or nd.get('end',''))
+                dur_text = _fmt_duration_auto(t.get('duration_')) or _fmt_duration_auto(nd.get('duration'))
+                msg = (lc.get('message') or '').strip()
+                inline_extra, msg_suggest = _split_msg(msg)
+
+                v_tmp = nd.get("value") or {}
+                tr_suggest = ""
+                if isinstance(v_tmp, dict):
+                    tr_suggest = str(v_tmp.get("TASK_REASON") or "").strip()
+
+                suggest_text = tr_suggest if tr_suggest else msg_suggest
+                if (not any([assignee, start_txt, end_txt, (dur_text or ''), msg])) and (task_name in ('结束','')):
+                    return []
+                status_text = ("审批通过" if mk=='🟢' else ("审批未通过" if mk=='🔴' else ""))
+                if (not str(meta_info.get('endTime','')).strip()) and mk == '⚪':
+                    status_text = "审批中"
+                header = (f"**审批任务：{task_name} {mk}{(inline_extra or status_text)}**" if not label_child
+                          else f"**{task_name}→子任务 {mk}{(inline_extra or status_text)}**")
+                out = [header, ""]
+                av = str(nd.get("assignee_val") or "").strip()
+                dp = str(nd.get("dept") or "").strip()
+                disp = (f"{av}（{dp}）" if av and dp else (av or assignee))
+                if disp:
+                    out.append(f"审批人：{disp}")
+                    out.append("")
+                line = []
+                if start_txt:
+                    line.append(f"创建时间：{start_txt}")
+                if end_txt:
+                    line.append(f"审批时间： {end_txt}")
+                if dur_text:
+                    line.append(f"耗时： {dur_text}")
+                if line:
+                    out.append(" ".join(line))
+                    out.append("")
+                out.append(f"审批建议：{suggest_text}" if suggest_text else "审批建议：")
+                out.append("")
+                return out
+            for nd in nds_sorted:
+                t = nd.get("task", {}) or {}
+                tid = str(t.get("id_") or "").strip()
+                if not tid or tid in visited:
+                    continue
+                parent_id = str(t.get("parent_task_id_") or "").strip()
+                if parent_id:
+                    pnd = task_map.get(parent_id)
+                    if pnd and str((pnd.get('task') or {}).get('id_') or '').strip() not in visited:
+                        nodes_md.extend(_fmt_block(pnd, label_child=False))
+                        visited.add(str((pnd.get('task') or {}).get('id_') or '').strip())
+                    nodes_md.extend(_fmt_block(nd, label_child=True))
+                    visited.add(tid)
+                    continue
+                nodes_md.extend(_fmt_block(nd, label_child=False))
+                visited.add(tid)
+                for ch in children_map.get(tid, []):
+                    ctid = str((ch.get('task') or {}).get('id_') or '').strip()
+                    if ctid and ctid not in visited:
+                        nodes_md.extend(_fmt_block(ch, label_child=True))
+                        visited.add(ctid)
+            if not nodes_md:
+                for tsk in (data.get("runtime", {}) or {}).get("tasks", []) or []:
+                    name_rt = (tsk.get("name_", "") or "").strip()
+                    assignee_rt = (tsk.get("assignee_", "") or "").strip()
+                    start_txt_rt = _fmt_time(tsk.get("create_time_"))
+                    nodes_md.append(f"**审批任务：{name_rt}**")
+                    nodes_md.append("⚪审批中")
+                    nodes_md.append("")
+                    disp_rt = assignee_rt
+                    if disp_rt:
+                        nodes_md.append(f"审批人：{disp_rt}")
+                        nodes_md.append("")
+                    line_rt = []
+                    if start_txt_rt:
+                        line_rt.append(f"创建时间：{start_txt_rt}")
+                    if line_rt:
+                        nodes_md.append(" ".join(line_rt))
+                        nodes_md.append("")
+                    nodes_md.append("审批建议：")
+                    nodes_md.append("")
+            ps_raw = str(hi_vars_map.get("PROCESS_STATUS") or hi_vars_map.get("processStatus") or "").strip()
+            status_map = {'0':'待提交','1':'审批中','2':'审批通过','3':'审批不通过','4':'已取消','5':'已回退'}
+            if ps_raw in status_map:
+                concl = status_map[ps_raw]
+            else:
+                hs_raw = str(hist.get('taskStatus','')).strip()
+                code_map = {
+                    '0':'待审批','1':'审批中','2':'审批通过','3':'审批不通过','4':'已取消','5':'已回退','6':'委派中','7':'审批通过中','8':'自动抄送'
+                }
+                concl = code_map.get(hs_raw)
+                if not concl:
+                    hs = hs_raw.lower()
+                    hmk = ''
+                    for kw in ['通过','同意','批准','审核通过']:
+                        if kw in hs:
+                            hmk = '审核通过'
+                            break
+                    if not hmk:
+                        for kw in ['驳回','拒绝','不通过','不同意']:
+                            if kw in hs:
+                                hmk = '审核未通过'
+                                break
+                    concl = '审批通过' if hmk=='审核通过' else ('审批未通过' if hmk=='审核未通过' else hs_raw)
+            ended_raw = meta_info.get('endTime','')
+            ended_flag = bool(str(ended_raw).strip())
+            head_icon = '🟢' if concl in ('审批通过','审批通过中') else ('🔴' if concl in ('审批未通过','审批不通过') else '⚪')
+            header1 = f"**结束流程：在 {_fmt_time(ended_raw)} 结束**"
+            header2 = f"{head_icon} {concl}"
+            nds = parsed.get("nodes", []) or []
+            umap, _ = _user_dept_maps()
+            scode = str(meta_info.get("starterCode") or "").strip()
+            sname = (umap.get(scode) or {}).get("name", "")
+            starter = sname or (str(nds[0].get("assignee_val") or ((nds[0].get("task") or {}).get("assignee_") or nds[0].get("assignee") or "")).strip() if nds else "")
+            flow_name = str(meta_info.get("flowDefineName") or meta_info.get("processName") or "").strip()
+            start_md = f"**发起流程：【{starter}】在 {_fmt_time(meta_info.get('startTime',''))} 发起【 {flow_name} 】流程**"
+            flow_md = "\n".join(([header1, header2, ""] if ended_flag else []) + nodes_md + ["", start_md]).strip()
+            fields_obj["flow_md"] = flow_md
+            fields_obj["flow_md_label"] = flow_md
+            meta = _extract_entity_meta(fields_obj)
+            entity_obj = {
+                "uuid": "(mock uuid)",
+                "sid": st.session_state.get("current_sid", SID),
+                "type": type_override or (entity or tbl or ""),
+                "name": out_name or "",
+                "del": int(meta.get("del", 0)),
+                "input_date": int(meta.get("input_date", 0)),
+                "update_date": int(meta.get("update_date", 0)),
+                "data": fields_obj,
+            }
+            st.code(json.dumps(entity_obj, ensure_ascii=False, indent=2))
+            md = str(fields_obj.get("flow_md", "")).strip()
+            if md:
+                st.markdown(md)
+
+        write_mode = st.selectbox(
+            "写入模式",
+            options=["合并写入（默认）", "仅保存 source_flow/flow_md 覆盖"],
+            index=0,
+            key=f"flow_write_mode_{flow_sel}"
+        )
+        if typed_pid and st.button("入库当前", key=f"import_{final_pid}"):
+            bundle = _build_flow_import_bundle(final_pid)
+            fields_obj = bundle.get("fields_obj") or {}
+            flow_md = bundle.get("flow_md") or ""
+            meta = bundle.get("meta") or {}
+            type_name = bundle.get("type_name") or ""
+            key_field = bundle.get("key_field") or "id"
+            key_val = bundle.get("key_val") or ""
+            final_name = bundle.get("final_name") or ""
+            used_match = bundle.get("match")
+            if write_mode == "仅保存 source_flow/flow_md 覆盖":
+                key_val = (used_match or {}).get("id") or key_val or str(final_pid or "")
+                if fields_obj.get("id") in (None, "") and key_val:
+                    fields_obj["id"] = key_val
+                cover_obj = {
+                    key_field: key_val,
+                    "name": fields_obj.get("name", ""),
+                    "bt": fields_obj.get("bt", ""),
+                    "type": fields_obj.get("type", type_name),
+                    # "source_flow": fields_obj.get("source_flow",""),
+                    "flow_md": flow_md,
+                    "flow_md_label": flow_md,
+                    "lcspzt": fields_obj.get("lcspzt", ""),
+                    "lcspzt_label": fields_obj.get("lcspzt_label", ""),
+                    "lcbh": fields_obj.get("lcbh", ""),
+                    "sqsj": fields_obj.get("sqsj", ""),
+                    "jssj": fields_obj.get("jssj", "")
+                }
+                data_json = json.dumps(cover_obj, ensure_ascii=False)
+                import_mode = "upsert_replace"
+                sid = st.session_state.get("current_sid", SID)
+                wrote = _upsert_entity_row(type_name, key_field, key_val, sid, final_name, data_json, meta, import_mode=import_mode)
+                st.success(f"入库完成：写入 {wrote} 条")
+            else:
+                if not key_val:
+                    key_val = str(final_pid or "")
+                    if key_val:
+                        fields_obj["id"] = key_val
+                data_json = json.dumps(fields_obj, ensure_ascii=False)
+                import_mode = "upsert"
+                sid = st.session_state.get("current_sid", SID)
+                wrote = _upsert_entity_row(type_name, key_field, key_val, sid, final_name, data_json, meta, import_mode=import_mode)
+                st.success(f"入库完成：写入 {wrote} 条")
+            st.stop()
+
+        elif final_pid and st.button("仅修复状态字段（当前）", key=f"fix_status_{final_pid}"):
+            bundle = _build_flow_import_bundle(final_pid)
+            concl = bundle.get("concl") or ""
+            rev = {'待提交':'0','审批中':'1','审批通过':'2','审批不通过':'3','已取消':'4','已回退':'5'}
+            code = rev.get(concl, "")
+            type_name = bundle.get("type_name") or ""
+            key_field = bundle.get("key_field") or "id"
+            key_val = bundle.get("key_val") or str(final_pid or "")
+            sid = st.session_state.get("current_sid", SID)
+            patch_obj = {"lcspzt": concl, "lcspzt_label": concl}
+            now_ts = int(time.time())
+            meta_fix = {"del": 0, "input_date": now_ts, "update_date": now_ts}
+            wrote = _upsert_entity_row(type_name, key_field, key_val, sid, "", json.dumps(patch_obj, ensure_ascii=False), meta_fix, import_mode="update_merge")
+            st.success(f"已修复状态字段：写入 {wrote} 条")
+            st.stop()
+
+        elif st.button("批量入库当前流程全部", key=f"import_all_{flow_sel}"):
+            from backend.flow_import import run_flow_import
+            rows = _build_instance_rows()
+            def _match_flow(r):
+                return str(r.get("flow_define_name","")) == str(flow_sel)
+            view = [r for r in rows if _match_flow(r)]
+            pids_all = [r.get("proc_inst_id") for r in view if r.get("proc_inst_id")]
+            pg = st.progress(0)
+            sid = st.session_state.get("current_sid", SID)
+            cover_mode = (write_mode == "仅保存 source_flow/flow_md 覆盖")
+            def _prepare(pid0):
+                bundle = _build_flow_import_bundle(pid0)
+                fields_obj = bundle.get("fields_obj") or {}
+                flow_md = bundle.get("flow_md") or ""
+                type_name = bundle.get("type_name") or ""
+                key_field = bundle.get("key_field") or "id"
+                key_val = bundle.get("key_val") or ""
+                if not key_val:
+                    key_val = str(pid0 or "")
+                    if key_val:
+                        fields_obj["id"] = key_val
+                if cover_mode:
+                    cover_obj = {
+                        key_field: key_val,
+                        "name": fields_obj.get("name", ""),
+                        "bt": fields_obj.get("bt", ""),
+                        "type": fields_obj.get("type", type_name),
+                        # "source_flow": fields_obj.get("source_flow",""),
+                        "flow_md": flow_md,
+                        "flow_md_label": flow_md,
+                        "lcspzt": fields_obj.get("lcspzt", ""),
+                        "lcspzt_label": fields_obj.get("lcspzt_label", ""),
+                        "lcbh": fields_obj.get("lcbh", ""),
+                        "sqsj": fields_obj.get("sqsj", ""),
+                        "jssj": fields_obj.get("jssj", "")
+                    }
+                    data_json = json.dumps(cover_obj, ensure_ascii=False)
+                    import_mode = "upsert_replace"
+                else:
+                    data_json = json.dumps(fields_obj, ensure_ascii=False)
+                    import_mode = "upsert"
+                return {"type_name": type_name, "key_field": key_field, "key_value": key_val,
+                        "name_val": bundle.get("final_name") or "", "data_json": data_json,
+                        "meta": bundle.get("meta") or {}, "import_mode": import_mode}
+            tracker = Progress(total=len(pids_all), unit="实例").subscribe(_st_progress_sink(pg, "批量入库"))
+            _flow_import_prewarm()
+            stats = run_flow_import([(p0, p0) for p0 in pids_all], _prepare, sid,
+                                    initializer=_flow_import_initializer(), progress=tracker)
+            _render_flow_import_result(stats)
+
+        elif st.button("批量入库（按流程编号lcbh合并）", key=f"import_all_lcbh_{flow_sel}"):
+            from backend.flow_import import run_flow_import
+            rows = _build_instance_rows()
+            def _match_flow(r):
+                return str(r.get("flow_define_name","")) == str(flow_sel)
+            view = [r for r in rows if _match_flow(r)]
+            pids_all = [r.get("proc_inst_id") for r in view if r.get("proc_inst_id")]
+            pg = st.progress(0)
+            sid = st.session_state.get("current_sid", SID)
+            def _prepare(pid0):
+                bundle = _build_flow_import_bundle(pid0)
+                fields_obj = bundle.get("fields_obj") or {}
+                # 强制使用 lcbh 逻辑
+                key_val = str(pid0 or "")
+                if key_val:
+                    fields_obj["lcbh"] = key_val
+                return {"type_name": bundle.get("type_name") or "", "key_field": "lcbh", "key_value": key_val,
+                        "name_val": bundle.get("final_name") or "", "data_json": json.dumps(fields_obj, ensure_ascii=False),
+                        "meta": bundle.get("meta") or {}, "import_mode": "upsert"}
+            tracker = Progress(total=len(pids_all), unit="实例").subscribe(_st_progress_sink(pg, "批量入库（合并）"))
+            _flow_import_prewarm()
+            stats = run_flow_import([(p0, p0) for p0 in pids_all], _prepare, sid,
+                                    initializer=_flow_import_initializer(), progress=tracker)
+            _render_flow_import_result(stats, "批量入库（按lcbh合并）")
+
+        elif st.button("批量修复状态字段（当前流程）", key=f"fix_all_status_{flow_sel}"):
+            rows = _build_instance_rows()
+            def _match_flow(r):
+                return str(r.get("flow_define_name","")) == str(flow_sel)
+            view = [r for r in rows if _match_flow(r)]
+            pids_all = [r.get("proc_inst_id") for r in view]
+            pg = st.progress(0)
+            total = len(pids_all)
+            wrote_sum = 0
+            rev = {'待提交':'0','审批中':'1','审批通过':'2','审批不通过':'3','已取消':'4','已回退':'5'}
+            tracker = Progress(total=total, unit="实例").subscribe(_st_progress_sink(pg, "修复中"))
+            for pid0 in pids_all or []:
+                tracker.add()
+                if not pid0:
+                    continue
+                bundle = _build_flow_import_bundle(pid0)
+                concl = bundle.get("concl") or ""
+                code = rev.get(concl, "")
+                type_name = bundle.get("type_name") or ""
+                key_field = bundle.get("key_field") or "id"
+                key_val = bundle.get("key_val") or str(pid0 or "")
+                sid = st.session_state.get("current_sid", SID)
+                patch_obj = {"lcspzt": concl, "lcspzt_label": concl}
+                now_ts = int(time.time())
+                meta_fix = {"del": 0, "input_date": now_ts, "update_date": now_ts}
+                wrote = _upsert_entity_row(type_name, key_field, key_val, sid, "", json.dumps(patch_obj, ensure_ascii=False), meta_fix, import_mode="update_merge")
+                wrote_sum += int(wrote or 0)
+            tracker.finish()
+            st.success(f"批量修复完成：写入 {wrote_sum} 条")
+        elif st.button("批量入库源表流程数据", key=f"import_src_flow_{flow_sel}"):
+            fm = get_flow_entity_map(flow_sel)
+            tbl = fm.get("source_table") or ""
+            tgt_entity = fm.get("target_entity") or ""
+            if not tbl:
+                st.warning("未配置该流程对应的源表")
+            else:
+                from backend.flow_import import run_flow_import
+                from backend.mapper_core import apply_record_mapping, apply_records_mapping, COLUMNAR_CHUNK, _has_lookup_rules
+                rows_src = _read_sql_rows(tbl)
+                pg = st.progress(0)
+                sid = st.session_state.get("current_sid", SID)
+                # 1) 源记录按编译后的规则分块列式映射（脚本只取一次）；
+                #    规则含 entity/rel/sql 查找时改为逐条映射并写入，查找才能看到本次先写入的行
+                script = get_table_script(tbl, tgt_entity or None) or ""
+                lookups = _has_lookup_rules(tbl, tgt_entity)
+                mapped_all = [None] * len(rows_src or [])
+                if not lookups:
+                    mapped_all = []
+                    for k in range(0, len(rows_src or []), COLUMNAR_CHUNK):
+                        pg.progress(0, text=f"映射源记录：{k}/{len(rows_src)}")
+                        mapped_all.extend(apply_records_mapping(tbl, rows_src[k:k + COLUMNAR_CHUNK], script, target_entity=tgt_entity or ""))
+                # 2) 各实例并行构建流程字段并与映射结果合并
+                def _prepare(arg):
+                    r, mp = arg
+                    mapped, out_name, type_override = mp or apply_record_mapping(tbl, r, script, target_entity=tgt_entity or "")
+                    meta = _extract_entity_meta(mapped)
+                    type_name = (type_override or tgt_entity or tbl or flow_sel or "flow_instance")
+                    key_val = mapped.get("id") or r.get("id") or str(r.get("process_instance_id") or "")
+                    final_name = mapped.get("__name__", "") or out_name or mapped.get("name", "")
+                    pid0 = str(r.get("process_instance_id") or "")
+                    if pid0:
+                        data_bundle = _build_flow_import_bundle(pid0, match=r, map_record=False)
+                        used_match = data_bundle.get("match")
+                        flow_md = data_bundle.get("flow_md") or ""
+                        fld = data_bundle.get("fields_obj") or {}
+                        if used_match:
+                            merged_obj = dict(mapped)
+                            # merged_obj["source_flow"] = fld.get("source_flow", "")
+                            merged_obj["flow_md"] = flow_md
+                            merged_obj["flow_md_label"] = flow_md
+                            merged_obj["lcspzt"] = (data_bundle.get("concl") or "")
+                            merged_obj["lcspzt_label"] = (data_bundle.get("concl") or "")
+                            merged_obj["lcbh"] = (fld.get("lcbh", "") or pid0)
+                            merged_obj["sqsj"] = fld.get("sqsj", "")
+                            merged_obj["jssj"] = fld.get("jssj", "")
+                            data_json = json.dumps(merged_obj, ensure_ascii=False)
+                        else:
+                            mapped["lcspzt"] = (data_bundle.get("concl") or "")
+                            mapped["lcspzt_label"] = (data_bundle.get("concl") or "")
+                            mapped["lcbh"] = (fld.get("lcbh", "") or pid0)
+                            mapped["sqsj"] = fld.get("sqsj", "")
+                            mapped["jssj"] = fld.get("jssj", "")
+                            data_json = json.dumps(mapped, ensure_ascii=False)
+                    else:
+                        data_json = json.dumps(mapped, ensure_ascii=False)
+                    return {"type_name": type_name, "key_field": "id", "key_value": key_val,
+                            "name_val": final_name, "data_json": data_json, "meta": meta, "import_mode": "upsert"}
+                _flow_import_prewarm()
+                items = [(str(r.get("process_instance_id") or r.get("id") or i), (r, mp)) for i, (r, mp) in enumerate(zip(rows_src or [], mapped_all))]
+                tracker = Progress(total=len(items), unit="实例").subscribe(_st_progress_sink(pg, "批量入库"))
+                # 逐条模式：单线程、在途 1 个、每条即写，保证前一条写入后才映射下一条
+                serial = {"workers": 1, "queue_size": 1, "batch_size": 1} if lookups else {}
+                stats = run_flow_import(items, _prepare, sid, initializer=_flow_import_initializer(), progress=tracker, **serial)
+                _render_flow_import_result(stats)
+
+    with super_tabs[2]:
+        tabs = st.tabs(["实例预览(JSON)", "流程定义", "表单库", "分类", "表达式库", "监听器库", "实例抄送", "用户组", "实例总览", "全部实例"]) 
+
+        # 实例预览（JSON）
+        with tabs[0]:
+            st.subheader("按流程实例聚合（JSON 预览）")
+            # 选择实例来源于历史实例表
+            hi = _read_sql_rows("act_hi_procinst")
+            all_pids = [r.get("id_","") for r in hi if r.get("id_")]
+            kw = st.text_input("关键词（实例ID/业务键）", key="json_kw")
+            def _match_pid(r):
+                s = (kw or "").strip().lower()
+                return (not s) or s in str(r.get("id_","")) .lower() or s in str(r.get("business_key_","")) .lower()
+            view_pids = [r.get("id_","") for r in hi if _match_pid(r)]
+            pid = st.selectbox("选择实例ID", options=view_pids or all_pids, index=0 if (view_pids or all_pids) else None, key="json_pid")
+            if pid:
+                data = _build_instance_json(pid)
+                st.json(data)
+                st.download_button("下载 JSON", data=json.dumps(data, ensure_ascii=False, indent=2), file_name=f"procinst_{pid}.json", mime="application/json")
+
+        # 流程定义
+        with tabs[1]:
+            kw = st.text_input("关键词（定义ID/模型ID/描述）", key="pd_kw")
+            def _code_of(pd_id: str):
+                s = str(pd_id or "")
+                return s.split(":")[0] if ":" in s else s
+            # _parse_all_inserts 返回进程级缓存的行，复制后再加 _code
+            recs = [{**r, "_code": _code_of(r.get("process_definition_id"))}
+                    for r in _parse_all_inserts("bpm_process_definition_info")]
+            code = st.text_input("按分类编码过滤（例如 ContractApproval）", key="pd_code")
+            def _match(r):
+                def _has(s):
+                    return (kw or "").strip().lower() in str(s or "").lower()
+                ok_kw = (not kw) or _has(r.get("process_definition_id")) or _has(r.get("model_id")) or _has(r.get("description"))
+                ok_code = (not code) or (str(r.get("_code","")) == code)
+                return ok_kw and ok_code
+            view = [r for r in recs if _match(r)]
+            cols = ["process_definition_id", "model_id", "description", "form_type", "form_id", "_code"]
+            st.dataframe([{k: v for k, v in r.items() if k in cols} for r in view], use_container_width=True)
+
+        # 表单库
+        with tabs[2]:
+            kw = st.text_input("关键词（表单名/备注）", key="form_kw")
+            recs = _parse_all_inserts("bpm_form")
+            def _match(r):
+                s1 = str(r.get("name",""))
+                s2 = str(r.get("remark",""))
+                return (not kw) or (kw.lower() in s1.lower() or kw.lower() in s2.lower())
+            view = [r for r in recs if _match(r)]
+            cols = ["id","name","status","remark"]
+            st.dataframe([{k: v for k, v in r.items() if k in cols} for r in view], use_container_width=True)
+
+        # 分类
+        with tabs[3]:
+            recs = _parse_all_inserts("bpm_category")
+            cols = ["id","name","code","status","sort"]
+            st.dataframe([{k: v for k, v in r.items() if k in cols} for r in recs], use_container_width=True)
+
+        # 表达式库
+        with tabs[4]:
+            kw = st.text_input("关键词（表达式名/内容）", key="expr_kw")
+            recs = _parse_all_inserts("bpm_process_expression")
+            def _match(r):
+                s1 = str(r.get("name",""))
+                s2 = str(r.get("expression",""))
+                return (not kw) or (kw.lower() in s1.lower() or kw.lower() in s2.lower())
+            view = [r for r in recs if _match(r)]
+            cols = ["id","name","status","expression"]
+            st.dataframe([{k: v for k, v in r.items() if k in cols} for r in view], use_container_width=True)
+
+        # 监听器库
+        with tabs[5]:
+            kw = st.text_input("关键词（监听器名/事件/值）", key="lst_kw")
+            recs = _parse_all_inserts("bpm_process_listener")
+            def _match(r):
+                s1 = str(r.get("name",""))
+                s2 = str(r.get("event",""))
+                s3 = str(r.get("value",""))
+                return (not kw) or (kw.lower() in s1.lower() or kw.lower() in s2.lower() or kw.lower() in s3.lower())
+            view = [r for r in recs if _match(r)]
+            cols = ["id","name","type","status","event","value_type","value"]
+            st.dataframe([{k: v for k, v in r.items() if k in cols} for r in view], use_container_width=True)
+
+        # 实例抄送
+        with tabs[6]:
+            kw = st.text_input("关键词（实例ID/任务ID/名称）", key="copy_kw")
+            recs = _parse_all_inserts("bpm_process_instance_copy")
+            def _match(r):
+                s1 = str(r.get("process_instance_id",""))
+                s2 = str(r.get("task_id",""))
+                s3 = str(r.get("task_name",""))
+                return (not kw) or (kw.lower() in s1.lower() or kw.lower() in s2.lower() or kw.lower() in s3.lower())
+            view = [r for r in recs if _match(r)]
+            cols = ["id","user_id","start_user_id","process_instance_id","process_instance_name","task_id","task_name","category"]
+            st.dataframe([{k: v for k, v in r.items() if k in cols} for r in view], use_container_width=True)
+
+        # 用户组
+        with tabs[7]:
+            recs = _parse_all_inserts("bpm_user_group")
+            cols = ["id","name","description","user_ids","status"]
+            st.dataframe([{k: v for k, v in r.items() if k in cols} for r in recs], use_container_width=True)
+
+        # 实例总览（按 process_instance_id 聚合）
+        with tabs[8]:
+            recs = _read_sql_rows("bpm_process_instance_copy")
+            if not recs:
+                st.info("暂无实例数据。")
+            else:
+                from collections import defaultdict
+                groups = defaultdict(list)
+                for r in recs:
+                    pid = str(r.get("process_instance_id","")).strip()
+                    if pid:
+                        groups[pid].append(r)
+                rows = []
+                for pid, items in groups.items():
+                    name = next((x.get("process_instance_name") for x in items if x.get("process_instance_name")), "")
+                    users = sorted({x.get("user_id") for x in items if x.get("user_id")})
+                    starters = sorted({x.get("start_user_id") for x in items if x.get("start_user_id")})
+                    tasks = sorted({x.get("task_id") for x in items if x.get("task_id")})
+                    cats = sorted({x.get("category") for x in items if x.get("category")})
+                    ctimes = [x.get("create_time") for x in items if x.get("create_time")]
+                    utimes = [x.get("update_time") for x in items if x.get("update_time")]
+                    rows.append({
+                        "process_instance_id": pid,
+                        "process_instance_name": name,
+                        "copies": len(items),
+                        "users": ",".join(map(str, users)),
+                        "starters": ",".join(map(str, starters)),
+                        "task_count": len(tasks),
+                        "categories": ",".join(map(str, cats)),
+                        "first_create_time": min(ctimes) if ctimes else "",
+                        "last_update_time": max(utimes) if utimes else "",
+                    })
+                st.dataframe(rows, use_container_width=True)
+
+        # 全部实例（运行时 + 历史）
+        with tabs[9]:
+            st.subheader("历史实例")
+            hi = _read_sql_rows("act_hi_procinst")
+            hist_cols = ["id_","proc_def_id_","start_time_","end_time_","business_key_"]
+            st.dataframe(_pick_cols(hi, hist_cols), use_container_width=True)
+
+            st.subheader("运行时：执行树")
+            ru_exec = _read_sql_rows("act_ru_execution")
+            exec_cols = ["id_","proc_inst_id_","parent_id_","super_exec_","act_id_","is_active_","is_concurrent_","is_scope_"]
+            st.dataframe(_pick_cols(ru_exec, exec_cols), use_container_width=True)
+
+            st.subheader("运行时：任务")
+            ru_task = _read_sql_rows("act_ru_task")
+            task_cols = ["id_","proc_inst_id_","name_","assignee_","owner_","create_time_","due_date_","category_","priority_"]
+            st.dataframe(_pick_cols(ru_task, task_cols), use_container_width=True)
+
+            st.subheader("运行时：变量")
+            ru_var = _read_sql_rows("act_ru_variable")
+            var_cols = ["id_","proc_inst_id_","execution_id_","name_","text_","double_","long_"]
+            st.dataframe(_pick_cols(ru_var, var_cols), use_container_width=True)
+
+        # 流程实例（综合）
+        with tabs[9]:
+            kw = st.text_input("关键词（实例ID/业务键/定义编码）", key="inst_kw")
+            code_filter = st.text_input("按定义编码过滤（如 ContractApproval）", key="inst_code")
+            rows = _build_instance_rows()
+            def _match(r):
+                s = (kw or "").strip().lower()
+                ok_kw = (not s) or s in str(r.get("proc_inst_id","")).lower() or s in str(r.get("business_key","")).lower() or s in str(r.get("def_code","")).lower()
+                ok_code = (not code_filter) or str(r.get("def_code","")) == code_filter
+                return ok_kw and ok_code
+            view = [r for r in rows if _match(r)]
+            cols = [
+                "proc_inst_id","proc_def_id","def_code","category","business_key","start_time","end_time",
+                "open_task_count","open_task_names","open_assignees","current_activities",
+                "hist_task_count","hist_act_count","copy_count","copy_users","def_desc","form_type","form_id","vars"
+            ]
+            st.dataframe([{k: v for k, v in r.items() if k in cols} for r in view], use_container_width=True)
+
+            # 详情抽屉
+            inst_ids = [r.get("proc_inst_id") for r in view]
+            if inst_ids:
+                sel = st.selectbox("选择实例ID查看详情", options=inst_ids, index=0, key="inst_sel")
+                if sel:
+                    st.markdown("---")
+                    st.subheader("实例详情")
+                    # 运行时任务
+                    st.markdown("**运行时任务**")
+                    ru_task = _read_sql_rows("act_ru_task")
+                    task_cols = ["id_","proc_inst_id_","name_","assignee_","owner_","create_time_","due_date_","category_","priority_"]
+                    task_detail = [r for r in ru_task if str(r.get("proc_inst_id_","")) == str(sel)]
+                    st.dataframe(_pick_cols(task_detail, task_cols), use_container_width=True)
+
+                    # 运行时执行树
+                    st.markdown("**运行时执行树**")
+                    ru_exec = _read_sql_rows("act_ru_execution")
+                    exec_cols = ["id_","proc_inst_id_","parent_id_","super_exec_","act_id_","is_active_","is_concurrent_","is_scope_"]
+                    exec_detail = [r for r in ru_exec if str(r.get("proc_inst_id_","")) == str(sel)]
+                    st.dataframe(_pick_cols(exec_detail, exec_cols), use_container_width=True)
+
+                    # 历史节点轨迹
+                    st.markdown("**历史节点轨迹（act_hi_actinst）**")
+                    hi_act = _read_sql_rows("act_hi_actinst")
+                    hact_cols = ["id_","proc_inst_id_","act_id_","act_name_","start_time_","end_time_","assignee_","task_id_"]
+                    hact_detail = [r for r in hi_act if str(r.get("proc_inst_id_","")) == str(sel)]
+                    st.dataframe(_pick_cols(hact_detail, hact_cols), use_container_width=True)
+
+                    # 变量全部键值
+                    st.markdown("**变量（全部）**")
+                    ru_var = _read_sql_rows("act_ru_variable")
+                    def _val(v):
+                        return v.get("text_") or v.get("double_") or v.get("long_") or ""
+                    var_detail = [r for r in ru_var if str(r.get("proc_inst_id_","")) == str(sel)]
+                    var_rows = [{"name_": v.get("name_",""), "value": _val(v), "execution_id_": v.get("execution_id_",""), "id_": v.get("id_","")} for v in var_detail]
+                    st.dataframe(var_rows, use_container_width=True)
+
+                    # 表单预览（绑定 bpm_process_definition_info → bpm_form）
+                    st.markdown("**表单预览**")
+                    hi = _read_sql_rows("act_hi_procinst")
+                    curr = next((r for r in hi if str(r.get("id_","")) == str(sel)), None)
+                    def _code_of(def_id):
+                        s = str(def_id or "")
+                        return s.split(":")[0] if ":" in s else s
+                    if curr:
+                        def_id = curr.get("proc_def_id_","")
+                        code = _code_of(def_id)
+                        def_info = _read_sql_rows("bpm_process_definition_info")
+                        di = next((d for d in def_info if _code_of(d.get("process_definition_id")) == code), None)
+                        if di:
+                            st.text(f"定义描述：{di.get('description','')}")
+                            st.text(f"表单类型：{di.get('form_type','')} 表单ID：{di.get('form_id','')}")
+                            form_type = str(di.get("form_type",""))
+                            if form_type == "10" and di.get("form_id"):
+                                forms = _read_sql_rows("bpm_form")
+                                fi = next((f for f in forms if str(f.get("id","")) == str(di.get("form_id"))), None)
+                                if fi:
+                                    st.text(f"表单名称：{fi.get('name','')} 状态：{fi.get('status','')}")
+                                    st.text(f"备注：{fi.get('remark','')}")
+                                    st.text(f"字段：{fi.get('fields','')}")
+                                else:
+                                    st.info("未找到对应的公共表单记录")
+                            else:
+                                st.text(f"定义内置字段：{di.get('form_fields','')}")
+                                st.text(f"定义内置配置：{di.get('form_conf','')}")
+                        else:
+                            st.info("未找到对应的流程定义扩展记录")
+            else:
+                st.info("暂无匹配的实例。")
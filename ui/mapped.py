@@ -0,0 +1,239 @@
+# ui/mapped.py
+# -*- coding: utf-8 -*-
+"""
+映射结果管理页（🧩）：已映射表的入库 / 删除，入库任务面板与耗时剖析。
+"""
+import json
+
+import streamlit as st
+
+from backend.db import get_app_setting, list_mapped_tables, set_app_setting
+from backend.mapper_core import delete_table_data, entity_status_by_sid
+from backend.jobs import (
+    cancel_job, clear_finished_jobs, has_active_jobs, list_jobs, submit_import_batch, submit_import_job
+)
+from backend.progress import fmt_eta, fmt_rate
+from ui.common import SID, _guess_table_display_name, render_top_tabs
+
+
+# ================= 入库任务面板（后台线程执行，页面仅轮询） =================
+_JOB_STATUS_LABEL = {
+    "queued": "⏳ 排队中",
+    "running": "🔄 运行中",
+    "done": "✅ 完成",
+    "failed": "❌ 失败",
+    "cancelled": "⏹ 已取消",
+    "interrupted": "⚠️ 已中断",
+}
+
+def _render_import_jobs_body():
+    jobs = list_jobs(limit=20)
+    active = any(j.get("status") in ("queued", "running") for j in jobs)
+    # 任务由运行转为结束时整页重跑一次，刷新入库状态列
+    if st.session_state.get("_jobs_were_active") and not active:
+        st.session_state["_jobs_were_active"] = False
+        st.rerun()
+    st.session_state["_jobs_were_active"] = active
+    if not jobs:
+        st.caption("暂无入库任务。")
+        return
+    for j in jobs:
+        done, total = int(j.get("done") or 0), int(j.get("total") or 0)
+        pct = int(done * 100 / total) if total else (100 if j.get("status") == "done" else 0)
+        label = _JOB_STATUS_LABEL.get(j.get("status"), j.get("status"))
+        text = f"{j.get('source_table')} → {j.get('target_entity') or '-'}｜{label}｜{done}/{total}"
+        if j.get("status") == "running":
+            text += f"｜{fmt_rate(j.get('rate', 0))}｜预计剩余 {fmt_eta(j.get('eta', 0))}"
+        elif j.get("status") in ("done", "cancelled"):
+            text += f"｜写入 {int(j.get('wrote') or 0)} 条｜耗时 {fmt_eta(j.get('elapsed', 0))}"
+        elif j.get("error"):
+            text += f"｜{j.get('error')}"
+        c1, c2 = st.columns([9, 1])
+        c1.progress(min(max(pct, 0), 100), text=text)
+        if j.get("status") in ("queued", "running"):
+            if c2.button("停止", key=f"job_cancel_{j['id']}"):
+                cancel_job(j["id"])
+                st.rerun()
+
+if hasattr(st, "fragment"):
+    _render_import_jobs_live = st.fragment(run_every=2)(_render_import_jobs_body)
+else:
+    _render_import_jobs_live = _render_import_jobs_body
+
+def render_import_jobs():
+    with st.expander("📋 入库任务", expanded=has_active_jobs()):
+        h1, h2 = st.columns([1, 1])
+        if h1.button("🔄 刷新任务", key="jobs_refresh"):
+            st.rerun()
+        if h2.button("清理已结束任务", key="jobs_clear"):
+            clear_finished_jobs()
+            st.rerun()
+        _render_import_jobs_live()
+
+
+def render_import_profiles():
+    """入库耗时剖析：最近一次（或选定）剖析的阶段 / 规则类型 / 规则 / 缓存表，可与另一次对比并下载 JSON"""
+    from backend.profiler import compare_phases, list_profiles, load_profile
+    items = list_profiles(limit=50)
+    if not items:
+        return
+    with st.expander("⏱ 入库耗时剖析", expanded=False):
+        names = [it["name"] for it in items]
+        c1, c2 = st.columns([1, 1])
+        pick = c1.selectbox("剖析记录", options=names, index=0, key="profile_pick")
+        other = c2.selectbox("对比记录（可选）", options=["（不对比）"] + names, index=0, key="profile_cmp")
+        path = items[names.index(pick)]["path"]
+        prof = load_profile(path)
+        if not prof:
+            st.warning("剖析文件读取失败")
+            return
+        meta = prof.get("meta") or {}
+        st.caption(
+            f"{meta.get('source_table', '')} → {meta.get('target_entity') or '-'}｜{meta.get('status', '')}｜"
+            f"{int(meta.get('rows') or 0)} 条，写入 {int(meta.get('wrote') or 0)} 条｜"
+            f"耗时 {fmt_eta(prof.get('elapsed', 0))}｜{prof.get('rows_per_s', 0):.0f} 条/秒｜错误 {prof.get('errors', 0)}"
+        )
+        if other != "（不对比）":
+            prof_b = load_profile(items[names.index(other)]["path"])
+            if prof_b:
+                st.markdown("**阶段对比**（a = 对比记录，b = 当前记录）")
+                st.dataframe(compare_phases(prof_b, prof), use_container_width=True)
+        st.markdown("**阶段**")
+        st.dataframe(prof.get("phases") or [], use_container_width=True)
+        st.markdown("**规则类型**")
+        st.dataframe(prof.get("kinds") or [], use_container_width=True)
+        st.markdown("**规则**（按 field_map id，多规则 || 为 id.序号）")
+        st.dataframe(prof.get("rules") or [], use_container_width=True)
+        if prof.get("caches"):
+            st.markdown("**缓存命中**")
+            st.dataframe(prof.get("caches"), use_container_width=True)
+        st.download_button(
+            "下载 JSON", data=json.dumps(prof, ensure_ascii=False, indent=1),
+            file_name=f"{pick}.json", mime="application/json", key="profile_download",
+        )
+
+
+# ================= 新增：映射结果管理页 =================
+def render_mapped_tables():
+    st.title("🧩 映射结果管理")
+    render_top_tabs('mapped')
+
+    rows = list_mapped_tables()
+    if not rows:
+        st.info("暂无已设置映射的表。请先在『源表列表』里为表设置 target_entity。")
+        return
+
+    delete_lock_key = "lock_delete_mapped_tables"
+    locked = (get_app_setting(delete_lock_key, "0") == "1")
+    lock_now = st.checkbox("屏蔽删除按钮（防误删除，长期生效）", value=locked, key=delete_lock_key)
+    if lock_now != locked:
+        set_app_setting(delete_lock_key, "1" if lock_now else "0")
+        locked = lock_now
+
+    # 顶部批量操作
+    c1, c2, c3 = st.columns([1,1,6])
+    with c1:
+        # 批量入库方式选择
+        bulk_mode_label_to_val = {
+            "创建更新": "upsert",
+            "仅更新": "update_only",
+            "仅创建": "create_only",
+        }
+        bulk_mode = st.selectbox(
+            "入库方式",
+            options=list(bulk_mode_label_to_val.keys()),
+            index=0,
+            key="bulk_import_mode"
+        )
+        bulk_sync_soft_delete = st.checkbox("同步清理未命中（del=1）", value=False, key="bulk_sync_soft_delete")
+        profile_on = st.checkbox("记录耗时剖析", value=False, key="import_profile_on",
+                                 help="按阶段 / 规则 / 规则类型 / 缓存命中统计入库耗时，结果见下方『入库耗时剖析』")
+        if st.button("一键入库（全部）", type="primary"):
+            # 同优先级并发，不同优先级按从高到低分批执行
+            submit_import_batch(
+                rows,
+                sid=st.session_state.get("current_sid", SID),
+                import_mode=bulk_mode_label_to_val.get(bulk_mode, "upsert"),
+                sync_soft_delete=bulk_sync_soft_delete,
+                source_kind=st.session_state.get("source_input_kind", "file"),
+                profile=profile_on,
+            )
+            st.success(f"✅ 已提交 {len(rows)} 个入库任务（{bulk_mode}），可在下方『入库任务』查看进度。")
+    with c2:
+        if st.button("一键删除（全部）", disabled=locked):
+            total_del = 0
+            for r in rows:
+                total_del += delete_table_data(r["target_entity"], sid=st.session_state.get("current_sid", SID)) 
+            st.success(f"🗑 已删除 {total_del} 条（按 type 汇总）。")
+
+    render_import_jobs()
+    render_import_profiles()
+
+    st.markdown("---")
+
+    # 表头
+    head = st.columns([3, 3, 3, 3, 1, 1, 2])
+    head[0].markdown("**名称**")
+    head[1].markdown("**源表**")
+    head[2].markdown("**目标 type**")
+    head[3].markdown("**描述**")
+    head[4].markdown("**状态**")
+    head[5].markdown("**优先度**")
+    head[6].markdown("**操作**")
+
+    # 每行
+    status_map = entity_status_by_sid(st.session_state.get("current_sid", SID))
+    for r in rows:
+        src = r["source_table"]
+        tgt = r["target_entity"]
+        pri = r["priority"]
+        desc = r.get("description") or ""
+        disp_name = _guess_table_display_name(src)
+        count = (status_map.get(tgt) or {}).get("count", 0)
+        status = "✅ 已入库" if count > 0 else "❌ 未入库"
+
+        cols = st.columns([3, 3, 3, 3, 1, 1, 3])
+        cols[0].text(disp_name)
+        # 跳转时携带 entity 参数，直达该目标的详情页（新标签页打开）
+        cols[1].markdown(
+            f'<a href="?page=detail&table={src}&entity={tgt}" target="_blank">{src}</a>',
+            unsafe_allow_html=True
+        )
+        cols[2].text(tgt)
+        cols[3].text(desc)
+        cols[4].text("✅" if count > 0 else "❌")
+        cols[5].text(str(pri))
+
+        with cols[6]:
+            # 行级入库方式选择 + 操作按钮
+            mode_label_to_val = {
+                "创建更新": "upsert",
+                "仅更新": "update_only",
+                "仅创建": "create_only",
+            }
+            row_mode_label = st.selectbox(
+                "入库方式",
+                options=list(mode_label_to_val.keys()),
+                index=0,
+                key=f"mode_{src}_{tgt}"
+            )
+            row_sync_soft_delete = st.checkbox("同步清理", value=False, key=f"sync_{src}_{tgt}")
+            b1, b2 = st.columns([1,1])
+            with b1:
+                if st.button("入库", key=f"imp_{src}_{tgt}"):
+                    submit_import_job(
+                        src,
+                        target_entity=tgt,
+                        sid=st.session_state.get("current_sid", SID),
+                        import_mode=mode_label_to_val.get(row_mode_label, "upsert"),
+                        sync_soft_delete=row_sync_soft_delete,
+                        source_kind=st.session_state.get("source_input_kind", "file"),
+                        profile=profile_on,
+                    )
+                    st.success(f"已提交入库任务（{row_mode_label}）：{src} → {tgt}")
+                    st.rerun()
+            with b2:
+                if st.button("删除", key=f"del_{src}_{tgt}", disabled=locked):
+                    n = delete_table_data(tgt, sid=st.session_state.get("current_sid", SID))
+                    st.success(f"删除完成：清理 {n} 条")
+                    st.rerun()
@@ -0,0 +1,94 @@
+# ui/multi_mapping.py
+# -*- coding: utf-8 -*-
+"""
+多映射管理页：同一源表映射到多个 target_entity。
+"""
+import streamlit as st
+
+from backend.db import delete_table_mapping, list_mapped_tables, list_tables, save_table_mapping
+from ui.common import _ensure_all_fields_seeded, render_top_tabs
+
+
+@st.cache_data(ttl=30)
+def _cached_list_tables():
+    return [r[0] for r in list_tables()]
+
+def render_multi_mapping():
+    st.title("🧩 多映射管理中心")
+    render_top_tabs('multi_mapping')
+
+    rows = list_mapped_tables()
+    if not rows:
+        st.info("暂无已设置映射目标。")
+    else:
+        c1, c2 = st.columns([1, 1])
+        with c1:
+            if st.button("➕ 新建映射目标"):
+                st.session_state["creating_map"] = True
+        with c2:
+            if st.button("🔄 刷新"):
+                st.rerun()
+
+        st.divider()
+
+        for r in rows:
+            src, tgt, desc = r["source_table"], r["target_entity"], r["description"]
+            pri = r.get("priority", 0)
+            cols = st.columns([3, 3, 3, 2])
+            # 源表列改为可点击跳详情（携带 entity，新标签页打开）
+            cols[0].markdown(
+                f'🗂️ <a href="?page=detail&table={src}&entity={tgt}" target="_blank"><code>{src}</code></a>',
+                unsafe_allow_html=True
+            )
+            cols[1].markdown(f"🎯 `{tgt}`")
+            new_desc = cols[2].text_input("描述", value=desc or "", key=f"desc_{src}_{tgt}")
+            with cols[3]:
+                b1, b2 = st.columns([1,1])
+                with b1:
+                    if st.button("保存", key=f"save_{src}_{tgt}"):
+                        save_table_mapping(src, tgt, pri, new_desc or "")
+                        st.success("描述已更新")
+                        st.rerun()
+                with b2:
+                    if st.button("❌ 删除", key=f"del_{src}_{tgt}"):
+                        # 弹出确认层：携带表/实体/描述
+                        st.session_state["confirm_del_show"] = True
+                        st.session_state["confirm_del_src"] = src
+                        st.session_state["confirm_del_tgt"] = tgt
+                        st.session_state["confirm_del_desc"] = new_desc or ""
+
+        # 删除确认弹层（全局唯一）
+        if st.session_state.get("confirm_del_show"):
+            st.warning(
+                f"确认删除该映射？\n\n- 源表：{st.session_state.get('confirm_del_src','')}\n- 实体：{st.session_state.get('confirm_del_tgt','')}\n- 描述：{st.session_state.get('confirm_del_desc','')}\n\n删除后会同时清理该实体下的所有字段映射。"
+            )
+            cdel = st.columns([1,1,6])
+            with cdel[0]:
+                if st.button("确定删除", key="confirm_delete_go"):
+                    delete_table_mapping(st.session_state.get("confirm_del_src",""), st.session_state.get("confirm_del_tgt",""))
+                    st.success("已删除映射，并清理对应字段")
+                    st.session_state["confirm_del_show"] = False
+                    st.session_state.pop("confirm_del_src", None)
+                    st.session_state.pop("confirm_del_tgt", None)
+                    st.session_state.pop("confirm_del_desc", None)
+                    st.rerun()
+            with cdel[1]:
+                if st.button("取消", key="confirm_delete_cancel"):
+                    st.session_state["confirm_del_show"] = False
+                    st.rerun()
+
+            # ========== 创建新映射弹窗 ==========
+        if st.session_state.get("creating_map"):
+            st.subheader("➕ 新建映射目标")
+            table_name = st.text_input("源表名")
+            target_entity = st.text_input("目标实体名")
+            desc = st.text_input("描述", "自动生成的映射")
+            pri = st.number_input("优先级", value=0)
+            if st.button("创建映射"):
+                save_table_mapping(table_name, target_entity, pri, desc)
+                # ✅ 新建后立即为该实体生成基础字段映射（不覆盖既有字段）
+                _ensure_all_fields_seeded(table_name, target_entity or "")
+                st.success("✅ 新映射已创建，并初始化基础字段映射")
+                st.session_state["creating_map"] = False
+                st.rerun()
+        st.markdown("---")
@@ -0,0 +1,367 @@
+# ui/sidebar.py
+# -*- coding: utf-8 -*-
+"""
+侧边栏：源库 / 目标库连接与 SID 预设。
+- init_session_state：会话默认值；最近一次应用的目标库 / 源库配置每个会话只从 SQLite 恢复一次；
+- 连接探测结果按配置缓存在会话中，配置变化（或点击「重新检测连接」）时才重新连接。
+"""
+import json
+from typing import Any, Callable, Optional
+
+import streamlit as st
+
+from backend.presets import (
+    delete_preset, get_last_runtime, get_last_source, list_presets, save_last_runtime, save_preset
+)
+from backend.sql_utils import update_runtime_db
+from ui.common import SID
+
+
+def init_session_state():
+    """会话默认值；首次运行时恢复最近一次应用的目标库 / 源库配置"""
+    if "source_input_kind" not in st.session_state:
+        st.session_state.source_input_kind = "file"
+    if "source_db_cfg" not in st.session_state:
+        st.session_state.source_db_cfg = {
+            "host": "127.0.0.1",
+            "port": 5432,
+            "user": "postgres",
+            "password": "",
+            "database": "postgres",
+            "schema": "public",
+        }
+    if "db_kind" not in st.session_state:
+        st.session_state.db_kind = "mysql"
+    if "db_cfg" not in st.session_state:
+        st.session_state.db_cfg = {
+            "host": "127.0.0.1",
+            "port": 3307,
+            "user": "im",
+            "password": "root",
+            "database": "im",
+            "charset": "utf8mb4",
+            "autocommit": False,
+            "schema": "public",  # 仅 PG 使用
+        }
+    if "current_sid" not in st.session_state:
+        st.session_state.current_sid = SID
+    if st.session_state.get("_runtime_restored"):
+        return
+    st.session_state["_runtime_restored"] = True
+    # 会话首次运行时恢复最近一次应用的运行时配置
+    last = get_last_runtime()
+    if last:
+        st.session_state.db_kind = last.get("kind") or st.session_state.db_kind
+        st.session_state.db_cfg = {
+            "host": last.get("host", st.session_state.db_cfg.get("host")),
+            "port": int(last.get("port", st.session_state.db_cfg.get("port"))),
+            "user": last.get("user", st.session_state.db_cfg.get("user")),
+            "password": last.get("password", st.session_state.db_cfg.get("password")),
+            "database": last.get("database", st.session_state.db_cfg.get("database")),
+            "charset": last.get("charset", st.session_state.db_cfg.get("charset")),
+            "autocommit": bool(last.get("autocommit", st.session_state.db_cfg.get("autocommit"))),
+            "schema": last.get("schema", st.session_state.db_cfg.get("schema")),
+        }
+        # 兼容：如无 sid 则回退使用 schema
+        st.session_state.current_sid = last.get("sid") or last.get("schema") or st.session_state.current_sid
+        try:
+            update_runtime_db(st.session_state.db_kind, st.session_state.db_cfg)
+        except Exception as e:
+            st.warning(f"恢复上次配置失败：{e}")
+
+    last_src = get_last_source()
+    if last_src:
+        st.session_state.source_db_cfg = {
+            "host": last_src.get("host", st.session_state.source_db_cfg.get("host")),
+            "port": (int(last_src.get("port")) if last_src.get("port") is not None else st.session_state.source_db_cfg.get("port")),
+            "user": last_src.get("user", st.session_state.source_db_cfg.get("user")),
+            "password": last_src.get("password", st.session_state.source_db_cfg.get("password")),
+            "database": last_src.get("database", st.session_state.source_db_cfg.get("database")),
+            "schema": last_src.get("schema", st.session_state.source_db_cfg.get("schema")),
+        }
+        st.session_state.source_input_kind = ("db" if str(last_src.get("kind","")) == "pg" else "file")
+        try:
+            from backend.sql_utils import update_source_db
+            update_source_db("pg", st.session_state.source_db_cfg)
+        except Exception:
+            pass
+
+
+def _probe(slot: str, sig: Any, connect: Callable[[], Any]) -> Optional[str]:
+    """按配置缓存连接探测结果：sig 未变时直接返回上次结果。成功返回 None，失败返回错误信息"""
+    key = json.dumps(sig, sort_keys=True, default=str)
+    cache = st.session_state.setdefault("_conn_probe", {})
+    hit = cache.get(slot)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    err = None
+    try:
+        connect().close()
+    except Exception as e:
+        err = str(e)
+    cache[slot] = (key, err)
+    return err
+
+
+def render_sidebar():
+    with st.sidebar:
+        st.header("源库选择")
+        _src_opts = ["本地文件", "接入数据库（pgsql）"]
+        _src_sel = st.radio("源数据来源", options=_src_opts, index=(0 if st.session_state.get("source_input_kind") != "db" else 1))
+        st.session_state.source_input_kind = ("db" if _src_sel == "接入数据库（pgsql）" else "file")
+        # 来源切换时才应用并记录（不在每次重跑时写库）
+        if st.session_state.get("_source_kind_saved") != st.session_state.source_input_kind:
+            st.session_state["_source_kind_saved"] = st.session_state.source_input_kind
+            try:
+                from backend.presets import save_last_source
+                if st.session_state.source_input_kind == "db":
+                    from backend.sql_utils import update_source_db
+                    update_source_db("pg", st.session_state.source_db_cfg)
+                    save_last_source("pg", st.session_state.source_db_cfg)
+                else:
+                    save_last_source("file", {})
+            except Exception:
+                pass
+        if st.session_state.source_input_kind == "db":
+            from backend.sql_utils import get_source_conn
+            cfg = st.session_state.source_db_cfg
+            err = _probe("source", ("pg", cfg), get_source_conn)
+            if err is None:
+                st.caption(f"源库连接：{cfg.get('host')}:{cfg.get('port')}/{cfg.get('database')}@{cfg.get('schema')} 已连接")
+            else:
+                st.error(f"源库连接失败：{err}")
+        if st.session_state.source_input_kind == "db":
+            from backend.presets import list_src_presets, save_src_preset, delete_src_preset, save_last_source
+            st.subheader("源库连接（pgsql）")
+            src_presets = list_src_presets()
+            if src_presets:
+                for p in src_presets:
+                    label = f"{(p.get('name') or '').strip()}-{(p.get('schema') or '').strip()}"
+                    cols_row = st.columns([4,1,1])
+                    with cols_row[0]:
+                        if st.button(label or "(未命名)", key=f"src_preset_select_{p.get('name','')}"):
+                            st.session_state["selected_src_preset_name"] = p.get("name")
+                            st.session_state["selected_src_preset_label"] = label or p.get("name")
+                    with cols_row[1]:
+                        if st.button("❌", key=f"src_preset_del_{p.get('name','')}"):
+                            try:
+                                delete_src_preset(p.get("name"))
+                                st.success("已删除源库预设")
+                                st.rerun()
+                            except Exception as e:
+                                st.error(f"删除失败：{e}")
+                    with cols_row[2]:
+                        if st.button("🧹缓存", key=f"src_preset_cache_{p.get('name','')}"):
+                            try:
+                                from backend.access_cache import clear_access_cache
+                                conn_key = f"pg|{str(p.get('host') or '')}|{str(p.get('port') or '')}|{str(p.get('database') or '')}|{str(p.get('schema') or '')}"
+                                n = clear_access_cache("db", conn_key)
+                                from backend.source_store import invalidate as _invalidate_source
+                                _invalidate_source("db", conn_key)
+                                st.success(f"已清除该源库缓存 {n} 项")
+                            except Exception as e:
+                                st.error(f"清除失败：{e}")
+                if st.session_state.get("selected_src_preset_label"):
+                    st.caption(f"已选中：{st.session_state.get('selected_src_preset_label')}")
+            else:
+                st.info("暂无源库预设，请点击下方『添加』进行创建")
+            ctrl_cols2 = st.columns([1,1])
+            with ctrl_cols2[0]:
+                if st.button("添加源库"):
+                    st.session_state["show_add_src_panel"] = True
+            with ctrl_cols2[1]:
+                if st.button("应用源库"):
+                    sel_name = st.session_state.get("selected_src_preset_name")
+                    if not sel_name:
+                        st.warning("请先选择一个源库预设。")
+                    else:
+                        src_presets = list_src_presets()
+                        target = next((x for x in src_presets if x.get("name") == sel_name), None)
+                        if not target:
+                            st.warning("选中的源库预设不存在。")
+                        else:
+                            st.session_state.source_db_cfg = {
+                                "host": target.get("host") or st.session_state.source_db_cfg.get("host"),
+                                "port": int(target.get("port") or st.session_state.source_db_cfg.get("port")),
+                                "user": target.get("user") or st.session_state.source_db_cfg.get("user"),
+                                "password": target.get("password") or st.session_state.source_db_cfg.get("password"),
+                                "database": target.get("database") or st.session_state.source_db_cfg.get("database"),
+                                "schema": target.get("schema") or st.session_state.source_db_cfg.get("schema"),
+                            }
+                            try:
+                                from backend.sql_utils import update_source_db
+                                update_source_db("pg", st.session_state.source_db_cfg)
+                                save_last_source("pg", st.session_state.source_db_cfg)
+                                st.success("已应用源库预设")
+                            except Exception as e:
+                                st.error(f"应用失败：{e}")
+                            st.rerun()
+            if st.session_state.get("show_add_src_panel"):
+                with st.form("add_src_preset_form"):
+                    st.subheader("添加源库连接")
+                    preset_name = st.text_input("名称", value="")
+                    host_inp = st.text_input("主机", value=st.session_state.source_db_cfg.get("host", "127.0.0.1"))
+                    port_inp = st.number_input("端口", value=int(st.session_state.source_db_cfg.get("port", 5432)), step=1)
+                    user_inp = st.text_input("用户", value=st.session_state.source_db_cfg.get("user", "postgres"))
+                    pwd_inp = st.text_input("密码", value=st.session_state.source_db_cfg.get("password", ""))
+                    db_inp = st.text_input("库/数据库", value=st.session_state.source_db_cfg.get("database", "postgres"))
+                    schema_inp = st.text_input("空间(schema)", value=st.session_state.source_db_cfg.get("schema", "public"))
+                    c1,c2 = st.columns([1,1])
+                    with c1:
+                        do_save = st.form_submit_button("保存")
+                    with c2:
+                        do_cancel = st.form_submit_button("取消")
+                    if do_cancel:
+                        st.session_state["show_add_src_panel"] = False
+                        st.rerun()
+                    if do_save:
+                        name_norm = (preset_name or "").strip()
+                        if not name_norm:
+                            st.warning("请填写名称。")
+                        elif not db_inp:
+                            st.warning("请填写库/数据库名称。")
+                        else:
+                            try:
+                                save_src_preset(name_norm, "pg", host_inp, int(port_inp or 0), user_inp, pwd_inp, db_inp, schema_inp)
+                                st.session_state["show_add_src_panel"] = False
+                                st.session_state["selected_src_preset_name"] = name_norm
+                                st.session_state["selected_src_preset_label"] = f"{name_norm}-{(schema_inp or '').strip()}"
+                                st.success("预设已保存")
+                                st.rerun()
+                            except Exception as e:
+                                st.error(f"保存失败：{e}")
+        
+        st.header("库/空间目标")
+        st.caption("列表：名称-sid（删除：❌）；支持添加与应用")
+        from backend.sql_utils import get_conn
+        cfg = st.session_state.db_cfg
+        err = _probe("target", (st.session_state.db_kind, cfg), get_conn)
+        if err is None:
+            st.caption(f"目标库连接：{cfg.get('host')}:{cfg.get('port')}/{cfg.get('database')}@{cfg.get('schema')} 已连接")
+        else:
+            st.error(f"目标库连接失败：{err}")
+        if st.button("🔄 重新检测连接", key="conn_probe_reset"):
+            st.session_state.pop("_conn_probe", None)
+            st.rerun()
+
+        # 预设列表：点击即切换
+        presets = list_presets()
+        if presets:
+            for p in presets:
+                disp_label = (p.get('name') or '').strip()
+                # 兼容旧预设：无 sid 则显示 schema
+                sid_label = (p.get('sid') or p.get('schema') or '').strip()
+                label = f"{disp_label}-{sid_label}" if sid_label else disp_label
+                cols_row = st.columns([4, 1])
+                with cols_row[0]:
+                    if st.button(label or "(未命名)", key=f"preset_select_{p.get('name','')}"):
+                        st.session_state["selected_preset_name"] = p.get("name")
+                        st.session_state["selected_preset_label"] = label or p.get("name")
+                with cols_row[1]:
+                    if st.button("❌", key=f"preset_del_{p.get('name','')}"):
+                        try:
+                            delete_preset(p.get("name"))
+                            st.success("已删除预设")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"删除失败：{e}")
+            if st.session_state.get("selected_preset_label"):
+                st.caption(f"已选中：{st.session_state.get('selected_preset_label')}")
+        else:
+            st.info("暂无预设，请点击下方『添加』进行创建")
+
+        # 交互：添加 & 应用
+        ctrl_cols = st.columns([1, 1])
+        with ctrl_cols[0]:
+            if st.button("添加"):
+                st.session_state["show_add_panel"] = True
+        with ctrl_cols[1]:
+            if st.button("应用"):
+                sel_name = st.session_state.get("selected_preset_name")
+                if not sel_name:
+                    st.warning("请先在上方列表里选择一个条目。")
+                else:
+                    # 找到并应用
+                    presets = list_presets()
+                    target = next((x for x in presets if x.get("name") == sel_name), None)
+                    if not target:
+                        st.warning("选中的条目不存在，请刷新后重试。")
+                    else:
+                        st.session_state.db_kind = (target.get("kind") or st.session_state.db_kind)
+                        st.session_state.db_cfg = {
+                            "host": target.get("host") or st.session_state.db_cfg.get("host"),
+                            "port": int(target.get("port") or st.session_state.db_cfg.get("port")),
+                            "user": target.get("user") or st.session_state.db_cfg.get("user"),
+                            "password": target.get("password") or st.session_state.db_cfg.get("password"),
+                            "database": target.get("database") or st.session_state.db_cfg.get("database"),
+                            "charset": target.get("charset") or st.session_state.db_cfg.get("charset"),
+                            "autocommit": bool(target.get("autocommit") if target.get("autocommit") is not None else st.session_state.db_cfg.get("autocommit")),
+                            # 统一：schema 即为 SID；兼容旧数据使用 schema
+                            "schema": target.get("sid") or target.get("schema") or st.session_state.db_cfg.get("schema"),
+                        }
+                        # 同步当前 SID，兼容旧数据
+                        st.session_state.current_sid = target.get("sid") or target.get("schema") or st.session_state.current_sid
+                        try:
+                            update_runtime_db(st.session_state.db_kind, st.session_state.db_cfg)
+                            save_last_runtime(st.session_state.db_kind, st.session_state.db_cfg, st.session_state.current_sid)
+                            st.success("已应用选中条目")
+                        except Exception as e:
+                            st.error(f"应用失败：{e}")
+                        st.rerun()
+
+        # 添加面板（弹出式）
+        if st.session_state.get("show_add_panel"):
+            with st.form("add_preset_form"):
+                st.subheader("添加库连接与SID")
+                preset_name = st.text_input("名称", value="")
+                kind_label_to_val = {"mysql": "mysql", "postgres": "pg"}
+                kind_choice = st.selectbox("数据库类型", options=list(kind_label_to_val.keys()), index=0)
+                host_inp = st.text_input("主机", value=st.session_state.db_cfg.get("host", "127.0.0.1"))
+                port_inp = st.number_input("端口", value=int(st.session_state.db_cfg.get("port", 3306)), step=1)
+                user_inp = st.text_input("用户", value=st.session_state.db_cfg.get("user", "root"))
+                pwd_inp  = st.text_input("密码", value=st.session_state.db_cfg.get("password", ""))
+                db_inp   = st.text_input("库/数据库", value=st.session_state.db_cfg.get("database", ""))
+                # 统一：空间即 SID
+                schema_inp = st.text_input("空间(sid)", value=st.session_state.db_cfg.get("schema", ""))
+
+                c1, c2 = st.columns([1,1])
+                with c1:
+                    do_save = st.form_submit_button("保存")
+                with c2:
+                    do_cancel = st.form_submit_button("取消")
+
+                if do_cancel:
+                    st.session_state["show_add_panel"] = False
+                    st.rerun()
+
+                if do_save:
+                    name_norm = (preset_name or "").strip()
+                    if not name_norm:
+                        st.warning("请填写预设名称。")
+                    elif not db_inp:
+                        st.warning("请填写库/数据库名称。")
+                    else:
+                        try:
+                            save_preset(
+                                name=name_norm,
+                                kind=kind_label_to_val.get(kind_choice, "mysql"),
+                                host=host_inp,
+                                port=int(port_inp or 0),
+                                user=user_inp,
+                                password=pwd_inp,
+                                database=db_inp,
+                                charset=st.session_state.db_cfg.get("charset"),
+                                autocommit=st.session_state.db_cfg.get("autocommit"),
+                                # 同步保存：schema 与 sid 使用同一值
+                                schema=(schema_inp or None),
+                                sid=(schema_inp or None),
+                            )
+                            # 关闭添加面板并选中新建条目
+                            st.session_state["show_add_panel"] = False
+                            new_label = f"{name_norm}-{(schema_inp or '').strip()}" if (schema_inp or '').strip() else name_norm
+                            st.session_state["selected_preset_name"] = name_norm
+                            st.session_state["selected_preset_label"] = new_label
+                            st.success("✅ 预设已保存")
+                            st.rerun()
+                        except Exception as e:
+                            st.error(f"保存失败：{e}")
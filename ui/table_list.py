@@ -0,0 +1,71 @@
+# ui/table_list.py
+# -*- coding: utf-8 -*-
+"""
+主页：源表列表、启用 / 停用、配置导入导出。
+"""
+import json
+
+import streamlit as st
+
+from backend.db import export_all, import_all, list_tables, restore_table, soft_delete_table
+from ui.common import render_top_tabs
+
+
+def render_table_list():
+    st.title("🏠 主页")
+    render_top_tabs('list')
+
+    top = st.columns([1,1,6])
+    with top[0]:
+        if st.button("导出配置"):
+            cfg = export_all()
+            st.download_button(
+                "下载 mapping_config.json",
+                data=json.dumps(cfg, ensure_ascii=False, indent=2),
+                file_name="mapping_config.json",
+                mime="application/json",
+                key="download_all_btn"
+            )
+    with top[1]:
+        upf = st.file_uploader("导入配置", type=["json"])
+        if upf:
+            obj = json.loads(upf.read().decode("utf-8"))
+            import_all(obj)
+            st.success("导入完成"); st.rerun()
+
+    st.markdown("---")
+
+    # 顶部导航已包含所有管理入口，主页继续保留导出/导入功能
+
+    st.markdown("---")
+
+    # 搜索 & 回收站
+    col_s = st.columns([3, 2])
+    with col_s[0]:
+        search = st.text_input("搜索")
+    with col_s[1]:
+        show_disabled = st.checkbox("显示停用表", value=False)
+
+    rows = list_tables(include_disabled=show_disabled)
+    if search:
+        rows = [r for r in rows if search.lower() in r[0].lower()]
+
+    st.markdown("**源表 | 目标entity | 优先级 | 操作 | 状态**")
+    for src, tgt, pri, dis, desc in rows:
+        col = st.columns([3, 3, 1, 1, 2])
+        with col[0]:
+            link = f"?page=detail&table={src}" + (f"&entity={tgt}" if (tgt or "").strip() else "")
+            st.markdown(f"[{src}]({link})", unsafe_allow_html=True)
+        with col[1]:
+            st.text(tgt or "")
+        with col[2]:
+            st.text(str(pri))
+        with col[3]:
+            if dis:
+                if st.button("恢复", key=f"res_{src}_{tgt}"):
+                    restore_table(src); st.rerun()
+            else:
+                if st.button("停用", key=f"del_{src}_{tgt}"):
+                    soft_delete_table(src); st.rerun()
+        with col[4]:
+            st.text("停用" if dis else "启用")
@@ -0,0 +1,186 @@
+# ui/user_dept.py
+# -*- coding: utf-8 -*-
+"""
+用户部门管理页（👥）：用户/部门映射刷新，sys_user 解析、预览并写入 / 删除 usr。
+"""
+import json
+
+import streamlit as st
+
+from backend.progress import Progress
+from ui.common import SID, _parse_all_inserts, _st_progress_sink, _user_dept_maps, gen_uuid10, render_top_tabs
+
+
+def render_user_dept_mgmt():
+    from backend.user_directory import invalidate_usr
+    st.title("👥 用户部门管理")
+    render_top_tabs('user_dept')
+    kw = st.text_input("关键词（姓名/ID/部门）", key="user_dept_kw")
+    only_missing = st.checkbox("仅看缺失部门", value=False, key="user_dept_missing")
+    rows = _parse_all_inserts("sys_user")
+    umap, dmap = _user_dept_maps()
+    data = []
+    for r in rows:
+        uid = str(r.get("user_id") or "").strip()
+        name = str(r.get("nick_name") or "").strip()
+        did = str(r.get("dept_id") or "").strip()
+        dname = dmap.get(did, "")
+        item = {"user_id": uid, "nick_name": name, "dept_id": did, "dept_name": dname}
+        if kw:
+            s = kw.strip().lower()
+            if not (s in uid.lower() or s in name.lower() or s in did.lower() or s in dname.lower()):
+                continue
+        if only_missing and dname:
+            continue
+        data.append(item)
+    st.dataframe(data, use_container_width=True)
+    cols = st.columns([1,1,6])
+    with cols[0]:
+        if st.button("🔄 刷新映射", key="user_dept_refresh"):
+            from backend.user_directory import invalidate as _invalidate_dir, invalidate_usr
+            _invalidate_dir()
+            invalidate_usr()
+            _user_dept_maps()
+            st.rerun()
+
+    st.subheader("用户入库")
+    imp_cols = st.columns([2,1,1,1,1,1])
+    with imp_cols[0]:
+        rec_id = st.text_input("记录ID（仅处理该记录）", key="usr_imp_rec_id")
+    with imp_cols[1]:
+        btn_preview = st.button("解析预览", key="usr_imp_preview")
+    with imp_cols[2]:
+        btn_write_preview = st.button("写入预览", key="usr_imp_write_preview")
+    with imp_cols[3]:
+        btn_apply = st.button("一键入库", key="usr_imp_apply")
+    with imp_cols[4]:
+        btn_del = st.button("一键删除", key="usr_imp_delete")
+    with imp_cols[5]:
+        btn_del_preview = st.button("预览删除", key="usr_imp_delete_preview")
+
+    def _gen_uuid11():
+        import random
+        chars = "0123456789abcdefghijklmnopqrstuvwxyz"
+        try:
+            base = gen_uuid10()
+        except Exception:
+            base = "".join(random.choice(chars) for _ in range(10))
+        return base + random.choice(chars)
+
+    def _build_usr_row(sys_row: dict):
+        return {
+            "uuid": _gen_uuid11(),
+            "email": str(sys_row.get("user_name") or ""),
+            "pwd": "02b45e1b907d4dbe89d72c01fb5a5f5bd004f944",
+            "tel": None,
+            "name": str(sys_row.get("nick_name") or ""),
+            "sid": SID,
+            "data": json.dumps({"bool_c_p":0,"freeze_account":"否","pwd_error":0, "source_id": sys_row.get("user_id")}, ensure_ascii=False),
+            "belong_space": 1,
+        }
+
+    def _select_sys_users():
+        all_rows = _parse_all_inserts("sys_user")
+        if rec_id:
+            return [r for r in all_rows if str(r.get("user_id","")) == str(rec_id)]
+        return all_rows
+
+    def _write_usr(rows: list):
+        from backend.bulk_writer import bulk_insert
+        wrote, err = bulk_insert("usr", rows, columns=["uuid","email","pwd","tel","name","sid","data","belong_space"])
+        if wrote:
+            invalidate_usr()
+        if err:
+            st.error(f"入库失败：{err}")
+        return wrote
+
+    def _delete_usr_by_sys_users():
+        from backend.sql_utils import get_conn
+        emails = [str(r.get("user_name") or "") for r in _select_sys_users()]
+        emails = [e for e in emails if e]
+        if not emails:
+            return 0
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                # 仅删除属于 sys_user 映射的邮箱
+                fmt = ",".join(["%s"]*len(emails))
+                cur.execute(f"DELETE FROM usr WHERE email IN ({fmt})", emails)
+            conn.commit()
+            invalidate_usr()
+            return len(emails)
+        except Exception as e:
+            conn.rollback(); st.error(f"删除失败：{e}")
+            return 0
+        finally:
+            conn.close()
+
+    def _preview_delete_usr_by_sys_users():
+        from backend.sql_utils import get_conn
+        emails = [str(r.get("user_name") or "") for r in _select_sys_users()]
+        emails = [e for e in emails if e]
+        if not emails:
+            st.info("无匹配邮箱")
+            return
+        conn = get_conn()
+        try:
+            with conn.cursor() as cur:
+                fmt = ",".join(["%s"]*len(emails))
+                cur.execute(f"SELECT uuid,email,name FROM usr WHERE email IN ({fmt})", emails)
+                rows = cur.fetchall() or []
+            show = []
+            for r in rows:
+                try:
+                    # pymysql 返回为元组；psycopg2 为元组；统一处理
+                    uu, em, nm = r[0], r[1], (r[2] if len(r) > 2 else "")
+                    show.append({"uuid": uu, "email": em, "name": nm})
+                except Exception:
+                    continue
+            st.dataframe(show[:200], use_container_width=True)
+            st.info(f"可删除 usr {len(show)} 条")
+        finally:
+            conn.close()
+
+    if btn_preview:
+        src = _select_sys_users()
+        show = [{
+            "user_id": r.get("user_id"),
+            "user_name": r.get("user_name"),
+            "nick_name": r.get("nick_name"),
+            "phonenumber": r.get("phonenumber"),
+        } for r in src][:200]
+        st.dataframe(show, use_container_width=True)
+
+    if btn_write_preview:
+        src = _select_sys_users()
+        rows_preview = [_build_usr_row(r) for r in src]
+        st.dataframe([
+            {"uuid": x["uuid"], "email": x["email"], "tel": x["tel"], "name": x["name"], "sid": x["sid"], "belong_space": x["belong_space"], "data": x["data"]}
+            for x in rows_preview
+        ][:200], use_container_width=True)
+
+    if btn_apply:
+        src = _select_sys_users()
+        targets = [_build_usr_row(r) for r in src]
+        total = len(targets)
+        prog = st.progress(0)
+        tracker = Progress(total=total).subscribe(_st_progress_sink(prog, "入库 usr"))
+        wrote = 0
+        batch = []
+        for row in targets:
+            batch.append(row)
+            if len(batch) >= 100:
+                wrote += _write_usr(batch)
+                batch = []
+            tracker.add()
+        if batch:
+            wrote += _write_usr(batch)
+        tracker.finish()
+        st.success(f"入库 usr {wrote} 条")
+
+    if btn_del:
+        n = _delete_usr_by_sys_users()
+        st.success(f"已删除 usr {n} 条（来自 sys_user 的邮箱匹配）")
+
+    if btn_del_preview:
+        _preview_delete_usr_by_sys_users()
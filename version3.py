@@ -19,13 +19,16 @@ from datetime import datetime
 from typing import List, Any, Tuple, Set
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from backend.mapper_core import apply_record_mapping, get_target_entity, get_all_prioritized_tables, get_table_priority
+from backend.sql_shards import load_shard_manifest, manifest_path, read_shard_text
+from backend.event_log import log_event
 
 # ========== 配置 ==========
 SQL_DIR = "./source/sql"
 TABLE_FILE = Path("./source/table_temp.txt")
 CHANGE_FILE = Path("./source/change_temp.txt")
-LOG_FILE = "import_log.txt"
+# 日志：backend/event_log.py 缓冲写入 import_log.jsonl（JSON lines，自动轮转）
 THREADS = 6
+SHARD_THREADS = 4  # 有分片清单（scripts/split_sql.py）时，单表内并行处理的分片数
 DRY_RUN = False
 DELETE_MODE = "physical"  # "logical" or "physical"
 SID = "i6qzt3nn20"  # ← 全局宏定义空间
@@ -116,8 +119,8 @@ def to_timestamp(val: str) -> int:
 
 def log(msg: str):
     print(msg)
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {msg}\n")
+    level = "error" if re.search(r"ERROR|FAIL|失败|异常", msg) else "info"
+    log_event(level, msg, source="version3")
 
 # ---------- 自动重命名 ----------
 def try_rename_from_sql(file_path: Path) -> Path:
@@ -133,6 +136,9 @@ def try_rename_from_sql(file_path: Path) -> Path:
         log(f"[SKIP_RENAME] {file_path.name} → {new_path.name} 已存在，跳过。")
         return new_path
     file_path.rename(new_path)
+    old_manifest = manifest_path(file_path)
+    if old_manifest.exists():
+        old_manifest.rename(manifest_path(new_path))
     log(f"[RENAME] {file_path.name} → {new_path.name}")
     return new_path
 
@@ -167,7 +173,10 @@ def parse_sql_file(file_path: Path) -> List[Tuple[str, str, str, str, str, int,
     """
     解析 SQL 文件 -> [(uuid, sid, type, name, data, del, input_ts, update_ts)]
     """
-    text = safe_read_sql(file_path)
+    return parse_sql_text(safe_read_sql(file_path))
+
+def parse_sql_text(text: str) -> List[Tuple[str, str, str, str, str, int, int, int]]:
+    """解析 SQL 文本（整文件或一个分片）"""
     matches = INSERT_RE.finditer(text)
     entities = []
 
@@ -244,7 +253,8 @@ def ensure_table(conn):
     with conn.cursor() as cur:
         cur.execute(sql)
 
-def insert_entities(rows):
+def insert_entities(rows) -> bool:
+    """批量写入 entity，成功返回 True；失败时回滚、记 [ERROR_INSERT] 并返回 False"""
     conn = pymysql.connect(**MYSQL_CFG)
     try:
         ensure_table(conn)
@@ -256,9 +266,11 @@ def insert_entities(rows):
         with conn.cursor() as cur:
             cur.executemany(sql, rows)
         conn.commit()
+        return True
     except Exception as e:
         conn.rollback()
         log(f"[ERROR_INSERT] {e}")
+        return False
     finally:
         conn.close()
 
@@ -283,6 +295,28 @@ def sync_state(data: List[str]):
     log(f"🔄 状态文件已同步，共 {len(data)} 张表。")
 
 # ---------- 主处理 ----------
+def _import_shard(file_path: Path, shard: dict) -> int:
+    rows = parse_sql_text(read_shard_text(file_path, shard))
+    if rows and not insert_entities(rows):
+        raise RuntimeError(f"写入失败（{len(rows)} 条）")
+    return len(rows)
+
+def process_shards(file_path: Path, manifest: dict) -> Tuple[int, int]:
+    """按分片清单并行解析 + 写入同一张表，返回 (总条数, 失败分片数)"""
+    shards = manifest["shards"]
+    total = 0
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(SHARD_THREADS, len(shards)))) as ex:
+        futs = {ex.submit(_import_shard, file_path, s): s for s in shards}
+        for fut in as_completed(futs):
+            s = futs[fut]
+            try:
+                total += fut.result()
+            except Exception as e:
+                failed += 1
+                log(f"[ERROR_SHARD] {file_path.name}#{s.get('index')}: {e}")
+    return total, failed
+
 def process_file(file_path: Path, allowed: Set[str]) -> str:
     try:
         real_path = try_rename_from_sql(file_path)
@@ -290,6 +324,21 @@ def process_file(file_path: Path, allowed: Set[str]) -> str:
         if ENABLED_TABLES and table not in ENABLED_TABLES:
             log(f"[SKIP] {table} 不在 custom_handler 启用列表中。")
             return None
+        manifest = load_shard_manifest(real_path)
+        if manifest and len(manifest["shards"]) > 1:
+            if allowed and table not in allowed:
+                log(f"[SKIP] {table} 不在允许列表中。")
+                return None
+            n, failed = process_shards(real_path, manifest)
+            if failed:
+                # 有分片失败时不标记为已导入，下次运行重新导入整表
+                log(f"[ERROR] {table}: {failed}/{len(manifest['shards'])} 个分片失败（已写入 {n} 条）。")
+                return None
+            if not n:
+                log(f"[EMPTY] {table} 无有效记录。")
+                return table
+            log(f"[OK] {table}: {n} 条导入成功（{len(manifest['shards'])} 个分片）。")
+            return table
         rows = parse_sql_file(real_path)
         if allowed and table not in allowed:
             log(f"[SKIP] {table} 不在允许列表中。")
@@ -297,7 +346,9 @@ def process_file(file_path: Path, allowed: Set[str]) -> str:
         if not rows:
             log(f"[EMPTY] {table} 无有效记录。")
             return table
-        insert_entities(rows)
+        if not insert_entities(rows):
+            log(f"[ERROR] {table}: 写入失败。")
+            return None
         log(f"[OK] {table}: {len(rows)} 条导入成功。")
         return table
     except Exception as e: